@@ -0,0 +1,300 @@
+"""
+Alíquotas de IBS por localidade (UF e município).
+ALIQUOTA_PADRAO ajusta a alíquota de referência (ALIQUOTA_REFERENCIA) de um
+tributo numa UF (IBSUF) ou num município (IBSMun), por substituição, acréscimo
+ou decréscimo. Os ajustes são indexados uma única vez por
+(tributo, UF, município) e vigência, de modo que a alíquota de um item
+(NCM, UF, município, data) é resolvida em memória, sem SQL: referência
+vigente -> ajustes da UF e do município -> percentual de redução da
+classificação.
+"""
+
+from typing import NamedTuple, Optional
+
+import modelos
+import vigencia
+from taxas_efetivas import calcular_aliquota_efetiva
+
+SUBSTITUICAO = "SUBSTITUICAO"
+ACRESCIMO = "ACRESCIMO"
+DECRESCIMO = "DECRESCIMO"
+
+
+class AliquotaLocal(NamedTuple):
+    """Alíquota de um tributo para a classificação e a localidade do item."""
+    cclasstrib: Optional[str]
+    tributo: str
+    aliquota_referencia: float
+    ajustes: tuple
+    aliquota: float
+    reducao: Optional[float]
+    aliquota_efetiva: float
+
+
+def aplicar_ajuste(aliquota, valor, forma_aplicacao):
+    """
+    Aplica um ajuste de ALIQUOTA_PADRAO à alíquota.
+
+    Args:
+        aliquota: Alíquota atual, em percentual
+        valor: ALPA_VALOR
+        forma_aplicacao: SUBSTITUICAO, ACRESCIMO ou DECRESCIMO
+
+    Raises:
+        ValueError: Se a forma de aplicação não for conhecida
+    """
+    if forma_aplicacao == SUBSTITUICAO:
+        return valor
+    if forma_aplicacao == ACRESCIMO:
+        return aliquota + valor
+    if forma_aplicacao == DECRESCIMO:
+        return max(aliquota - valor, 0.0)
+    raise ValueError(f"Forma de aplicação desconhecida: {forma_aplicacao}")
+
+
+class ResolvedorAliquotasLocais:
+    """
+    Resolve as alíquotas de CBS/IBS de um NCM numa UF e município.
+
+    Args:
+        conn: Conexão com o banco (lê UF, MUNICIPIO e ALIQUOTA_PADRAO)
+        base: snapshot.SnapshotBanco com as regras, alíquotas de referência e reduções
+    """
+
+    def __init__(self, conn, base):
+        self.base = base
+        cur = conn.cursor()
+
+        cur.execute("SELECT UF_CD, UF_SIGLA FROM UF")
+        self.uf_por_sigla = {}
+        self.ufs = set()
+        for uf_cd, sigla in cur.fetchall():
+            self.uf_por_sigla[sigla.upper()] = uf_cd
+            self.ufs.add(uf_cd)
+
+        cur.execute("SELECT MUNI_CD, MUNI_UF_CD FROM MUNICIPIO")
+        self.uf_por_municipio = dict(cur.fetchall())
+
+        tributo_por_aliquota = {
+            linha[0]: tbto_id
+            for tbto_id, linhas in base.aliquotas_por_tributo.items() for linha in linhas
+        }
+        self._tributo_por_sigla = {sigla: tbto_id for tbto_id, (sigla, _) in base.tributos.items()}
+
+        # (TBTO_ID, UF_CD, None) ou (TBTO_ID, None, MUNI_CD) -> (ALRE_ID, VALOR, FORMA_APLICACAO)
+        cur.execute("""
+            SELECT ALPA_ALRE_ID, ALPA_UF_CD, ALPA_MUNI_CD, ALPA_VALOR, ALPA_FORMA_APLICACAO,
+                   ALPA_INICIO_VIGENCIA, ALPA_FIM_VIGENCIA
+            FROM ALIQUOTA_PADRAO
+            ORDER BY ALPA_ID
+        """)
+        registros = []
+        for alre_id, uf_cd, muni_cd, valor, forma, inicio, fim in cur.fetchall():
+            tbto_id = tributo_por_aliquota.get(alre_id)
+            if tbto_id is None:
+                continue
+            chave = (tbto_id, None, muni_cd) if muni_cd is not None else (tbto_id, uf_cd, None)
+            registros.append((chave, inicio, fim, (alre_id, modelos.para_numero(valor), forma)))
+        self.ajustes = vigencia.IndiceIntervalos(registros)
+        self._ufs_com_ajuste = {chave[1] for chave, _, _, _ in registros if chave[1] is not None}
+        self._municipios_com_ajuste = {chave[2] for chave, _, _, _ in registros if chave[2] is not None}
+
+        self._pontos = sorted(set(base.indices_vigencia().pontos) | self.ajustes.pontos())
+        self._aliquotas = {}
+        self._reducoes = {}
+
+    def normalizar_local(self, uf=None, municipio=None):
+        """
+        Converte a localidade informada nos códigos do IBGE.
+
+        Args:
+            uf: Sigla (RS) ou código (43) da UF, opcional se o município for informado
+            municipio: Código IBGE do município, opcional
+
+        Returns:
+            Tupla (UF_CD, MUNI_CD); MUNI_CD é None se o município não for informado
+
+        Raises:
+            ValueError: Se a UF ou o município não existirem ou não forem compatíveis
+        """
+        uf_cd = None
+        if uf is not None and str(uf).strip():
+            texto = str(uf).strip().upper()
+            uf_cd = int(texto) if texto.isdigit() else self.uf_por_sigla.get(texto)
+            if uf_cd not in self.ufs:
+                raise ValueError(f"UF inválida: {uf}")
+
+        muni_cd = None
+        if municipio is not None and str(municipio).strip():
+            texto = str(municipio).strip()
+            muni_cd = int(texto) if texto.isdigit() else None
+            uf_municipio = self.uf_por_municipio.get(muni_cd)
+            if uf_municipio is None:
+                raise ValueError(f"Município inválido: {municipio}")
+            if uf_cd is not None and uf_cd != uf_municipio:
+                raise ValueError(f"O município {municipio} não pertence à UF {uf}")
+            uf_cd = uf_municipio
+        return uf_cd, muni_cd
+
+    def aliquota_local(self, tbto_id, uf_cd, muni_cd, data):
+        """
+        Retorna (aliquota_referencia, ajustes, aliquota) do tributo na localidade e data,
+        ou None se não houver alíquota de referência vigente.
+        Os ajustes da UF são aplicados antes dos do município; apenas os ajustes
+        da alíquota de referência vigente são considerados.
+        """
+        # Localidades sem ajuste compartilham a mesma entrada do cache
+        if (tbto_id, uf_cd, None) not in self.ajustes:
+            uf_cd = None
+        if (tbto_id, None, muni_cd) not in self.ajustes:
+            muni_cd = None
+        chave = (tbto_id, uf_cd, muni_cd, vigencia.normalizar_data(self._pontos, data))
+        if chave in self._aliquotas:
+            return self._aliquotas[chave]
+
+        referencias = self.base.indices_vigencia().aliquotas.vigentes(tbto_id, data)
+        resultado = None
+        if referencias:
+            # A alíquota de referência iniciada por último prevalece
+            alre_id, valor = referencias[-1][:2]
+            referencia = modelos.para_numero(valor)
+            if referencia is not None:
+                aliquota = referencia
+                ajustes = []
+                for chave_ajuste in ((tbto_id, uf_cd, None), (tbto_id, None, muni_cd)):
+                    for alre_ajuste, valor_ajuste, forma in self.ajustes.vigentes(chave_ajuste, data):
+                        if alre_ajuste == alre_id and valor_ajuste is not None:
+                            aliquota = aplicar_ajuste(aliquota, valor_ajuste, forma)
+                            ajustes.append((forma, valor_ajuste))
+                resultado = (referencia, tuple(ajustes), aliquota)
+        self._aliquotas[chave] = resultado
+        return resultado
+
+    def _reducoes_classificacao(self, cltr_id, data):
+        """Retorna {TBTO_ID: maior percentual de redução vigente} da classificação."""
+        chave = (cltr_id, vigencia.normalizar_data(self._pontos, data))
+        reducoes = self._reducoes.get(chave)
+        if reducoes is None:
+            reducoes = {}
+            for tbto_id, valor, _, _ in self.base.indices_vigencia().reducoes.vigentes(cltr_id, data):
+                valor = modelos.para_numero(valor)
+                if valor is not None and valor > reducoes.get(tbto_id, -1.0):
+                    reducoes[tbto_id] = valor
+            self._reducoes[chave] = reducoes
+        return reducoes
+
+    def _aliquotas_tributos(self, cclasstrib, tributos, reducoes, uf_cd, muni_cd, data):
+        aliquotas = []
+        for tbto_id in tributos:
+            tributo = self.base.tributos.get(tbto_id)
+            local = self.aliquota_local(tbto_id, uf_cd, muni_cd, data) if tributo else None
+            if local is None:
+                continue
+            referencia, ajustes, aliquota = local
+            reducao = reducoes.get(tbto_id)
+            aliquotas.append(AliquotaLocal(
+                cclasstrib, tributo[0], referencia, ajustes, aliquota, reducao,
+                calcular_aliquota_efetiva(aliquota, reducao if reducao is not None else 0.0),
+            ))
+        aliquotas.sort(key=lambda a: a.tributo)
+        return aliquotas
+
+    def _aliquotas_classificacao(self, cltr_id, uf_cd, muni_cd, data):
+        classificacao = self.base.classificacoes[cltr_id]
+        sitr_id = classificacao[9]
+        tributos = self.base.tributos_por_situacao.get(sitr_id, []) if sitr_id in self.base.situacoes else []
+        return self._aliquotas_tributos(classificacao[0], tributos,
+                                        self._reducoes_classificacao(cltr_id, data), uf_cd, muni_cd, data)
+
+    def aliquotas_ncm(self, codigo, data, uf=None, municipio=None, incluir_herdadas=True):
+        """
+        Retorna as alíquotas de todas as classificações aplicáveis ao NCM na localidade.
+
+        Args:
+            codigo: Código do NCM
+            data: Data (YYYY-MM-DD) da operação
+            uf: Sigla ou código da UF
+            municipio: Código IBGE do município
+            incluir_herdadas: Se True, considera também as regras dos prefixos do NCM
+
+        Returns:
+            Lista de AliquotaLocal ordenada por cClassTrib e tributo; vazia se o NCM
+            não vigorar na data
+        """
+        uf_cd, muni_cd = self.normalizar_local(uf, municipio)
+        if self.base.buscar_ncm(codigo, data) is None:
+            return []
+        vistos = set()
+        aliquotas = []
+        for regra in self.base.regras_ncm(codigo, incluir_herdadas, data):
+            cltr_id = regra[2]
+            if cltr_id in vistos or cltr_id not in self.base.classificacoes:
+                continue
+            vistos.add(cltr_id)
+            aliquotas.extend(self._aliquotas_classificacao(cltr_id, uf_cd, muni_cd, data))
+        aliquotas.sort(key=lambda a: (a.cclasstrib, a.tributo))
+        return aliquotas
+
+    def taxas(self, codigo, cclasstrib, data, uf=None, municipio=None):
+        """
+        Retorna as alíquotas de um item, por sigla do tributo.
+        Sem cClassTrib, aplica a tributação integral (alíquota local sem redução).
+
+        Returns:
+            Dicionário {sigla: AliquotaLocal}, ou None se o NCM ou a classificação
+            não vigorar na data
+        """
+        uf_cd, muni_cd = self.normalizar_local(uf, municipio)
+        return self._taxas(codigo, cclasstrib, data, uf_cd, muni_cd)
+
+    def _taxas(self, codigo, cclasstrib, data, uf_cd, muni_cd):
+        if self.base.buscar_ncm(codigo, data) is None:
+            return None
+        if cclasstrib is None:
+            aliquotas = self._aliquotas_tributos(None, self._tributo_por_sigla.values(), {}, uf_cd, muni_cd, data)
+            return {aliquota.tributo: aliquota for aliquota in aliquotas}
+        for regra in self.base.regras_ncm(codigo, True, data):
+            classificacao = self.base.classificacoes.get(regra[2])
+            if classificacao is not None and classificacao[0] == cclasstrib:
+                aliquotas = self._aliquotas_classificacao(regra[2], uf_cd, muni_cd, data)
+                return {aliquota.tributo: aliquota for aliquota in aliquotas}
+        return None
+
+    def _local_efetivo(self, uf_cd, muni_cd):
+        """Descarta da localidade a UF e o município sem ajuste cadastrado (não mudam a alíquota)."""
+        return (uf_cd if uf_cd in self._ufs_com_ajuste else None,
+                muni_cd if muni_cd in self._municipios_com_ajuste else None)
+
+    def resolver_lote(self, itens):
+        """
+        Resolve as alíquotas de um lote de itens. Combinações repetidas — incluindo
+        localidades diferentes sem ajuste cadastrado — são resolvidas uma única vez.
+
+        Args:
+            itens: Iterável de (ncm, cclasstrib, data, uf, municipio)
+
+        Returns:
+            Lista com o resultado de taxas() de cada item, na ordem da entrada
+        """
+        locais = {}
+        resolvidos = {}
+        resultado = []
+        for codigo, cclasstrib, data, uf, municipio in itens:
+            local = locais.get((uf, municipio))
+            if local is None:
+                local = locais[(uf, municipio)] = self._local_efetivo(*self.normalizar_local(uf, municipio))
+            chave = (codigo, cclasstrib, data) + local
+            taxas = resolvidos.get(chave)
+            if taxas is None and chave not in resolvidos:
+                taxas = resolvidos[chave] = self._taxas(codigo, cclasstrib, data, *local)
+            resultado.append(taxas)
+        return resultado
+
+    def estatisticas(self):
+        """Retorna o tamanho do índice de ajustes e dos caches."""
+        return {
+            'ajustes': self.ajustes.estatisticas(),
+            'municipios': len(self.uf_por_municipio),
+            'aliquotas_em_cache': len(self._aliquotas),
+            'reducoes_em_cache': len(self._reducoes),
+        }
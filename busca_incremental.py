@@ -0,0 +1,218 @@
+"""
+Busca incremental por descrição (pesquisa enquanto o usuário digita).
+Quando a nova consulta apenas estende uma consulta recente ("arro" -> "arroz",
+"arroz" -> "arroz quebrado"), o resultado é obtido filtrando em memória o
+resultado anterior, sem voltar ao banco. As consultas recentes ficam num
+cache LRU pequeno, e o resultado entregue é limitado, com a indicação de
+que há mais itens disponíveis.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import NamedTuple
+
+# Quantidade de consultas recentes mantidas para refinamento em memória
+TAMANHO_CACHE = 32
+
+# Acima desta quantidade de itens, refazer a consulta no índice é mais rápido
+# do que filtrar o resultado anterior em memória
+LIMITE_REFINAMENTO = 1000
+
+# Quantidade máxima de itens entregues por busca
+LIMITE_RESULTADOS = 200
+
+# Quantidade mínima de caracteres para a pesquisa enquanto digita
+TAMANHO_MINIMO_TEXTO = 2
+
+# Espera, em milissegundos, após a última tecla antes de disparar a busca
+ATRASO_DEBOUNCE_MS = 250
+
+_PADRAO_PALAVRA = re.compile(r"\w+")
+
+
+class ResultadoBusca(NamedTuple):
+    """Resultado limitado de uma busca incremental."""
+    itens: list
+    total: int
+    ha_mais: bool
+    refinado: bool
+
+
+def normalizar(texto):
+    """Remove acentos, converte para minúsculas e separa as palavras do texto."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return _PADRAO_PALAVRA.findall(sem_acentos.casefold())
+
+
+def texto_pesquisavel(descricao):
+    """Retorna a descrição normalizada com cada palavra precedida de espaço (" agua mineral")."""
+    return " " + " ".join(normalizar(descricao))
+
+
+def descricao_contem(pesquisavel, termos):
+    """
+    Indica se cada termo é prefixo de alguma palavra da descrição (mesma regra do índice FTS5).
+
+    Args:
+        pesquisavel: Descrição já convertida por texto_pesquisavel
+        termos: Termos normalizados da consulta
+    """
+    return all(" " + termo in pesquisavel for termo in termos)
+
+
+def estende_consulta(termos_anteriores, termos):
+    """
+    Indica se a consulta nova só pode ter resultados contidos na anterior:
+    mesmos termos, com o último possivelmente mais longo, e termos extras no fim.
+    """
+    if not termos_anteriores or len(termos) < len(termos_anteriores):
+        return False
+    ultimo = len(termos_anteriores) - 1
+    return (termos[:ultimo] == termos_anteriores[:ultimo]
+            and termos[ultimo].startswith(termos_anteriores[ultimo]))
+
+
+class BuscaIncremental:
+    """
+    Motor de busca incremental sobre uma função de busca por descrição.
+
+    Args:
+        funcao_busca: Função texto -> lista de (codigo, descricao, ...), em ordem de relevância
+        tamanho_cache: Quantidade de consultas recentes mantidas (LRU)
+        obter_versao: Função opcional que retorna a versão dos dados; o cache é
+                      descartado quando ela muda
+    """
+
+    def __init__(self, funcao_busca, tamanho_cache=TAMANHO_CACHE, obter_versao=None):
+        self._funcao_busca = funcao_busca
+        self._tamanho_cache = tamanho_cache
+        self._obter_versao = obter_versao
+        self._versao = None
+        self._cache = OrderedDict()
+        self._pesquisaveis = {}
+        self._trava = threading.Lock()
+        self.consultas_banco = 0
+        self.refinamentos = 0
+        self.acertos = 0
+
+    def _pesquisavel(self, item):
+        """Retorna (com cache) a descrição normalizada do item."""
+        pesquisavel = self._pesquisaveis.get(item[0])
+        if pesquisavel is None:
+            pesquisavel = self._pesquisaveis[item[0]] = texto_pesquisavel(item[1])
+        return pesquisavel
+
+    def _verificar_versao(self):
+        """Descarta o cache se a versão dos dados mudou."""
+        if self._obter_versao is None:
+            return
+        versao = self._obter_versao()
+        if versao != self._versao:
+            self._cache.clear()
+            self._pesquisaveis.clear()
+            self._versao = versao
+
+    def resultados(self, texto):
+        """
+        Retorna a lista completa de resultados do texto, refinando em memória quando possível.
+
+        Returns:
+            Tupla (lista de itens, refinado), onde refinado indica que não houve consulta ao banco
+        """
+        termos = tuple(normalizar(texto))
+        with self._trava:
+            self._verificar_versao()
+
+            itens = self._cache.get(termos)
+            if itens is not None:
+                self._cache.move_to_end(termos)
+                self.acertos += 1
+                return itens, True
+
+            # Consulta recente mais específica que ainda contém a nova
+            base = None
+            for anteriores in reversed(self._cache):
+                candidata = self._cache[anteriores]
+                if (estende_consulta(anteriores, termos) and len(candidata) <= LIMITE_REFINAMENTO
+                        and (base is None or len(candidata) < len(base))):
+                    base = candidata
+
+            if base is not None:
+                itens = [item for item in base if descricao_contem(self._pesquisavel(item), termos)]
+                self.refinamentos += 1
+                refinado = True
+            else:
+                refinado = False
+
+        if not refinado:
+            itens = list(self._funcao_busca(texto))
+            self.consultas_banco += 1
+
+        with self._trava:
+            if termos:
+                self._cache[termos] = itens
+                self._cache.move_to_end(termos)
+                while len(self._cache) > self._tamanho_cache:
+                    self._cache.popitem(last=False)
+        return itens, refinado
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS):
+        """
+        Busca o texto e limita a quantidade de itens entregues.
+
+        Returns:
+            ResultadoBusca com os itens (até o limite), o total encontrado e ha_mais
+        """
+        itens, refinado = self.resultados(texto)
+        return ResultadoBusca(itens[:limite], len(itens), len(itens) > limite, refinado)
+
+    def limpar(self):
+        """Descarta as consultas em cache."""
+        with self._trava:
+            self._cache.clear()
+            self._pesquisaveis.clear()
+
+    def estatisticas(self):
+        """Retorna os contadores de uso do motor de busca."""
+        return {
+            'consultas_em_cache': len(self._cache),
+            'consultas_banco': self.consultas_banco,
+            'refinamentos': self.refinamentos,
+            'acertos': self.acertos,
+        }
+
+
+class Debounce:
+    """
+    Adia a execução de uma função até que as chamadas parem por um intervalo.
+    Usa widget.after/after_cancel, de modo que a função roda na thread do Tk.
+
+    Args:
+        widget: Qualquer widget Tk (usado para agendar)
+        funcao: Função chamada com os argumentos da última chamada a agendar
+        atraso_ms: Intervalo sem novas chamadas antes de executar
+    """
+
+    def __init__(self, widget, funcao, atraso_ms=ATRASO_DEBOUNCE_MS):
+        self.widget = widget
+        self.funcao = funcao
+        self.atraso_ms = atraso_ms
+        self._agendamento = None
+
+    def agendar(self, *args):
+        """Cancela a execução pendente e agenda uma nova."""
+        self.cancelar()
+        self._agendamento = self.widget.after(self.atraso_ms, self._executar, *args)
+
+    def cancelar(self):
+        """Cancela a execução pendente, se houver."""
+        if self._agendamento is not None:
+            self.widget.after_cancel(self._agendamento)
+            self._agendamento = None
+
+    def _executar(self, *args):
+        self._agendamento = None
+        self.funcao(*args)
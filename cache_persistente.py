@@ -0,0 +1,619 @@
+"""
+Cache persistente dos resultados resolvidos por NCM.
+Os resultados das consultas por NCM (com os argumentos padrão) são gravados
+num arquivo ao lado do banco principal (calculadora.db ->
+calculadora_resultados.bin), mapeado em memória na primeira consulta: o
+primeiro acesso de um processo recém-iniciado custa uma busca binária no
+mapa e a leitura do resultado, sem abrir conexão nem executar JOINs.
+
+Formato do arquivo:
+    MARCA_ARQUIVO (8 bytes) | tamanho do cabeçalho (uint32) | cabeçalho (marshal) | corpo
+O cabeçalho traz a versão da base, a assinatura e o resumo do conteúdo do
+arquivo do banco, o resumo do código que gerou os resultados e, por consulta,
+a posição do seu índice no corpo. Cada índice é uma sequência de registros de
+tamanho fixo (código com 8 bytes, posição, tamanho) ordenados pelo código; os
+resultados ficam no fim do corpo, gravados com marshal como dados simples
+(ver codificar) e recriados como modelos na leitura, sem pickle: ler o
+arquivo nunca executa código.
+
+O arquivo vale enquanto o código (modelos e módulos das consultas) for o
+mesmo e a assinatura do banco (data de modificação e tamanho do arquivo e do
+-wal) for a gravada; se a assinatura mudar, vale apenas se a versão em
+VERSAO_BASE_DADO e o conteúdo do banco forem os mesmos. Um arquivo ausente
+ou desatualizado é ignorado (as consultas são respondidas pelo banco) até
+ser reconstruído explicitamente: por aquecer(), chamado na partida das
+interfaces, do serviço HTTP e da consulta em lote, por reconstruir() ou por:
+    python cache_persistente.py
+Cada construtor grava num temporário próprio (processo e thread), de modo
+que gravações simultâneas não se misturam; a última substitui o arquivo.
+"""
+
+import bisect
+import functools
+import hashlib
+import inspect
+import marshal
+import mmap
+import os
+import struct
+import sys
+import threading
+from pathlib import Path
+
+from snapshot import assinatura_banco
+
+# Sufixo e extensão do arquivo (calculadora.db -> calculadora_resultados.bin)
+SUFIXO_ARQUIVO = "_resultados"
+EXTENSAO_ARQUIVO = ".bin"
+
+# Identifica o formato; muda quando o layout do arquivo ou a codificação dos resultados muda
+MARCA_ARQUIVO = b"CTRES002"
+
+# Tamanho do código no índice (NCMs têm até 8 dígitos)
+TAMANHO_CODIGO = 8
+
+# Tamanho dos blocos lidos no resumo do conteúdo do banco
+TAMANHO_BLOCO_LEITURA = 1024 * 1024
+
+_CABECALHO = struct.Struct("<8sI")
+_REGISTRO = struct.Struct("<8sQI")
+
+_ATOMICOS = frozenset((str, bytes, int, float, bool, type(None)))
+
+# Campos que apontam para objetos já recriados (ver codificar)
+_OBJETO = 1
+_TUPLA_OBJETOS = 2
+_LISTA_OBJETOS = 3
+
+
+def caminho_arquivo(caminho_banco):
+    """Retorna o caminho do arquivo de resultados para o banco informado."""
+    caminho = Path(caminho_banco)
+    return str(caminho.with_name(caminho.stem + SUFIXO_ARQUIVO + EXTENSAO_ARQUIVO))
+
+
+def resumo_conteudo_banco(caminho_banco):
+    """
+    Retorna o resumo (BLAKE2b) do conteúdo do banco e do seu -wal.
+
+    Raises:
+        OSError: Se o banco não puder ser lido
+    """
+    resumo = hashlib.blake2b(digest_size=16)
+    for caminho in (caminho_banco, caminho_banco + "-wal"):
+        try:
+            arquivo = open(caminho, "rb")
+        except FileNotFoundError:
+            continue
+        with arquivo:
+            for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_LEITURA), b""):
+                resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def resumo_codigo(tipos, arquivos):
+    """
+    Retorna o resumo dos modelos (nome e campos) e do código-fonte dos arquivos
+    que produzem os resultados; muda quando o modelo ou as consultas mudam.
+
+    Raises:
+        OSError: Se um dos arquivos não puder ser lido
+    """
+    resumo = hashlib.blake2b(MARCA_ARQUIVO, digest_size=16)
+    for tipo in tipos:
+        resumo.update(f"{tipo.__module__}.{tipo.__qualname__}{tipo._fields}".encode())
+    for caminho in sorted(arquivos):
+        with open(caminho, "rb") as arquivo:
+            resumo.update(arquivo.read())
+    return resumo.hexdigest()
+
+
+def _chave(codigo):
+    """Código no formato do índice, ou None se não couber nele."""
+    try:
+        chave = codigo.encode("ascii")
+    except (AttributeError, UnicodeEncodeError):
+        return None
+    if len(chave) > TAMANHO_CODIGO:
+        return None
+    return chave.ljust(TAMANHO_CODIGO, b"\0")
+
+
+# Codificação dos resultados
+
+class _Codificador:
+    """Converte um resultado com modelos numa tabela de objetos gravável com marshal."""
+
+    def __init__(self, tipos):
+        self._nomes = {tipo: tipo.__name__ for tipo in tipos}
+        self.moldes = []
+        self.objetos = []
+        self._moldes = {}
+        self._indices = {}
+
+    def campo(self, valor):
+        """
+        Retorna (modo, valor codificado): 0 para dados sem modelos, gravados como
+        estão; _OBJETO para o índice de um objeto; _TUPLA_OBJETOS ou _LISTA_OBJETOS
+        para os índices de uma sequência só de objetos.
+        """
+        tipo = type(valor)
+        if tipo in _ATOMICOS:
+            return 0, valor
+        if tipo in self._nomes:
+            return _OBJETO, self._objeto(valor)
+        if tipo is tuple or tipo is list:
+            campos = [self.campo(item) for item in valor]
+            if not any(modo for modo, _ in campos):
+                return 0, valor
+            if all(modo == _OBJETO for modo, _ in campos):
+                modo = _TUPLA_OBJETOS if tipo is tuple else _LISTA_OBJETOS
+                return modo, tuple(indice for _, indice in campos)
+            return _OBJETO, self._registrar(tipo.__name__, campos)
+        if tipo is dict:
+            if any(self.campo(item)[0] for item in valor.values()):
+                raise TypeError("Dicionários com modelos não podem ser gravados no cache persistente")
+            return 0, valor
+        raise TypeError(f"Tipo não suportado no cache persistente: {tipo.__name__}")
+
+    def _objeto(self, valor):
+        # Objetos compartilhados entre as regras são gravados uma única vez
+        indice = self._indices.get(id(valor))
+        if indice is None:
+            indice = self._registrar(self._nomes[type(valor)], [self.campo(item) for item in valor])
+            self._indices[id(valor)] = indice
+        return indice
+
+    def _registrar(self, nome, campos):
+        molde = (nome, tuple((posicao, modo) for posicao, (modo, _) in enumerate(campos) if modo))
+        indice_molde = self._moldes.get(molde)
+        if indice_molde is None:
+            indice_molde = self._moldes[molde] = len(self.moldes)
+            self.moldes.append(molde)
+        self.objetos.append((indice_molde, tuple(valor for _, valor in campos)))
+        return len(self.objetos) - 1
+
+
+def codificar(valor, tipos):
+    """
+    Converte um resultado em dados simples (tuplas, listas, dicionários e
+    valores atômicos) graváveis com marshal. Os modelos viram uma tabela de
+    objetos, filhos antes dos pais, e o molde de cada objeto (nome do tipo e
+    campos que apontam para outros objetos) diz como recriá-lo.
+
+    Args:
+        valor: Resultado de uma consulta
+        tipos: Tipos de modelo (NamedTuples) que podem aparecer no resultado
+
+    Returns:
+        (moldes, objetos, modo da raiz, raiz codificada)
+
+    Raises:
+        TypeError: Se o resultado tiver tipos que não podem ser gravados
+    """
+    codificador = _Codificador(tipos)
+    modo, raiz = codificador.campo(valor)
+    return codificador.moldes, codificador.objetos, modo, raiz
+
+
+def _referencia(construidos, modo, valor):
+    if modo == _OBJETO:
+        return construidos[valor]
+    if modo == _TUPLA_OBJETOS:
+        return tuple([construidos[indice] for indice in valor])
+    return [construidos[indice] for indice in valor]
+
+
+def decodificar(dados, construtores):
+    """
+    Recria o resultado convertido por codificar.
+
+    Args:
+        dados: (moldes, objetos, modo da raiz, raiz codificada)
+        construtores: Dicionário {nome do tipo: função que cria o objeto a partir dos campos}
+
+    Raises:
+        KeyError, IndexError, TypeError, ValueError: Se os dados não forem de um resultado codificado
+    """
+    moldes, objetos, modo_raiz, raiz = dados
+    criadores = [(construtores[nome], referencias) for nome, referencias in moldes]
+    construidos = []
+    for indice_molde, campos in objetos:
+        criar, referencias = criadores[indice_molde]
+        if referencias:
+            campos = list(campos)
+            for posicao, modo in referencias:
+                campos[posicao] = _referencia(construidos, modo, campos[posicao])
+        construidos.append(criar(campos))
+    return _referencia(construidos, modo_raiz, raiz) if modo_raiz else raiz
+
+
+def construir_arquivo(caminho, identificacao, consultas, codigos, tipos):
+    """
+    Grava o arquivo de resultados. O arquivo é montado num temporário e só
+    então substitui o anterior (os.replace).
+
+    Args:
+        caminho: Caminho do arquivo de resultados
+        identificacao: Dicionário gravado no cabeçalho (versao, assinatura, conteudo, codigo)
+        consultas: Lista de (nome, função(codigo)) a gravar
+        codigos: Códigos de NCM consultados
+        tipos: Tipos de modelo que podem aparecer nos resultados
+
+    Returns:
+        Quantidade de resultados gravados
+    """
+    chaves = sorted((_chave(codigo), codigo) for codigo in codigos if _chave(codigo) is not None)
+    indices = []
+    dados = []
+    posicao = 0
+    for nome, funcao in consultas:
+        registros = []
+        for chave, codigo in chaves:
+            bloco = marshal.dumps(codificar(funcao(codigo), tipos))
+            registros.append(_REGISTRO.pack(chave, posicao, len(bloco)))
+            dados.append(bloco)
+            posicao += len(bloco)
+        indices.append((nome, b"".join(registros)))
+
+    # Posições relativas ao início do corpo; os resultados vêm depois dos índices
+    tamanho_indices = sum(len(registros) for _, registros in indices)
+    posicoes = {}
+    inicio = 0
+    for nome, registros in indices:
+        posicoes[nome] = (inicio, len(registros) // _REGISTRO.size)
+        inicio += len(registros)
+    cabecalho = marshal.dumps(dict(identificacao, consultas=posicoes, inicio_dados=tamanho_indices))
+
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(_CABECALHO.pack(MARCA_ARQUIVO, len(cabecalho)))
+            arquivo.write(cabecalho)
+            for _, registros in indices:
+                arquivo.write(registros)
+            for bloco in dados:
+                arquivo.write(bloco)
+        os.replace(temporario, caminho)
+    except OSError:
+        _remover(temporario)
+        raise
+    return len(dados)
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def ler_cabecalho(mapa):
+    """Retorna (cabeçalho, início do corpo) do arquivo mapeado, ou None se o formato não for reconhecido."""
+    try:
+        marca, tamanho = _CABECALHO.unpack_from(mapa, 0)
+        if marca != MARCA_ARQUIVO:
+            return None
+        cabecalho = marshal.loads(mapa[_CABECALHO.size:_CABECALHO.size + tamanho])
+    except (struct.error, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(cabecalho, dict):
+        return None
+    return cabecalho, _CABECALHO.size + tamanho
+
+
+class _Indice:
+    """Visão de sequência das chaves de um índice, para a busca binária no mapa."""
+
+    def __init__(self, mapa, inicio, quantidade):
+        self._mapa = mapa
+        self._inicio = inicio
+        self._quantidade = quantidade
+
+    def __len__(self):
+        return self._quantidade
+
+    def __getitem__(self, posicao):
+        inicio = self._inicio + posicao * _REGISTRO.size
+        return self._mapa[inicio:inicio + TAMANHO_CODIGO]
+
+    def registro(self, posicao):
+        return _REGISTRO.unpack_from(self._mapa, self._inicio + posicao * _REGISTRO.size)
+
+
+# Cache
+
+class CachePersistente:
+    """
+    Resultados por NCM gravados em disco e mapeados em memória.
+
+    Args:
+        caminho_banco: Caminho do banco principal (calculadora.db)
+        obter_versao: Função que retorna a versão atual da base
+        listar_codigos: Função que retorna os códigos de NCM a gravar
+        caminho: Caminho do arquivo de resultados; por padrão, ao lado do banco
+        tipos: Tipos de modelo (NamedTuples) que podem aparecer nos resultados
+        arquivos_codigo: Arquivos-fonte que, além dos das consultas decoradas,
+                         determinam os resultados (ex.: modelos.py)
+        liberar_recursos: Função chamada ao fim de cada reconstrução, na thread
+                          que a executou (ex.: fechar a conexão usada por ela)
+    """
+
+    def __init__(self, caminho_banco, obter_versao, listar_codigos, caminho=None, tipos=(),
+                 arquivos_codigo=(), liberar_recursos=None):
+        self.caminho_banco = caminho_banco
+        self.caminho = caminho or caminho_arquivo(caminho_banco)
+        self.ativo = True
+        self._obter_versao = obter_versao
+        self._listar_codigos = listar_codigos
+        self._tipos = tuple(tipos)
+        self._construtores = {'tuple': tuple, 'list': list}
+        self._construtores.update((tipo.__name__, tipo._make) for tipo in self._tipos)
+        self._arquivos_codigo = {os.path.abspath(__file__)}
+        self._arquivos_codigo.update(os.path.abspath(caminho) for caminho in arquivos_codigo)
+        self._resumo_codigo = None
+        self._liberar_recursos = liberar_recursos
+        self._consultas = {}
+        self._trava = threading.Lock()
+        self._mapa = None
+        self._cabecalho = None
+        self._assinatura_confirmada = None
+        self._indices = {}
+        self._inicio_dados = 0
+        self._aberto = False
+        self._construcao = None
+        self.acertos = 0
+        self.falhas = 0
+        self.reconstrucoes = 0
+        self.erro = None
+
+    # Arquivo
+
+    def _codigo_atual(self):
+        """Resumo do código que produz os resultados, calculado uma vez por processo."""
+        if self._resumo_codigo is None:
+            self._resumo_codigo = resumo_codigo(self._tipos, self._arquivos_codigo)
+        return self._resumo_codigo
+
+    def _valido(self, cabecalho):
+        """
+        O arquivo vale se foi gravado pelo código atual e o banco não mudou ou,
+        tendo mudado de assinatura, se a versão e o conteúdo do banco são os mesmos.
+        """
+        try:
+            if cabecalho.get('codigo') != self._codigo_atual():
+                return False
+            assinatura = assinatura_banco(self.caminho_banco)
+            if cabecalho.get('assinatura') != assinatura and (
+                    cabecalho.get('versao') != self._obter_versao()
+                    or cabecalho.get('conteudo') != resumo_conteudo_banco(self.caminho_banco)):
+                return False
+        except OSError:
+            return False
+        self._assinatura_confirmada = assinatura
+        return True
+
+    def _mapear(self):
+        """Mapeia o arquivo se ele existir e estiver válido. Chamado com a trava."""
+        self._desmapear()
+        try:
+            with open(self.caminho, "rb") as arquivo:
+                mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        lido = ler_cabecalho(mapa)
+        if lido is None or not self._valido(lido[0]):
+            mapa.close()
+            return False
+        cabecalho, inicio_corpo = lido
+        self._mapa = mapa
+        self._cabecalho = cabecalho
+        self._indices = {nome: _Indice(mapa, inicio_corpo + inicio, quantidade)
+                         for nome, (inicio, quantidade) in cabecalho['consultas'].items()}
+        self._inicio_dados = inicio_corpo + cabecalho['inicio_dados']
+        return True
+
+    def _desmapear(self):
+        if self._mapa is not None:
+            self._mapa.close()
+        self._mapa = None
+        self._cabecalho = None
+        self._assinatura_confirmada = None
+        self._indices = {}
+
+    def abrir(self):
+        """
+        Mapeia o arquivo de resultados. Um arquivo ausente ou desatualizado é
+        ignorado, sem reconstrução (ver aquecer).
+
+        Returns:
+            True se o arquivo foi mapeado
+        """
+        with self._trava:
+            self._aberto = True
+            return self._mapear()
+
+    def aquecer(self, esperar=False):
+        """
+        Mapeia o arquivo de resultados; se ele não existir ou estiver
+        desatualizado, reconstrói-o em segundo plano.
+
+        Args:
+            esperar: Se True, aguarda o fim da reconstrução
+
+        Returns:
+            True se o arquivo já estava válido
+        """
+        if self.abrir():
+            return True
+        self.reconstruir(esperar)
+        return False
+
+    def versao_confirmada(self):
+        """
+        Retorna a versão gravada no arquivo se o banco não mudou desde a sua
+        validação, dispensando a leitura de VERSAO_BASE_DADO; caso contrário, None.
+        """
+        if not self._aberto:
+            self.abrir()
+        cabecalho = self._cabecalho
+        assinatura = self._assinatura_confirmada
+        try:
+            if cabecalho is not None and assinatura == assinatura_banco(self.caminho_banco):
+                return cabecalho['versao']
+        except OSError:
+            pass
+        return None
+
+    def verificar(self):
+        """Revalida o arquivo mapeado (após uma mudança na base), deixando de usá-lo se não valer mais."""
+        with self._trava:
+            if self._cabecalho is not None and not self._valido(self._cabecalho):
+                self._desmapear()
+
+    def reconstruir(self, esperar=False):
+        """
+        Reconstrói o arquivo numa thread em segundo plano (uma por vez).
+
+        Args:
+            esperar: Se True, aguarda o fim da reconstrução
+        """
+        with self._trava:
+            if self._construcao is None or not self._construcao.is_alive():
+                self._construcao = threading.Thread(target=self._construir, name="cache-persistente",
+                                                    daemon=True)
+                self._construcao.start()
+            construcao = self._construcao
+        if esperar:
+            construcao.join()
+
+    def _construir(self):
+        # Nome próprio deste processo e desta thread: outro processo pode estar gravando ao mesmo tempo
+        temporario = f"{self.caminho}.{os.getpid()}.{threading.get_ident()}.novo"
+        try:
+            identificacao = {
+                'versao': self._obter_versao(),
+                'assinatura': assinatura_banco(self.caminho_banco),
+                'conteudo': resumo_conteudo_banco(self.caminho_banco),
+                'codigo': self._codigo_atual(),
+            }
+            consultas = list(self._consultas.items())
+            construir_arquivo(temporario, identificacao, consultas, self._listar_codigos(), self._tipos)
+            with self._trava:
+                # O arquivo mapeado é liberado antes da troca (no Windows ele não pode ser substituído)
+                self._desmapear()
+                os.replace(temporario, self.caminho)
+                self._aberto = True
+                self._mapear()
+                self.reconstrucoes += 1
+            self.erro = None
+        except Exception as erro:
+            # Pasta sem permissão de escrita, disco cheio, banco ilegível etc.: as consultas seguem pelo banco
+            _remover(temporario)
+            self.erro = erro
+            print(f"Erro ao gravar o cache persistente {self.caminho}: {erro}", file=sys.stderr)
+        finally:
+            if self._liberar_recursos is not None:
+                self._liberar_recursos()
+
+    def fechar(self):
+        """Desfaz o mapeamento do arquivo (refeito na próxima consulta)."""
+        with self._trava:
+            self._desmapear()
+            self._aberto = False
+
+    # Consulta
+
+    def obter(self, nome, codigo):
+        """
+        Retorna (True, resultado) se o resultado da consulta para o código estiver
+        gravado, ou (False, None).
+        """
+        if not self._aberto:
+            self.abrir()
+        chave = _chave(codigo)
+        with self._trava:
+            indice = self._indices.get(nome)
+            if indice is None or chave is None:
+                self.falhas += 1
+                return False, None
+            posicao = bisect.bisect_left(indice, chave)
+            if posicao == len(indice) or indice[posicao] != chave:
+                self.falhas += 1
+                return False, None
+            _, inicio, tamanho = indice.registro(posicao)
+            inicio += self._inicio_dados
+            bloco = self._mapa[inicio:inicio + tamanho]
+        try:
+            resultado = decodificar(marshal.loads(bloco), self._construtores)
+        except (EOFError, ValueError, TypeError, KeyError, IndexError):
+            # Bloco corrompido: a consulta é respondida pelo banco
+            self.falhas += 1
+            return False, None
+        self.acertos += 1
+        return True, resultado
+
+    def memorizar(self, funcao):
+        """
+        Decora uma consulta por código de NCM: chamadas com os demais argumentos
+        no valor padrão são respondidas pelo arquivo. A função original fica em
+        wrapper.sem_persistencia (e em wrapper.sem_cache) e é a usada para gravar
+        o arquivo; o arquivo-fonte dela entra no resumo do código.
+        """
+        nome = funcao.__qualname__
+        assinatura = inspect.signature(funcao)
+        parametros = list(assinatura.parameters.values())
+        padroes = [(parametro.name, parametro.default) for parametro in parametros[1:]]
+        self._consultas[nome] = funcao
+        self._arquivos_codigo.add(os.path.abspath(funcao.__code__.co_filename))
+        self._resumo_codigo = None
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            if not self.ativo:
+                return funcao(*args, **kwargs)
+            if len(args) == 1 and not kwargs:
+                codigo = args[0]
+            else:
+                try:
+                    argumentos = assinatura.bind(*args, **kwargs).arguments
+                except TypeError:
+                    return funcao(*args, **kwargs)
+                if any(argumentos.get(nome_parametro, padrao) != padrao for nome_parametro, padrao in padroes):
+                    return funcao(*args, **kwargs)
+                codigo = argumentos[parametros[0].name]
+            encontrado, resultado = self.obter(nome, codigo)
+            if encontrado:
+                return resultado
+            return funcao(*args, **kwargs)
+
+        wrapper.sem_persistencia = wrapper.sem_cache = funcao
+        return wrapper
+
+    def estatisticas(self):
+        """Retorna o estado do arquivo e os contadores."""
+        return {
+            'caminho': self.caminho,
+            'versao': self._cabecalho['versao'] if self._cabecalho else None,
+            'mapeado': self._mapa is not None,
+            'bytes': len(self._mapa) if self._mapa is not None else 0,
+            'consultas': sorted(self._indices),
+            'reconstruindo': self._construcao is not None and self._construcao.is_alive(),
+            'reconstrucoes': self.reconstrucoes,
+            'erro': str(self.erro) if self.erro is not None else None,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+        }
+
+
+if __name__ == "__main__":
+    import database
+
+    print("🔄 Reconstruindo o cache persistente de resultados...")
+    database.reconstruir_cache_persistente(esperar=True)
+    estatisticas = database.estatisticas_cache_persistente()
+    database.fechar_conexoes()
+    if estatisticas['erro']:
+        sys.exit(1)
+    print(f"✅ {estatisticas['caminho']}: versão {estatisticas['versao']}, "
+          f"{estatisticas['bytes'] / 1e6:.1f} MB ({', '.join(estatisticas['consultas'])})")
@@ -0,0 +1,367 @@
+"""
+Cache dos resultados das consultas de database.py.
+
+Os resultados ficam em memória por (função, argumentos), limitados em
+quantidade e em bytes estimados, com descarte LRU (menos recente) ou LFU
+(menos frequente). O cache é invalidado sozinho quando o arquivo do banco
+(ou seu -wal) muda de data de modificação ou quando a versão registrada em
+VERSAO_BASE_DADO muda; a verificação é feita no máximo a cada
+INTERVALO_VERIFICACAO segundos, de modo que uma consulta repetida custa
+apenas o acesso ao dicionário.
+
+Quem recebe um resultado recebe cópias das suas listas, dicionários e
+conjuntos, e pode alterá-las sem afetar o cache; tuplas, NamedTuples e demais
+objetos são imutáveis (ou tratados como tais) e compartilhados entre as
+chamadas.
+"""
+
+import functools
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Quantidade máxima de resultados mantidos
+TAMANHO_MAXIMO_ENTRADAS = 4096
+
+# Memória máxima estimada dos resultados mantidos (64 MB)
+TAMANHO_MAXIMO_BYTES = 64 * 1024 * 1024
+
+# Intervalo mínimo (segundos) entre duas verificações do arquivo e da versão da base
+INTERVALO_VERIFICACAO = 1.0
+
+LRU = "lru"
+LFU = "lfu"
+POLITICAS = (LRU, LFU)
+
+_ATOMICOS = frozenset((str, bytes, int, float, bool, type(None)))
+
+# Listas e tuplas maiores que isto são estimadas por uma amostra dos itens
+TAMANHO_AMOSTRA = 32
+
+
+def estimar_tamanho(valor):
+    """
+    Estima a memória ocupada por um resultado, percorrendo tuplas, listas,
+    dicionários, conjuntos e objetos com __dict__/__slots__. Contêineres
+    compartilhados são contados uma única vez; listas e tuplas longas são
+    estimadas por uma amostra de TAMANHO_AMOSTRA itens.
+
+    Args:
+        valor: Resultado de uma consulta
+
+    Returns:
+        Tamanho aproximado em bytes
+    """
+    tamanho = sys.getsizeof
+    vistos = set()
+    pendentes = [(valor, 1.0)]
+    total = 0.0
+    while pendentes:
+        objeto, peso = pendentes.pop()
+        tipo = type(objeto)
+        if tipo in _ATOMICOS:
+            total += tamanho(objeto) * peso
+            continue
+        if id(objeto) in vistos:
+            continue
+        vistos.add(id(objeto))
+        total += tamanho(objeto) * peso
+        if isinstance(objeto, (tuple, list)) and len(objeto) > TAMANHO_AMOSTRA:
+            passo = len(objeto) / TAMANHO_AMOSTRA
+            pendentes.extend((objeto[int(indice * passo)], peso * passo) for indice in range(TAMANHO_AMOSTRA))
+        elif isinstance(objeto, (tuple, list, set, frozenset)):
+            pendentes.extend((item, peso) for item in objeto)
+        elif isinstance(objeto, dict):
+            pendentes.extend((item, peso) for item in objeto.keys())
+            pendentes.extend((item, peso) for item in objeto.values())
+        else:
+            atributos = getattr(objeto, "__dict__", None)
+            if atributos is not None:
+                pendentes.append((atributos, peso))
+            for nome in getattr(tipo, "__slots__", ()):
+                if hasattr(objeto, nome):
+                    pendentes.append((getattr(objeto, nome), peso))
+    return int(total)
+
+
+def _atomicos_ou_linhas(itens):
+    """True se os itens forem atômicos ou tuplas simples de atômicos (linhas de consulta)."""
+    tipos = set(map(type, itens))
+    if tipos <= _ATOMICOS:
+        return True
+    if tipos - _ATOMICOS != {tuple}:
+        return False
+    return _ATOMICOS.issuperset(map(type, itertools.chain.from_iterable(
+        item for item in itens if type(item) is tuple)))
+
+
+def copiador(valor):
+    """
+    Monta a função que copia as partes mutáveis (listas, dicionários e conjuntos)
+    de um resultado, reaproveitando as imutáveis. A estrutura é percorrida uma
+    única vez, ao guardar o resultado; uma lista de linhas de consulta, por
+    exemplo, é copiada por list.copy.
+
+    Args:
+        valor: Resultado de uma consulta
+
+    Returns:
+        Função valor -> cópia, ou None se o resultado não tiver partes mutáveis
+    """
+    tipo = type(valor)
+    if tipo in _ATOMICOS:
+        return None
+    if tipo is list or tipo is dict:
+        itens = list(valor.values()) if tipo is dict else valor
+        if _atomicos_ou_linhas(itens):
+            return tipo.copy
+        planos = [copiador(item) for item in itens]
+        if not any(planos):
+            return tipo.copy
+        if tipo is list:
+            return lambda lista: [plano(item) if plano else item for plano, item in zip(planos, lista)]
+        chaves = list(valor)
+        return lambda dicionario: {chave: plano(dicionario[chave]) if plano else dicionario[chave]
+                                   for chave, plano in zip(chaves, planos)}
+    if tipo is set:
+        return set.copy
+    if isinstance(valor, tuple):
+        if _ATOMICOS.issuperset(map(type, valor)):
+            return None
+        planos = [copiador(item) for item in valor]
+        if not any(planos):
+            return None
+        criar = tipo._make if hasattr(tipo, "_make") else tipo
+        return lambda tupla: criar(plano(item) if plano else item for plano, item in zip(planos, tupla))
+    return None
+
+
+class CacheResultados:
+    """
+    Cache limitado dos resultados das funções de consulta, invalidado quando a base muda.
+
+    Args:
+        caminho_banco: Caminho do arquivo SQLite cuja data de modificação é acompanhada
+        obter_versao: Função que retorna a versão atual da base (VERSAO_BASE_DADO)
+        max_entradas: Quantidade máxima de resultados mantidos
+        max_bytes: Memória máxima estimada dos resultados mantidos
+        politica: LRU (descarta o menos recente) ou LFU (descarta o menos consultado)
+        ao_invalidar: Função chamada (sem argumentos) quando a base muda, opcional
+    """
+
+    def __init__(self, caminho_banco, obter_versao, max_entradas=TAMANHO_MAXIMO_ENTRADAS,
+                 max_bytes=TAMANHO_MAXIMO_BYTES, politica=LRU, ao_invalidar=None,
+                 intervalo_verificacao=INTERVALO_VERIFICACAO):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de descarte inválida: {politica}")
+        self.caminho_banco = caminho_banco
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.politica = politica
+        self.intervalo_verificacao = intervalo_verificacao
+        self.ativo = True
+        self._obter_versao = obter_versao
+        self._ao_invalidar = ao_invalidar
+        self._trava = threading.RLock()
+        # chave -> (resultado, bytes, copiador), na ordem de uso (LRU)
+        self._resultados = OrderedDict()
+        # LFU: chave -> frequência e frequência -> chaves na ordem de chegada
+        self._frequencias = {}
+        self._baldes = {}
+        self._menor_frequencia = 0
+        self.bytes = 0
+        self._assinatura = None
+        self._proxima_verificacao = 0.0
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+        self.invalidacoes = 0
+        self.ignoradas = 0
+
+    # Validade
+
+    def _ler_assinatura(self):
+        """Retorna (versão, mtime do banco, mtime do -wal) da base atual; um -wal vazio conta como ausente."""
+        try:
+            banco = os.stat(self.caminho_banco).st_mtime_ns
+        except OSError:
+            banco = None
+        try:
+            estado_wal = os.stat(self.caminho_banco + "-wal")
+            wal = estado_wal.st_mtime_ns if estado_wal.st_size else None
+        except OSError:
+            wal = None
+        return (self._obter_versao(), banco, wal)
+
+    def verificar(self, forcar=False):
+        """
+        Confere se a base mudou desde a última verificação e, se mudou, esvazia o cache.
+
+        Args:
+            forcar: Se True, verifica mesmo antes de decorrido o intervalo de verificação
+
+        Returns:
+            True se o cache foi invalidado
+        """
+        agora = time.monotonic()
+        if not forcar and agora < self._proxima_verificacao:
+            return False
+        with self._trava:
+            self._proxima_verificacao = agora + self.intervalo_verificacao
+            assinatura = self._ler_assinatura()
+            if assinatura == self._assinatura:
+                return False
+            anterior, self._assinatura = self._assinatura, assinatura
+            if anterior is None:
+                return False
+            self.limpar()
+            self.invalidacoes += 1
+        if self._ao_invalidar is not None:
+            self._ao_invalidar()
+        return True
+
+    @property
+    def versao(self):
+        """Versão da base com que os resultados em cache foram obtidos."""
+        self.verificar()
+        return self._assinatura[0] if self._assinatura else None
+
+    @property
+    def assinatura(self):
+        """(versão, mtime do banco, mtime do -wal) com que os resultados em cache foram obtidos."""
+        self.verificar()
+        return self._assinatura
+
+    # Armazenamento
+
+    def obter(self, chave):
+        """
+        Retorna (True, resultado) se a chave estiver em cache, ou (False, None).
+        As partes mutáveis do resultado são copiadas (ver copiador).
+        Não verifica a validade: quem consulta chama verificar() antes.
+        """
+        with self._trava:
+            item = self._resultados.get(chave)
+            if item is None:
+                self.falhas += 1
+                return False, None
+            self.acertos += 1
+            if self.politica == LRU:
+                self._resultados.move_to_end(chave)
+            else:
+                self._incrementar_frequencia(chave)
+        resultado, _, copiar = item
+        return True, copiar(resultado) if copiar else resultado
+
+    def guardar(self, chave, resultado):
+        """
+        Guarda o resultado, descartando os menos recentes/frequentes acima dos limites.
+
+        Returns:
+            O resultado a entregar a quem consultou: uma cópia das partes mutáveis,
+            de modo que alterá-lo não altere o que ficou em cache
+        """
+        tamanho = estimar_tamanho(resultado)
+        if tamanho > self.max_bytes:
+            self.ignoradas += 1
+            return resultado
+        copiar = copiador(resultado)
+        with self._trava:
+            if chave in self._resultados:
+                self._remover(chave)
+            while self._resultados and (len(self._resultados) >= self.max_entradas
+                                        or self.bytes + tamanho > self.max_bytes):
+                self._remover(self._escolher_descarte())
+                self.descartes += 1
+            self._resultados[chave] = (resultado, tamanho, copiar)
+            self.bytes += tamanho
+            if self.politica == LFU:
+                self._frequencias[chave] = 1
+                self._baldes.setdefault(1, OrderedDict())[chave] = None
+                self._menor_frequencia = 1
+        return copiar(resultado) if copiar else resultado
+
+    def _incrementar_frequencia(self, chave):
+        frequencia = self._frequencias[chave]
+        balde = self._baldes[frequencia]
+        del balde[chave]
+        if not balde:
+            del self._baldes[frequencia]
+            if self._menor_frequencia == frequencia:
+                self._menor_frequencia = frequencia + 1
+        self._frequencias[chave] = frequencia + 1
+        self._baldes.setdefault(frequencia + 1, OrderedDict())[chave] = None
+
+    def _escolher_descarte(self):
+        if self.politica == LRU:
+            return next(iter(self._resultados))
+        if self._menor_frequencia not in self._baldes:
+            self._menor_frequencia = min(self._baldes)
+        return next(iter(self._baldes[self._menor_frequencia]))
+
+    def _remover(self, chave):
+        _, tamanho, _ = self._resultados.pop(chave)
+        self.bytes -= tamanho
+        if self.politica == LFU:
+            frequencia = self._frequencias.pop(chave)
+            balde = self._baldes[frequencia]
+            del balde[chave]
+            if not balde:
+                del self._baldes[frequencia]
+
+    def limpar(self):
+        """Esvazia o cache (os contadores são mantidos)."""
+        with self._trava:
+            self._resultados.clear()
+            self._frequencias.clear()
+            self._baldes.clear()
+            self._menor_frequencia = 0
+            self.bytes = 0
+
+    # Decorador
+
+    def memorizar(self, funcao):
+        """
+        Decora uma função de consulta para que seus resultados passem pelo cache.
+        Chamadas com argumentos não hasheáveis (listas, por exemplo) e exceções
+        não são guardadas. A função sem nenhuma camada de cache (nem esta nem as
+        de baixo, que também expõem sem_cache) fica em wrapper.sem_cache.
+        """
+        nome = funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            if not self.ativo:
+                return funcao(*args, **kwargs)
+            self.verificar()
+            chave = (nome, args, tuple(kwargs.items())) if kwargs else (nome, args)
+            try:
+                encontrado, resultado = self.obter(chave)
+            except TypeError:
+                self.ignoradas += 1
+                return funcao(*args, **kwargs)
+            if encontrado:
+                return resultado
+            return self.guardar(chave, funcao(*args, **kwargs))
+
+        wrapper.sem_cache = getattr(funcao, "sem_cache", funcao)
+        return wrapper
+
+    def estatisticas(self):
+        """Retorna o tamanho, os limites e os contadores do cache."""
+        return {
+            'politica': self.politica,
+            'versao': self._assinatura[0] if self._assinatura else None,
+            'resultados_em_cache': len(self._resultados),
+            'bytes': self.bytes,
+            'max_entradas': self.max_entradas,
+            'max_bytes': self.max_bytes,
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'descartes': self.descartes,
+            'invalidacoes': self.invalidacoes,
+            'ignoradas': self.ignoradas,
+        }
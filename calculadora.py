@@ -6,6 +6,12 @@ Versão atualizada com funcionalidades de CST, CClasTrib, Redução, Alíquotas
 import tkinter as tk
 from tkinter import ttk, messagebox
 import database
+from documento import Documento, aplicar_no_widget
+import modelos
+import relatorios
+import busca_incremental
+from executor_consultas import CANAL_BUSCA, CANAL_CONSULTA, ExecutorConsultas
+from lista_virtual import ListaVirtual
 
 # Configurações de estilo
 COR_PRIMARIA = "#2c3e50"
@@ -46,8 +52,17 @@ class CalculadoraTributariaCompleta:
         self.btn_buscar_desc = None
         self.btn_listar_todos = None
         self.modo_consulta = tk.StringVar(value="cst_cclastrib")
+        self.debounce_busca = None
+        self.barra_progresso = None
         
         self.criar_widgets()
+        
+        # Consultas ao banco rodam fora da thread do Tk
+        self.executor = ExecutorConsultas(self.janela, ao_mudar_estado=self.indicar_ocupado)
+        self.janela.protocol("WM_DELETE_WINDOW", self.fechar)
+        
+        # Mapeia os resultados gravados por NCM (regravados em segundo plano se desatualizados)
+        database.aquecer_cache_persistente()
     
     def criar_widgets(self):
         """Cria todos os widgets da interface."""
@@ -121,6 +136,10 @@ class CalculadoraTributariaCompleta:
         self.entry_busca_desc.pack(side=tk.LEFT, padx=(0, 5))
         self.entry_busca_desc.bind('<Return>', lambda event: self.buscar_ncms_por_descricao())
         
+        # Pesquisa enquanto digita: dispara após uma pausa na digitação
+        self.debounce_busca = busca_incremental.Debounce(self.entry_busca_desc, self.buscar_ncms_incremental)
+        self.entry_busca_desc.bind('<KeyRelease>', self.ao_digitar_descricao)
+        
         self.btn_buscar_desc = tk.Button(linha2_frame, text="Buscar", command=self.buscar_ncms_por_descricao,
                                          bg=COR_TERCIARIA, fg="white", font=FONTE_NORMAL,
                                          relief=tk.FLAT, padx=12, cursor="hand2")
@@ -135,25 +154,11 @@ class CalculadoraTributariaCompleta:
         lista_frame = tk.Frame(controles_frame, bg=COR_FUNDO)
         lista_frame.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
         
-        # Scrollbar vertical para a lista (agora vertical para mais linhas)
-        scrollbar_vertical = tk.Scrollbar(lista_frame)
-        scrollbar_vertical.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Scrollbar horizontal para a lista
-        scrollbar_horizontal = tk.Scrollbar(lista_frame, orient=tk.HORIZONTAL)
-        scrollbar_horizontal.pack(side=tk.BOTTOM, fill=tk.X)
-        
-        # Listbox para mostrar NCMs (ALTURA AUMENTADA para 6 linhas)
-        self.lista_ncms = tk.Listbox(lista_frame, height=6, width=100, font=FONTE_MONO,
-                                     yscrollcommand=scrollbar_vertical.set,
-                                     xscrollcommand=scrollbar_horizontal.set,
-                                     bg="#f8f9fa", fg=COR_TEXTO,
-                                     relief=tk.SOLID, bd=1, selectmode=tk.SINGLE)
+        # Lista virtualizada: só as linhas visíveis são materializadas no Listbox
+        self.lista_ncms = ListaVirtual(lista_frame, altura=6, largura=100, font=FONTE_MONO,
+                                       bg="#f8f9fa", fg=COR_TEXTO, relief=tk.SOLID, bd=1,
+                                       ao_selecionar=self.selecionar_ncm_lista)
         self.lista_ncms.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.lista_ncms.bind('<<ListboxSelect>>', self.selecionar_ncm_lista)
-        
-        scrollbar_vertical.config(command=self.lista_ncms.yview)
-        scrollbar_horizontal.config(command=self.lista_ncms.xview)
         
         # Frame para informações da lista
         info_frame = tk.Frame(controles_frame, bg=COR_FUNDO)
@@ -209,6 +214,29 @@ class CalculadoraTributariaCompleta:
         self.status_label = tk.Label(status_bar, text="Pronto para consultar", 
                                      bg=COR_PRIMARIA, fg="white", font=("Segoe UI", 9))
         self.status_label.pack(side=tk.LEFT, padx=10)
+        
+        # Indicador de consulta em andamento
+        self.barra_progresso = ttk.Progressbar(status_bar, mode="indeterminate", length=120)
+        self.barra_progresso.pack(side=tk.RIGHT, padx=10, pady=3)
+    
+    def indicar_ocupado(self, ocupado):
+        """Mostra (ou esconde) o indicador de consulta em andamento."""
+        if ocupado:
+            self.barra_progresso.start(15)
+            self.janela.config(cursor="watch")
+        else:
+            self.barra_progresso.stop()
+            self.janela.config(cursor="")
+    
+    def fechar(self):
+        """Encerra as consultas em andamento e fecha a janela."""
+        self.executor.encerrar()
+        self.janela.destroy()
+    
+    def exibir_erro_consulta(self, codigo, erro):
+        """Exibe o erro de uma consulta executada em segundo plano."""
+        messagebox.showerror("Erro", f"Erro ao consultar NCM {codigo}: {str(erro)}")
+        self.status_label.config(text=f"Erro ao consultar NCM: {codigo}")
     
     def preencher_e_consultar(self, ncm):
         """Preenche o campo NCM e executa a consulta."""
@@ -216,48 +244,18 @@ class CalculadoraTributariaCompleta:
         self.entry_ncm.insert(0, ncm)
         self.consultar_ncm()
     
-    def formatar_reducao(self, valor):
-        """Formata o valor da redução para exibição."""
-        if valor is None:
-            return "Sem redução"
-        
-        try:
-            # Converter para float se for string
-            if isinstance(valor, str):
-                # Verificar se é uma data (YYYY-MM-DD)
-                if len(valor) == 10 and valor[4] == '-' and valor[7] == '-':
-                    return f"Data inválida: {valor}"
-                valor_float = float(valor)
-            else:
-                valor_float = float(valor)
-            
-            # Valores como 10000.00% provavelmente são fatores de multiplicação
-            if valor_float >= 10000:
-                return "Isenção total (100%)"
-            elif valor_float >= 100:
-                # Redução maior que 100% - pode ser erro ou fator especial
-                return f"{valor_float:.2f}% (fator especial)"
-            else:
-                return f"{valor_float:.2f}%"
-        except (ValueError, TypeError):
-            # Se não puder converter, retornar como string
-            return str(valor)
-    
     def formatar_aliquota(self, valor):
-        """Formata o valor da alíquota para exibição."""
+        """Formata o valor da alíquota para exibição (valores numéricos já convertidos)."""
         if valor is None:
             return "Não especificada"
         
-        try:
-            # Converter para float se for string
-            if isinstance(valor, str):
-                valor_float = float(valor)
-            else:
-                valor_float = float(valor)
-            
-            return f"{valor_float:.2f}%"
-        except (ValueError, TypeError):
-            return str(valor)
+        if isinstance(valor, str):
+            try:
+                valor = modelos.para_numero(valor)
+            except ValueError:
+                return valor
+        
+        return f"{valor:.2f}%"
     
     def consultar_ncm(self):
         """Consulta o NCM e exibe os resultados conforme o modo selecionado."""
@@ -269,368 +267,287 @@ class CalculadoraTributariaCompleta:
         
         modo = self.modo_consulta.get()
         self.status_label.config(text=f"Consultando NCM: {codigo} ({'CST/CClasTrib' if modo == 'cst_cclastrib' else 'Completo'})...")
-        self.janela.update()
-        
-        # Limpar área de resultados
-        self.resultado_texto.delete("1.0", tk.END)
         
+        # A consulta roda em segundo plano; um novo clique substitui a anterior
         if modo == "cst_cclastrib":
             self.consultar_cst_cclastrib(codigo)
         else:
             self.consultar_completo(codigo)
     
     def consultar_cst_cclastrib(self, codigo):
-        """Consulta apenas CST, CClasTrib e redução."""
-        # Buscar os dados
-        resultados = database.buscar_cst_cclastrib_reducao_ncm(codigo)
-        
-        if not resultados:
+        """Consulta apenas CST, CClasTrib e redução (em segundo plano)."""
+        self.executor.submeter(CANAL_CONSULTA, relatorios.relatorio_cst_cclastrib, codigo,
+                               ao_concluir=lambda relatorio: self.exibir_cst_cclastrib(codigo, relatorio),
+                               ao_erro=lambda erro: self.exibir_erro_consulta(codigo, erro))
+    
+    def exibir_cst_cclastrib(self, codigo, relatorio):
+        """Exibe CST, CClasTrib e redução agrupados por classificação (RelatorioCst)."""
+        if not relatorio:
             self.exibir_sem_resultados(codigo)
             return
         
-        # Agrupar resultados por classificação tributária
-        resultados_agrupados = {}
-        for resultado in resultados:
-            ncm_cd, ncm_desc, sitr_cd, sitr_desc, cltr_cd, cltr_desc, pere_valor, tbto_sigla, tbto_nome = resultado
-            
-            # Chave única para agrupamento: NCM + CST + CClasTrib
-            chave = (ncm_cd, sitr_cd, cltr_cd)
-            
-            if chave not in resultados_agrupados:
-                resultados_agrupados[chave] = {
-                    'ncm_descricao': ncm_desc,
-                    'sitr_descricao': sitr_desc,
-                    'cltr_descricao': cltr_desc,
-                    'reducoes': []
-                }
-            
-            # Adicionar redução se existir
-            if pere_valor is not None:
-                reducao_formatada = self.formatar_reducao(pere_valor)
-                tributo_info = f"{tbto_sigla} ({tbto_nome})" if tbto_sigla else "Tributo não especificado"
-                resultados_agrupados[chave]['reducoes'].append({
-                    'valor': pere_valor,
-                    'formatado': reducao_formatada,
-                    'tributo': tributo_info
-                })
+        # O relatório é montado em memória e aplicado ao widget de uma vez
+        documento = Documento()
         
         # Exibir resultados
-        self.resultado_texto.insert(tk.END, f"✅ CONSULTA: NCM {codigo} (CST, CClasTrib e Redução)\n", "titulo")
-        self.resultado_texto.insert(tk.END, "=" * 100 + "\n\n")
+        documento.adicionar(f"✅ CONSULTA: NCM {codigo} (CST, CClasTrib e Redução)\n", "titulo")
+        documento.adicionar("=" * 100 + "\n\n")
         
-        if len(resultados_agrupados) == 1:
-            self.resultado_texto.insert(tk.END, f"📋 1 COMBINAÇÃO ENCONTRADA\n\n", "subtitulo")
+        if len(relatorio.combinacoes) == 1:
+            documento.adicionar(f"📋 1 COMBINAÇÃO ENCONTRADA\n\n", "subtitulo")
         else:
-            self.resultado_texto.insert(tk.END, f"📋 {len(resultados_agrupados)} COMBINAÇÕES ENCONTRADAS\n\n", "subtitulo")
+            documento.adicionar(f"📋 {len(relatorio.combinacoes)} COMBINAÇÕES ENCONTRADAS\n\n", "subtitulo")
         
-        for i, (chave, dados) in enumerate(resultados_agrupados.items(), 1):
-            ncm_cd, sitr_cd, cltr_cd = chave
-            
-            self.resultado_texto.insert(tk.END, f"\n{i}. ", "subtitulo")
-            self.resultado_texto.insert(tk.END, f"NCM: {ncm_cd}\n", "normal")
+        for i, combinacao in enumerate(relatorio.combinacoes, 1):
+            documento.adicionar(f"\n{i}. ", "subtitulo")
+            documento.adicionar(f"NCM: {combinacao.ncm}\n", "normal")
             
             # Descrição do NCM (completa)
-            desc_ncm = dados['ncm_descricao']
-            self.resultado_texto.insert(tk.END, f"   Descrição: {desc_ncm}\n", "info")
+            documento.adicionar(f"   Descrição: {combinacao.ncm_descricao}\n", "info")
             
             # CST
-            self.resultado_texto.insert(tk.END, f"   CST: ", "normal")
-            self.resultado_texto.insert(tk.END, f"{sitr_cd} - {dados['sitr_descricao']}\n", "destaque")
+            documento.adicionar(f"   CST: ", "normal")
+            documento.adicionar(f"{combinacao.cst} - {combinacao.cst_descricao}\n", "destaque")
             
             # CClasTrib
-            self.resultado_texto.insert(tk.END, f"   CClasTrib: ", "normal")
-            self.resultado_texto.insert(tk.END, f"{cltr_cd} - {dados['cltr_descricao']}\n", "destaque")
+            documento.adicionar(f"   CClasTrib: ", "normal")
+            documento.adicionar(f"{combinacao.cclasstrib} - {combinacao.cclasstrib_descricao}\n", "destaque")
             
             # Reduções
-            if dados['reducoes']:
-                self.resultado_texto.insert(tk.END, f"   Reduções aplicáveis:\n", "normal")
-                for reducao in dados['reducoes']:
-                    self.resultado_texto.insert(tk.END, f"     • {reducao['tributo']}: ", "normal")
-                    self.resultado_texto.insert(tk.END, f"{reducao['formatado']}\n", "destaque")
+            if combinacao.reducoes:
+                documento.adicionar(f"   Reduções aplicáveis:\n", "normal")
+                for reducao in combinacao.reducoes:
+                    documento.adicionar(f"     • {reducao.tributo}: ", "normal")
+                    documento.adicionar(f"{reducao.formatado}\n", "destaque")
             else:
-                self.resultado_texto.insert(tk.END, f"   Redução: Sem redução cadastrada\n", "info")
+                documento.adicionar(f"   Redução: Sem redução cadastrada\n", "info")
             
-            self.resultado_texto.insert(tk.END, "-" * 100 + "\n", "info")
-        
-        # Contar reduções totais
-        total_reducoes = sum(len(dados['reducoes']) for dados in resultados_agrupados.values())
-        self.resultado_texto.insert(tk.END, f"• Total de reduções: {total_reducoes}\n", "normal")
-        
-        # Contar reduções com 100%
-        reducoes_100 = 0
-        for dados in resultados_agrupados.values():
-            for reducao in dados['reducoes']:
-                try:
-                    valor = float(reducao['valor'])
-                    if valor >= 100:
-                        reducoes_100 += 1
-                except:
-                    pass
-        
-        if reducoes_100 > 0:
-            self.resultado_texto.insert(tk.END, f"• Reduções de 100% (isenção): {reducoes_100}\n", "normal")
+            documento.adicionar("-" * 100 + "\n", "info")
+        
+        documento.adicionar(f"• Total de reduções: {relatorio.total_reducoes}\n", "normal")
+        if relatorio.reducoes_isencao > 0:
+            documento.adicionar(f"• Reduções de 100% (isenção): {relatorio.reducoes_isencao}\n", "normal")
         
+        aplicar_no_widget(self.resultado_texto, documento)
         self.status_label.config(text=f"Consulta concluída para NCM: {codigo}")
     
     def exibir_sem_resultados(self, codigo):
         """Exibe mensagem quando não há resultados."""
-        self.resultado_texto.insert(tk.END, f"🔍 CONSULTA: NCM {codigo}\n", "titulo")
-        self.resultado_texto.insert(tk.END, "=" * 100 + "\n\n")
-        self.resultado_texto.insert(tk.END, "❌ NENHUM RESULTADO ENCONTRADO\n\n", "destaque")
-        self.resultado_texto.insert(tk.END, "Possíveis causas:\n", "subtitulo")
-        self.resultado_texto.insert(tk.END, "1. O código NCM pode estar incorreto\n")
-        self.resultado_texto.insert(tk.END, "2. O NCM pode não ter regras tributárias cadastradas\n")
-        self.resultado_texto.insert(tk.END, "3. Verifique a formatação (ex: 30049099 em vez de 3004.90.99)\n")
+        documento = Documento()
+        documento.adicionar(f"🔍 CONSULTA: NCM {codigo}\n", "titulo")
+        documento.adicionar("=" * 100 + "\n\n")
+        documento.adicionar("❌ NENHUM RESULTADO ENCONTRADO\n\n", "destaque")
+        documento.adicionar("Possíveis causas:\n", "subtitulo")
+        documento.adicionar("1. O código NCM pode estar incorreto\n")
+        documento.adicionar("2. O NCM pode não ter regras tributárias cadastradas\n")
+        documento.adicionar("3. Verifique a formatação (ex: 30049099 em vez de 3004.90.99)\n")
+        aplicar_no_widget(self.resultado_texto, documento)
         self.status_label.config(text=f"Nenhum resultado para NCM: {codigo}")
     
     def consultar_completo(self, codigo):
-        """Consulta informações completas incluindo alíquotas e legislação."""
-        # Buscar informações completas
-        dados_ncm, resultados = database.buscar_informacoes_completas_ncm(codigo)
-        
-        if not dados_ncm:
+        """Consulta informações completas incluindo alíquotas e legislação (em segundo plano)."""
+        # Relatório completo, já agrupado por regra e tributo (em cache por versão da base)
+        self.executor.submeter(CANAL_CONSULTA, relatorios.relatorio_completo, codigo,
+                               ao_concluir=lambda relatorio: self.exibir_completo(codigo, relatorio),
+                               ao_erro=lambda erro: self.exibir_erro_consulta(codigo, erro))
+    
+    def exibir_completo(self, codigo, relatorio):
+        """Exibe as informações completas do NCM, incluindo alíquotas e legislação (RelatorioCompleto)."""
+        if not relatorio.ncm:
             self.exibir_sem_resultados(codigo)
             return
         
-        ncm_cd, ncm_desc, inicio_vig, fim_vig = dados_ncm
+        # O relatório é montado em memória e aplicado ao widget de uma vez
+        documento = Documento()
+        
+        ncm_cd, ncm_desc, inicio_vig, fim_vig = relatorio.ncm
+        regras = relatorio.regras
         
         # Exibir cabeçalho
-        self.resultado_texto.insert(tk.END, f"✅ CONSULTA COMPLETA: NCM {codigo}\n", "titulo")
-        self.resultado_texto.insert(tk.END, "=" * 120 + "\n\n")
+        documento.adicionar(f"✅ CONSULTA COMPLETA: NCM {codigo}\n", "titulo")
+        documento.adicionar("=" * 120 + "\n\n")
         
         # Informações básicas do NCM
-        self.resultado_texto.insert(tk.END, f"📦 INFORMAÇÕES DO NCM:\n", "subtitulo")
-        self.resultado_texto.insert(tk.END, f"• Código: {ncm_cd}\n", "normal")
-        self.resultado_texto.insert(tk.END, f"• Descrição: {ncm_desc}\n", "normal")
-        self.resultado_texto.insert(tk.END, f"• Vigência: {inicio_vig} até {fim_vig if fim_vig else 'atual'}\n", "normal")
-        self.resultado_texto.insert(tk.END, "\n")
-        
-        if not resultados:
-            self.resultado_texto.insert(tk.END, "⚠️ Nenhuma regra tributária encontrada para este NCM.\n", "destaque")
+        documento.adicionar(f"📦 INFORMAÇÕES DO NCM:\n", "subtitulo")
+        documento.adicionar(f"• Código: {ncm_cd}\n", "normal")
+        documento.adicionar(f"• Descrição: {ncm_desc}\n", "normal")
+        documento.adicionar(f"• Vigência: {inicio_vig} até {fim_vig if fim_vig else 'atual'}\n", "normal")
+        documento.adicionar("\n")
+        
+        if not regras:
+            documento.adicionar("⚠️ Nenhuma regra tributária encontrada para este NCM.\n", "destaque")
+            aplicar_no_widget(self.resultado_texto, documento)
             self.status_label.config(text=f"Nenhuma regra encontrada para NCM: {codigo}")
             return
         
-        # Agrupar resultados por NCMA_ID (regra de aplicação)
-        regras_agrupadas = {}
-        for r in resultados:
-            ncm_id = r[4]  # NCMA_ID
-            if ncm_id not in regras_agrupadas:
-                regras_agrupadas[ncm_id] = []
-            regras_agrupadas[ncm_id].append(r)
+        documento.adicionar(f"📋 REGRAS TRIBUTÁRIAS ENCONTRADAS: {len(regras)}\n\n", "subtitulo")
         
-        self.resultado_texto.insert(tk.END, f"📋 REGRAS TRIBUTÁRIAS ENCONTRADAS: {len(regras_agrupadas)}\n\n", "subtitulo")
-        
-        for i, (ncm_id, regras_grupo) in enumerate(regras_agrupadas.items(), 1):
-            primeira_regra = regras_grupo[0]
+        for i, regra_relatorio in enumerate(regras, 1):
+            regra = regra_relatorio.regra
+            classificacao = regra.classificacao
+            anexo = regra.anexo
             
-            self.resultado_texto.insert(tk.END, f"\n{i}. REGRA (ID: {ncm_id}):\n", "subtitulo")
-            self.resultado_texto.insert(tk.END, f"   • Vigência: {primeira_regra[5]} até {primeira_regra[6] if primeira_regra[6] else 'atual'}\n", "normal")
+            documento.adicionar(f"\n{i}. REGRA (ID: {regra.id}):\n", "subtitulo")
+            documento.adicionar(f"   • Vigência: {regra.inicio_vigencia} até {regra.fim_vigencia if regra.fim_vigencia else 'atual'}\n", "normal")
             
             # Classificação Tributária
-            if primeira_regra[7]:  # CLTR_CD
-                self.resultado_texto.insert(tk.END, f"   • Código Classificação: {primeira_regra[7]}\n", "normal")
-                self.resultado_texto.insert(tk.END, f"   • Descrição: {primeira_regra[8]}\n", "normal")
+            if classificacao.codigo:
+                documento.adicionar(f"   • Código Classificação: {classificacao.codigo}\n", "normal")
+                documento.adicionar(f"   • Descrição: {classificacao.descricao}\n", "normal")
                 
-                # Memória de cálculo
-                memoria_calculo = primeira_regra[9]
-                if memoria_calculo:
-                    memoria_processada = database.processar_memoria_calculo(
-                        memoria_calculo=memoria_calculo,
-                        norma="LC 214/2025",
-                        tratamento="Tributação integral"
-                    )
-                    self.resultado_texto.insert(tk.END, f"   • Memória de cálculo: {memoria_processada}\n", "info")
+                # Memória de cálculo (já processada pelo relatório)
+                if regra_relatorio.memoria_calculo:
+                    documento.adicionar(f"   • Memória de cálculo: {regra_relatorio.memoria_calculo}\n", "info")
             
             # Situação Tributária (CST)
-            if primeira_regra[16]:  # SITR_CD
-                self.resultado_texto.insert(tk.END, f"   • CST: {primeira_regra[16]} - {primeira_regra[17]}\n", "destaque")
+            if classificacao.cst:
+                documento.adicionar(f"   • CST: {classificacao.cst} - {classificacao.cst_descricao}\n", "destaque")
             
                 # Anexo (Legislação)
-                if primeira_regra[18]:  # ANXO_NUMERO
-                    self.resultado_texto.insert(tk.END, f"   📚 LEGISLAÇÃO:\n", "legislacao")
-                    self.resultado_texto.insert(tk.END, f"     • Anexo: {primeira_regra[18]}, Item: {primeira_regra[19]}\n", "legislacao")
-                    if primeira_regra[20]:
-                        texto_item = primeira_regra[20]
-                        self.resultado_texto.insert(tk.END, f"     • Texto: {texto_item}\n", "legislacao")
+                if anexo:
+                    documento.adicionar(f"   📚 LEGISLAÇÃO:\n", "legislacao")
+                    documento.adicionar(f"     • Anexo: {anexo.numero}, Item: {anexo.item}\n", "legislacao")
+                    if anexo.texto:
+                        documento.adicionar(f"     • Texto: {anexo.texto}\n", "legislacao")
             
             # Tributos e Alíquotas
-            tributos_info = {}
-            for regra in regras_grupo:
-                if regra[21]:  # TBTO_SIGLA
-                    sigla = regra[21]
-                    if sigla not in tributos_info:
-                        tributos_info[sigla] = {
-                            'nome': regra[22],  # TBTO_NOME
-                            'aliquotas': set(),
-                            'reducoes': set()
-                        }
-                    
-                    # Alíquotas
-                    if regra[23]:  # ALRE_VALOR
-                        aliquota_valor = regra[23]
-                        aliquota_inicio = regra[24]
-                        aliquota_fim = regra[25]
-                        aliquota_info = f"{self.formatar_aliquota(aliquota_valor)} ({aliquota_inicio} até {aliquota_fim if aliquota_fim else 'atual'})"
-                        tributos_info[sigla]['aliquotas'].add(aliquota_info)
-                    
-                    # Reduções
-                    if regra[28]:  # PERE_VALOR
-                        reducao_valor = regra[28]
-                        reducao_inicio = regra[29]
-                        reducao_fim = regra[30]
-                        reducao_info = f"{self.formatar_reducao(reducao_valor)} ({reducao_inicio} até {reducao_fim if reducao_fim else 'atual'})"
-                        tributos_info[sigla]['reducoes'].add(reducao_info)
-            
-            if tributos_info:
-                self.resultado_texto.insert(tk.END, f"   💰 ALÍQUOTAS E REDUÇÕES:\n", "aliquota")
-                for sigla, info in tributos_info.items():
-                    self.resultado_texto.insert(tk.END, f"     • {sigla} ({info['nome']}):\n", "aliquota")
+            if regra.tributos:
+                documento.adicionar(f"   💰 ALÍQUOTAS E REDUÇÕES:\n", "aliquota")
+                for tributo in regra.tributos:
+                    documento.adicionar(f"     • {tributo.sigla} ({tributo.nome}):\n", "aliquota")
                     
-                    if info['aliquotas']:
-                        self.resultado_texto.insert(tk.END, f"       - Alíquotas: ", "normal")
-                        for aliquota in info['aliquotas']:
-                            self.resultado_texto.insert(tk.END, f"{aliquota}; ", "aliquota")
-                        self.resultado_texto.insert(tk.END, "\n", "normal")
+                    if tributo.aliquotas:
+                        documento.adicionar(f"       - Alíquotas: ", "normal")
+                        for aliquota in tributo.aliquotas:
+                            aliquota_info = f"{self.formatar_aliquota(aliquota.valor)} ({relatorios.formatar_vigencia(aliquota.inicio_vigencia, aliquota.fim_vigencia)})"
+                            documento.adicionar(f"{aliquota_info}; ", "aliquota")
+                        documento.adicionar("\n", "normal")
                     
-                    if info['reducoes']:
-                        self.resultado_texto.insert(tk.END, f"       - Reduções: ", "normal")
-                        for reducao in info['reducoes']:
-                            self.resultado_texto.insert(tk.END, f"{reducao}; ", "destaque")
-                        self.resultado_texto.insert(tk.END, "\n", "normal")
+                    if tributo.reducoes:
+                        documento.adicionar(f"       - Reduções: ", "normal")
+                        for reducao in tributo.reducoes:
+                            reducao_info = f"{relatorios.formatar_reducao(reducao.valor)} ({relatorios.formatar_vigencia(reducao.inicio_vigencia, reducao.fim_vigencia)})"
+                            documento.adicionar(f"{reducao_info}; ", "destaque")
+                        documento.adicionar("\n", "normal")
             
-            self.resultado_texto.insert(tk.END, "\n" + "-" * 120 + "\n", "info")
+            documento.adicionar("\n" + "-" * 120 + "\n", "info")
         
         # Resumo final
-        self.resultado_texto.insert(tk.END, f"\n📊 RESUMO COMPLETO:\n", "subtitulo")
-        self.resultado_texto.insert(tk.END, f"• Total de regras: {len(regras_agrupadas)}\n", "normal")
+        documento.adicionar(f"\n📊 RESUMO COMPLETO:\n", "subtitulo")
+        documento.adicionar(f"• Total de regras: {len(regras)}\n", "normal")
         
-        # Contar tributos diferentes
-        todos_tributos = set()
-        for regras_grupo in regras_agrupadas.values():
-            for regra in regras_grupo:
-                if regra[21]:  # TBTO_SIGLA
-                    todos_tributos.add(regra[21])
-        
-        if todos_tributos:
-            self.resultado_texto.insert(tk.END, f"• Tributos aplicáveis: {', '.join(sorted(todos_tributos))}\n", "normal")
+        if relatorio.tributos:
+            documento.adicionar(f"• Tributos aplicáveis: {', '.join(relatorio.tributos)}\n", "normal")
         
         # Verificar se tem ISS (Imposto Sobre Serviços)
-        tem_iss = any('ISS' in tributo for tributo in todos_tributos)
-        if tem_iss:
-            self.resultado_texto.insert(tk.END, f"• ISS: Presente na tributação\n", "normal")
+        if relatorio.tem_iss:
+            documento.adicionar(f"• ISS: Presente na tributação\n", "normal")
         else:
-            self.resultado_texto.insert(tk.END, f"• ISS: Não aplicável a este NCM\n", "info")
+            documento.adicionar(f"• ISS: Não aplicável a este NCM\n", "info")
         
+        aplicar_no_widget(self.resultado_texto, documento)
         self.status_label.config(text=f"Consulta completa concluída para NCM: {codigo}")
     
     def buscar_ncms_por_descricao(self):
         """Busca NCMs por descrição e exibe na lista."""
         texto = self.entry_busca_desc.get().strip()
+        self.debounce_busca.cancelar()
         
         if not texto:
             messagebox.showinfo("Informação", "Digite um termo para buscar na descrição dos NCMs.")
             return
         
         self.status_label.config(text=f"Buscando NCMs com: '{texto}'...")
-        self.janela.update()
         
-        # Limpar lista atual
-        self.lista_ncms.delete(0, tk.END)
+        # Buscar no banco de dados (em segundo plano, substituindo a pesquisa incremental)
+        self.executor.submeter(CANAL_BUSCA, database.buscar_por_descricao, texto,
+                               ao_concluir=lambda resultados: self.exibir_resultados_busca(texto, resultados, len(resultados)),
+                               ao_erro=self.exibir_erro_busca)
+    
+    def exibir_erro_busca(self, erro):
+        """Exibe o erro de uma busca executada em segundo plano."""
+        messagebox.showerror("Erro", f"Erro ao buscar NCMs: {str(erro)}")
+        self.status_label.config(text="Erro na busca de NCMs")
+    
+    def ao_digitar_descricao(self, event):
+        """Agenda a pesquisa incremental a cada tecla digitada na busca por descrição."""
+        if event.keysym in ("Return", "Up", "Down", "Left", "Right", "Home", "End", "Tab"):
+            return
+        self.debounce_busca.agendar()
+    
+    def buscar_ncms_incremental(self):
+        """Pesquisa enquanto digita: resultado limitado, refinado em memória quando possível."""
+        texto = self.entry_busca_desc.get().strip()
+        if len(texto) < busca_incremental.TAMANHO_MINIMO_TEXTO:
+            self.executor.cancelar(CANAL_BUSCA)
+            return
         
-        # Buscar no banco de dados
-        try:
-            resultados = database.buscar_por_descricao(texto)
-            
-            if not resultados:
-                self.lista_ncms.insert(tk.END, f"Nenhum NCM encontrado com: '{texto}'")
-                self.label_info_lista.config(text=f"Nenhum resultado para: '{texto}'")
-                self.status_label.config(text=f"Nenhum NCM encontrado com: '{texto}'")
-                return
-            
-            # Adicionar resultados à lista
-            for ncm_cd, ncm_desc in resultados:
-                # Formatar para exibição: código + descrição (limitada para caber na lista)
-                desc_curta = ncm_desc[:80] + "..." if len(ncm_desc) > 80 else ncm_desc
-                item = f"{ncm_cd} - {desc_curta}"
-                self.lista_ncms.insert(tk.END, item)
-            
-            self.label_info_lista.config(text=f"{len(resultados)} NCMs encontrados com: '{texto}'")
-            self.status_label.config(text=f"{len(resultados)} NCMs encontrados com: '{texto}'")
-            
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao buscar NCMs: {str(e)}")
-            self.status_label.config(text="Erro na busca de NCMs")
+        self.executor.submeter(
+            CANAL_BUSCA, database.buscar_por_descricao_incremental, texto,
+            ao_concluir=lambda resultado: self.exibir_resultados_busca(texto, resultado.itens, resultado.total),
+            ao_erro=lambda erro: self.status_label.config(text=f"Erro na busca de NCMs: {str(erro)}"))
+    
+    def exibir_resultados_busca(self, texto, resultados, total):
+        """Preenche a lista com os NCMs encontrados (resultados pode ser parte do total)."""
+        if not resultados:
+            self.lista_ncms.limpar(f"Nenhum NCM encontrado com: '{texto}'")
+            self.label_info_lista.config(text=f"Nenhum resultado para: '{texto}'")
+            self.status_label.config(text=f"Nenhum NCM encontrado com: '{texto}'")
+            return
+        
+        # Resultados em ordem de relevância (ir para código faz busca sequencial)
+        self.lista_ncms.definir_itens(resultados)
+        
+        if total > len(resultados):
+            info = f"{len(resultados)} de {total} NCMs com: '{texto}' (continue digitando para refinar)"
+        else:
+            info = f"{total} NCMs encontrados com: '{texto}'"
+        self.label_info_lista.config(text=info)
+        self.status_label.config(text=info)
     
     def listar_todos_ncms(self):
         """Lista todos os NCMs disponíveis no banco de dados."""
+        # Limpar campo de busca
+        self.debounce_busca.cancelar()
+        self.entry_busca_desc.delete(0, tk.END)
         self.status_label.config(text="Carregando todos os NCMs...")
-        self.janela.update()
         
-        # Limpar lista atual
-        self.lista_ncms.delete(0, tk.END)
+        # Buscar todos os NCMs do snapshot em memória (o cache de consultas entrega uma
+        # cópia rasa da lista, que pode ser alterada aqui sem afetar o snapshot; a
+        # primeira carga do snapshot roda em segundo plano)
+        self.executor.submeter(CANAL_BUSCA, database.buscar_ncms, usar_snapshot=True,
+                               ao_concluir=self.exibir_todos_ncms,
+                               ao_erro=self.exibir_erro_busca)
+    
+    def exibir_todos_ncms(self, resultados):
+        """Exibe a lista completa de NCMs."""
+        if not resultados:
+            self.lista_ncms.limpar("Nenhum NCM encontrado no banco de dados")
+            self.label_info_lista.config(text="Nenhum NCM no banco de dados")
+            self.status_label.config(text="Nenhum NCM encontrado")
+            return
         
-        # Limpar campo de busca
-        self.entry_busca_desc.delete(0, tk.END)
+        # A lista exibe apenas as linhas visíveis: custo constante, qualquer que seja o total
+        self.lista_ncms.definir_itens(resultados, ordenado_por_codigo=True)
         
-        # Buscar todos os NCMs
-        try:
-            resultados = database.buscar_ncms()
-            
-            if not resultados:
-                self.lista_ncms.insert(tk.END, "Nenhum NCM encontrado no banco de dados")
-                self.label_info_lista.config(text="Nenhum NCM no banco de dados")
-                self.status_label.config(text="Nenhum NCM encontrado")
-                return
-            
-            total = len(resultados)
-            
-            # Adicionar TODOS os resultados à lista
-            for i, (ncm_cd, ncm_desc) in enumerate(resultados):
-                # Formatar para exibição: código + descrição (limitada para caber melhor)
-                desc_curta = ncm_desc[:60] + "..." if len(ncm_desc) > 60 else ncm_desc
-                item = f"{ncm_cd} - {desc_curta}"
-                self.lista_ncms.insert(tk.END, item)
-                
-                # Atualizar status periodicamente para mostrar progresso
-                if i % 500 == 0 and i > 0:
-                    self.status_label.config(text=f"Carregando NCMs... {i}/{total}")
-                    self.janela.update()
-            
-            self.label_info_lista.config(text=f"{total} NCMs carregados. Use busca para filtrar.")
-            self.status_label.config(text=f"{total} NCMs carregados completos")
-            
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao carregar NCMs: {str(e)}")
-            self.status_label.config(text="Erro ao carregar NCMs")
+        total = len(resultados)
+        self.label_info_lista.config(
+            text=f"{total} NCMs carregados. Digite um código na lista para ir até ele, ou use a busca para filtrar.")
+        self.status_label.config(text=f"{total} NCMs carregados completos")
     
-    def selecionar_ncm_lista(self, event):
+    def selecionar_ncm_lista(self, item):
         """Quando um NCM é selecionado na lista, preenche o campo e executa consulta."""
-        # Obter índice selecionado
-        selecao = self.lista_ncms.curselection()
+        ncm_codigo = item[0]
         
-        if not selecao:
-            return
+        # Preencher campo de consulta
+        self.entry_ncm.delete(0, tk.END)
+        self.entry_ncm.insert(0, ncm_codigo)
         
-        # Obter texto do item selecionado
-        item_texto = self.lista_ncms.get(selecao[0])
+        # Executar consulta automaticamente
+        self.consultar_ncm()
         
-        # Extrair código NCM (primeira parte antes do " - ")
-        if " - " in item_texto:
-            ncm_codigo = item_texto.split(" - ")[0].strip()
-            
-            # Verificar se é um código NCM válido (apenas dígitos)
-            if ncm_codigo.isdigit():
-                # Preencher campo de consulta
-                self.entry_ncm.delete(0, tk.END)
-                self.entry_ncm.insert(0, ncm_codigo)
-                
-                # Executar consulta automaticamente
-                self.consultar_ncm()
-                
-                # Atualizar status
-                self.label_info_lista.config(text=f"NCM {ncm_codigo} selecionado e consultado")
-            else:
-                self.label_info_lista.config(text="Seleção inválida - não é um código NCM")
+        # Atualizar status
+        self.label_info_lista.config(text=f"NCM {ncm_codigo} selecionado e consultado")
 
 
 def main():
@@ -5,6 +5,9 @@ Interface com apenas um campo de busca que mostra todas as informações vincula
 import tkinter as tk
 from tkinter import ttk, messagebox
 import database
+import relatorios
+from documento import Documento, aplicar_no_widget
+from executor_consultas import CANAL_CONSULTA, ExecutorConsultas
 
 # Configurações de estilo
 COR_PRIMARIA = "#2c3e50"
@@ -36,10 +39,19 @@ class CalculadoraTributariaSimplificada:
         # Widgets principais
         self.resultado = None
         self.entry_codigo = None
+        self.entry_data = None
         self.status_label = None
+        self.barra_progresso = None
         
         self.criar_widgets()
         self.configurar_eventos()
+        
+        # Consultas ao banco rodam fora da thread do Tk
+        self.executor = ExecutorConsultas(self.janela, ao_mudar_estado=self.indicar_ocupado)
+        self.janela.protocol("WM_DELETE_WINDOW", self.fechar)
+        
+        # Mapeia os resultados gravados por NCM (regravados em segundo plano se desatualizados)
+        database.aquecer_cache_persistente()
     
     def criar_widgets(self):
         """Cria todos os widgets da interface."""
@@ -79,6 +91,12 @@ class CalculadoraTributariaSimplificada:
                            relief=tk.FLAT, padx=20, cursor="hand2")
         self.btn_buscar.pack(side=tk.LEFT)
         
+        # Data de referência opcional: vazia exibe todo o histórico de vigências
+        tk.Label(entrada_frame, text="Vigente em (AAAA-MM-DD):", 
+                 font=FONTE_NORMAL, bg=COR_CARD, fg=COR_TEXTO).pack(side=tk.LEFT, padx=(20, 5))
+        self.entry_data = tk.Entry(entrada_frame, width=12, font=FONTE_NORMAL, relief=tk.SOLID, bd=1)
+        self.entry_data.pack(side=tk.LEFT)
+        
         # Card de resultados
         card_resultado = tk.Frame(main_frame, bg=COR_CARD, relief=tk.RAISED, bd=1)
         card_resultado.pack(fill=tk.BOTH, expand=True)
@@ -112,45 +130,30 @@ class CalculadoraTributariaSimplificada:
         self.status_label = tk.Label(status_bar, text="Pronto para consultar", 
                                     bg=COR_PRIMARIA, fg="white", font=("Segoe UI", 9))
         self.status_label.pack(side=tk.LEFT, padx=10)
+        
+        # Indicador de consulta em andamento
+        self.barra_progresso = ttk.Progressbar(status_bar, mode="indeterminate", length=120)
+        self.barra_progresso.pack(side=tk.RIGHT, padx=10, pady=3)
     
     def configurar_eventos(self):
         """Configura os eventos dos widgets."""
         # Permitir buscar com Enter
         self.entry_codigo.bind("<Return>", lambda event: self.acao_buscar_completo())
+        self.entry_data.bind("<Return>", lambda event: self.acao_buscar_completo())
     
-    def converter_para_numero(self, valor):
-        """Converte um valor para número (float) se for string."""
-        if valor is None:
-            return None
-        
-        try:
-            if isinstance(valor, str):
-                # Remover caracteres não numéricos se necessário
-                valor = valor.replace(',', '.')
-                return float(valor)
-            elif isinstance(valor, (int, float)):
-                return float(valor)
-            else:
-                return None
-        except (ValueError, TypeError):
-            return None
-    
-    def formatar_reducao(self, valor):
-        """Formata o valor da redução corretamente."""
-        if valor is None:
-            return "Não especificada"
-        
-        # Converter para número primeiro
-        valor_num = self.converter_para_numero(valor)
-        if valor_num is None:
-            return str(valor)
-        
-        if valor_num >= 10000:
-            return "Isenção total (100%)"
-        elif valor_num >= 100:
-            return f"{valor_num:.2f}% (fator especial)"
+    def indicar_ocupado(self, ocupado):
+        """Mostra (ou esconde) o indicador de consulta em andamento."""
+        if ocupado:
+            self.barra_progresso.start(15)
+            self.janela.config(cursor="watch")
         else:
-            return f"{valor_num:.2f}%"
+            self.barra_progresso.stop()
+            self.janela.config(cursor="")
+    
+    def fechar(self):
+        """Encerra as consultas em andamento e fecha a janela."""
+        self.executor.encerrar()
+        self.janela.destroy()
     
     def acao_buscar_completo(self):
         """Busca todas as informações do NCM, incluindo reduções."""
@@ -159,216 +162,144 @@ class CalculadoraTributariaSimplificada:
             messagebox.showwarning("Aviso", "Digite um código NCM válido.")
             return
         
-        self.status_label.config(text=f"Buscando informações completas para NCM: {codigo}...")
-        self.janela.update()
+        data_referencia = self.entry_data.get().strip() or None
         
-        # Limpar área de resultados
-        self.resultado.delete("1.0", tk.END)
-        
-        # Buscar informações completas
-        ncm, regras_completas = database.buscar_informacoes_completas_ncm(codigo)
+        self.status_label.config(text=f"Buscando informações completas para NCM: {codigo}...")
         
-        if not ncm:
-            self.resultado.insert(tk.END, f"❌ NCM {codigo} não encontrado no banco de dados.\n")
+        # Buscar o relatório completo, já agrupado por regra e tributo (em segundo plano);
+        # com data, apenas as regras, alíquotas e reduções vigentes nela
+        self.executor.submeter(CANAL_CONSULTA, relatorios.relatorio_completo, codigo, data_referencia,
+                               ao_concluir=lambda relatorio: self.exibir_completo(codigo, relatorio),
+                               ao_erro=lambda erro: self.exibir_erro(codigo, erro))
+    
+    def exibir_erro(self, codigo, erro):
+        """Exibe o erro de uma consulta executada em segundo plano."""
+        messagebox.showerror("Erro", f"Erro ao consultar NCM {codigo}: {str(erro)}")
+        self.status_label.config(text=f"Erro ao consultar NCM: {codigo}")
+    
+    def exibir_completo(self, codigo, relatorio):
+        """Exibe todas as informações do NCM, incluindo reduções (RelatorioCompleto)."""
+        # O relatório é montado em memória e aplicado ao widget de uma vez
+        documento = Documento()
+        
+        if not relatorio.ncm:
+            documento.adicionar(f"❌ NCM {codigo} não encontrado no banco de dados.\n")
+            aplicar_no_widget(self.resultado, documento)
             self.status_label.config(text=f"NCM {codigo} não encontrado")
             return
         
         # Exibir informações básicas do NCM
-        codigo_ncm, desc, inicio, fim = ncm
+        codigo_ncm, desc, inicio, fim = relatorio.ncm
         
-        self.resultado.insert(tk.END, f"📦 INFORMAÇÕES DO NCM\n")
-        self.resultado.insert(tk.END, "=" * 100 + "\n")
-        self.resultado.insert(tk.END, f"Código: {codigo_ncm}\n")
-        self.resultado.insert(tk.END, f"Descrição: {desc}\n")
-        self.resultado.insert(tk.END, f"Vigência: {inicio} até {fim if fim else 'atual'}\n\n")
+        documento.adicionar(f"📦 INFORMAÇÕES DO NCM\n")
+        documento.adicionar("=" * 100 + "\n")
+        documento.adicionar(f"Código: {codigo_ncm}\n")
+        documento.adicionar(f"Descrição: {desc}\n")
+        documento.adicionar(f"Vigência: {relatorios.formatar_vigencia(inicio, fim)}\n\n")
         
-        if not regras_completas:
-            self.resultado.insert(tk.END, "⚠️ Nenhuma regra tributária vinculada a este NCM.\n")
+        if not relatorio.regras:
+            documento.adicionar("⚠️ Nenhuma regra tributária vinculada a este NCM.\n")
+            aplicar_no_widget(self.resultado, documento)
             self.status_label.config(text=f"NCM {codigo} encontrado, mas sem regras tributárias")
             return
         
-        # Agrupar regras por NCMA_ID para evitar duplicações
-        regras_agrupadas = {}
-        for r in regras_completas:
-            ncm_id = r[4]  # NCMA_ID
-            if ncm_id not in regras_agrupadas:
-                regras_agrupadas[ncm_id] = []
-            regras_agrupadas[ncm_id].append(r)
-        
-        self.resultado.insert(tk.END, f"📘 REGRAS TRIBUTÁRIAS VINCULADAS\n")
-        self.resultado.insert(tk.END, "=" * 100 + "\n\n")
+        documento.adicionar(f"📘 REGRAS TRIBUTÁRIAS VINCULADAS\n")
+        documento.adicionar("=" * 100 + "\n\n")
         
-        total_regras = len(regras_agrupadas)
-        self.resultado.insert(tk.END, f"Total de regras encontradas: {total_regras}\n\n")
+        total_regras = len(relatorio.regras)
+        documento.adicionar(f"Total de regras encontradas: {total_regras}\n\n")
         
-        for i, (ncm_id, regras_grupo) in enumerate(regras_agrupadas.items(), 1):
-            primeira_regra = regras_grupo[0]
+        for i, regra_relatorio in enumerate(relatorio.regras, 1):
+            regra = regra_relatorio.regra
+            classificacao = regra.classificacao
             
-            self.resultado.insert(tk.END, f"📋 REGRA {i} (ID: {ncm_id})\n")
-            self.resultado.insert(tk.END, "-" * 80 + "\n")
-            self.resultado.insert(tk.END, f"Vigência da regra: {primeira_regra[5]} até {primeira_regra[6] if primeira_regra[6] else 'atual'}\n\n")
+            documento.adicionar(f"📋 REGRA {i} (ID: {regra.id})\n")
+            documento.adicionar("-" * 80 + "\n")
+            documento.adicionar(f"Vigência da regra: {relatorios.formatar_vigencia(regra.inicio_vigencia, regra.fim_vigencia)}\n\n")
             
             # Classificação Tributária
-            if primeira_regra[7]:  # CLTR_CD
-                self.resultado.insert(tk.END, f"📊 CLASSIFICAÇÃO TRIBUTÁRIA\n")
-                self.resultado.insert(tk.END, f"Código: {primeira_regra[7]}\n")
-                self.resultado.insert(tk.END, f"Descrição: {primeira_regra[8]}\n")
+            if classificacao.codigo:
+                documento.adicionar(f"📊 CLASSIFICAÇÃO TRIBUTÁRIA\n")
+                documento.adicionar(f"Código: {classificacao.codigo}\n")
+                documento.adicionar(f"Descrição: {classificacao.descricao}\n")
                 
-                # Memória de cálculo
-                memoria_calculo = primeira_regra[9]
-                if memoria_calculo:
-                    # Buscar valores para substituição
-                    percentual_reducao = None
-                    aliquota_ad_valorem = None
-                    
-                    for regra in regras_grupo:
-                        if regra[28] is not None:  # PERCENTUAL_REDUCAO
-                            percentual_reducao = regra[28]
-                        if regra[23] is not None:  # ALRE_VALOR
-                            aliquota_ad_valorem = regra[23]
-                    
-                    memoria_processada = database.processar_memoria_calculo(
-                        memoria_calculo=memoria_calculo,
-                        percentual_reducao=percentual_reducao,
-                        aliquota_ad_valorem=aliquota_ad_valorem,
-                        norma="LC 214/2025",
-                        tratamento="Tributação integral"
-                    )
-                    self.resultado.insert(tk.END, f"Memória de cálculo: {memoria_processada}\n")
+                # Memória de cálculo (já processada pelo relatório)
+                if regra_relatorio.memoria_calculo:
+                    documento.adicionar(f"Memória de cálculo: {regra_relatorio.memoria_calculo}\n")
                 else:
-                    self.resultado.insert(tk.END, f"Memória de cálculo: Não disponível\n")
+                    documento.adicionar(f"Memória de cálculo: Não disponível\n")
                 
                 # Informações de crédito
-                self.resultado.insert(tk.END, f"\n💳 INFORMAÇÕES DE CRÉDITO\n")
-                credito_cbs = "SIM" if primeira_regra[10] == 1 else "NÃO"
-                credito_ibs = "SIM" if primeira_regra[11] == 1 else "NÃO"
-                credito_pres_forn = "SIM" if primeira_regra[12] == 1 else "NÃO"
-                credito_pres_adq = "SIM" if primeira_regra[13] == 1 else "NÃO"
+                documento.adicionar(f"\n💳 INFORMAÇÕES DE CRÉDITO\n")
+                credito_cbs = "SIM" if classificacao.credito_cbs else "NÃO"
+                credito_ibs = "SIM" if classificacao.credito_ibs else "NÃO"
+                credito_pres_forn = "SIM" if classificacao.credito_presumido_fornecedor else "NÃO"
+                credito_pres_adq = "SIM" if classificacao.credito_presumido_adquirente else "NÃO"
                 
-                self.resultado.insert(tk.END, f"Crédito CBS: {credito_cbs}\n")
-                self.resultado.insert(tk.END, f"Crédito IBS: {credito_ibs}\n")
-                self.resultado.insert(tk.END, f"Crédito Presumido Fornecedor: {credito_pres_forn}\n")
-                self.resultado.insert(tk.END, f"Crédito Presumido Adquirente: {credito_pres_adq}\n")
-                self.resultado.insert(tk.END, f"Tipo de Alíquota: {primeira_regra[14]}\n")
-                self.resultado.insert(tk.END, f"Nomenclatura: {primeira_regra[15]}\n")
+                documento.adicionar(f"Crédito CBS: {credito_cbs}\n")
+                documento.adicionar(f"Crédito IBS: {credito_ibs}\n")
+                documento.adicionar(f"Crédito Presumido Fornecedor: {credito_pres_forn}\n")
+                documento.adicionar(f"Crédito Presumido Adquirente: {credito_pres_adq}\n")
+                documento.adicionar(f"Tipo de Alíquota: {classificacao.tipo_aliquota}\n")
+                documento.adicionar(f"Nomenclatura: {classificacao.nomenclatura}\n")
             
             # Situação Tributária (CST)
-            if primeira_regra[16]:  # SITR_CD
-                self.resultado.insert(tk.END, f"\n🏷️ SITUAÇÃO TRIBUTÁRIA (CST)\n")
-                self.resultado.insert(tk.END, f"Código: {primeira_regra[16]} - {primeira_regra[17]}\n")
+            if classificacao.cst:
+                documento.adicionar(f"\n🏷️ SITUAÇÃO TRIBUTÁRIA (CST)\n")
+                documento.adicionar(f"Código: {classificacao.cst} - {classificacao.cst_descricao}\n")
             
             # Anexo
-            if primeira_regra[18]:  # ANXO_NUMERO
-                self.resultado.insert(tk.END, f"\n📄 ANEXO\n")
-                self.resultado.insert(tk.END, f"Número: {primeira_regra[18]}, Item: {primeira_regra[19]}\n")
-                self.resultado.insert(tk.END, f"Descrição: {primeira_regra[20]}\n")
+            if regra.anexo:
+                documento.adicionar(f"\n📄 ANEXO\n")
+                documento.adicionar(f"Número: {regra.anexo.numero}, Item: {regra.anexo.item}\n")
+                documento.adicionar(f"Descrição: {regra.anexo.texto}\n")
             
             # Informações detalhadas de alíquotas e reduções
-            self.resultado.insert(tk.END, f"\n💰 INFORMAÇÕES DETALHADAS DE ALÍQUOTAS E REDUÇÕES\n")
-            self.resultado.insert(tk.END, "-" * 80 + "\n")
-            
-            # Agrupar informações por tributo
-            tributos_info = {}
-            for regra in regras_grupo:
-                if regra[21]:  # TBTO_SIGLA
-                    tributo_sigla = regra[21]
-                    tributo_nome = regra[22]
-                    aliquota_valor = regra[23]  # ALRE_VALOR
-                    aliquota_inicio = regra[24]  # ALIQUOTA_INICIO
-                    aliquota_fim = regra[25]  # ALIQUOTA_FIM
-                    aliquota_padrao_valor = regra[26]  # ALPA_VALOR
-                    aliquota_padrao_forma = regra[27]  # ALPA_FORMA_APLICACAO
-                    percentual_reducao = regra[28]  # PERCENTUAL_REDUCAO
-                    reducao_inicio = regra[29]  # REDUCAO_INICIO
-                    reducao_fim = regra[30]  # REDUCAO_FIM
-                    
-                    if tributo_sigla not in tributos_info:
-                        tributos_info[tributo_sigla] = {
-                            'nome': tributo_nome,
-                            'aliquotas': [],
-                            'reducoes': []
-                        }
-                    
-                    # Adicionar informações de alíquota se existirem
-                    if aliquota_valor is not None:
-                        aliquota_info = {
-                            'valor': aliquota_valor,
-                            'inicio': aliquota_inicio,
-                            'fim': aliquota_fim,
-                            'padrao_valor': aliquota_padrao_valor,
-                            'padrao_forma': aliquota_padrao_forma
-                        }
-                        # Verificar se já não existe uma alíquota igual
-                        if aliquota_info not in tributos_info[tributo_sigla]['aliquotas']:
-                            tributos_info[tributo_sigla]['aliquotas'].append(aliquota_info)
-                    
-                    # Adicionar informações de redução se existirem
-                    if percentual_reducao is not None:
-                        reducao_info = {
-                            'valor': percentual_reducao,
-                            'inicio': reducao_inicio,
-                            'fim': reducao_fim
-                        }
-                        # Verificar se já não existe uma redução igual
-                        if reducao_info not in tributos_info[tributo_sigla]['reducoes']:
-                            tributos_info[tributo_sigla]['reducoes'].append(reducao_info)
+            documento.adicionar(f"\n💰 INFORMAÇÕES DETALHADAS DE ALÍQUOTAS E REDUÇÕES\n")
+            documento.adicionar("-" * 80 + "\n")
             
             # Exibir informações dos tributos
-            if tributos_info:
-                for sigla, info in tributos_info.items():
-                    self.resultado.insert(tk.END, f"\n  📊 TRIBUTO: {sigla} - {info['nome']}\n")
+            if regra.tributos:
+                for tributo in regra.tributos:
+                    documento.adicionar(f"\n  📊 TRIBUTO: {tributo.sigla} - {tributo.nome}\n")
                     
                     # Exibir alíquotas
-                    if info['aliquotas']:
-                        for i, aliquota in enumerate(info['aliquotas'], 1):
-                            self.resultado.insert(tk.END, f"    {i}. Alíquota: {database.formatar_aliquota(aliquota['valor'])}\n")
-                            if aliquota['inicio']:
-                                self.resultado.insert(tk.END, f"       Vigência: {aliquota['inicio']} até {aliquota['fim'] if aliquota['fim'] else 'atual'}\n")
-                            if aliquota['padrao_valor'] is not None:
-                                self.resultado.insert(tk.END, f"       Alíquota Padrão: {database.formatar_aliquota(aliquota['padrao_valor'])}\n")
-                                if aliquota['padrao_forma']:
-                                    self.resultado.insert(tk.END, f"       Forma de Aplicação: {aliquota['padrao_forma']}\n")
+                    if tributo.aliquotas:
+                        for i, aliquota in enumerate(tributo.aliquotas, 1):
+                            documento.adicionar(f"    {i}. Alíquota: {database.formatar_aliquota(aliquota.valor)}\n")
+                            if aliquota.inicio_vigencia:
+                                documento.adicionar(f"       Vigência: {relatorios.formatar_vigencia(aliquota.inicio_vigencia, aliquota.fim_vigencia)}\n")
+                            for padrao in aliquota.padroes:
+                                documento.adicionar(f"       Alíquota Padrão: {database.formatar_aliquota(padrao.valor)}\n")
+                                if padrao.forma_aplicacao:
+                                    documento.adicionar(f"       Forma de Aplicação: {padrao.forma_aplicacao}\n")
                     else:
-                        self.resultado.insert(tk.END, f"    Alíquota: Não especificada\n")
+                        documento.adicionar(f"    Alíquota: Não especificada\n")
                     
                     # Exibir reduções
-                    if info['reducoes']:
-                        for i, reducao in enumerate(info['reducoes'], 1):
-                            self.resultado.insert(tk.END, f"    {i}. Redução: {self.formatar_reducao(reducao['valor'])}\n")
-                            if reducao['inicio']:
-                                self.resultado.insert(tk.END, f"       Vigência: {reducao['inicio']} até {reducao['fim'] if reducao['fim'] else 'atual'}\n")
+                    if tributo.reducoes:
+                        for i, reducao in enumerate(tributo.reducoes, 1):
+                            documento.adicionar(f"    {i}. Redução: {relatorios.formatar_reducao(reducao.valor, 'Não especificada')}\n")
+                            if reducao.inicio_vigencia:
+                                documento.adicionar(f"       Vigência: {relatorios.formatar_vigencia(reducao.inicio_vigencia, reducao.fim_vigencia)}\n")
                             
-                            # Calcular alíquota efetiva se houver alíquota
-                            if info['aliquotas']:
-                                for aliquota in info['aliquotas']:
-                                    if aliquota['valor'] is not None:
-                                        # Converter valores usando a função auxiliar
-                                        aliquota_base = self.converter_para_numero(aliquota['valor'])
-                                        reducao_valor = self.converter_para_numero(reducao['valor'])
-                                        
-                                        if aliquota_base is not None and reducao_valor is not None:
-                                            if reducao_valor >= 10000:
-                                                aliquota_efetiva = 0.0
-                                            elif reducao_valor >= 100:
-                                                # Redução maior que 100% - tratar como isenção total
-                                                aliquota_efetiva = 0.0
-                                            else:
-                                                aliquota_efetiva = aliquota_base * (1 - reducao_valor/100)
-                                            
-                                            aliquota_efetiva_formatada = database.formatar_aliquota(aliquota_efetiva)
-                                            self.resultado.insert(tk.END, f"       Alíquota Efetiva (com redução): {aliquota_efetiva_formatada}\n")
-                                        else:
-                                            self.resultado.insert(tk.END, f"       Alíquota Efetiva: Cálculo não disponível\n")
-                                        break
+                            # Alíquota efetiva desta redução sobre a primeira alíquota
+                            if tributo.aliquotas:
+                                aliquota_efetiva = relatorios.calcular_aliquota_efetiva(tributo.aliquotas[0].valor, reducao.valor)
+                                if aliquota_efetiva is not None:
+                                    documento.adicionar(f"       Alíquota Efetiva (com redução): {database.formatar_aliquota(aliquota_efetiva)}\n")
+                                else:
+                                    documento.adicionar(f"       Alíquota Efetiva: Cálculo não disponível\n")
                     else:
-                        self.resultado.insert(tk.END, f"    Redução: Não aplicável\n")
+                        documento.adicionar(f"    Redução: Não aplicável\n")
                     
-                    self.resultado.insert(tk.END, "\n")
+                    documento.adicionar("\n")
             else:
-                self.resultado.insert(tk.END, "  Nenhum tributo vinculado a esta regra.\n")
+                documento.adicionar("  Nenhum tributo vinculado a esta regra.\n")
             
-            self.resultado.insert(tk.END, "\n" + "=" * 100 + "\n\n")
+            documento.adicionar("\n" + "=" * 100 + "\n\n")
         
+        aplicar_no_widget(self.resultado, documento)
         self.status_label.config(text=f"Consulta concluída para NCM: {codigo} - {total_regras} regras encontradas")
 
 
@@ -0,0 +1,326 @@
+"""
+Cálculo de CBS, IBS e IS para lotes de itens de nota fiscal.
+Os itens são recebidos em colunas (NCM, base de cálculo, quantidade, data e,
+opcionalmente, cClassTrib). As alíquotas de cada combinação distinta de
+NCM/cClassTrib/data são resolvidas uma única vez (tabela materializada de
+alíquotas efetivas) e o cálculo é feito coluna a coluna, com aritmética
+inteira exata: valores e alíquotas viram frações e cada tributo é arredondado
+para centavos (ROUND_HALF_UP) só no resultado, sem erro de ponto flutuante.
+A expressão aplicada é a do TRATAMENTO_TRIBUTARIO:
+baseCalculo * aliquotaAdValorem + quantidade * aliquotaAdRem.
+O IS usa as alíquotas de produto do NCM (imposto_seletivo); a quantidade do
+item deve estar na unidade da alíquota ad rem.
+Itens com data, base ou quantidade inválida não interrompem o lote: ficam sem
+valores e são informados em nao_resolvidos.
+"""
+
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+import database
+import modelos
+import vigencia
+
+# Tributos calculados, na ordem das colunas do resultado
+TRIBUTOS_CALCULO = ("CBS", "IBSUF", "IBSMun", "IS")
+POSICAO_IS = TRIBUTOS_CALCULO.index("IS")
+
+CENTAVO = Decimal("0.01")
+
+
+def para_fracao(valor):
+    """
+    Converte um valor (int, str, float ou Decimal) na fração exata (numerador, denominador).
+    Floats são convertidos pela representação decimal mais curta (0.1 -> 1/10).
+    """
+    if type(valor) is int:
+        return valor, 1
+    texto = valor if type(valor) is str else str(valor)
+    inteiro, _, fracao = texto.strip().partition('.')
+    try:
+        if not fracao:
+            return int(inteiro), 1
+        return int(inteiro + fracao), 10 ** len(fracao)
+    except ValueError:
+        # Notação científica, vírgula decimal etc.
+        return Decimal(texto.strip().replace(',', '.')).as_integer_ratio()
+
+
+def _fracao_valida(valor):
+    """para_fracao que retorna None se o valor não for um número (ex.: "1.000,50", None, NaN)."""
+    try:
+        return para_fracao(valor)
+    except (ArithmeticError, ValueError, TypeError):
+        return None
+
+
+def _data_valida(data, hoje):
+    """Data do item no formato YYYY-MM-DD (hoje se não informada), ou None se for inválida."""
+    try:
+        return vigencia.validar_data_referencia(data) or hoje
+    except (TypeError, ValueError):
+        return None
+
+
+def arredondar_centavos(numerador, denominador):
+    """Arredonda a fração (em centavos) para o inteiro mais próximo, empates para longe do zero."""
+    if numerador >= 0:
+        return (2 * numerador + denominador) // (2 * denominador)
+    return -((denominador - 2 * numerador) // (2 * denominador))
+
+
+def centavos_para_decimal(centavos):
+    """Converte centavos inteiros em Decimal com duas casas (None permanece None)."""
+    if centavos is None:
+        return None
+    return Decimal(centavos).scaleb(-2)
+
+
+def fracao_aliquota_efetiva(aliquota, reducao):
+    """
+    Retorna a alíquota efetiva exata, em percentual, como fração (numerador, denominador).
+    Reduções de 100% ou mais zeram a alíquota.
+    """
+    aliquota = Decimal(str(aliquota))
+    if reducao is not None:
+        reducao = Decimal(str(reducao))
+        aliquota = Decimal(0) if reducao >= 100 else aliquota * (100 - reducao) / 100
+    return aliquota.as_integer_ratio()
+
+
+class ResolvedorTaxas:
+    """
+    Resolve as alíquotas de (NCM, cClassTrib, data) e as mantém em memória.
+    Sem cClassTrib, aplica a tributação integral (alíquota de referência sem redução).
+    O IS vem das alíquotas de produto do NCM, com ou sem cClassTrib.
+
+    Args:
+        tabela: taxas_efetivas.TabelaTaxasEfetivas (padrão: a do database)
+        base: snapshot.SnapshotBanco (padrão: o do database)
+        seletivo: imposto_seletivo.ResolvedorImpostoSeletivo (padrão: o do database)
+    """
+
+    def __init__(self, tabela=None, base=None, seletivo=None):
+        self._tabela = tabela if tabela is not None else database.obter_taxas_efetivas()
+        self._base = base if base is not None else database.obter_snapshot()
+        self._seletivo = seletivo if seletivo is not None else database.obter_imposto_seletivo()
+        self._tributo_por_sigla = {sigla: tbto_id for tbto_id, (sigla, _) in self._base.tributos.items()}
+        self._por_ncm_data = {}
+        self._taxas = {}
+
+    def taxas(self, ncm, cclasstrib, data):
+        """
+        Retorna as alíquotas do item, uma por tributo de TRIBUTOS_CALCULO.
+
+        Returns:
+            Tupla com (fração ad valorem, fração ad rem) ou None (tributo não incide)
+            para cada tributo; None se o NCM ou a classificação não vigorar na data
+        """
+        chave = (ncm, cclasstrib, data)
+        if chave in self._taxas:
+            return self._taxas[chave]
+
+        if cclasstrib is None:
+            taxas = self._taxas_integrais(ncm, data)
+        else:
+            taxas = self._classificacoes_ncm(ncm, data).get(cclasstrib)
+        if taxas is not None:
+            taxas = self._com_seletivo(taxas, ncm, data)
+        self._taxas[chave] = taxas
+        return taxas
+
+    def _com_seletivo(self, taxas, ncm, data):
+        """Preenche o IS com as alíquotas de produto do NCM (ad valorem e/ou ad rem)."""
+        aliquota = self._seletivo.aliquota_seletivo(ncm, data)
+        if aliquota is None or taxas[POSICAO_IS] is not None:
+            return taxas
+        ad_valorem = (fracao_aliquota_efetiva(aliquota.ad_valorem, None)
+                      if aliquota.ad_valorem is not None else None)
+        ad_rem = para_fracao(aliquota.ad_rem) if aliquota.ad_rem is not None else None
+        return taxas[:POSICAO_IS] + ((ad_valorem, ad_rem),) + taxas[POSICAO_IS + 1:]
+
+    def unidade_ad_rem(self, ncm, data):
+        """Retorna a sigla da unidade da alíquota ad rem do IS do NCM na data (None se não houver)."""
+        aliquota = self._seletivo.aliquota_seletivo(ncm, data)
+        return aliquota.unidade if aliquota is not None and aliquota.ad_rem is not None else None
+
+    def _classificacoes_ncm(self, ncm, data):
+        """Lê numa única consulta as alíquotas de todas as classificações do NCM na data."""
+        chave = (ncm, data)
+        classificacoes = self._por_ncm_data.get(chave)
+        if classificacoes is None:
+            por_tributo = {}
+            for taxa in self._tabela.consultar_ncm(ncm, data):
+                por_tributo.setdefault(taxa.cclasstrib, {})[taxa.tributo] = (
+                    fracao_aliquota_efetiva(taxa.aliquota, taxa.reducao), None)
+            classificacoes = self._por_ncm_data[chave] = {
+                cclasstrib: tuple(taxas.get(sigla) for sigla in TRIBUTOS_CALCULO)
+                for cclasstrib, taxas in por_tributo.items()
+            }
+        return classificacoes
+
+    def _taxas_integrais(self, ncm, data):
+        if self._base.buscar_ncm(ncm, data) is None:
+            return None
+        aliquotas = self._base.indices_vigencia().aliquotas
+        taxas = []
+        for sigla in TRIBUTOS_CALCULO:
+            vigentes = aliquotas.vigentes(self._tributo_por_sigla.get(sigla), data)
+            # A alíquota de referência iniciada por último prevalece
+            aliquota = modelos.para_numero(vigentes[-1][1]) if vigentes else None
+            taxas.append((fracao_aliquota_efetiva(aliquota, None), None) if aliquota is not None else None)
+        return tuple(taxas)
+
+    def estatisticas(self):
+        """Retorna a quantidade de combinações resolvidas."""
+        return {
+            'combinacoes': len(self._taxas),
+            'consultas_ncm_data': len(self._por_ncm_data),
+        }
+
+
+class ResultadoLote:
+    """
+    Valores calculados de um lote, em colunas de centavos inteiros por tributo.
+
+    Args:
+        centavos: Dicionário {sigla: [centavos ou None por item]}
+        nao_resolvidos: Índices dos itens cujo NCM/cClassTrib não vigora na data
+                        ou cuja data, base ou quantidade é inválida
+        unidades_incompativeis: Índices dos itens cuja unidade difere da unidade
+                                da alíquota ad rem do IS (IS não calculado)
+    """
+
+    def __init__(self, centavos, nao_resolvidos, unidades_incompativeis=()):
+        self.centavos = centavos
+        self.nao_resolvidos = nao_resolvidos
+        self.unidades_incompativeis = list(unidades_incompativeis)
+
+    def __len__(self):
+        return len(self.centavos[TRIBUTOS_CALCULO[0]])
+
+    def valores(self, sigla):
+        """Retorna a coluna do tributo em Decimal (duas casas); None onde ele não incide."""
+        return [centavos_para_decimal(c) for c in self.centavos[sigla]]
+
+    def item(self, indice):
+        """Retorna {sigla: Decimal ou None} de um item."""
+        return {sigla: centavos_para_decimal(coluna[indice]) for sigla, coluna in self.centavos.items()}
+
+    def totais(self):
+        """Retorna o total de cada tributo no lote, em Decimal."""
+        return {sigla: centavos_para_decimal(sum(c for c in coluna if c is not None))
+                for sigla, coluna in self.centavos.items()}
+
+
+def calcular_lote(ncms, bases, quantidades=None, datas=None, cclasstribs=None, resolvedor=None,
+                  unidades=None):
+    """
+    Calcula os tributos de um lote de itens informado em colunas.
+
+    Args:
+        ncms: Códigos NCM dos itens
+        bases: Bases de cálculo (int, str, float ou Decimal, em reais)
+        quantidades: Quantidades (usadas pelas alíquotas ad rem), opcional
+        datas: Datas (YYYY-MM-DD) das operações, opcional (padrão: hoje)
+        cclasstribs: Classificações tributárias dos itens, opcional (None = tributação integral)
+        resolvedor: ResolvedorTaxas reaproveitado entre lotes, opcional
+        unidades: Siglas da unidade de cada quantidade (UNIDADE_MEDIDA), opcional;
+                  sem unidade, a quantidade é considerada na unidade da alíquota ad rem
+
+    Returns:
+        ResultadoLote
+    """
+    quantidade_itens = len(ncms)
+    hoje = date.today().isoformat()
+    if datas is None:
+        datas = [hoje] * quantidade_itens
+    if cclasstribs is None:
+        cclasstribs = [None] * quantidade_itens
+    if quantidades is None:
+        quantidades = [0] * quantidade_itens
+    if not (len(bases) == len(quantidades) == len(datas) == len(cclasstribs) == quantidade_itens
+            and (unidades is None or len(unidades) == quantidade_itens)):
+        raise ValueError("As colunas do lote devem ter o mesmo tamanho")
+    if resolvedor is None:
+        resolvedor = ResolvedorTaxas()
+
+    # Validação: data, base e quantidade de cada item; os inválidos não são resolvidos
+    datas_validas = {data: _data_valida(data, hoje) for data in set(datas)}
+    datas = [datas_validas[data] for data in datas]
+    fracoes_base = list(map(_fracao_valida, bases))
+    fracoes_quantidade = list(map(_fracao_valida, quantidades))
+    validos = [data is not None and base is not None and quantidade is not None
+               for data, base, quantidade in zip(datas, fracoes_base, fracoes_quantidade)]
+
+    # Resolução: uma vez por combinação distinta
+    chaves = list(zip(ncms, cclasstribs, datas))
+    taxas_por_chave = {chave: resolvedor.taxas(*chave)
+                       for chave in {chave for chave, valido in zip(chaves, validos) if valido}}
+    taxas_itens = [taxas_por_chave[chave] if valido else None for chave, valido in zip(chaves, validos)]
+    fracoes_base = [base if valido else (0, 1) for base, valido in zip(fracoes_base, validos)]
+    nao_resolvidos = [indice for indice, taxas in enumerate(taxas_itens) if taxas is None]
+
+    # IS ad rem com quantidade em outra unidade: não há como converter, o IS fica sem valor
+    unidades_incompativeis = []
+    if unidades is not None:
+        unidades_ad_rem = {}
+        for indice, (chave, unidade) in enumerate(zip(chaves, unidades)):
+            taxas = taxas_itens[indice]
+            if not unidade or taxas is None or taxas[POSICAO_IS] is None or taxas[POSICAO_IS][1] is None:
+                continue
+            ncm_data = (chave[0], chave[2])
+            unidade_ad_rem = unidades_ad_rem.get(ncm_data)
+            if unidade_ad_rem is None:
+                unidade_ad_rem = unidades_ad_rem[ncm_data] = resolvedor.unidade_ad_rem(*ncm_data) or ""
+            if unidade_ad_rem and unidade.strip().upper() != unidade_ad_rem.upper():
+                taxas_itens[indice] = taxas[:POSICAO_IS] + (None,) + taxas[POSICAO_IS + 1:]
+                unidades_incompativeis.append(indice)
+
+    # Cálculo coluna a coluna
+    centavos = {}
+    for posicao, sigla in enumerate(TRIBUTOS_CALCULO):
+        taxas_tributo = [taxas[posicao] if taxas is not None else None for taxas in taxas_itens]
+        if any(taxa is not None and taxa[1] is not None for taxa in taxas_tributo):
+            centavos[sigla] = [
+                None if taxa is None else _calcular_item(base, quantidade, taxa)
+                for base, quantidade, taxa in zip(fracoes_base, fracoes_quantidade, taxas_tributo)
+            ]
+        else:
+            # Só ad valorem: centavos = base * aliquota(%)
+            centavos[sigla] = [
+                None if taxa is None else arredondar_centavos(bn * taxa[0][0], bd * taxa[0][1])
+                for (bn, bd), taxa in zip(fracoes_base, taxas_tributo)
+            ]
+    return ResultadoLote(centavos, nao_resolvidos, unidades_incompativeis)
+
+
+def _calcular_item(base, quantidade, taxa):
+    """baseCalculo * aliquotaAdValorem(%) + quantidade * aliquotaAdRem (R$/unidade), em centavos."""
+    (bn, bd), (qn, qd) = base, quantidade
+    ad_valorem, ad_rem = taxa
+    numerador, denominador = 0, 1
+    if ad_valorem is not None:
+        numerador, denominador = bn * ad_valorem[0], bd * ad_valorem[1]
+    if ad_rem is not None:
+        # R$ -> centavos
+        numerador = numerador * qd * ad_rem[1] + qn * ad_rem[0] * 100 * denominador
+        denominador = denominador * qd * ad_rem[1]
+    return arredondar_centavos(numerador, denominador)
+
+
+def calcular_itens(itens, resolvedor=None):
+    """
+    Atalho de calcular_lote para uma lista de tuplas
+    (ncm, base_calculo, quantidade, data[, cclasstrib[, unidade]]).
+    """
+    itens = [tuple(item) + (None,) * (6 - len(item)) for item in itens]
+    if not itens:
+        return ResultadoLote({sigla: [] for sigla in TRIBUTOS_CALCULO}, [])
+    ncms, bases, quantidades, datas, cclasstribs, unidades = (list(coluna) for coluna in zip(*itens))
+    return calcular_lote(ncms, bases, quantidades, datas, cclasstribs, resolvedor, unidades)
+
+
+def quantizar(valor):
+    """Arredonda um Decimal para centavos (ROUND_HALF_UP), como no resultado do lote."""
+    return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
@@ -0,0 +1,271 @@
+"""
+Consulta de NCMs em lote pela linha de comando, sem interface gráfica.
+Lê os códigos de um arquivo (ou da entrada padrão) em CSV ou JSON Lines,
+resolve-os em blocos pela consulta em lote do snapshot e grava o resultado
+de cada bloco assim que ele fica pronto, em JSON Lines ou CSV. Só um bloco
+fica em memória por vez, então o consumo não depende do tamanho da entrada.
+Ao final, informa no stderr as linhas processadas e a vazão (linhas/s).
+
+Uso:
+    python consulta_lote_cli.py itens.csv --coluna ncm --saida resultado.jsonl
+    cat codigos.txt | python consulta_lote_cli.py - --formato-saida csv --data 2027-01-01
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from itertools import islice
+from typing import NamedTuple
+
+import database
+import vigencia
+
+TAMANHO_BLOCO_PADRAO = 2000
+
+FORMATOS_ENTRADA = ("auto", "csv", "jsonl")
+FORMATOS_SAIDA = ("jsonl", "csv")
+
+COLUNAS_CSV = ("ncm", "encontrado", "descricao", "cclasstrib", "cst", "classificacao",
+               "tributo", "aliquotas", "reducoes")
+
+
+class ResumoProcessamento(NamedTuple):
+    """Contagens e tempo de uma execução."""
+    linhas: int
+    encontrados: int
+    nao_encontrados: int
+    ignoradas: int
+    segundos: float
+
+    @property
+    def linhas_por_segundo(self):
+        return self.linhas / self.segundos if self.segundos else 0.0
+
+
+def normalizar_codigo(valor):
+    """Remove espaços e pontuação do código (3004.90.69 -> 30049069); None se não for numérico."""
+    codigo = ''.join(caractere for caractere in str(valor) if caractere.isalnum())
+    return codigo if codigo.isdigit() else None
+
+
+# Leitura
+
+def _ler_jsonl(linhas, campo):
+    for linha in linhas:
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            registro = json.loads(linha)
+        except json.JSONDecodeError:
+            yield None
+            continue
+        yield registro.get(campo) if isinstance(registro, dict) else registro
+
+
+def _ler_csv(linhas, coluna):
+    leitor = csv.reader(linhas)
+    indice = 0
+    for numero, registro in enumerate(leitor):
+        if not registro:
+            continue
+        if numero == 0:
+            # Cabeçalho: localiza a coluna pelo nome; sem cabeçalho, usa a primeira coluna
+            nomes = [nome.strip().lower() for nome in registro]
+            if coluna and coluna.lower() in nomes:
+                indice = nomes.index(coluna.lower())
+                continue
+            if normalizar_codigo(registro[0]) is None:
+                continue
+        yield registro[indice] if indice < len(registro) else None
+
+
+def ler_codigos(linhas, formato="auto", coluna="ncm"):
+    """
+    Gera os códigos da entrada, um por linha, sem carregá-la inteira.
+
+    Args:
+        linhas: Iterável de linhas de texto (arquivo aberto ou sys.stdin)
+        formato: "csv", "jsonl" ou "auto" (JSON Lines se a primeira linha começar com '{' ou '"')
+        coluna: Coluna do CSV ou campo do JSON com o código
+
+    Yields:
+        Código normalizado, ou None para linhas sem código válido
+    """
+    linhas = iter(linhas)
+    if formato == "auto":
+        primeira = next(linhas, None)
+        if primeira is None:
+            return
+        formato = "jsonl" if primeira.lstrip()[:1] in ('{', '"') else "csv"
+        linhas = _encadear(primeira, linhas)
+
+    valores = _ler_jsonl(linhas, coluna) if formato == "jsonl" else _ler_csv(linhas, coluna)
+    for valor in valores:
+        yield normalizar_codigo(valor) if valor is not None else None
+
+
+def _encadear(primeira, linhas):
+    yield primeira
+    yield from linhas
+
+
+# Escrita
+
+def _resumir_regra(regra):
+    classificacao = regra.classificacao
+    return {
+        'cclasstrib': classificacao.codigo,
+        'cst': classificacao.cst,
+        'classificacao': classificacao.descricao,
+        'tributos': [
+            {
+                'sigla': tributo.sigla,
+                'aliquotas': [aliquota.valor for aliquota in tributo.aliquotas],
+                'reducoes': [reducao.valor for reducao in tributo.reducoes],
+            }
+            for tributo in regra.tributos
+        ],
+    }
+
+
+class EscritorJsonl:
+    """Grava um objeto JSON por código de entrada."""
+
+    def __init__(self, saida):
+        self._saida = saida
+
+    def escrever(self, codigo, ncm, regras):
+        if ncm is None:
+            registro = {'ncm': codigo, 'encontrado': False}
+        else:
+            registro = {'ncm': codigo, 'encontrado': True, 'descricao': ncm.descricao,
+                        'regras': [_resumir_regra(regra) for regra in regras]}
+        self._saida.write(json.dumps(registro, ensure_ascii=False, separators=(',', ':')))
+        self._saida.write('\n')
+
+
+class EscritorCsv:
+    """Grava uma linha por (código, regra, tributo); listas de valores separadas por '|'."""
+
+    def __init__(self, saida):
+        self._escritor = csv.writer(saida, lineterminator='\n')
+        self._escritor.writerow(COLUNAS_CSV)
+
+    def escrever(self, codigo, ncm, regras):
+        if ncm is None:
+            self._escritor.writerow((codigo, 0, '', '', '', '', '', '', ''))
+            return
+        if not regras:
+            self._escritor.writerow((codigo, 1, ncm.descricao, '', '', '', '', '', ''))
+            return
+        linhas = []
+        for regra in regras:
+            classificacao = regra.classificacao
+            base = (codigo, 1, ncm.descricao, classificacao.codigo, classificacao.cst or '',
+                    classificacao.descricao)
+            if not regra.tributos:
+                linhas.append(base + ('', '', ''))
+            for tributo in regra.tributos:
+                linhas.append(base + (
+                    tributo.sigla,
+                    '|'.join(str(aliquota.valor) for aliquota in tributo.aliquotas),
+                    '|'.join(str(reducao.valor) for reducao in tributo.reducoes),
+                ))
+        self._escritor.writerows(linhas)
+
+
+ESCRITORES = {"jsonl": EscritorJsonl, "csv": EscritorCsv}
+
+
+# Processamento
+
+def processar(linhas, saida, formato_entrada="auto", coluna="ncm", formato_saida="jsonl",
+              data_referencia=None, incluir_herdadas=False, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Resolve os códigos da entrada em blocos e grava o resultado de cada bloco.
+
+    Args:
+        linhas: Iterável de linhas da entrada
+        saida: Arquivo de texto de saída
+        formato_entrada: "auto", "csv" ou "jsonl"
+        coluna: Coluna/campo com o código do NCM
+        formato_saida: "jsonl" ou "csv"
+        data_referencia: Data (YYYY-MM-DD) para considerar apenas os registros vigentes
+        incluir_herdadas: Se True, considera também as regras dos prefixos do NCM
+        tamanho_bloco: Quantidade de linhas resolvidas de cada vez
+
+    Returns:
+        ResumoProcessamento
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    escritor = ESCRITORES[formato_saida](saida)
+    codigos = ler_codigos(linhas, formato_entrada, coluna)
+
+    inicio = time.perf_counter()
+    linhas_lidas = encontrados = ignoradas = 0
+    while True:
+        bloco = list(islice(codigos, tamanho_bloco))
+        if not bloco:
+            break
+        validos = [codigo for codigo in bloco if codigo is not None]
+        resultados = database.buscar_informacoes_estruturadas_lote(validos, incluir_herdadas, data_referencia)
+        for codigo in validos:
+            ncm, regras = resultados[codigo]
+            escritor.escrever(codigo, ncm, regras)
+            encontrados += ncm is not None
+        linhas_lidas += len(validos)
+        ignoradas += len(bloco) - len(validos)
+        saida.flush()
+
+    return ResumoProcessamento(linhas_lidas, encontrados, linhas_lidas - encontrados, ignoradas,
+                               time.perf_counter() - inicio)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Consulta de NCMs em lote (CSV/JSON Lines)")
+    parser.add_argument("entrada", help="Arquivo de entrada, ou - para a entrada padrão")
+    parser.add_argument("--formato-entrada", choices=FORMATOS_ENTRADA, default="auto")
+    parser.add_argument("--coluna", default="ncm", help="Coluna do CSV ou campo do JSON com o NCM")
+    parser.add_argument("--saida", default="-", help="Arquivo de saída, ou - para a saída padrão")
+    parser.add_argument("--formato-saida", choices=FORMATOS_SAIDA, default="jsonl")
+    parser.add_argument("--data", help="Data de referência (AAAA-MM-DD)")
+    parser.add_argument("--herdadas", action="store_true", help="Incluir regras dos prefixos do NCM")
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO_PADRAO)
+    argumentos = parser.parse_args(argumentos)
+
+    try:
+        vigencia.validar_data_referencia(argumentos.data)
+    except ValueError:
+        parser.error(f"data inválida: {argumentos.data} (use AAAA-MM-DD)")
+
+    # Mapeia os resultados gravados por NCM; se desatualizados, regrava-os antes do lote,
+    # já que uma gravação em segundo plano seria interrompida no fim desta execução
+    if not database.aquecer_cache_persistente(esperar=True):
+        estatisticas = database.estatisticas_cache_persistente()
+        if estatisticas['erro'] is None:
+            print(f"Cache persistente regravado: {estatisticas['caminho']}", file=sys.stderr)
+
+    entrada = sys.stdin if argumentos.entrada == "-" else open(argumentos.entrada, encoding="utf-8", newline="")
+    saida = sys.stdout if argumentos.saida == "-" else open(argumentos.saida, "w", encoding="utf-8", newline="")
+    try:
+        resumo = processar(entrada, saida, argumentos.formato_entrada, argumentos.coluna,
+                           argumentos.formato_saida, argumentos.data, argumentos.herdadas,
+                           max(1, argumentos.tamanho_bloco))
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
+        database.fechar_conexoes()
+
+    print(f"{resumo.linhas} linhas em {resumo.segundos:.2f} s ({resumo.linhas_por_segundo:,.0f} linhas/s): "
+          f"{resumo.encontrados} encontrados, {resumo.nao_encontrados} não encontrados, "
+          f"{resumo.ignoradas} sem código válido", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
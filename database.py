@@ -1,31 +1,248 @@
 """
 Módulo de acesso ao banco de dados da Calculadora Tributária.
-Contém todas as funções de consulta SQL.
+Contém todas as funções de consulta SQL; os resultados passam pelo cache de cache_resultados
+e, nas consultas por NCM, pelo arquivo gravado por cache_persistente.
 """
 
+import json
 import sqlite3
 
+import aliquotas_locais
+import busca_incremental
+import cache_persistente
+import cache_resultados
+import expressoes
+import imposto_seletivo
+import indice_busca
+import modelos_memoria
+import modelos
+import snapshot
+import taxas_efetivas
+import vigencia
+from pool_conexoes import PoolConexoes
+from resolvedor_prefixos import carregar_resolvedor_ncm
+
 DB_PATH = "calculadora.db"
 
+# Pool de conexões somente leitura compartilhado pelas funções de consulta
+_pool = PoolConexoes(DB_PATH)
+
+# Resolvedor hierárquico de NCM_APLICAVEL, carregado na primeira utilização
+_resolvedor_ncm = None
+
+# Snapshot em memória da versão atual da base, carregado na primeira utilização
+_snapshot = None
+
+# Índice FTS5 das descrições de NCM/NBS, aberto (ou construído) na primeira busca
+_indice_busca = None
+
+# Motor de busca incremental sobre o índice, com cache das buscas recentes
+_busca_incremental = None
+
+# Tabela materializada das alíquotas efetivas, aberta (ou construída) na primeira consulta
+_taxas_efetivas = None
+
+# Expressões do TRATAMENTO_TRIBUTARIO compiladas, carregadas na primeira utilização
+_catalogo_tratamentos = None
+
+# Alíquotas por UF/município (ALIQUOTA_PADRAO), montadas sobre o snapshot atual
+_aliquotas_locais = None
+
+# Alíquotas de produto do Imposto Seletivo, recarregadas quando a versão da base muda
+_imposto_seletivo = None
+
 
 def conectar():
-    """Estabelece conexão com o banco de dados."""
+    """Estabelece uma conexão avulsa com o banco de dados."""
     return sqlite3.connect(DB_PATH)
 
 
-def buscar_ncms():
-    """Retorna todos os NCMs da tabela."""
-    conn = conectar()
+def obter_conexao():
+    """Retorna a conexão somente leitura da thread atual, mantida pelo pool."""
+    return _pool.obter()
+
+
+def estatisticas_pool():
+    """Retorna as estatísticas de uso do pool de conexões."""
+    return _pool.estatisticas()
+
+
+def fechar_conexoes():
+    """Fecha todas as conexões do pool (serão reabertas sob demanda)."""
+    _pool.fechar()
+    _cache_persistente.fechar()
+    if _indice_busca is not None:
+        _indice_busca.fechar()
+    if _taxas_efetivas is not None:
+        _taxas_efetivas.fechar()
+
+
+def obter_versao_base():
+    """Retorna a versão atual da base (último VRBD_VERSAO_BASE_DADO registrado)."""
+    return snapshot.ler_versao_base(obter_conexao())
+
+
+def _base_alterada():
+    """
+    Descarta todas as estruturas derivadas da base (snapshot, resolvedores,
+    índice de busca, tabela de alíquotas efetivas, catálogo de tratamentos),
+    para que sejam relidas ou reconstruídas a partir da base alterada.
+    As conexões dos objetos descartados não são fechadas aqui, pois outras
+    threads podem estar consultando; são liberadas quando as threads terminam.
+    """
+    global _snapshot, _resolvedor_ncm, _indice_busca, _busca_incremental, _taxas_efetivas
+    global _catalogo_tratamentos, _aliquotas_locais, _imposto_seletivo
+    _snapshot = None
+    _resolvedor_ncm = None
+    _indice_busca = None
+    _busca_incremental = None
+    _taxas_efetivas = None
+    _catalogo_tratamentos = None
+    _aliquotas_locais = None
+    _imposto_seletivo = None
+    _cache_persistente.verificar()
+
+
+# Resultados por NCM gravados ao lado do banco, para que a primeira consulta de cada processo não execute JOINs
+_cache_persistente = cache_persistente.CachePersistente(
+    DB_PATH, obter_versao_base, lambda: [ncm[0] for ncm in obter_snapshot().ncms],
+    tipos=modelos.MODELOS, arquivos_codigo=(modelos.__file__, snapshot.__file__),
+    liberar_recursos=_pool.liberar)
+
+
+def _versao_cache():
+    """Versão da base para o cache: a do arquivo de resultados, se o banco não mudou, sem abrir conexão."""
+    return _cache_persistente.versao_confirmada() or obter_versao_base()
+
+
+# Resultados das consultas por (função, argumentos), invalidados quando o banco ou sua versão mudam
+_cache_consultas = cache_resultados.CacheResultados(DB_PATH, _versao_cache, ao_invalidar=_base_alterada)
+
+
+def limpar_cache():
+    """Esvazia o cache dos resultados das consultas."""
+    _cache_consultas.limpar()
+
+
+def assinatura_base():
+    """
+    Retorna a assinatura da base acompanhada pelo cache (versão e datas de
+    modificação do banco), conferida no máximo a cada INTERVALO_VERIFICACAO
+    segundos; serve de chave para os caches derivados das consultas.
+    """
+    return _cache_consultas.assinatura
+
+
+def estatisticas_cache():
+    """Retorna os contadores do cache dos resultados das consultas."""
+    return _cache_consultas.estatisticas()
+
+
+def reconstruir_cache_persistente(esperar=False):
+    """
+    Regrava o arquivo de resultados por NCM em segundo plano.
+
+    Args:
+        esperar: Se True, aguarda o fim da gravação
+    """
+    _cache_persistente.reconstruir(esperar)
+
+
+def aquecer_cache_persistente(esperar=False):
+    """
+    Mapeia o arquivo de resultados por NCM, regravando-o em segundo plano se
+    estiver ausente ou desatualizado (as consultas nunca o regravam sozinhas).
+
+    Args:
+        esperar: Se True, aguarda o fim da gravação
+
+    Returns:
+        True se o arquivo já estava válido
+    """
+    return _cache_persistente.aquecer(esperar)
+
+
+def estatisticas_cache_persistente():
+    """Retorna o estado do arquivo de resultados por NCM."""
+    return _cache_persistente.estatisticas()
+
+
+def obter_snapshot(recarregar=False):
+    """
+    Retorna o snapshot em memória das tabelas de consulta.
+
+    Args:
+        recarregar: Se True, verifica a versão da base e recarrega o snapshot se ela mudou
+
+    Returns:
+        Instância de snapshot.SnapshotBanco
+    """
+    global _snapshot
+    # Confere se a base mudou (no máximo a cada INTERVALO_VERIFICACAO), descartando o snapshot antigo
+    _cache_consultas.verificar()
+    if _snapshot is None or recarregar:
+        _snapshot = snapshot.carregar_snapshot(obter_conexao())
+    return _snapshot
+
+
+def obter_resolvedor_ncm():
+    """Retorna o resolvedor de regras por prefixo de NCM, carregando-o uma única vez."""
+    global _resolvedor_ncm
+    _cache_consultas.verificar()
+    if _resolvedor_ncm is None:
+        _resolvedor_ncm = carregar_resolvedor_ncm(obter_conexao())
+    return _resolvedor_ncm
+
+
+@_cache_consultas.memorizar
+def buscar_regras_aplicaveis_ncm(codigo, data_referencia=None):
+    """
+    Retorna as regras de NCM_APLICAVEL aplicáveis ao NCM, incluindo as herdadas
+    do capítulo, posição e subposições, já descontadas as exceções.
+    A resolução é feita em memória, sem consulta SQL.
+
+    Args:
+        codigo: Código do NCM
+        data_referencia: Data (YYYY-MM-DD) para considerar apenas regras vigentes, opcional
+
+    Returns:
+        Lista de tuplas (NCMA_ID, NCMA_NCM_CD, NCMA_CLTR_ID, NCMA_ANXO_ID,
+                         NCMA_INICIO_VIGENCIA, NCMA_FIM_VIGENCIA), da mais específica à mais genérica
+    """
+    return obter_resolvedor_ncm().regras_aplicaveis(codigo, data_referencia)
+
+
+def _filtro_regras_ncm(codigo, incluir_herdadas):
+    """Monta a condição de junção NCM -> NCM_APLICAVEL e os parâmetros correspondentes."""
+    if not incluir_herdadas:
+        return "n.NCM_CD = na.NCMA_NCM_CD", ()
+    ids = obter_resolvedor_ncm().ids_aplicaveis(codigo)
+    return "na.NCMA_ID IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+
+
+@_cache_consultas.memorizar
+def buscar_ncms(usar_snapshot=False):
+    """
+    Retorna todos os NCMs da tabela, ordenados pelo código.
+
+    Args:
+        usar_snapshot: Se True, retorna uma cópia (feita pelo cache) da lista já carregada no
+                       snapshot em memória (tuplas (codigo, descricao, inicio, fim)), sem consultar o banco
+    """
+    if usar_snapshot:
+        return obter_snapshot().ncms
+
+    conn = obter_conexao()
     cur = conn.cursor()
     cur.execute("SELECT NCM_CD, NCM_DESCRICAO FROM NCM ORDER BY NCM_CD")
     dados = cur.fetchall()
-    conn.close()
     return dados
 
 
+@_cache_consultas.memorizar
 def buscar_por_codigo(codigo):
     """Busca dados do NCM e regras relacionadas."""
-    conn = conectar()
+    conn = obter_conexao()
     cur = conn.cursor()
 
     # Busca o NCM
@@ -36,7 +253,6 @@ def buscar_por_codigo(codigo):
     dados_ncm = cur.fetchone()
 
     if not dados_ncm:
-        conn.close()
         return None, None
 
     # Busca regras no NCM_APLICAVEL com JOIN para informações relacionadas
@@ -62,13 +278,79 @@ def buscar_por_codigo(codigo):
     """, (codigo,))
     regras = cur.fetchall()
 
-    conn.close()
     return dados_ncm, regras
 
 
+def obter_indice_busca():
+    """Retorna o índice FTS5 de descrições, criado na primeira utilização."""
+    global _indice_busca
+    if _indice_busca is None:
+        _indice_busca = indice_busca.IndiceBusca(DB_PATH, obter_conexao)
+    return _indice_busca
+
+
+def obter_busca_incremental():
+    """Retorna o motor de busca incremental por descrição de NCM, criado na primeira utilização."""
+    global _busca_incremental
+    if _busca_incremental is None:
+        _busca_incremental = busca_incremental.BuscaIncremental(
+            _buscar_por_descricao_indexada,
+            obter_versao=lambda: obter_indice_busca().versao_atual()
+        )
+    return _busca_incremental
+
+
+@_cache_consultas.memorizar
 def buscar_por_descricao(texto):
-    """Busca NCM por parte da descrição."""
-    conn = conectar()
+    """
+    Busca NCM por palavras da descrição, sem diferenciar acentos e maiúsculas.
+    Usa o índice FTS5 (resultados ordenados por relevância), refinando em memória
+    as buscas que apenas estendem uma busca recente; se o texto não tiver palavras
+    ou o índice não puder ser usado, recorre ao LIKE na tabela NCM.
+    """
+    if indice_busca.montar_consulta_fts(texto) is not None:
+        try:
+            return list(obter_busca_incremental().resultados(texto)[0])
+        except (sqlite3.OperationalError, OSError):
+            pass
+    return _buscar_por_descricao_like(texto)
+
+
+@_cache_consultas.memorizar
+def buscar_por_descricao_incremental(texto, limite=busca_incremental.LIMITE_RESULTADOS):
+    """
+    Versão limitada de buscar_por_descricao para pesquisa enquanto se digita.
+
+    Args:
+        texto: Texto digitado até o momento
+        limite: Quantidade máxima de NCMs retornados
+
+    Returns:
+        busca_incremental.ResultadoBusca com itens (NCM_CD, NCM_DESCRICAO), total e ha_mais
+    """
+    if indice_busca.montar_consulta_fts(texto) is not None:
+        try:
+            return obter_busca_incremental().buscar(texto, limite)
+        except (sqlite3.OperationalError, OSError):
+            pass
+    itens = _buscar_por_descricao_like(texto)
+    return busca_incremental.ResultadoBusca(itens[:limite], len(itens), len(itens) > limite, False)
+
+
+def _buscar_por_descricao_indexada(texto):
+    """Busca NCM no índice FTS5, sem limite de resultados."""
+    return [linha[:2] for linha in obter_indice_busca().buscar(texto, indice_busca.TIPO_NCM, -1)]
+
+
+@_cache_consultas.memorizar
+def buscar_nbs_por_descricao(texto, limite=indice_busca.LIMITE_PADRAO):
+    """Busca NBS por palavras da descrição no índice FTS5. Retorna (NBS_CD, NBS_DESCRICAO)."""
+    return [linha[:2] for linha in obter_indice_busca().buscar(texto, indice_busca.TIPO_NBS, limite)]
+
+
+def _buscar_por_descricao_like(texto):
+    """Busca NCM por parte da descrição (LIKE, sem índice)."""
+    conn = obter_conexao()
     cur = conn.cursor()
     cur.execute("""
         SELECT NCM_CD, NCM_DESCRICAO
@@ -77,38 +359,14 @@ def buscar_por_descricao(texto):
         ORDER BY NCM_CD
     """, (f"%{texto}%",))
     dados = cur.fetchall()
-    conn.close()
     return dados
 
 
-def buscar_informacoes_completas_ncm(codigo):
-    """
-    Busca informações completas do NCM incluindo todas as regras tributárias, alíquotas e reduções.
-    Usa uma consulta simplificada que sabemos que funciona.
-    """
-    conn = conectar()
-    cur = conn.cursor()
-
-    # 1. Buscar informações básicas do NCM
-    cur.execute("""
-        SELECT 
-            NCM_CD,
-            NCM_DESCRICAO,
-            NCM_INICIO_VIGENCIA,
-            NCM_FIM_VIGENCIA
-        FROM NCM 
-        WHERE NCM_CD = ?
-    """, (codigo,))
-    
-    dados_ncm = cur.fetchone()
-    
-    if not dados_ncm:
-        conn.close()
-        return None, None
-    
-    # 2. Buscar todas as regras vinculadas ao NCM com informações completas
-    # Consulta simplificada que garante que as reduções sejam retornadas
-    cur.execute("""
+# Consulta completa de regras, tributos, alíquotas e reduções, compartilhada
+# pela consulta individual e pela consulta em lote.
+# origem_regras: junção que produz os pares NCM (n) x NCM_APLICAVEL (na)
+# filtro_ncm: condição do WHERE que seleciona os NCMs consultados
+_SQL_INFORMACOES_COMPLETAS = """
         SELECT 
             -- Informações do NCM
             n.NCM_CD,
@@ -161,9 +419,8 @@ def buscar_informacoes_completas_ncm(codigo):
             pr.PERE_INICIO_VIGENCIA,
             pr.PERE_FIM_VIGENCIA
             
-        FROM NCM n
         -- JOIN principal: NCM -> NCM_APLICAVEL -> CLASSIFICACAO_TRIBUTARIA
-        JOIN NCM_APLICAVEL na ON n.NCM_CD = na.NCMA_NCM_CD
+        FROM {origem_regras}
         JOIN CLASSIFICACAO_TRIBUTARIA ct ON na.NCMA_CLTR_ID = ct.CLTR_ID
         
         -- JOINs opcionais para informações adicionais
@@ -183,20 +440,394 @@ def buscar_informacoes_completas_ncm(codigo):
         LEFT JOIN PERCENTUAL_REDUCAO pr ON ct.CLTR_ID = pr.PERE_CLTR_ID 
             AND (pr.PERE_TBTO_ID IS NULL OR pr.PERE_TBTO_ID = t.TBTO_ID)
         
-        WHERE n.NCM_CD = ?
+        WHERE {filtro_ncm}
         ORDER BY 
+            n.NCM_CD,
             na.NCMA_INICIO_VIGENCIA DESC,
             ct.CLTR_CD,
             t.TBTO_SIGLA,
             pr.PERE_VALOR DESC NULLS LAST
+"""
+
+
+@_cache_consultas.memorizar
+def buscar_informacoes_completas_ncm(codigo, incluir_herdadas=False):
+    """
+    Busca informações completas do NCM incluindo todas as regras tributárias, alíquotas e reduções.
+    Usa uma consulta simplificada que sabemos que funciona.
+    Com incluir_herdadas=True, considera também as regras dos prefixos do NCM.
+    """
+    conn = obter_conexao()
+    cur = conn.cursor()
+
+    # 1. Buscar informações básicas do NCM
+    cur.execute("""
+        SELECT 
+            NCM_CD,
+            NCM_DESCRICAO,
+            NCM_INICIO_VIGENCIA,
+            NCM_FIM_VIGENCIA
+        FROM NCM 
+        WHERE NCM_CD = ?
     """, (codigo,))
     
+    dados_ncm = cur.fetchone()
+    
+    if not dados_ncm:
+        return None, None
+    
+    # 2. Buscar todas as regras vinculadas ao NCM com informações completas
+    # Consulta simplificada que garante que as reduções sejam retornadas
+    filtro_regras, parametros_filtro = _filtro_regras_ncm(codigo, incluir_herdadas)
+    cur.execute(_SQL_INFORMACOES_COMPLETAS.format(
+        origem_regras=f"NCM n JOIN NCM_APLICAVEL na ON {filtro_regras}",
+        filtro_ncm="n.NCM_CD = ?"
+    ), parametros_filtro + (codigo,))
+    
     resultados = cur.fetchall()
-    conn.close()
     
     return dados_ncm, resultados
 
 
+def buscar_informacoes_completas_lote(codigos, incluir_herdadas=False, usar_snapshot=False):
+    """
+    Busca as informações completas de vários NCMs numa única consulta SQL.
+    Equivale a chamar buscar_informacoes_completas_ncm para cada código, mas resolve
+    todos de uma vez (códigos repetidos são consultados uma só vez). O lote não
+    passa pelo cache de resultados: cada chamada devolve um dicionário novo.
+
+    Args:
+        codigos: Iterável com os códigos de NCM (ex.: itens de uma nota fiscal)
+        incluir_herdadas: Se True, considera também as regras dos prefixos de cada NCM
+        usar_snapshot: Se True, responde pelo snapshot em memória com os modelos
+                       estruturados, sem montar o produto cartesiano das linhas
+
+    Returns:
+        Dicionário {codigo: (dados_ncm, resultados)}, com as mesmas colunas e ordenação
+        da consulta individual; com usar_snapshot, {codigo: (NcmInfo, [RegraAplicavel])}
+        como em buscar_informacoes_estruturadas_lote. Códigos inexistentes recebem (None, None)
+    """
+    codigos = list(dict.fromkeys(codigos))
+    if usar_snapshot:
+        base = obter_snapshot()
+        return {codigo: base.informacoes_estruturadas(codigo, incluir_herdadas) for codigo in codigos}
+
+    lote = {codigo: (None, None) for codigo in codigos}
+    if not codigos:
+        return lote
+
+    conn = obter_conexao()
+    cur = conn.cursor()
+
+    cur.execute("""
+        SELECT NCM_CD, NCM_DESCRICAO, NCM_INICIO_VIGENCIA, NCM_FIM_VIGENCIA
+        FROM NCM
+        WHERE NCM_CD IN (SELECT value FROM json_each(?))
+    """, (json.dumps(codigos),))
+    for dados_ncm in cur.fetchall():
+        lote[dados_ncm[0]] = (dados_ncm, [])
+
+    if incluir_herdadas:
+        # Pares [NCM, NCMA_ID] resolvidos em memória; a junção parte deles (CROSS JOIN
+        # fixa a ordem) para não comparar cada NCM com todas as regras
+        resolvedor = obter_resolvedor_ncm()
+        pares = [[codigo, id_regra]
+                 for codigo in codigos if lote[codigo][0]
+                 for id_regra in resolvedor.ids_aplicaveis(codigo)]
+        cur.execute(_SQL_INFORMACOES_COMPLETAS.format(
+            origem_regras="""json_each(?) rh
+        CROSS JOIN NCM n ON n.NCM_CD = json_extract(rh.value, '$[0]')
+        CROSS JOIN NCM_APLICAVEL na ON na.NCMA_ID = json_extract(rh.value, '$[1]')""",
+            filtro_ncm="1 = 1"
+        ), (json.dumps(pares),))
+    else:
+        cur.execute(_SQL_INFORMACOES_COMPLETAS.format(
+            origem_regras="NCM n JOIN NCM_APLICAVEL na ON n.NCM_CD = na.NCMA_NCM_CD",
+            filtro_ncm="n.NCM_CD IN (SELECT value FROM json_each(?))"
+        ), (json.dumps(codigos),))
+
+    for linha in cur:
+        lote[linha[0]][1].append(linha)
+
+    return lote
+
+
+@_cache_consultas.memorizar
+@_cache_persistente.memorizar
+def buscar_informacoes_estruturadas_ncm(codigo, incluir_herdadas=False, data_referencia=None):
+    """
+    Busca as informações completas do NCM já organizadas por regra e tributo.
+    Cada dimensão (regras, tributos, alíquotas e reduções) é lida numa consulta
+    própria, sem o produto cartesiano da consulta completa, e montada em memória.
+
+    Args:
+        codigo: Código do NCM
+        incluir_herdadas: Se True, considera também as regras dos prefixos do NCM
+        data_referencia: Data (YYYY-MM-DD) para considerar apenas os registros vigentes
+                         nela; respondida pelos índices de vigência do snapshot
+
+    Returns:
+        Tupla (modelos.NcmInfo, [modelos.RegraAplicavel]), ou (None, None) se o NCM
+        não existir (ou não estiver vigente na data). Cada regra traz classificação
+        (com CST), anexo e os tributos, com suas alíquotas e reduções.
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    if data_referencia is not None:
+        return obter_snapshot().informacoes_estruturadas(codigo, incluir_herdadas, data_referencia)
+    dados_ncm, regras, _ = _buscar_estrutura_ncm(codigo, incluir_herdadas)
+    return dados_ncm, regras
+
+
+def buscar_informacoes_estruturadas_lote(codigos, incluir_herdadas=False, data_referencia=None):
+    """
+    Versão em lote de buscar_informacoes_estruturadas_ncm, respondida pelo snapshot
+    em memória (os objetos de classificação, alíquotas e tributos são compartilhados).
+
+    Returns:
+        Dicionário {codigo: (NcmInfo, regras)}; códigos inexistentes recebem (None, None)
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    base = obter_snapshot()
+    return {codigo: base.informacoes_estruturadas(codigo, incluir_herdadas, data_referencia)
+            for codigo in dict.fromkeys(codigos)}
+
+
+def comparar_linhas_consulta_ncm(codigo, incluir_herdadas=False):
+    """
+    Compara o volume de linhas lidas pela consulta completa e pela estruturada.
+
+    Returns:
+        Dicionário {'completa': linhas, 'estruturada': linhas, 'regras': quantidade}
+    """
+    _, resultados = buscar_informacoes_completas_ncm(codigo, incluir_herdadas)
+    _, regras, linhas_lidas = _buscar_estrutura_ncm(codigo, incluir_herdadas)
+    return {
+        'completa': len(resultados or []),
+        'estruturada': linhas_lidas,
+        'regras': len(regras or []),
+    }
+
+
+def _buscar_estrutura_ncm(codigo, incluir_herdadas):
+    """Executa as consultas da busca estruturada e retorna (dados_ncm, regras, linhas_lidas)."""
+    conn = obter_conexao()
+    cur = conn.cursor()
+
+    cur.execute("""
+        SELECT NCM_CD, NCM_DESCRICAO, NCM_INICIO_VIGENCIA, NCM_FIM_VIGENCIA
+        FROM NCM WHERE NCM_CD = ?
+    """, (codigo,))
+    dados_ncm = cur.fetchone()
+    if not dados_ncm:
+        return None, None, 0
+
+    # 1. Uma linha por regra, com classificação, CST e anexo
+    filtro_regras, parametros_filtro = _filtro_regras_ncm(codigo, incluir_herdadas)
+    cur.execute(f"""
+        SELECT
+            na.NCMA_ID, na.NCMA_INICIO_VIGENCIA, na.NCMA_FIM_VIGENCIA,
+            ct.CLTR_ID, ct.CLTR_CD, ct.CLTR_DESCRICAO, ct.CLTR_MEMORIA_CALCULO,
+            ct.CLTR_IN_APROPRIACAO_CREDITOS_ADQUIRENTES_CBS,
+            ct.CLTR_IN_APROPRIACAO_CREDITOS_ADQUIRENTES_IBS,
+            ct.CLTR_IN_CREDITO_PRESUMIDO_FORNECEDOR,
+            ct.CLTR_IN_CREDITO_PRESUMIDO_ADQUIRENTE,
+            ct.CLTR_TIPO_ALIQUOTA, ct.CLTR_NOMENCLATURA,
+            st.SITR_ID, st.SITR_CD, st.SITR_DESCRICAO,
+            a.ANXO_NUMERO, a.ANXO_NUMERO_ITEM, a.ANXO_TEXTO_ITEM
+        FROM NCM n
+        JOIN NCM_APLICAVEL na ON {filtro_regras}
+        JOIN CLASSIFICACAO_TRIBUTARIA ct ON na.NCMA_CLTR_ID = ct.CLTR_ID
+        LEFT JOIN SITUACAO_TRIBUTARIA st ON ct.CLTR_SITR_ID = st.SITR_ID
+        LEFT JOIN ANEXO a ON na.NCMA_ANXO_ID = a.ANXO_ID
+        WHERE n.NCM_CD = ?
+        ORDER BY na.NCMA_INICIO_VIGENCIA DESC, ct.CLTR_CD, na.NCMA_ID
+    """, parametros_filtro + (codigo,))
+    linhas_regras = cur.fetchall()
+    linhas_lidas = 1 + len(linhas_regras)
+
+    situacoes = json.dumps(sorted({r[13] for r in linhas_regras if r[13] is not None}))
+    classificacoes = json.dumps(sorted({r[3] for r in linhas_regras}))
+
+    # 2. Tributos de cada situação tributária
+    cur.execute("""
+        SELECT tst.TRST_SITR_ID, t.TBTO_ID, t.TBTO_SIGLA, t.TBTO_NOME
+        FROM TRIBUTO_SITUACAO_TRIBUTARIA tst
+        JOIN TRIBUTO t ON tst.TRST_TBTO_ID = t.TBTO_ID
+        WHERE tst.TRST_SITR_ID IN (SELECT value FROM json_each(?))
+        ORDER BY t.TBTO_SIGLA, tst.TRST_ID
+    """, (situacoes,))
+    tributos_por_situacao = {}
+    tributos_usados = set()
+    for sitr_id, tbto_id, sigla, nome in cur.fetchall():
+        tributos_por_situacao.setdefault(sitr_id, []).append((tbto_id, sigla, nome))
+        tributos_usados.add(tbto_id)
+        linhas_lidas += 1
+
+    # 3. Alíquotas de referência (e padrão) de cada tributo
+    cur.execute("""
+        SELECT ar.ALRE_TBTO_ID, ar.ALRE_ID, ar.ALRE_VALOR,
+               ar.ALRE_INICIO_VIGENCIA, ar.ALRE_FIM_VIGENCIA,
+               ap.ALPA_VALOR, ap.ALPA_FORMA_APLICACAO,
+               ap.ALPA_INICIO_VIGENCIA, ap.ALPA_FIM_VIGENCIA
+        FROM ALIQUOTA_REFERENCIA ar
+        LEFT JOIN ALIQUOTA_PADRAO ap ON ar.ALRE_ID = ap.ALPA_ALRE_ID
+        WHERE ar.ALRE_TBTO_ID IN (SELECT value FROM json_each(?))
+        ORDER BY ar.ALRE_INICIO_VIGENCIA, ar.ALRE_ID, ap.ALPA_ID
+    """, (json.dumps(sorted(tributos_usados)),))
+    aliquotas = {}
+    padroes = {}
+    for tbto_id, alre_id, valor, inicio, fim, *padrao in cur.fetchall():
+        linhas_lidas += 1
+        if alre_id not in padroes:
+            padroes[alre_id] = []
+            aliquotas.setdefault(tbto_id, []).append((alre_id, valor, inicio, fim))
+        if padrao[0] is not None:
+            padroes[alre_id].append(modelos.criar_padrao(*padrao))
+    aliquotas_por_tributo = {
+        tbto_id: tuple(modelos.criar_aliquota(valor, inicio, fim, padroes[alre_id])
+                       for alre_id, valor, inicio, fim in linhas)
+        for tbto_id, linhas in aliquotas.items()
+    }
+
+    # 4. Percentuais de redução de cada classificação, por tributo
+    cur.execute("""
+        SELECT PERE_CLTR_ID, PERE_TBTO_ID, PERE_VALOR,
+               PERE_INICIO_VIGENCIA, PERE_FIM_VIGENCIA
+        FROM PERCENTUAL_REDUCAO
+        WHERE PERE_CLTR_ID IN (SELECT value FROM json_each(?))
+        ORDER BY PERE_VALOR DESC, PERE_ID
+    """, (classificacoes,))
+    reducoes = {}
+    for cltr_id, tbto_id, valor, inicio, fim in cur.fetchall():
+        linhas_lidas += 1
+        reducoes.setdefault((cltr_id, tbto_id), []).append(modelos.criar_reducao(valor, inicio, fim))
+
+    regras = []
+    for linha in linhas_regras:
+        cltr_id, sitr_id = linha[3], linha[13]
+        situacao = linha[14:16] if sitr_id is not None else None
+        regras.append(modelos.RegraAplicavel(
+            linha[0], linha[1], linha[2],
+            modelos.criar_classificacao(linha[4:13], situacao),
+            modelos.criar_anexo(*linha[16:19]),
+            tuple(
+                modelos.TributoAliquota(sigla, nome,
+                                        aliquotas_por_tributo.get(tbto_id, ()),
+                                        tuple(reducoes.get((cltr_id, tbto_id), ())))
+                for tbto_id, sigla, nome in tributos_por_situacao.get(sitr_id, [])
+            ),
+        ))
+
+    return modelos.criar_ncm(dados_ncm), regras, linhas_lidas
+
+
+def obter_taxas_efetivas():
+    """Retorna a tabela de alíquotas efetivas, criando-a (ou reconstruindo-a) se necessário."""
+    global _taxas_efetivas
+    if _taxas_efetivas is None:
+        _taxas_efetivas = taxas_efetivas.TabelaTaxasEfetivas(DB_PATH, obter_conexao)
+    return _taxas_efetivas
+
+
+@_cache_consultas.memorizar
+def buscar_aliquota_efetiva(codigo, cclasstrib, tributo, data_referencia):
+    """
+    Retorna a alíquota efetiva de um item de nota fiscal pela tabela materializada.
+
+    Args:
+        codigo: Código do NCM
+        cclasstrib: Código da classificação tributária
+        tributo: Sigla do tributo (CBS, IBSUF, IBSMun)
+        data_referencia: Data (YYYY-MM-DD) da operação
+
+    Returns:
+        taxas_efetivas.TaxaEfetiva, ou None se não houver alíquota vigente
+    """
+    return obter_taxas_efetivas().consultar(codigo, cclasstrib, tributo, data_referencia)
+
+
+@_cache_consultas.memorizar
+def buscar_aliquotas_efetivas_ncm(codigo, data_referencia):
+    """Retorna todas as alíquotas efetivas (TaxaEfetiva) do NCM vigentes na data."""
+    return obter_taxas_efetivas().consultar_ncm(codigo, data_referencia)
+
+
+def obter_aliquotas_locais():
+    """Retorna o resolvedor de alíquotas por UF/município do snapshot atual."""
+    global _aliquotas_locais
+    base = obter_snapshot()
+    if _aliquotas_locais is None or _aliquotas_locais.base is not base:
+        _aliquotas_locais = aliquotas_locais.ResolvedorAliquotasLocais(obter_conexao(), base)
+    return _aliquotas_locais
+
+
+@_cache_consultas.memorizar
+def buscar_aliquotas_locais_ncm(codigo, data_referencia, uf=None, municipio=None):
+    """
+    Retorna as alíquotas de CBS/IBS do NCM na UF e no município, com os ajustes de
+    ALIQUOTA_PADRAO aplicados sobre a alíquota de referência e as reduções da classificação.
+
+    Args:
+        codigo: Código do NCM
+        data_referencia: Data (YYYY-MM-DD) da operação
+        uf: Sigla (RS) ou código (43) da UF
+        municipio: Código IBGE do município
+
+    Returns:
+        Lista de aliquotas_locais.AliquotaLocal ordenada por cClassTrib e tributo
+
+    Raises:
+        ValueError: Se a data, a UF ou o município forem inválidos
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    return obter_aliquotas_locais().aliquotas_ncm(codigo, data_referencia, uf, municipio)
+
+
+def obter_imposto_seletivo():
+    """Retorna o resolvedor das alíquotas de produto (IS ad valorem e ad rem) da versão atual."""
+    global _imposto_seletivo
+    versao = obter_snapshot().versao
+    if _imposto_seletivo is None or _imposto_seletivo.versao != versao:
+        _imposto_seletivo = imposto_seletivo.ResolvedorImpostoSeletivo(obter_conexao(), versao)
+    return _imposto_seletivo
+
+
+@_cache_consultas.memorizar
+def buscar_imposto_seletivo_ncm(codigo, data_referencia):
+    """
+    Retorna as alíquotas de produto do NCM vigentes na data, herdadas dos prefixos
+    e descontadas as exceções (EXCECAO_AD_VALOREM_PRODUTO / EXCECAO_AD_REM_PRODUTO).
+
+    Args:
+        codigo: Código do NCM
+        data_referencia: Data (YYYY-MM-DD) da operação
+
+    Returns:
+        Dicionário {sigla do tributo: imposto_seletivo.AliquotaSeletivo}
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    return obter_imposto_seletivo().aliquotas(codigo, data_referencia)
+
+
+def obter_catalogo_tratamentos():
+    """Retorna o catálogo dos tratamentos tributários com as expressões compiladas."""
+    global _catalogo_tratamentos
+    if _catalogo_tratamentos is None:
+        _catalogo_tratamentos = expressoes.CatalogoTratamentos(obter_conexao)
+    return _catalogo_tratamentos
+
+
+@_cache_consultas.memorizar
+def buscar_tratamento_tributario(trtr_id):
+    """
+    Retorna o tratamento tributário com as expressões de cálculo compiladas.
+
+    Returns:
+        expressoes.TratamentoCompilado, ou None se o TRTR_ID não existir
+    """
+    return obter_catalogo_tratamentos().obter(trtr_id)
+
+
 def formatar_aliquota(valor):
     """Formata o valor da alíquota corretamente (0.9 → 0.90%)."""
     if valor is None:
@@ -211,7 +842,8 @@ def processar_memoria_calculo(memoria_calculo, percentual_reducao=None, aliquota
                              base_calculo=None, norma=None, tratamento=None, aliquota_ad_rem=None,
                              quantidade=None, unidade=None):
     """
-    Substitui placeholders na memória de cálculo pelos valores reais.
+    Substitui placeholders na memória de cálculo pelos valores reais
+    (modelo compilado uma vez por texto, ver modelos_memoria).
     
     Args:
         memoria_calculo: Texto da memória de cálculo com placeholders
@@ -227,83 +859,32 @@ def processar_memoria_calculo(memoria_calculo, percentual_reducao=None, aliquota
     Returns:
         Texto da memória de cálculo com placeholders substituídos
     """
-    if not memoria_calculo:
-        return "Memória de cálculo não disponível"
-    
-    resultado = memoria_calculo
-    
-    # Substituir placeholders comuns
-    if percentual_reducao is not None:
-        try:
-            # Converter para float se for string
-            if isinstance(percentual_reducao, str):
-                percentual_reducao = float(percentual_reducao)
-            resultado = resultado.replace('[percentual_reducao]', f'{percentual_reducao:.2f}')
-        except (ValueError, TypeError):
-            resultado = resultado.replace('[percentual_reducao]', str(percentual_reducao))
-    
-    if aliquota_ad_valorem is not None:
-        try:
-            # Converter para float se for string
-            if isinstance(aliquota_ad_valorem, str):
-                aliquota_ad_valorem = float(aliquota_ad_valorem)
-            resultado = resultado.replace('[aliquota_ad_valorem]', f'{aliquota_ad_valorem:.2f}')
-        except (ValueError, TypeError):
-            resultado = resultado.replace('[aliquota_ad_valorem]', str(aliquota_ad_valorem))
-    
-    if base_calculo is not None:
-        try:
-            # Converter para float se for string
-            if isinstance(base_calculo, str):
-                base_calculo = float(base_calculo)
-            resultado = resultado.replace('[base_calculo]', f'{base_calculo:.2f}')
-        except (ValueError, TypeError):
-            resultado = resultado.replace('[base_calculo]', str(base_calculo))
-    
-    if norma is not None:
-        resultado = resultado.replace('[norma]', norma)
-    
-    if tratamento is not None:
-        resultado = resultado.replace('[tratamento]', tratamento)
-    
-    if aliquota_ad_rem is not None:
-        try:
-            # Converter para float se for string
-            if isinstance(aliquota_ad_rem, str):
-                aliquota_ad_rem = float(aliquota_ad_rem)
-            resultado = resultado.replace('[aliquota_ad_rem]', f'{aliquota_ad_rem:.2f}')
-        except (ValueError, TypeError):
-            resultado = resultado.replace('[aliquota_ad_rem]', str(aliquota_ad_rem))
-    
-    if quantidade is not None:
-        try:
-            # Converter para float se for string
-            if isinstance(quantidade, str):
-                quantidade = float(quantidade)
-            resultado = resultado.replace('[quantidade]', f'{quantidade:.2f}')
-        except (ValueError, TypeError):
-            resultado = resultado.replace('[quantidade]', str(quantidade))
-    
-    if unidade is not None:
-        resultado = resultado.replace('[unidade]', unidade)
-    
-    # Remover placeholders não substituídos
-    import re
-    resultado = re.sub(r'\[.*?\]', 'não especificado', resultado)
-    
-    return resultado
+    return modelos_memoria.renderizar_memoria(memoria_calculo, {
+        'percentual_reducao': percentual_reducao,
+        'aliquota_ad_valorem': aliquota_ad_valorem,
+        'base_calculo': base_calculo,
+        'norma': norma,
+        'tratamento': tratamento,
+        'aliquota_ad_rem': aliquota_ad_rem,
+        'quantidade': quantidade,
+        'unidade': unidade,
+    })
 
 
-def buscar_reducoes_ncm(codigo):
+@_cache_consultas.memorizar
+@_cache_persistente.memorizar
+def buscar_reducoes_ncm(codigo, incluir_herdadas=False):
     """
     Busca especificamente as reduções para um NCM.
     Retorna uma lista de reduções encontradas.
+    Com incluir_herdadas=True, considera também as regras dos prefixos do NCM.
     """
-    conn = conectar()
+    conn = obter_conexao()
     cur = conn.cursor()
     
     # Consulta especializada para encontrar reduções
-    cur.execute("""
+    filtro_regras, parametros_filtro = _filtro_regras_ncm(codigo, incluir_herdadas)
+    cur.execute(f"""
         SELECT 
             n.NCM_CD,
             ct.CLTR_CD,
@@ -317,7 +898,7 @@ def buscar_reducoes_ncm(codigo):
             ar.ALRE_INICIO_VIGENCIA as ALIQUOTA_INICIO,
             ar.ALRE_FIM_VIGENCIA as ALIQUOTA_FIM
         FROM NCM n
-        JOIN NCM_APLICAVEL na ON n.NCM_CD = na.NCMA_NCM_CD
+        JOIN NCM_APLICAVEL na ON {filtro_regras}
         JOIN CLASSIFICACAO_TRIBUTARIA ct ON na.NCMA_CLTR_ID = ct.CLTR_ID
         JOIN PERCENTUAL_REDUCAO pr ON ct.CLTR_ID = pr.PERE_CLTR_ID
         LEFT JOIN TRIBUTO t ON pr.PERE_TBTO_ID = t.TBTO_ID
@@ -326,14 +907,15 @@ def buscar_reducoes_ncm(codigo):
           AND pr.PERE_VALOR IS NOT NULL
           AND pr.PERE_VALOR > 0
         ORDER BY ct.CLTR_CD, t.TBTO_SIGLA
-    """, (codigo,))
+    """, parametros_filtro + (codigo,))
     
     resultados = cur.fetchall()
-    conn.close()
     
     return resultados
 
 
+@_cache_consultas.memorizar
+@_cache_persistente.memorizar
 def obter_relacoes_tabelas_ncm(codigo):
     """
     Retorna informações sobre as tabelas e relações envolvidas na consulta de um NCM.
@@ -344,7 +926,7 @@ def obter_relacoes_tabelas_ncm(codigo):
     Returns:
         Lista de dicionários com informações das tabelas relacionadas
     """
-    conn = conectar()
+    conn = obter_conexao()
     cur = conn.cursor()
     
     # Consulta para obter informações sobre as tabelas relacionadas
@@ -446,7 +1028,6 @@ def obter_relacoes_tabelas_ncm(codigo):
     """, (codigo, codigo, codigo, codigo, codigo, codigo, codigo, codigo))
     
     resultados = cur.fetchall()
-    conn.close()
     
     # Converter para lista de dicionários
     relacoes = []
@@ -461,23 +1042,33 @@ def obter_relacoes_tabelas_ncm(codigo):
     return relacoes
 
 
-def buscar_cst_cclastrib_reducao_ncm(codigo):
+@_cache_consultas.memorizar
+@_cache_persistente.memorizar
+def buscar_cst_cclastrib_reducao_ncm(codigo, incluir_herdadas=False, data_referencia=None):
     """
     Busca especificamente CST, CClasTrib e redução para um NCM.
     Retorna apenas os dados solicitados: NCM, CST, CClasTrib e redução.
     
     Args:
         codigo: Código do NCM
+        incluir_herdadas: Se True, inclui as regras herdadas dos prefixos do NCM
+        data_referencia: Data (YYYY-MM-DD) para considerar apenas os registros vigentes
+                         nela; respondida pelos índices de vigência do snapshot
         
     Returns:
         Lista de tuplas com (NCM_CD, NCM_DESCRICAO, SITR_CD, SITR_DESCRICAO, 
                             CLTR_CD, CLTR_DESCRICAO, PERE_VALOR, TBTO_SIGLA, TBTO_NOME)
     """
-    conn = conectar()
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    if data_referencia is not None:
+        return obter_snapshot().cst_cclastrib_reducao(codigo, incluir_herdadas, data_referencia)
+
+    conn = obter_conexao()
     cur = conn.cursor()
     
     # Consulta otimizada para buscar apenas CST, CClasTrib e redução
-    cur.execute("""
+    filtro_regras, parametros_filtro = _filtro_regras_ncm(codigo, incluir_herdadas)
+    cur.execute(f"""
         SELECT DISTINCT
             n.NCM_CD,
             n.NCM_DESCRICAO,
@@ -489,7 +1080,7 @@ def buscar_cst_cclastrib_reducao_ncm(codigo):
             t.TBTO_SIGLA,
             t.TBTO_NOME
         FROM NCM n
-        JOIN NCM_APLICAVEL na ON n.NCM_CD = na.NCMA_NCM_CD
+        JOIN NCM_APLICAVEL na ON {filtro_regras}
         JOIN CLASSIFICACAO_TRIBUTARIA ct ON na.NCMA_CLTR_ID = ct.CLTR_ID
         LEFT JOIN SITUACAO_TRIBUTARIA st ON ct.CLTR_SITR_ID = st.SITR_ID
         LEFT JOIN PERCENTUAL_REDUCAO pr ON ct.CLTR_ID = pr.PERE_CLTR_ID
@@ -499,22 +1090,119 @@ def buscar_cst_cclastrib_reducao_ncm(codigo):
             ct.CLTR_CD,
             t.TBTO_SIGLA,
             pr.PERE_VALOR DESC NULLS LAST
-    """, (codigo,))
+    """, parametros_filtro + (codigo,))
     
     resultados = cur.fetchall()
-    conn.close()
     
     return resultados
 
 
+# Consultas de NBS: mesmo caminho das consultas de NCM, respondidas pelo snapshot
+# em memória. Os códigos podem ser informados com pontos (1.0101.11.00).
+
+@_cache_consultas.memorizar
+def buscar_nbs(codigo, data_referencia=None):
+    """
+    Busca a NBS pelo código.
+
+    Args:
+        codigo: Código da NBS, com ou sem pontos
+        data_referencia: Data (YYYY-MM-DD) para considerar apenas NBS vigentes, opcional
+
+    Returns:
+        modelos.NbsInfo ou None
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    dados_nbs = obter_snapshot().buscar_nbs(snapshot.normalizar_codigo_nbs(codigo), data_referencia)
+    return modelos.criar_nbs(dados_nbs) if dados_nbs else None
+
+
+@_cache_consultas.memorizar
+def buscar_nbs_por_prefixo(prefixo):
+    """
+    Lista o nível da NBS e todos os seus subníveis (ex.: 1.01 -> 101, 10101, 101011...).
+
+    Returns:
+        Lista de modelos.NbsInfo ordenada pelo código
+    """
+    return [modelos.criar_nbs(linha)
+            for linha in obter_snapshot().nbs_por_prefixo(snapshot.normalizar_codigo_nbs(prefixo))]
+
+
+@_cache_consultas.memorizar
+def buscar_nbs_por_lc116(item):
+    """Retorna as NBS (modelos.NbsInfo) correspondentes ao item da lista de serviços da LC 116/2003."""
+    return [modelos.criar_nbs(linha) for linha in obter_snapshot().nbs_por_lc116.get(str(item).strip(), [])]
+
+
+@_cache_consultas.memorizar
+def buscar_informacoes_estruturadas_nbs(codigo, incluir_herdadas=False, data_referencia=None):
+    """
+    Busca as informações da NBS organizadas por regra e tributo, como
+    buscar_informacoes_estruturadas_ncm.
+
+    Args:
+        codigo: Código da NBS, com ou sem pontos
+        incluir_herdadas: Se True, considera também as regras dos níveis superiores da NBS
+        data_referencia: Data (YYYY-MM-DD) para considerar apenas os registros vigentes
+
+    Returns:
+        Tupla (modelos.NbsInfo, [modelos.RegraAplicavel]), ou (None, None) se a NBS
+        não existir (ou não estiver vigente na data)
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    return obter_snapshot().informacoes_estruturadas_nbs(
+        snapshot.normalizar_codigo_nbs(codigo), incluir_herdadas, data_referencia)
+
+
+def buscar_informacoes_estruturadas_lote_nbs(codigos, incluir_herdadas=False, data_referencia=None):
+    """
+    Versão em lote de buscar_informacoes_estruturadas_nbs.
+
+    Returns:
+        Dicionário {codigo informado: (NbsInfo, regras)}; códigos inexistentes recebem (None, None)
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    base = obter_snapshot()
+    return {codigo: base.informacoes_estruturadas_nbs(
+                snapshot.normalizar_codigo_nbs(codigo), incluir_herdadas, data_referencia)
+            for codigo in dict.fromkeys(codigos)}
+
+
+@_cache_consultas.memorizar
+def buscar_cst_cclastrib_reducao_nbs(codigo, incluir_herdadas=False, data_referencia=None):
+    """
+    Busca CST, CClasTrib e redução para uma NBS, como buscar_cst_cclastrib_reducao_ncm.
+
+    Returns:
+        Lista de tuplas com (NBS_CD, NBS_DESCRICAO, SITR_CD, SITR_DESCRICAO,
+                            CLTR_CD, CLTR_DESCRICAO, PERE_VALOR, TBTO_SIGLA, TBTO_NOME)
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    return obter_snapshot().cst_cclastrib_reducao_nbs(
+        snapshot.normalizar_codigo_nbs(codigo), incluir_herdadas, data_referencia)
+
+
+@_cache_consultas.memorizar
+def buscar_aliquotas_servico_nbs(codigo, data_referencia=None):
+    """
+    Busca as alíquotas ad valorem do Imposto Seletivo sobre o serviço
+    (ALIQUOTA_AD_VALOREM_SERVICO), herdadas dos níveis superiores da NBS.
+
+    Returns:
+        Lista de (TBTO_SIGLA, AADV_VALOR, INICIO_VIGENCIA, FIM_VIGENCIA)
+    """
+    data_referencia = vigencia.validar_data_referencia(data_referencia)
+    return obter_snapshot().aliquotas_servico(snapshot.normalizar_codigo_nbs(codigo), data_referencia)
+
+
 def testar_conexao():
     """Testa a conexão com o banco de dados."""
     try:
-        conn = conectar()
+        conn = obter_conexao()
         cur = conn.cursor()
         cur.execute("SELECT COUNT(*) FROM NCM")
         count = cur.fetchone()[0]
-        conn.close()
         return True, f"Conexão bem-sucedida. {count} NCMs encontrados."
     except Exception as e:
         return False, f"Erro na conexão: {str(e)}"
@@ -0,0 +1,141 @@
+"""
+API assíncrona (asyncio) das consultas do database.
+As funções bloqueantes do database rodam num pool limitado de threads; como o
+pool de conexões SQLite tem afinidade por thread, cada thread de trabalho
+reaproveita sempre a sua conexão. Consultas iguais feitas ao mesmo tempo
+(mesma função e argumentos) são agrupadas numa única execução (single-flight):
+todas as corrotinas aguardam o mesmo resultado.
+
+Os resultados são compartilhados entre as corrotinas agrupadas e não devem
+ser alterados por quem os recebe.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+# Threads de trabalho (cada uma com a sua conexão SQLite)
+QUANTIDADE_THREADS = 4
+
+
+class ConsultasAssincronas:
+    """
+    Executa funções do database fora do loop de eventos, agrupando chamadas repetidas.
+
+    Args:
+        quantidade_threads: Tamanho do pool de threads
+    """
+
+    def __init__(self, quantidade_threads=QUANTIDADE_THREADS):
+        self.quantidade_threads = quantidade_threads
+        self._executor = None
+        self._trava = threading.Lock()
+        self._em_andamento = {}
+        self.executadas = 0
+        self.agrupadas = 0
+
+    def _obter_executor(self):
+        if self._executor is None:
+            with self._trava:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.quantidade_threads,
+                                                        thread_name_prefix="database-async")
+        return self._executor
+
+    async def executar(self, funcao, *args, **kwargs):
+        """
+        Executa funcao(*args, **kwargs) no pool de threads. Se a mesma chamada já
+        estiver em andamento neste loop, aguarda o resultado dela.
+        O cancelamento de uma corrotina não cancela a consulta das demais.
+        """
+        loop = asyncio.get_running_loop()
+        chave = (loop, funcao, args, tuple(sorted(kwargs.items())))
+        executor = self._obter_executor()
+        with self._trava:
+            futuro = self._em_andamento.get(chave)
+            if futuro is None:
+                futuro = loop.run_in_executor(executor, functools.partial(funcao, *args, **kwargs))
+                self._em_andamento[chave] = futuro
+                futuro.add_done_callback(functools.partial(self._concluir, chave))
+                self.executadas += 1
+            else:
+                self.agrupadas += 1
+        return await asyncio.shield(futuro)
+
+    def _concluir(self, chave, futuro):
+        with self._trava:
+            self._em_andamento.pop(chave, None)
+        if not futuro.cancelled():
+            # Marca a exceção como lida mesmo que todas as corrotinas tenham sido canceladas
+            futuro.exception()
+
+    def encerrar(self):
+        """Encerra o pool de threads (consultas pendentes são canceladas)."""
+        with self._trava:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def estatisticas(self):
+        """Retorna os contadores de consultas executadas e agrupadas."""
+        return {
+            'threads': self.quantidade_threads,
+            'em_andamento': len(self._em_andamento),
+            'executadas': self.executadas,
+            'agrupadas': self.agrupadas,
+        }
+
+
+_consultas = None
+_trava_consultas = threading.Lock()
+
+
+def obter_consultas():
+    """Retorna o executor assíncrono compartilhado."""
+    global _consultas
+    if _consultas is None:
+        with _trava_consultas:
+            if _consultas is None:
+                _consultas = ConsultasAssincronas()
+    return _consultas
+
+
+def encerrar():
+    """Encerra o pool de threads compartilhado e fecha as conexões do database."""
+    global _consultas
+    with _trava_consultas:
+        consultas, _consultas = _consultas, None
+    if consultas is not None:
+        consultas.encerrar()
+    database.fechar_conexoes()
+
+
+async def buscar_informacoes_completas_ncm(codigo, incluir_herdadas=False):
+    """Versão assíncrona de database.buscar_informacoes_completas_ncm."""
+    return await obter_consultas().executar(
+        database.buscar_informacoes_completas_ncm, codigo, incluir_herdadas)
+
+
+async def buscar_informacoes_estruturadas_ncm(codigo, incluir_herdadas=False, data_referencia=None):
+    """Versão assíncrona de database.buscar_informacoes_estruturadas_ncm."""
+    return await obter_consultas().executar(
+        database.buscar_informacoes_estruturadas_ncm, codigo, incluir_herdadas, data_referencia)
+
+
+async def buscar_cst_cclastrib_reducao_ncm(codigo, incluir_herdadas=False, data_referencia=None):
+    """Versão assíncrona de database.buscar_cst_cclastrib_reducao_ncm."""
+    return await obter_consultas().executar(
+        database.buscar_cst_cclastrib_reducao_ncm, codigo, incluir_herdadas, data_referencia)
+
+
+async def buscar_reducoes_ncm(codigo, incluir_herdadas=False):
+    """Versão assíncrona de database.buscar_reducoes_ncm."""
+    return await obter_consultas().executar(database.buscar_reducoes_ncm, codigo, incluir_herdadas)
+
+
+async def buscar_por_descricao(texto):
+    """Versão assíncrona de database.buscar_por_descricao."""
+    return await obter_consultas().executar(database.buscar_por_descricao, texto)
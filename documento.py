@@ -0,0 +1,79 @@
+"""
+Modelo de documento dos relatórios de consulta.
+O relatório é montado em memória como uma sequência de trechos (texto, tag) e
+só então aplicado ao widget Text numa única chamada (Text.insert aceita vários
+pares texto/tags), em vez de uma chamada ao Tk por fragmento. O mesmo documento
+é convertido em texto simples para a linha de comando; o tkinter só é
+importado por aplicar_no_widget, de modo que o modelo funciona sem interface.
+"""
+
+
+class Documento:
+    """
+    Texto com trechos marcados por tags.
+    Trechos consecutivos com a mesma tag são unidos, de modo que o documento
+    fica com um trecho por mudança de formatação.
+    """
+
+    def __init__(self):
+        self._tags = []
+        self._partes = []
+
+    def adicionar(self, texto, tag=None):
+        """Acrescenta um trecho de texto com a tag informada (None para sem tag)."""
+        if not texto:
+            return
+        if self._tags and self._tags[-1] == tag:
+            self._partes[-1].append(texto)
+        else:
+            self._tags.append(tag)
+            self._partes.append([texto])
+
+    def trechos(self):
+        """Retorna a lista de (texto, tag), um por mudança de tag."""
+        return [("".join(partes), tag) for tag, partes in zip(self._tags, self._partes)]
+
+    def intervalos(self):
+        """Retorna os intervalos de tags como (inicio, fim, tag), em caracteres desde o início."""
+        intervalos = []
+        posicao = 0
+        for texto, tag in self.trechos():
+            fim = posicao + len(texto)
+            if tag is not None:
+                intervalos.append((posicao, fim, tag))
+            posicao = fim
+        return intervalos
+
+    def texto(self):
+        """Retorna o documento como texto simples, sem as tags."""
+        return "".join(parte for partes in self._partes for parte in partes)
+
+    def __len__(self):
+        return len(self._tags)
+
+
+def aplicar_no_widget(widget, documento, limpar=True):
+    """
+    Exibe o documento num widget Text com uma única chamada a insert.
+
+    Args:
+        widget: tk.Text de destino
+        documento: Documento montado
+        limpar: Se True, apaga o conteúdo anterior do widget
+    """
+    import tkinter as tk
+
+    argumentos = []
+    for texto, tag in documento.trechos():
+        argumentos.append(texto)
+        argumentos.append(tag if tag is not None else ())
+
+    if limpar:
+        widget.delete("1.0", tk.END)
+    if argumentos:
+        widget.insert(tk.END, *argumentos)
+
+
+def renderizar_texto(documento):
+    """Converte o documento em texto simples (linha de comando, arquivos)."""
+    return documento.texto()
@@ -0,0 +1,256 @@
+"""
+Executor de consultas em segundo plano para as interfaces Tkinter.
+As chamadas ao database rodam num pool de threads e os resultados voltam para
+a thread do Tk por uma fila lida com after(), de modo que a janela nunca fica
+bloqueada. Cada consulta pertence a um canal ("consulta", "busca"): uma nova
+consulta no mesmo canal substitui a anterior, que é cancelada se ainda não
+começou ou tem o resultado descartado se já estava rodando. Assim, cliques
+rápidos em sequência não formam fila e só o último resultado é exibido.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads de trabalho (consultas de canais diferentes podem rodar em paralelo)
+QUANTIDADE_THREADS = 2
+
+# Intervalo, em milissegundos, entre leituras da fila de resultados
+INTERVALO_VERIFICACAO_MS = 20
+
+# Canais usados pelas interfaces
+CANAL_CONSULTA = "consulta"
+CANAL_BUSCA = "busca"
+
+_CONCLUIDA = "concluida"
+_ERRO = "erro"
+_DESCARTADA = "descartada"
+_PROGRESSO = "progresso"
+
+
+class ConsultaCancelada(Exception):
+    """Levantada por Tarefa.verificar_cancelamento quando a consulta foi substituída."""
+
+
+class Tarefa:
+    """
+    Consulta submetida ao executor.
+
+    Args:
+        canal: Canal da consulta (uma nova consulta no canal substitui esta)
+        fila: Fila de resultados do executor
+        ao_concluir: Função chamada na thread do Tk com o resultado
+        ao_erro: Função chamada na thread do Tk com a exceção
+        ao_progresso: Função chamada na thread do Tk com (atual, total, mensagem)
+    """
+
+    def __init__(self, canal, fila, ao_concluir=None, ao_erro=None, ao_progresso=None):
+        self.canal = canal
+        self.ao_concluir = ao_concluir
+        self.ao_erro = ao_erro
+        self.ao_progresso = ao_progresso
+        self.futuro = None
+        self.criada_em = time.perf_counter()
+        self.tempo_ms = None
+        self._fila = fila
+        self._cancelada = threading.Event()
+
+    @property
+    def cancelada(self):
+        """Indica se a tarefa foi cancelada ou substituída."""
+        return self._cancelada.is_set()
+
+    def cancelar(self):
+        """
+        Marca a tarefa como cancelada.
+
+        Returns:
+            True se ela ainda não tinha começado (não vai mais rodar)
+        """
+        self._cancelada.set()
+        return self.futuro is not None and self.futuro.cancel()
+
+    def verificar_cancelamento(self):
+        """Interrompe a função da tarefa se ela foi cancelada (para consultas longas)."""
+        if self.cancelada:
+            raise ConsultaCancelada()
+
+    def informar_progresso(self, atual, total=None, mensagem=None):
+        """Publica o progresso da tarefa; pode ser chamado da thread de trabalho."""
+        if not self.cancelada:
+            self._fila.put((_PROGRESSO, self, (atual, total, mensagem)))
+
+
+class ExecutorConsultas:
+    """
+    Executa funções do database fora da thread do Tk.
+
+    Args:
+        widget: Widget Tk usado para agendar a leitura da fila (after)
+        ao_mudar_estado: Função opcional chamada com True quando há consultas
+                         em andamento e com False quando todas terminam
+        quantidade_threads: Threads de trabalho do pool
+    """
+
+    def __init__(self, widget, ao_mudar_estado=None, quantidade_threads=QUANTIDADE_THREADS):
+        self.widget = widget
+        self.ao_mudar_estado = ao_mudar_estado
+        self._pool = ThreadPoolExecutor(max_workers=quantidade_threads, thread_name_prefix="consulta")
+        self._fila = queue.Queue()
+        self._tarefas = {}
+        self._pendentes = 0
+        self._agendamento = None
+        self._encerrado = False
+        self.submetidas = 0
+        self.concluidas = 0
+        self.canceladas = 0
+        self.descartadas = 0
+        self.erros = 0
+        self.tempo_total_ms = 0.0
+
+    @property
+    def ocupado(self):
+        """Indica se há consultas em andamento."""
+        return self._pendentes > 0
+
+    def submeter(self, canal, funcao, *args, ao_concluir=None, ao_erro=None, ao_progresso=None, **kwargs):
+        """
+        Executa funcao(*args, **kwargs) em segundo plano, substituindo a consulta
+        anterior do mesmo canal. Deve ser chamado na thread do Tk.
+
+        Se ao_progresso for informado, a função recebe a Tarefa no argumento
+        nomeado 'tarefa' para publicar o progresso e verificar o cancelamento.
+
+        Returns:
+            Tarefa submetida
+        """
+        if self._encerrado:
+            raise RuntimeError("Executor de consultas encerrado")
+
+        self.cancelar(canal)
+        tarefa = Tarefa(canal, self._fila, ao_concluir, ao_erro, ao_progresso)
+        if ao_progresso is not None:
+            kwargs['tarefa'] = tarefa
+        self._tarefas[canal] = tarefa
+        self.submetidas += 1
+
+        self._pendentes += 1
+        if self._pendentes == 1:
+            self._notificar_estado(True)
+        tarefa.futuro = self._pool.submit(self._executar, tarefa, funcao, args, kwargs)
+        self._agendar_verificacao()
+        return tarefa
+
+    def cancelar(self, canal):
+        """Cancela a consulta em andamento no canal, se houver."""
+        tarefa = self._tarefas.pop(canal, None)
+        if tarefa is None:
+            return
+        self.canceladas += 1
+        if tarefa.cancelar():
+            # Nunca vai rodar: não haverá mensagem na fila para ela
+            self._finalizar_pendente()
+
+    def processar_fila(self):
+        """Entrega na thread do Tk os resultados que chegaram das threads de trabalho."""
+        self._agendamento = None
+        while True:
+            try:
+                tipo, tarefa, dados = self._fila.get_nowait()
+            except queue.Empty:
+                break
+
+            atual = not tarefa.cancelada and self._tarefas.get(tarefa.canal) is tarefa
+            if tipo == _PROGRESSO:
+                if atual:
+                    self._chamar(tarefa.ao_progresso, *dados)
+                continue
+
+            self._finalizar_pendente()
+            if not atual or tipo == _DESCARTADA:
+                self.descartadas += 1
+                continue
+
+            del self._tarefas[tarefa.canal]
+            tarefa.tempo_ms = (time.perf_counter() - tarefa.criada_em) * 1000
+            self.tempo_total_ms += tarefa.tempo_ms
+            if tipo == _CONCLUIDA:
+                self.concluidas += 1
+                self._chamar(tarefa.ao_concluir, dados)
+            else:
+                self.erros += 1
+                if tarefa.ao_erro is not None:
+                    self._chamar(tarefa.ao_erro, dados)
+                else:
+                    self._relatar_erro(dados)
+
+        if self._pendentes > 0:
+            self._agendar_verificacao()
+
+    def encerrar(self):
+        """Cancela as consultas pendentes e libera as threads de trabalho."""
+        self._encerrado = True
+        for canal in list(self._tarefas):
+            self.cancelar(canal)
+        if self._agendamento is not None:
+            self.widget.after_cancel(self._agendamento)
+            self._agendamento = None
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def estatisticas(self):
+        """Retorna os contadores do executor."""
+        return {
+            'submetidas': self.submetidas,
+            'concluidas': self.concluidas,
+            'canceladas': self.canceladas,
+            'descartadas': self.descartadas,
+            'erros': self.erros,
+            'pendentes': self._pendentes,
+            'tempo_medio_ms': self.tempo_total_ms / self.concluidas if self.concluidas else 0.0,
+        }
+
+    # Implementação
+
+    def _executar(self, tarefa, funcao, args, kwargs):
+        """Roda na thread de trabalho; o resultado sempre volta pela fila."""
+        if tarefa.cancelada:
+            self._fila.put((_DESCARTADA, tarefa, None))
+            return
+        try:
+            resultado = funcao(*args, **kwargs)
+        except ConsultaCancelada:
+            self._fila.put((_DESCARTADA, tarefa, None))
+        except Exception as e:
+            self._fila.put((_ERRO, tarefa, e))
+        else:
+            self._fila.put((_CONCLUIDA, tarefa, resultado))
+
+    def _agendar_verificacao(self):
+        if self._agendamento is None and not self._encerrado:
+            self._agendamento = self.widget.after(INTERVALO_VERIFICACAO_MS, self.processar_fila)
+
+    def _finalizar_pendente(self):
+        self._pendentes -= 1
+        if self._pendentes == 0:
+            self._notificar_estado(False)
+
+    def _notificar_estado(self, ocupado):
+        if self.ao_mudar_estado is not None:
+            self._chamar(self.ao_mudar_estado, ocupado)
+
+    def _chamar(self, funcao, *args):
+        """Chama um callback da interface sem interromper a leitura da fila."""
+        if funcao is None:
+            return
+        try:
+            funcao(*args)
+        except Exception as e:
+            self._relatar_erro(e)
+
+    def _relatar_erro(self, erro):
+        relatar = getattr(self.widget, "report_callback_exception", None)
+        if relatar is not None:
+            relatar(type(erro), erro, erro.__traceback__)
+        else:
+            raise erro
@@ -4,33 +4,7 @@ Conforme solicitado pelo usuário: "pegar apenas cst, cclasstrib e redução do
 """
 
 import database
-
-def formatar_reducao(valor):
-    """Formata o valor da redução para exibição."""
-    if valor is None:
-        return "Sem redução"
-    
-    try:
-        # Converter para float se for string
-        if isinstance(valor, str):
-            # Verificar se é uma data (YYYY-MM-DD)
-            if len(valor) == 10 and valor[4] == '-' and valor[7] == '-':
-                return f"Data inválida: {valor}"
-            valor_float = float(valor)
-        else:
-            valor_float = float(valor)
-        
-        # Valores como 10000.00% provavelmente são fatores de multiplicação
-        if valor_float >= 10000:
-            return "Isenção total (100%)"
-        elif valor_float >= 100:
-            # Redução maior que 100% - pode ser erro ou fator especial
-            return f"{valor_float:.2f}% (fator especial)"
-        else:
-            return f"{valor_float:.2f}%"
-    except (ValueError, TypeError):
-        # Se não puder converter, retornar como string
-        return str(valor)
+import relatorios
 
 def exibir_cst_cclastrib_reducao(codigo_ncm):
     """
@@ -43,58 +17,30 @@ def exibir_cst_cclastrib_reducao(codigo_ncm):
     print(f"CONSULTA: CST, CClasTrib e Redução para NCM: {codigo_ncm}")
     print(f"{'='*80}")
     
-    # Buscar os dados usando a nova função
-    resultados = database.buscar_cst_cclastrib_reducao_ncm(codigo_ncm)
+    # Buscar o relatório, já agrupado por NCM + CST + CClasTrib
+    relatorio = relatorios.relatorio_cst_cclastrib(codigo_ncm)
     
-    if not resultados:
+    if relatorio is None:
         print(f"Nenhum resultado encontrado para NCM: {codigo_ncm}")
         print("Verifique se o código NCM está correto.")
         return
     
-    # Agrupar resultados por classificação tributária para melhor organização
-    resultados_agrupados = {}
-    for resultado in resultados:
-        ncm_cd, ncm_desc, sitr_cd, sitr_desc, cltr_cd, cltr_desc, pere_valor, tbto_sigla, tbto_nome = resultado
-        
-        # Chave única para agrupamento: NCM + CST + CClasTrib
-        chave = (ncm_cd, sitr_cd, cltr_cd)
-        
-        if chave not in resultados_agrupados:
-            resultados_agrupados[chave] = {
-                'ncm_descricao': ncm_desc,
-                'sitr_descricao': sitr_desc,
-                'cltr_descricao': cltr_desc,
-                'reducoes': []
-            }
-        
-        # Adicionar redução se existir
-        if pere_valor is not None:
-            reducao_formatada = formatar_reducao(pere_valor)
-            tributo_info = f"{tbto_sigla} ({tbto_nome})" if tbto_sigla else "Tributo não especificado"
-            resultados_agrupados[chave]['reducoes'].append({
-                'valor': pere_valor,
-                'formatado': reducao_formatada,
-                'tributo': tributo_info
-            })
-    
     # Exibir resultados agrupados
-    for i, (chave, dados) in enumerate(resultados_agrupados.items(), 1):
-        ncm_cd, sitr_cd, cltr_cd = chave
-        
-        print(f"\n{i}. NCM: {ncm_cd}")
-        print(f"   Descrição: {dados['ncm_descricao'][:100]}..." if len(dados['ncm_descricao']) > 100 else f"   Descrição: {dados['ncm_descricao']}")
-        print(f"   CST: {sitr_cd} - {dados['sitr_descricao']}")
-        print(f"   CClasTrib: {cltr_cd} - {dados['cltr_descricao']}")
+    for i, combinacao in enumerate(relatorio.combinacoes, 1):
+        print(f"\n{i}. NCM: {combinacao.ncm}")
+        print(f"   Descrição: {combinacao.ncm_descricao[:100]}..." if len(combinacao.ncm_descricao) > 100 else f"   Descrição: {combinacao.ncm_descricao}")
+        print(f"   CST: {combinacao.cst} - {combinacao.cst_descricao}")
+        print(f"   CClasTrib: {combinacao.cclasstrib} - {combinacao.cclasstrib_descricao}")
         
-        if dados['reducoes']:
+        if combinacao.reducoes:
             print(f"   Reduções aplicáveis:")
-            for reducao in dados['reducoes']:
-                print(f"     • {reducao['tributo']}: {reducao['formatado']}")
+            for reducao in combinacao.reducoes:
+                print(f"     • {reducao.tributo}: {reducao.formatado}")
         else:
             print(f"   Redução: Sem redução cadastrada")
     
     print(f"\n{'='*80}")
-    print(f"Total de combinações encontradas: {len(resultados_agrupados)}")
+    print(f"Total de combinações encontradas: {len(relatorio.combinacoes)}")
     print(f"{'='*80}")
 
 def menu_principal():
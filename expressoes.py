@@ -0,0 +1,469 @@
+"""
+Compilador das expressões de cálculo do TRATAMENTO_TRIBUTARIO.
+As fórmulas gravadas como texto (ex.: "baseCalculo*aliquotaEfetiva",
+"aliquota*(1-percentualReducao)") são analisadas uma única vez e convertidas
+numa árvore de funções (closures), sem eval: aplicar uma expressão a um item
+custa apenas a aritmética. A mesma expressão pode ser avaliada num item
+(dicionário de variáveis) ou em colunas (listas de valores, um por item).
+Os tratamentos compilados ficam em memória por TRTR_ID e são recompilados
+quando a versão da base muda.
+
+Gramática aceita: números, nomes de variáveis, + - * /, sinal unário e parênteses.
+"""
+
+import operator
+import threading
+import time
+from itertools import repeat
+from typing import NamedTuple, Optional
+
+import snapshot
+import vigencia
+
+# Intervalo mínimo, em segundos, entre verificações da versão da base
+INTERVALO_VERIFICACAO_VERSAO = 5.0
+
+OPERADORES = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+}
+
+# Colunas de expressão do TRATAMENTO_TRIBUTARIO e a variável que cada uma calcula
+COLUNAS_EXPRESSAO = (
+    ("TRTR_EXPRESSAO_ALIQUOTA", "aliquota"),
+    ("TRTR_EXPRESSAO_ALIQUOTA_EFETIVA", "aliquotaEfetiva"),
+    ("TRTR_EXPRESSAO_BASE_CALCULO", "baseCalculo"),
+    ("TRTR_EXPRESSAO_TRIBUTO_CALCULADO", "tributoCalculado"),
+    ("TRTR_EXPRESSAO_TRIBUTO_DEVIDO", "tributoDevido"),
+    ("TRTR_EXPRESSAO_PERCENTUAL_DIFERIMENTO", "percentualDiferimento"),
+    ("TRTR_EXPRESSAO_VALOR_DIFERIMENTO", "valorDiferimento"),
+)
+
+
+class ExpressaoInvalida(ValueError):
+    """Expressão com sintaxe não suportada ou dependências circulares."""
+
+
+# Análise sintática
+
+def _tokenizar(texto):
+    """Divide a expressão em tokens (tipo, valor, posição)."""
+    tokens = []
+    posicao = 0
+    while posicao < len(texto):
+        caractere = texto[posicao]
+        if caractere.isspace():
+            posicao += 1
+        elif caractere.isdigit() or caractere == '.':
+            inicio = posicao
+            while posicao < len(texto) and (texto[posicao].isdigit() or texto[posicao] == '.'):
+                posicao += 1
+            numero = texto[inicio:posicao]
+            if numero.count('.') > 1 or numero == '.':
+                raise ExpressaoInvalida(f"Número inválido '{numero}' na posição {inicio} de '{texto}'")
+            tokens.append(('numero', numero, inicio))
+        elif caractere.isalpha() or caractere == '_':
+            inicio = posicao
+            while posicao < len(texto) and (texto[posicao].isalnum() or texto[posicao] == '_'):
+                posicao += 1
+            tokens.append(('nome', texto[inicio:posicao], inicio))
+        elif caractere in OPERADORES or caractere in '()':
+            tokens.append((caractere, caractere, posicao))
+            posicao += 1
+        else:
+            raise ExpressaoInvalida(f"Caractere '{caractere}' não suportado na posição {posicao} de '{texto}'")
+    return tokens
+
+
+class _Analisador:
+    """
+    Analisador descendente recursivo. Produz a árvore da expressão em tuplas:
+    ('numero', valor), ('variavel', nome), ('negativo', no), ('binario', simbolo, esq, dir).
+    """
+
+    def __init__(self, texto, numero):
+        self.texto = texto
+        self.numero = numero
+        self.tokens = _tokenizar(texto)
+        self.posicao = 0
+
+    def _atual(self):
+        return self.tokens[self.posicao] if self.posicao < len(self.tokens) else (None, None, len(self.texto))
+
+    def _consumir(self):
+        token = self._atual()
+        self.posicao += 1
+        return token
+
+    def analisar(self):
+        if not self.tokens:
+            raise ExpressaoInvalida("Expressão vazia")
+        arvore = self._soma()
+        tipo, valor, posicao = self._atual()
+        if tipo is not None:
+            raise ExpressaoInvalida(f"'{valor}' inesperado na posição {posicao} de '{self.texto}'")
+        return arvore
+
+    def _soma(self):
+        arvore = self._produto()
+        while self._atual()[0] in ('+', '-'):
+            simbolo = self._consumir()[0]
+            arvore = _binario(simbolo, arvore, self._produto())
+        return arvore
+
+    def _produto(self):
+        arvore = self._fator()
+        while self._atual()[0] in ('*', '/'):
+            simbolo = self._consumir()[0]
+            arvore = _binario(simbolo, arvore, self._fator())
+        return arvore
+
+    def _fator(self):
+        tipo, valor, posicao = self._consumir()
+        if tipo == '+':
+            return self._fator()
+        if tipo == '-':
+            operando = self._fator()
+            if operando[0] == 'numero':
+                return ('numero', -operando[1])
+            return ('negativo', operando)
+        if tipo == 'numero':
+            return ('numero', self.numero(valor))
+        if tipo == 'nome':
+            return ('variavel', valor)
+        if tipo == '(':
+            arvore = self._soma()
+            if self._consumir()[0] != ')':
+                raise ExpressaoInvalida(f"')' esperado na expressão '{self.texto}'")
+            return arvore
+        raise ExpressaoInvalida(f"Operando esperado na posição {posicao} de '{self.texto}'")
+
+
+def _binario(simbolo, esquerda, direita):
+    """Monta o nó binário, já calculando operações entre constantes (ex.: 100/100)."""
+    if esquerda[0] == 'numero' and direita[0] == 'numero':
+        try:
+            return ('numero', OPERADORES[simbolo](esquerda[1], direita[1]))
+        except ZeroDivisionError:
+            pass
+    return ('binario', simbolo, esquerda, direita)
+
+
+def _variaveis(arvore):
+    if arvore[0] == 'variavel':
+        return {arvore[1]}
+    if arvore[0] == 'negativo':
+        return _variaveis(arvore[1])
+    if arvore[0] == 'binario':
+        return _variaveis(arvore[2]) | _variaveis(arvore[3])
+    return set()
+
+
+# Geração das funções
+
+def _compilar_item(arvore):
+    """Converte a árvore numa função f(variaveis) -> valor."""
+    tipo = arvore[0]
+    if tipo == 'numero':
+        valor = arvore[1]
+        return lambda variaveis: valor
+    if tipo == 'variavel':
+        return operator.itemgetter(arvore[1])
+    if tipo == 'negativo':
+        operando = _compilar_item(arvore[1])
+        return lambda variaveis: -operando(variaveis)
+
+    operacao = OPERADORES[arvore[1]]
+    esquerda, direita = arvore[2], arvore[3]
+    # Folhas resolvidas direto, sem chamada intermediária
+    if esquerda[0] == 'variavel' and direita[0] == 'variavel':
+        nome_esq, nome_dir = esquerda[1], direita[1]
+        return lambda variaveis: operacao(variaveis[nome_esq], variaveis[nome_dir])
+    if esquerda[0] == 'variavel' and direita[0] == 'numero':
+        nome_esq, valor_dir = esquerda[1], direita[1]
+        return lambda variaveis: operacao(variaveis[nome_esq], valor_dir)
+    if esquerda[0] == 'numero' and direita[0] == 'variavel':
+        valor_esq, nome_dir = esquerda[1], direita[1]
+        return lambda variaveis: operacao(valor_esq, variaveis[nome_dir])
+    funcao_esq, funcao_dir = _compilar_item(esquerda), _compilar_item(direita)
+    return lambda variaveis: operacao(funcao_esq(variaveis), funcao_dir(variaveis))
+
+
+def _aplicar_colunas(operacao, esquerda, direita):
+    """Aplica a operação elemento a elemento; valores escalares valem para todos os itens."""
+    if type(esquerda) is list:
+        if type(direita) is list:
+            return list(map(operacao, esquerda, direita))
+        return list(map(operacao, esquerda, repeat(direita, len(esquerda))))
+    if type(direita) is list:
+        return list(map(operacao, repeat(esquerda, len(direita)), direita))
+    return operacao(esquerda, direita)
+
+
+def _compilar_colunas(arvore):
+    """Converte a árvore numa função f(colunas) -> lista (ou escalar, se nada variar)."""
+    tipo = arvore[0]
+    if tipo == 'numero':
+        valor = arvore[1]
+        return lambda colunas: valor
+    if tipo == 'variavel':
+        return operator.itemgetter(arvore[1])
+    if tipo == 'negativo':
+        operando = _compilar_colunas(arvore[1])
+        return lambda colunas: _aplicar_colunas(operator.mul, -1, operando(colunas))
+
+    operacao = OPERADORES[arvore[1]]
+    funcao_esq, funcao_dir = _compilar_colunas(arvore[2]), _compilar_colunas(arvore[3])
+    return lambda colunas: _aplicar_colunas(operacao, funcao_esq(colunas), funcao_dir(colunas))
+
+
+class ExpressaoCompilada:
+    """
+    Expressão pronta para avaliação.
+
+    Args:
+        texto: Texto original da expressão
+        numero: Tipo numérico das constantes (float, Decimal...)
+    """
+
+    __slots__ = ('texto', 'variaveis', 'constante', '_funcao_item', '_funcao_colunas')
+
+    def __init__(self, texto, numero=float):
+        arvore = _Analisador(texto, numero).analisar()
+        self.texto = texto
+        self.variaveis = frozenset(_variaveis(arvore))
+        self.constante = arvore[1] if arvore[0] == 'numero' else None
+        self._funcao_item = _compilar_item(arvore)
+        self._funcao_colunas = _compilar_colunas(arvore)
+
+    def avaliar(self, variaveis):
+        """
+        Avalia a expressão para um item.
+
+        Args:
+            variaveis: Dicionário {nome: valor}
+
+        Raises:
+            ValueError: Se faltar alguma variável da expressão
+        """
+        try:
+            return self._funcao_item(variaveis)
+        except KeyError as erro:
+            raise ValueError(f"Variável '{erro.args[0]}' não informada para '{self.texto}'") from None
+
+    def avaliar_colunas(self, colunas, tamanho=None):
+        """
+        Avalia a expressão para vários itens de uma vez.
+
+        Args:
+            colunas: Dicionário {nome: lista de valores ou valor único para todos}
+            tamanho: Quantidade de itens (padrão: tamanho das listas informadas)
+
+        Returns:
+            Lista com o valor de cada item
+        """
+        try:
+            resultado = self._funcao_colunas(colunas)
+        except KeyError as erro:
+            raise ValueError(f"Variável '{erro.args[0]}' não informada para '{self.texto}'") from None
+        if type(resultado) is list:
+            return resultado
+        if tamanho is None:
+            tamanho = max((len(valor) for valor in colunas.values() if type(valor) is list), default=1)
+        return [resultado] * tamanho
+
+    def __repr__(self):
+        return f"ExpressaoCompilada({self.texto!r})"
+
+
+def compilar(texto, numero=float):
+    """
+    Compila uma expressão. Textos vazios ou None retornam None (expressão não definida).
+
+    Raises:
+        ExpressaoInvalida: Se a sintaxe não for suportada
+    """
+    if texto is None or not texto.strip():
+        return None
+    return ExpressaoCompilada(texto, numero)
+
+
+# Tratamentos tributários
+
+class TratamentoCompilado(NamedTuple):
+    """Expressões compiladas de um TRATAMENTO_TRIBUTARIO, na ordem de cálculo."""
+    id: int
+    descricao: str
+    passos: tuple               # ((variável calculada, ExpressaoCompilada), ...)
+    entradas: frozenset         # Variáveis que precisam ser informadas
+    inicio_vigencia: str
+    fim_vigencia: Optional[str]
+
+    def calcular(self, variaveis):
+        """
+        Calcula as variáveis do tratamento para um item.
+
+        Args:
+            variaveis: Dicionário com as entradas (baseCalculoInformada, aliquota...)
+
+        Returns:
+            Dicionário {variável calculada: valor}
+        """
+        valores = dict(variaveis)
+        for saida, expressao in self.passos:
+            valores[saida] = expressao.avaliar(valores)
+        return {saida: valores[saida] for saida, _ in self.passos}
+
+    def calcular_colunas(self, colunas, tamanho=None):
+        """Calcula as variáveis do tratamento para vários itens (colunas de entradas)."""
+        valores = dict(colunas)
+        for saida, expressao in self.passos:
+            valores[saida] = expressao.avaliar_colunas(valores, tamanho)
+        return {saida: valores[saida] for saida, _ in self.passos}
+
+
+def ordenar_passos(expressoes):
+    """
+    Ordena as expressões de forma que cada uma seja calculada depois das que ela usa.
+    Uma expressão que usa a própria variável (ex.: aliquota = "aliquota") lê o valor informado.
+
+    Args:
+        expressoes: Lista de (variável calculada, ExpressaoCompilada), na ordem das colunas
+
+    Returns:
+        Tupla (passos ordenados, variáveis de entrada)
+
+    Raises:
+        ExpressaoInvalida: Se houver dependência circular
+    """
+    pendentes = dict(expressoes)
+    calculadas = set()
+    passos = []
+    entradas = set()
+    while pendentes:
+        prontas = [saida for saida, expressao in pendentes.items()
+                   if not (expressao.variaveis - {saida}) & (pendentes.keys() - {saida})]
+        if not prontas:
+            raise ExpressaoInvalida(f"Dependência circular entre {sorted(pendentes)}")
+        for saida in prontas:
+            expressao = pendentes.pop(saida)
+            entradas.update(variavel for variavel in expressao.variaveis
+                            if variavel == saida or variavel not in calculadas)
+            calculadas.add(saida)
+            passos.append((saida, expressao))
+    return tuple(passos), frozenset(entradas)
+
+
+def compilar_tratamento(linha, numero=float, compiladas=None):
+    """
+    Compila as expressões de uma linha do TRATAMENTO_TRIBUTARIO.
+
+    Args:
+        linha: sqlite3.Row (ou dicionário) com as colunas da tabela
+        numero: Tipo numérico das constantes
+        compiladas: Dicionário {texto: ExpressaoCompilada} compartilhado entre
+                    tratamentos (a maioria repete as mesmas fórmulas), opcional
+
+    Raises:
+        ExpressaoInvalida: Se alguma expressão for inválida
+    """
+    if compiladas is None:
+        compiladas = {}
+    expressoes = []
+    for coluna, saida in COLUNAS_EXPRESSAO:
+        texto = linha[coluna]
+        if texto is None or not texto.strip():
+            continue
+        if texto not in compiladas:
+            try:
+                compiladas[texto] = compilar(texto, numero)
+            except ExpressaoInvalida as erro:
+                raise ExpressaoInvalida(f"TRTR_ID {linha['TRTR_ID']}, {coluna}: {erro}") from None
+        expressoes.append((saida, compiladas[texto]))
+    passos, entradas = ordenar_passos(expressoes)
+    return TratamentoCompilado(linha['TRTR_ID'], linha['TRTR_DESCRICAO'], passos, entradas,
+                               linha['TRTR_INICIO_VIGENCIA'], linha['TRTR_FIM_VIGENCIA'])
+
+
+class CatalogoTratamentos:
+    """
+    Tratamentos tributários compilados, por TRTR_ID, em sincronia com a versão da base.
+
+    Args:
+        obter_conexao_banco: Função que retorna uma conexão de leitura do banco principal
+        numero: Tipo numérico das constantes das expressões
+    """
+
+    def __init__(self, obter_conexao_banco, numero=float):
+        self._obter_conexao_banco = obter_conexao_banco
+        self._numero = numero
+        self._trava = threading.Lock()
+        self._versao = None
+        self._ultima_verificacao = 0.0
+        self._tratamentos = {}
+        self._por_classificacao = vigencia.IndiceIntervalos()
+        self.compilacoes = 0
+
+    def garantir_atualizado(self):
+        """Recompila os tratamentos se a versão da base mudou."""
+        agora = time.monotonic()
+        if self._versao is not None and agora - self._ultima_verificacao < INTERVALO_VERIFICACAO_VERSAO:
+            return
+
+        with self._trava:
+            conn = self._obter_conexao_banco()
+            versao_base = snapshot.ler_versao_base(conn)
+            if self._versao != versao_base:
+                self._carregar(conn)
+                self._versao = versao_base
+            self._ultima_verificacao = agora
+
+    def _carregar(self, conn):
+        cursor = conn.execute("SELECT * FROM TRATAMENTO_TRIBUTARIO")
+        colunas = [descricao[0] for descricao in cursor.description]
+        compiladas = {}
+        tratamentos = {}
+        for valores in cursor.fetchall():
+            tratamento = compilar_tratamento(dict(zip(colunas, valores)), self._numero, compiladas)
+            tratamentos[tratamento.id] = tratamento
+
+        por_classificacao = vigencia.IndiceIntervalos(conn.execute("""
+            SELECT TRCL_CLTR_ID, TRCL_INICIO_VIGENCIA, TRCL_FIM_VIGENCIA, TRCL_TRTR_ID
+            FROM TRATAMENTO_CLASSIFICACAO
+        """))
+        self._tratamentos = tratamentos
+        self._por_classificacao = por_classificacao
+        self.compilacoes += 1
+
+    def obter(self, trtr_id):
+        """Retorna o TratamentoCompilado do TRTR_ID (None se não existir)."""
+        self.garantir_atualizado()
+        return self._tratamentos.get(trtr_id)
+
+    def por_classificacao(self, cltr_id, data_referencia):
+        """
+        Retorna o tratamento da classificação tributária vigente na data.
+
+        Args:
+            cltr_id: CLTR_ID da classificação
+            data_referencia: Data (YYYY-MM-DD)
+
+        Returns:
+            TratamentoCompilado, ou None se não houver tratamento vigente
+        """
+        data_referencia = vigencia.validar_data_referencia(data_referencia)
+        self.garantir_atualizado()
+        vigentes = self._por_classificacao.vigentes(cltr_id, data_referencia)
+        return self._tratamentos.get(vigentes[-1]) if vigentes else None
+
+    def estatisticas(self):
+        """Retorna o estado do catálogo."""
+        return {
+            'versao': self._versao,
+            'tratamentos': len(self._tratamentos),
+            'expressoes_distintas': len({id(expressao) for tratamento in self._tratamentos.values()
+                                         for _, expressao in tratamento.passos}),
+            'compilacoes': self.compilacoes,
+        }
@@ -0,0 +1,156 @@
+"""
+Alíquotas do Imposto Seletivo (e demais alíquotas ad rem) dos produtos.
+ALIQUOTA_AD_VALOREM_PRODUTO e ALIQUOTA_AD_REM_PRODUTO vinculam NCMs (ou
+prefixos de NCM) às alíquotas de ALIQUOTA_AD_VALOREM (percentual) e
+ALIQUOTA_AD_REM (R$ por unidade de UNIDADE_MEDIDA); as tabelas EXCECAO_AD_*
+retiram um vínculo de parte da hierarquia. Os vínculos são indexados por
+prefixo (resolvedor_prefixos) e a resolução de um NCM numa data é feita em
+memória: vale, por tributo, o vínculo vigente mais específico.
+"""
+
+from typing import NamedTuple, Optional
+
+import vigencia
+from resolvedor_prefixos import ResolvedorAplicabilidade, vigente_em
+
+SIGLA_IMPOSTO_SELETIVO = "IS"
+
+
+class AliquotaSeletivo(NamedTuple):
+    """Alíquotas de um tributo para o produto: ad valorem (%) e/ou ad rem (R$ por unidade)."""
+    tributo: str
+    ad_valorem: Optional[float]
+    ad_rem: Optional[float]
+    unidade: Optional[str]
+
+
+def _vinculos(cur, tabela, prefixo):
+    """Lê os vínculos (ID, NCM_CD, ID_ALIQUOTA, None, INICIO, FIM) de uma tabela *_PRODUTO."""
+    id_aliquota = {"AAVP": "AAVP_AADV_ID", "AARP": "AARP_AARE_ID"}[prefixo]
+    cur.execute(f"""
+        SELECT {prefixo}_ID, {prefixo}_NCM_CD, {id_aliquota}, NULL,
+               {prefixo}_INICIO_VIGENCIA, {prefixo}_FIM_VIGENCIA
+        FROM {tabela}
+        ORDER BY {prefixo}_INICIO_VIGENCIA DESC, {prefixo}_ID
+    """)
+    return cur.fetchall()
+
+
+class ResolvedorImpostoSeletivo:
+    """
+    Resolve as alíquotas ad valorem e ad rem de um NCM numa data.
+
+    Args:
+        conn: Conexão com o banco
+        versao: Versão da base lida (VERSAO_BASE_DADO), para quem mantém o resolvedor
+    """
+
+    def __init__(self, conn, versao=None):
+        self.versao = versao
+        cur = conn.cursor()
+
+        cur.execute("SELECT TBTO_ID, TBTO_SIGLA FROM TRIBUTO")
+        self.tributos = dict(cur.fetchall())
+
+        cur.execute("SELECT UNMD_ID, UNMD_SIGLA FROM UNIDADE_MEDIDA")
+        self.unidades = dict(cur.fetchall())
+
+        # AADV_ID -> (VALOR, TBTO_ID, INICIO, FIM)
+        cur.execute("""
+            SELECT AADV_ID, AADV_VALOR, AADV_TBTO_ID, AADV_INICIO_VIGENCIA, AADV_FIM_VIGENCIA
+            FROM ALIQUOTA_AD_VALOREM
+        """)
+        self.aliquotas_ad_valorem = {linha[0]: linha[1:] for linha in cur.fetchall()}
+
+        # AARE_ID -> (VALOR, UNMD_ID, TBTO_ID, INICIO, FIM)
+        cur.execute("""
+            SELECT AARE_ID, AARE_VALOR, AARE_UNMD_ID, AARE_TBTO_ID,
+                   AARE_INICIO_VIGENCIA, AARE_FIM_VIGENCIA
+            FROM ALIQUOTA_AD_REM
+        """)
+        self.aliquotas_ad_rem = {linha[0]: linha[1:] for linha in cur.fetchall()}
+
+        vinculos_ad_valorem = _vinculos(cur, "ALIQUOTA_AD_VALOREM_PRODUTO", "AAVP")
+        cur.execute("""
+            SELECT EAVP_NCM_CD, EAVP_AAVP_ID, EAVP_INICIO_VIGENCIA, EAVP_FIM_VIGENCIA
+            FROM EXCECAO_AD_VALOREM_PRODUTO
+        """)
+        excecoes_ad_valorem = cur.fetchall()
+        self.resolvedor_ad_valorem = ResolvedorAplicabilidade(vinculos_ad_valorem, excecoes_ad_valorem)
+
+        vinculos_ad_rem = _vinculos(cur, "ALIQUOTA_AD_REM_PRODUTO", "AARP")
+        cur.execute("""
+            SELECT EARP_NCM_CD, EARP_AARP_ID, EARP_INICIO_VIGENCIA, EARP_FIM_VIGENCIA
+            FROM EXCECAO_AD_REM_PRODUTO
+        """)
+        excecoes_ad_rem = cur.fetchall()
+        self.resolvedor_ad_rem = ResolvedorAplicabilidade(vinculos_ad_rem, excecoes_ad_rem)
+
+        # Entre dois pontos consecutivos nenhum vínculo, exceção ou alíquota muda:
+        # o ponto que contém a data serve de chave do cache
+        intervalos = [linha[4:6] for linha in vinculos_ad_valorem + vinculos_ad_rem]
+        intervalos += [linha[2:4] for linha in excecoes_ad_valorem + excecoes_ad_rem]
+        intervalos += [linha[2:4] for linha in self.aliquotas_ad_valorem.values()]
+        intervalos += [linha[3:5] for linha in self.aliquotas_ad_rem.values()]
+        pontos = {inicio or vigencia.INICIO_INDEFINIDO for inicio, _ in intervalos}
+        pontos.update(vigencia.dia_seguinte(fim) for _, fim in intervalos if fim)
+        pontos.discard(None)
+        self._pontos = sorted(pontos)
+        self._cache = {}
+
+    def aliquotas(self, codigo, data):
+        """
+        Retorna as alíquotas de produto do NCM vigentes na data, por tributo.
+
+        Args:
+            codigo: Código do NCM
+            data: Data (YYYY-MM-DD) da operação
+
+        Returns:
+            Dicionário {sigla: AliquotaSeletivo}; vazio se nenhum tributo tiver
+            alíquota de produto para o NCM na data
+        """
+        chave = (codigo, vigencia.normalizar_data(self._pontos, data))
+        resultado = self._cache.get(chave)
+        if resultado is not None:
+            return resultado
+
+        ad_valorem = {}
+        for vinculo in self.resolvedor_ad_valorem.regras_aplicaveis(codigo, data):
+            aliquota = self.aliquotas_ad_valorem.get(vinculo[2])
+            if aliquota is None or not vigente_em(aliquota[2], aliquota[3], data):
+                continue
+            # Os vínculos vêm do mais específico para o mais genérico
+            ad_valorem.setdefault(aliquota[1], aliquota[0])
+
+        ad_rem = {}
+        for vinculo in self.resolvedor_ad_rem.regras_aplicaveis(codigo, data):
+            aliquota = self.aliquotas_ad_rem.get(vinculo[2])
+            if aliquota is None or not vigente_em(aliquota[3], aliquota[4], data):
+                continue
+            ad_rem.setdefault(aliquota[2], (aliquota[0], self.unidades.get(aliquota[1])))
+
+        resultado = {}
+        for tbto_id in ad_valorem.keys() | ad_rem.keys():
+            sigla = self.tributos.get(tbto_id)
+            if sigla is None:
+                continue
+            valor_ad_rem, unidade = ad_rem.get(tbto_id, (None, None))
+            resultado[sigla] = AliquotaSeletivo(sigla, ad_valorem.get(tbto_id), valor_ad_rem, unidade)
+        self._cache[chave] = resultado
+        return resultado
+
+    def aliquota_seletivo(self, codigo, data):
+        """Retorna a AliquotaSeletivo do Imposto Seletivo do NCM na data, ou None se ele não incidir."""
+        return self.aliquotas(codigo, data).get(SIGLA_IMPOSTO_SELETIVO)
+
+    def estatisticas(self):
+        """Retorna o tamanho dos índices e do cache."""
+        return {
+            'versao': self.versao,
+            'vinculos_ad_valorem': self.resolvedor_ad_valorem.estatisticas(),
+            'vinculos_ad_rem': self.resolvedor_ad_rem.estatisticas(),
+            'aliquotas_ad_valorem': len(self.aliquotas_ad_valorem),
+            'aliquotas_ad_rem': len(self.aliquotas_ad_rem),
+            'em_cache': len(self._cache),
+        }
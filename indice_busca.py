@@ -0,0 +1,208 @@
+"""
+Índice de busca textual (FTS5) das descrições de NCM e NBS.
+O índice fica num arquivo SQLite separado, ao lado do banco principal, e é
+reconstruído automaticamente quando a versão da base (VERSAO_BASE_DADO) ou o
+arquivo do banco (assinatura de snapshot.assinatura_banco) mudam.
+A tokenização ignora acentos e maiúsculas ("agua" encontra "Água"), cada termo
+é buscado por prefixo ("arro" encontra "arroz") e o resultado é ordenado por bm25.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from pool_conexoes import PoolConexoes
+from snapshot import assinatura_banco, ler_versao_base
+
+# Sufixo do arquivo do índice (calculadora.db -> calculadora_busca.db)
+SUFIXO_ARQUIVO = "_busca"
+
+# Intervalo mínimo, em segundos, entre verificações da versão da base
+INTERVALO_VERIFICACAO_VERSAO = 5.0
+
+# Limite padrão de resultados por busca
+LIMITE_PADRAO = 500
+
+TIPO_NCM = "NCM"
+TIPO_NBS = "NBS"
+
+_PADRAO_TERMO = re.compile(r"\w+")
+
+
+def caminho_indice(caminho_banco):
+    """Retorna o caminho do arquivo do índice para o banco informado."""
+    caminho = Path(caminho_banco)
+    return str(caminho.with_name(caminho.stem + SUFIXO_ARQUIVO + caminho.suffix))
+
+
+def montar_consulta_fts(texto):
+    """
+    Converte o texto digitado numa expressão MATCH do FTS5.
+    Cada palavra vira um termo de prefixo entre aspas (sem operadores do FTS5),
+    e todas precisam ocorrer na descrição.
+
+    Returns:
+        Expressão MATCH, ou None se o texto não tiver nenhuma palavra
+    """
+    termos = _PADRAO_TERMO.findall(texto)
+    if not termos:
+        return None
+    return " ".join(f'"{termo}"*' for termo in termos)
+
+
+def construir_indice(conn_banco, caminho, versao, assinatura=None):
+    """
+    Cria o arquivo do índice a partir de NCM e NBS; a versão e a assinatura do
+    banco ficam gravadas em META.
+    O índice é gravado num arquivo temporário e só então substitui o anterior
+    (os.replace), de modo que leitores nunca veem um índice incompleto.
+    """
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    conn = sqlite3.connect(temporario)
+    try:
+        conn.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE META (CHAVE TEXT PRIMARY KEY, VALOR TEXT);
+            CREATE VIRTUAL TABLE BUSCA USING fts5(
+                codigo UNINDEXED,
+                tipo UNINDEXED,
+                descricao,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3 4'
+            );
+        """)
+        conn.executemany(
+            "INSERT INTO BUSCA (codigo, tipo, descricao) VALUES (?, ?, ?)",
+            conn_banco.execute(f"""
+                SELECT NCM_CD, '{TIPO_NCM}', NCM_DESCRICAO FROM NCM
+                UNION ALL
+                SELECT NBS_CD, '{TIPO_NBS}', NBS_DESCRICAO FROM NBS
+            """)
+        )
+        conn.execute("INSERT INTO BUSCA (BUSCA) VALUES ('optimize')")
+        conn.executemany("INSERT INTO META (CHAVE, VALOR) VALUES (?, ?)",
+                         (('versao', versao), ('assinatura', assinatura)))
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(temporario, caminho)
+
+
+def ler_meta_indice(caminho):
+    """Retorna o META do índice ({chave: valor}), vazio se ele não existir/for inválido."""
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        conn = sqlite3.connect(Path(caminho).resolve().as_uri() + "?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT CHAVE, VALOR FROM META"))
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return {}
+
+
+def ler_versao_indice(caminho):
+    """Retorna a versão da base gravada no índice, ou None se ele não existir/for inválido."""
+    return ler_meta_indice(caminho).get('versao')
+
+
+class IndiceBusca:
+    """
+    Índice FTS5 das descrições, mantido em sincronia com a versão da base.
+
+    Args:
+        caminho_banco: Caminho do banco principal (calculadora.db)
+        obter_conexao_banco: Função que retorna uma conexão de leitura do banco principal
+    """
+
+    def __init__(self, caminho_banco, obter_conexao_banco):
+        self.caminho_banco = caminho_banco
+        self.caminho = caminho_indice(caminho_banco)
+        self._obter_conexao_banco = obter_conexao_banco
+        self._pool = PoolConexoes(self.caminho)
+        self._trava = threading.Lock()
+        self._versao = None
+        self._assinatura = None
+        self._ultima_verificacao = 0.0
+        self.reconstrucoes = 0
+
+    def garantir_atualizado(self):
+        """Reconstrói o índice se ele não existir ou se a versão ou o arquivo da base mudaram."""
+        agora = time.monotonic()
+        if self._versao is not None and agora - self._ultima_verificacao < INTERVALO_VERIFICACAO_VERSAO:
+            return
+
+        with self._trava:
+            conn_banco = self._obter_conexao_banco()
+            versao_base = ler_versao_base(conn_banco)
+            assinatura = str(assinatura_banco(self.caminho_banco))
+            if (self._versao, self._assinatura) != (versao_base, assinatura):
+                meta = ler_meta_indice(self.caminho)
+                if (meta.get('versao'), meta.get('assinatura')) != (versao_base, assinatura):
+                    construir_indice(conn_banco, self.caminho, versao_base, assinatura)
+                    self.reconstrucoes += 1
+                # Conexões abertas no arquivo anterior são descartadas; cada thread fecha a sua
+                # na próxima busca, sem interromper as que estão em andamento
+                self._pool.invalidar()
+                self._versao = versao_base
+                self._assinatura = assinatura
+            self._ultima_verificacao = agora
+
+    def versao_atual(self):
+        """Retorna a versão da base do índice, verificando antes se ela mudou."""
+        self.garantir_atualizado()
+        return self._versao
+
+    def buscar(self, texto, tipo=TIPO_NCM, limite=LIMITE_PADRAO):
+        """
+        Busca descrições que contenham todas as palavras do texto (por prefixo).
+
+        Args:
+            texto: Texto digitado pelo usuário
+            tipo: TIPO_NCM, TIPO_NBS ou None para ambos
+            limite: Quantidade máxima de resultados
+
+        Returns:
+            Lista de tuplas (codigo, descricao, tipo), da mais relevante para a menos relevante
+        """
+        consulta = montar_consulta_fts(texto)
+        if consulta is None:
+            return []
+
+        self.garantir_atualizado()
+        conn = self._pool.obter()
+        if tipo is None:
+            return conn.execute("""
+                SELECT codigo, descricao, tipo FROM BUSCA
+                WHERE BUSCA MATCH ?
+                ORDER BY bm25(BUSCA), codigo
+                LIMIT ?
+            """, (consulta, limite)).fetchall()
+        return conn.execute("""
+            SELECT codigo, descricao, tipo FROM BUSCA
+            WHERE BUSCA MATCH ? AND tipo = ?
+            ORDER BY bm25(BUSCA), codigo
+            LIMIT ?
+        """, (consulta, tipo, limite)).fetchall()
+
+    def fechar(self):
+        """Fecha as conexões abertas no arquivo do índice."""
+        self._pool.fechar()
+
+    def estatisticas(self):
+        """Retorna o estado do índice."""
+        return {
+            'caminho': self.caminho,
+            'versao': self._versao,
+            'reconstrucoes': self.reconstrucoes,
+            'existe': os.path.exists(self.caminho),
+        }
@@ -6,6 +6,11 @@ Contém todas as funções relacionadas à interface Tkinter.
 import tkinter as tk
 from tkinter import ttk, messagebox
 import database
+import relatorios
+import busca_incremental
+from documento import Documento, aplicar_no_widget
+from executor_consultas import CANAL_BUSCA, CANAL_CONSULTA, ExecutorConsultas
+from lista_virtual import ListaVirtual
 
 
 # Configurações de estilo
@@ -23,6 +28,23 @@ FONTE_NORMAL = ("Segoe UI", 10)
 FONTE_MONO = ("Consolas", 9)
 
 
+def consultar_ncm_com_relacoes(codigo):
+    """
+    Consulta o relatório completo do NCM e as relações das tabelas (executada em segundo plano).
+
+    Returns:
+        Tupla (relatorio, relacoes); relacoes é a exceção da consulta quando ela falha
+    """
+    relatorio = relatorios.relatorio_completo(codigo)
+    relacoes = []
+    if relatorio.ncm:
+        try:
+            relacoes = database.obter_relacoes_tabelas_ncm(codigo)
+        except Exception as e:
+            relacoes = e
+    return relatorio, relacoes
+
+
 class CalculadoraTributaria:
     """Classe principal da interface da Calculadora Tributária."""
     
@@ -42,9 +64,18 @@ class CalculadoraTributaria:
         self.entry_desc = None
         self.lista_ncm = None
         self.status_label = None
+        self.debounce_busca = None
+        self.barra_progresso = None
         
         self.criar_widgets()
         self.configurar_eventos()
+        
+        # Consultas ao banco rodam fora da thread do Tk
+        self.executor = ExecutorConsultas(self.janela, ao_mudar_estado=self.indicar_ocupado)
+        self.janela.protocol("WM_DELETE_WINDOW", self.fechar)
+        
+        # Mapeia os resultados gravados por NCM (regravados em segundo plano se desatualizados)
+        database.aquecer_cache_persistente()
     
     def criar_widgets(self):
         """Cria todos os widgets da interface."""
@@ -124,13 +155,15 @@ class CalculadoraTributaria:
         lista_container = tk.Frame(frame_lista, bg=COR_CARD)
         lista_container.pack(fill=tk.X, pady=(0, 10))
         
-        self.lista_ncm = ttk.Combobox(lista_container, width=70, font=FONTE_NORMAL)
+        # Lista virtualizada: só as linhas visíveis são materializadas
+        self.lista_ncm = ListaVirtual(lista_container, altura=6, largura=70, font=FONTE_NORMAL,
+                                      ao_selecionar=self.acao_selecionar)
         self.lista_ncm.pack(side=tk.LEFT, padx=(0, 10))
         
         self.btn_carregar = tk.Button(lista_container, text="Carregar Todos", command=self.carregar_lista_todos_com_status,
                              bg=COR_PRIMARIA, fg="white", font=FONTE_SUBTITULO,
                              relief=tk.FLAT, padx=15, cursor="hand2")
-        self.btn_carregar.pack(side=tk.LEFT)
+        self.btn_carregar.pack(side=tk.LEFT, anchor=tk.N)
         
         # Card de resultados
         card_resultado = tk.Frame(main_frame, bg=COR_CARD, relief=tk.RAISED, bd=1)
@@ -172,38 +205,36 @@ class CalculadoraTributaria:
         self.status_label = tk.Label(status_bar, text="Pronto para consultar", 
                                     bg=COR_PRIMARIA, fg="white", font=("Segoe UI", 9))
         self.status_label.pack(side=tk.LEFT, padx=10)
+        
+        # Indicador de consulta em andamento
+        self.barra_progresso = ttk.Progressbar(status_bar, mode="indeterminate", length=120)
+        self.barra_progresso.pack(side=tk.RIGHT, padx=10, pady=3)
     
     def configurar_eventos(self):
         """Configura os eventos dos widgets."""
-        self.lista_ncm.bind("<<ComboboxSelected>>", self.acao_selecionar)
+        # Pesquisa enquanto digita na busca por descrição
+        self.debounce_busca = busca_incremental.Debounce(self.entry_desc, self.acao_buscar_descricao_incremental)
+        self.entry_desc.bind("<KeyRelease>", lambda event: self.debounce_busca.agendar())
+        self.entry_desc.bind("<Return>", lambda event: self.acao_buscar_descricao_com_status())
     
-    def formatar_reducao(self, valor):
-        """Formata o valor da redução corretamente."""
-        if valor is None:
-            return "Não especificada"
-        
-        try:
-            # Converter para float se for string
-            if isinstance(valor, str):
-                # Verificar se é uma data (YYYY-MM-DD)
-                if len(valor) == 10 and valor[4] == '-' and valor[7] == '-':
-                    return f"Data inválida: {valor}"
-                valor_float = float(valor)
-            else:
-                valor_float = float(valor)
-            
-            # Valores como 10000.00% provavelmente são fatores de multiplicação
-            # Vamos formatar de forma mais legível
-            if valor_float >= 10000:
-                return "Isenção total (100%)"
-            elif valor_float >= 100:
-                # Redução maior que 100% - pode ser erro ou fator especial
-                return f"{valor_float:.2f}% (fator especial)"
-            else:
-                return f"{valor_float:.2f}%"
-        except (ValueError, TypeError):
-            # Se não puder converter, retornar como string
-            return str(valor)
+    def indicar_ocupado(self, ocupado):
+        """Mostra (ou esconde) o indicador de consulta em andamento."""
+        if ocupado:
+            self.barra_progresso.start(15)
+            self.janela.config(cursor="watch")
+        else:
+            self.barra_progresso.stop()
+            self.janela.config(cursor="")
+    
+    def fechar(self):
+        """Encerra as consultas em andamento e fecha a janela."""
+        self.executor.encerrar()
+        self.janela.destroy()
+    
+    def exibir_erro(self, mensagem, erro):
+        """Exibe o erro de uma consulta executada em segundo plano."""
+        self.status_label.config(text=f"{mensagem}: {str(erro)}")
+        messagebox.showerror("Erro", f"{mensagem}: {str(erro)}")
     
     # Funções de ação
     def acao_buscar_codigo_com_status(self):
@@ -214,12 +245,17 @@ class CalculadoraTributaria:
             return
         
         self.status_label.config(text=f"Buscando NCM: {codigo}...")
-        self.janela.update()
         
-        ncm, regras_completas = database.buscar_informacoes_completas_ncm(codigo)
-        self.exibir_resultado_completo(ncm, regras_completas)
+        # A consulta roda em segundo plano; uma nova consulta substitui a anterior
+        self.executor.submeter(CANAL_CONSULTA, consultar_ncm_com_relacoes, codigo,
+                               ao_concluir=lambda resultado: self.concluir_busca_codigo(codigo, *resultado),
+                               ao_erro=lambda erro: self.exibir_erro(f"Erro ao consultar NCM {codigo}", erro))
+    
+    def concluir_busca_codigo(self, codigo, relatorio, relacoes):
+        """Exibe o resultado da busca por código."""
+        self.exibir_resultado_completo(relatorio, relacoes)
         
-        if ncm:
+        if relatorio.ncm:
             self.status_label.config(text=f"Consulta concluída para NCM: {codigo}")
         else:
             self.status_label.config(text=f"NCM {codigo} não encontrado")
@@ -231,10 +267,15 @@ class CalculadoraTributaria:
             messagebox.showwarning("Aviso", "Digite um termo para busca.")
             return
         
+        self.debounce_busca.cancelar()
         self.status_label.config(text=f"Buscando por: '{texto}'...")
-        self.janela.update()
         
-        ncms = database.buscar_por_descricao(texto)
+        self.executor.submeter(CANAL_BUSCA, database.buscar_por_descricao, texto,
+                               ao_concluir=lambda ncms: self.concluir_busca_descricao(texto, ncms),
+                               ao_erro=lambda erro: self.exibir_erro("Erro na busca por descrição", erro))
+    
+    def concluir_busca_descricao(self, texto, ncms):
+        """Exibe na lista o resultado da busca por descrição."""
         self.atualizar_lista(ncms)
         
         if ncms:
@@ -242,6 +283,27 @@ class CalculadoraTributaria:
         else:
             self.status_label.config(text=f"Nenhum NCM encontrado para: '{texto}'")
     
+    def acao_buscar_descricao_incremental(self):
+        """Pesquisa enquanto digita: mostra os primeiros NCMs encontrados na lista."""
+        texto = self.entry_desc.get().strip()
+        if len(texto) < busca_incremental.TAMANHO_MINIMO_TEXTO:
+            self.executor.cancelar(CANAL_BUSCA)
+            return
+        
+        self.executor.submeter(
+            CANAL_BUSCA, database.buscar_por_descricao_incremental, texto,
+            ao_concluir=lambda resultado: self.concluir_busca_incremental(texto, resultado),
+            ao_erro=lambda erro: self.status_label.config(text=f"Erro na busca por descrição: {str(erro)}"))
+    
+    def concluir_busca_incremental(self, texto, resultado):
+        """Exibe na lista o resultado limitado da pesquisa enquanto digita."""
+        self.atualizar_lista(resultado.itens)
+        
+        if resultado.ha_mais:
+            self.status_label.config(text=f"Mostrando {len(resultado.itens)} de {resultado.total} NCMs para: '{texto}' (continue digitando para refinar)")
+        else:
+            self.status_label.config(text=f"Encontrados {resultado.total} NCMs para: '{texto}'")
+    
     def acao_consultar_reducoes(self):
         """Consulta especificamente as reduções para o NCM informado."""
         codigo = self.entry_codigo.get().strip()
@@ -250,115 +312,90 @@ class CalculadoraTributaria:
             return
         
         self.status_label.config(text=f"Consultando reduções para NCM: {codigo}...")
-        self.janela.update()
-        
-        # Buscar reduções específicas
-        reducoes = database.buscar_reducoes_ncm(codigo)
-        
-        # Limpar área de resultados
-        self.resultado.delete("1.0", tk.END)
-        
-        if not reducoes:
-            self.resultado.insert(tk.END, f"🔍 CONSULTA DE REDUÇÕES - NCM: {codigo}\n")
-            self.resultado.insert(tk.END, "=" * 80 + "\n\n")
-            self.resultado.insert(tk.END, "❌ NENHUMA REDUÇÃO ENCONTRADA para este NCM.\n\n")
-            self.resultado.insert(tk.END, "Possíveis causas:\n")
-            self.resultado.insert(tk.END, "1. O NCM não possui reduções cadastradas\n")
-            self.resultado.insert(tk.END, "2. As reduções podem estar fora da vigência\n")
-            self.resultado.insert(tk.END, "3. Verifique se o código NCM está correto\n")
+        
+        # Buscar reduções específicas, já agrupadas por classificação (em segundo plano)
+        self.executor.submeter(CANAL_CONSULTA, relatorios.relatorio_reducoes, codigo,
+                               ao_concluir=lambda relatorio: self.exibir_reducoes(codigo, relatorio),
+                               ao_erro=lambda erro: self.exibir_erro(f"Erro ao consultar reduções do NCM {codigo}", erro))
+    
+    def exibir_reducoes(self, codigo, relatorio):
+        """Exibe as reduções do NCM agrupadas por classificação tributária (RelatorioReducoes)."""
+        # O relatório é montado em memória e aplicado ao widget de uma vez
+        documento = Documento()
+        
+        if not relatorio.classificacoes:
+            documento.adicionar(f"🔍 CONSULTA DE REDUÇÕES - NCM: {codigo}\n")
+            documento.adicionar("=" * 80 + "\n\n")
+            documento.adicionar("❌ NENHUMA REDUÇÃO ENCONTRADA para este NCM.\n\n")
+            documento.adicionar("Possíveis causas:\n")
+            documento.adicionar("1. O NCM não possui reduções cadastradas\n")
+            documento.adicionar("2. As reduções podem estar fora da vigência\n")
+            documento.adicionar("3. Verifique se o código NCM está correto\n")
+            aplicar_no_widget(self.resultado, documento)
             self.status_label.config(text=f"Nenhuma redução encontrada para NCM: {codigo}")
             return
         
         # Exibir reduções encontradas
-        self.resultado.insert(tk.END, f"✅ REDUÇÕES ENCONTRADAS - NCM: {codigo}\n")
-        self.resultado.insert(tk.END, "=" * 80 + "\n\n")
-        self.resultado.insert(tk.END, f"Total de reduções encontradas: {len(reducoes)}\n\n")
-        
-        # Agrupar por classificação tributária
-        reducoes_agrupadas = {}
-        for reducao in reducoes:
-            cltr_cd = reducao[1]  # CLTR_CD
-            if cltr_cd not in reducoes_agrupadas:
-                reducoes_agrupadas[cltr_cd] = {
-                    'descricao': reducao[2],  # CLTR_DESCRICAO
-                    'tributos': []
-                }
-            
-            reducoes_agrupadas[cltr_cd]['tributos'].append({
-                'sigla': reducao[3],  # TBTO_SIGLA
-                'nome': reducao[4],   # TBTO_NOME
-                'aliquota': reducao[5],  # ALIQUOTA
-                'reducao': reducao[6],   # REDUCAO
-                'reducao_inicio': reducao[7],  # REDUCAO_INICIO
-                'reducao_fim': reducao[8],     # REDUCAO_FIM
-                'aliquota_inicio': reducao[9],  # ALIQUOTA_INICIO
-                'aliquota_fim': reducao[10]     # ALIQUOTA_FIM
-            })
+        documento.adicionar(f"✅ REDUÇÕES ENCONTRADAS - NCM: {codigo}\n")
+        documento.adicionar("=" * 80 + "\n\n")
+        documento.adicionar(f"Total de reduções encontradas: {relatorio.total}\n\n")
         
         # Exibir reduções agrupadas
-        for cltr_cd, dados in reducoes_agrupadas.items():
-            self.resultado.insert(tk.END, f"📋 Classificação Tributária: {cltr_cd}\n")
-            self.resultado.insert(tk.END, f"   Descrição: {dados['descricao']}\n\n")
+        for grupo in relatorio.classificacoes:
+            documento.adicionar(f"📋 Classificação Tributária: {grupo.cclasstrib}\n")
+            documento.adicionar(f"   Descrição: {grupo.descricao}\n\n")
             
-            for tributo in dados['tributos']:
-                self.resultado.insert(tk.END, f"   • Tributo: {tributo['sigla']} ({tributo['nome']})\n")
-                
-                # Formatar alíquota e redução
-                aliquota_formatada = database.formatar_aliquota(tributo['aliquota'])
-                reducao_formatada = self.formatar_reducao(tributo['reducao'])
+            for tributo in grupo.tributos:
+                documento.adicionar(f"   • Tributo: {tributo.sigla} ({tributo.nome})\n")
+                documento.adicionar(f"     - Alíquota: {database.formatar_aliquota(tributo.aliquota)}\n")
+                documento.adicionar(f"       Vigência alíquota: {relatorios.formatar_vigencia(tributo.aliquota_inicio, tributo.aliquota_fim)}\n")
+                documento.adicionar(f"     - Redução: {relatorios.formatar_reducao(tributo.reducao, 'Não especificada')}\n")
+                documento.adicionar(f"       Vigência redução: {relatorios.formatar_vigencia(tributo.reducao_inicio, tributo.reducao_fim)}\n")
                 
-                self.resultado.insert(tk.END, f"     - Alíquota: {aliquota_formatada}\n")
-                self.resultado.insert(tk.END, f"       Vigência alíquota: {tributo['aliquota_inicio']} até {tributo['aliquota_fim'] if tributo['aliquota_fim'] else 'atual'}\n")
-                self.resultado.insert(tk.END, f"     - Redução: {reducao_formatada}\n")
-                self.resultado.insert(tk.END, f"       Vigência redução: {tributo['reducao_inicio']} até {tributo['reducao_fim'] if tributo['reducao_fim'] else 'atual'}\n")
+                if tributo.aliquota_efetiva is not None:
+                    documento.adicionar(f"     - Alíquota efetiva (com redução): {database.formatar_aliquota(tributo.aliquota_efetiva)}\n")
                 
-                # Calcular alíquota efetiva
-                if tributo['aliquota'] is not None and tributo['reducao'] is not None:
-                    try:
-                        aliquota_base = float(tributo['aliquota'])
-                        reducao_valor = float(tributo['reducao'])
-                        
-                        if reducao_valor >= 10000:
-                            aliquota_efetiva = 0.0
-                        elif reducao_valor >= 100:
-                            # Redução maior que 100% - tratar como isenção
-                            aliquota_efetiva = 0.0
-                        else:
-                            aliquota_efetiva = aliquota_base * (1 - reducao_valor/100)
-                        
-                        aliquota_efetiva_formatada = database.formatar_aliquota(aliquota_efetiva)
-                        self.resultado.insert(tk.END, f"     - Alíquota efetiva (com redução): {aliquota_efetiva_formatada}\n")
-                    except (ValueError, TypeError):
-                        pass
-                
-                self.resultado.insert(tk.END, "\n")
+                documento.adicionar("\n")
             
-            self.resultado.insert(tk.END, "\n")
+            documento.adicionar("\n")
         
-        self.status_label.config(text=f"Encontradas {len(reducoes)} reduções para NCM: {codigo}")
+        aplicar_no_widget(self.resultado, documento)
+        self.status_label.config(text=f"Encontradas {relatorio.total} reduções para NCM: {codigo}")
     
-    def exibir_resultado_completo(self, ncm, regras_completas):
-        """Exibe o resultado completo da consulta."""
-        self.resultado.delete("1.0", tk.END)
+    def exibir_resultado_completo(self, relatorio, relacoes=None):
+        """
+        Exibe o resultado completo da consulta.
+
+        Args:
+            relatorio: RelatorioCompleto do NCM
+            relacoes: Relações das tabelas já consultadas (ou a exceção da consulta);
+                      None para consultar aqui
+        """
+        # O relatório é montado em memória e aplicado ao widget de uma vez
+        documento = Documento()
 
-        if not ncm:
-            self.resultado.insert(tk.END, "NCM não encontrado.")
+        if not relatorio.ncm:
+            documento.adicionar("NCM não encontrado.")
+            aplicar_no_widget(self.resultado, documento)
             return
 
-        codigo, desc, inicio, fim = ncm
+        codigo, desc, inicio, fim = relatorio.ncm
 
         # Primeiro, mostrar informações das relações/tabelas envolvidas
-        self.resultado.insert(tk.END, f"📦 NCM: {codigo}\n")
-        self.resultado.insert(tk.END, f"Descrição: {desc}\n")
-        self.resultado.insert(tk.END, f"Início vigência: {inicio}\n")
-        self.resultado.insert(tk.END, f"Fim vigência: {fim}\n\n")
+        documento.adicionar(f"📦 NCM: {codigo}\n")
+        documento.adicionar(f"Descrição: {desc}\n")
+        documento.adicionar(f"Início vigência: {inicio}\n")
+        documento.adicionar(f"Fim vigência: {fim}\n\n")
         
         # Obter e exibir relações/tabelas envolvidas
-        self.resultado.insert(tk.END, "🔗 RELAÇÕES DO BANCO DE DADOS ENVOLVIDAS:\n")
-        self.resultado.insert(tk.END, "=" * 120 + "\n\n")
+        documento.adicionar("🔗 RELAÇÕES DO BANCO DE DADOS ENVOLVIDAS:\n")
+        documento.adicionar("=" * 120 + "\n\n")
         
         try:
-            relacoes = database.obter_relacoes_tabelas_ncm(codigo)
+            if relacoes is None:
+                relacoes = database.obter_relacoes_tabelas_ncm(codigo)
+            if isinstance(relacoes, Exception):
+                raise relacoes
             if relacoes:
                 # Agrupar por tabela
                 tabelas_agrupadas = {}
@@ -369,263 +406,135 @@ class CalculadoraTributaria:
                     tabelas_agrupadas[tabela].append(relacao)
                 
                 for tabela, rels in tabelas_agrupadas.items():
-                    self.resultado.insert(tk.END, f"📊 TABELA: {tabela}\n")
-                    self.resultado.insert(tk.END, f"  Total de registros relacionados: {len(rels)}\n")
+                    documento.adicionar(f"📊 TABELA: {tabela}\n")
+                    documento.adicionar(f"  Total de registros relacionados: {len(rels)}\n")
                     
                     # Mostrar apenas os primeiros 3 registros de cada tabela para não poluir
                     for rel in rels[:3]:
-                        self.resultado.insert(tk.END, f"  • Código: {rel['codigo']}\n")
+                        documento.adicionar(f"  • Código: {rel['codigo']}\n")
                         if rel['descricao']:
-                            self.resultado.insert(tk.END, f"    Descrição: {rel['descricao']}\n")
-                        self.resultado.insert(tk.END, f"    Tipo relação: {rel['tipo_relacao']}\n")
+                            documento.adicionar(f"    Descrição: {rel['descricao']}\n")
+                        documento.adicionar(f"    Tipo relação: {rel['tipo_relacao']}\n")
                     
                     if len(rels) > 3:
-                        self.resultado.insert(tk.END, f"  • ... e mais {len(rels) - 3} registros\n")
+                        documento.adicionar(f"  • ... e mais {len(rels) - 3} registros\n")
                     
-                    self.resultado.insert(tk.END, "\n")
+                    documento.adicionar("\n")
             else:
-                self.resultado.insert(tk.END, "Nenhuma relação específica encontrada.\n")
+                documento.adicionar("Nenhuma relação específica encontrada.\n")
         except Exception as e:
-            self.resultado.insert(tk.END, f"Erro ao obter relações: {str(e)}\n")
+            documento.adicionar(f"Erro ao obter relações: {str(e)}\n")
         
-        self.resultado.insert(tk.END, "\n" + "=" * 120 + "\n\n")
+        documento.adicionar("\n" + "=" * 120 + "\n\n")
 
-        if not regras_completas:
-            self.resultado.insert(tk.END, "Nenhuma regra tributária cadastrada.\n")
+        if not relatorio.regras:
+            documento.adicionar("Nenhuma regra tributária cadastrada.\n")
+            aplicar_no_widget(self.resultado, documento)
             return
 
-        # Agrupar regras por NCMA_ID para evitar duplicações
-        regras_agrupadas = {}
-        for r in regras_completas:
-            ncm_id = r[4]  # NCMA_ID
-            if ncm_id not in regras_agrupadas:
-                regras_agrupadas[ncm_id] = []
-            regras_agrupadas[ncm_id].append(r)
-        
-        self.resultado.insert(tk.END, "📘 CLASSIFICAÇÃO TRIBUTÁRIA COMPLETA:\n")
-        self.resultado.insert(tk.END, "=" * 120 + "\n\n")
-        
-        for i, (ncm_id, regras_grupo) in enumerate(regras_agrupadas.items(), 1):
-            # Primeira regra do grupo contém informações comuns
-            primeira_regra = regras_grupo[0]
+        documento.adicionar("📘 CLASSIFICAÇÃO TRIBUTÁRIA COMPLETA:\n")
+        documento.adicionar("=" * 120 + "\n\n")
+        
+        for i, regra_relatorio in enumerate(relatorio.regras, 1):
+            regra = regra_relatorio.regra
+            classificacao = regra.classificacao
             
-            self.resultado.insert(tk.END, f"REGRA {i} (ID: {ncm_id}):\n")
-            self.resultado.insert(tk.END, f"  • Vigência: {primeira_regra[5]} até {primeira_regra[6] if primeira_regra[6] else 'atual'}\n")
+            documento.adicionar(f"REGRA {i} (ID: {regra.id}):\n")
+            documento.adicionar(f"  • Vigência: {relatorios.formatar_vigencia(regra.inicio_vigencia, regra.fim_vigencia)}\n")
             
             # Classificação Tributária
-            if primeira_regra[7]:  # CLTR_CD
-                self.resultado.insert(tk.END, f"  • Código Classificação: {primeira_regra[7]}\n")
-                self.resultado.insert(tk.END, f"  • Descrição: {primeira_regra[8]}\n")
+            if classificacao.codigo:
+                documento.adicionar(f"  • Código Classificação: {classificacao.codigo}\n")
+                documento.adicionar(f"  • Descrição: {classificacao.descricao}\n")
                 
-                # Processar memória de cálculo com valores reais
-                memoria_calculo = primeira_regra[9]
-                if memoria_calculo:
-                    # Obter valores para substituição
-                    percentual_reducao = None
-                    aliquota_ad_valorem = None
-                    
-                    # Buscar valores de redução e alíquota para esta classificação
-                    # Garantir que pegamos apenas valores numéricos válidos
-                    for regra in regras_grupo:
-                        # Verificar se é um valor numérico válido para redução (não data)
-                        if regra[28] is not None and isinstance(regra[28], (int, float)):
-                            # Verificar se não é uma data (datas são strings no formato YYYY-MM-DD)
-                            if not (isinstance(regra[28], str) and len(regra[28]) == 10 and regra[28][4] == '-' and regra[28][7] == '-'):
-                                percentual_reducao = regra[28]
-                        
-                        # Verificar se é um valor numérico válido para alíquota
-                        if regra[23] is not None and isinstance(regra[23], (int, float)):
-                            aliquota_ad_valorem = regra[23]
-                    
-                    # Processar memória de cálculo
-                    memoria_processada = database.processar_memoria_calculo(
-                        memoria_calculo=memoria_calculo,
-                        percentual_reducao=percentual_reducao,
-                        aliquota_ad_valorem=aliquota_ad_valorem,
-                        # Outros parâmetros podem ser adicionados conforme necessário
-                        norma="LC 214/2025",  # Exemplo - poderia ser obtido do banco
-                        tratamento="Tributação integral"  # Exemplo - poderia ser obtido do banco
-                    )
-                    self.resultado.insert(tk.END, f"  • Memória de cálculo: {memoria_processada}\n")
+                # Memória de cálculo já processada com os valores reais
+                if regra_relatorio.memoria_calculo:
+                    documento.adicionar(f"  • Memória de cálculo: {regra_relatorio.memoria_calculo}\n")
                 else:
-                    self.resultado.insert(tk.END, f"  • Memória de cálculo: Não disponível\n")
+                    documento.adicionar(f"  • Memória de cálculo: Não disponível\n")
                 
                 # Informações de crédito
-                credito_cbs = "SIM" if primeira_regra[10] == 1 else "NÃO"
-                credito_ibs = "SIM" if primeira_regra[11] == 1 else "NÃO"
-                credito_pres_forn = "SIM" if primeira_regra[12] == 1 else "NÃO"
-                credito_pres_adq = "SIM" if primeira_regra[13] == 1 else "NÃO"
+                credito_cbs = "SIM" if classificacao.credito_cbs else "NÃO"
+                credito_ibs = "SIM" if classificacao.credito_ibs else "NÃO"
+                credito_pres_forn = "SIM" if classificacao.credito_presumido_fornecedor else "NÃO"
+                credito_pres_adq = "SIM" if classificacao.credito_presumido_adquirente else "NÃO"
                 
-                self.resultado.insert(tk.END, f"  • Crédito CBS: {credito_cbs}\n")
-                self.resultado.insert(tk.END, f"  • Crédito IBS: {credito_ibs}\n")
-                self.resultado.insert(tk.END, f"  • Crédito Presumido Fornecedor: {credito_pres_forn}\n")
-                self.resultado.insert(tk.END, f"  • Crédito Presumido Adquirente: {credito_pres_adq}\n")
-                self.resultado.insert(tk.END, f"  • Tipo de Alíquota: {primeira_regra[14]}\n")
-                self.resultado.insert(tk.END, f"  • Nomenclatura: {primeira_regra[15]}\n")
+                documento.adicionar(f"  • Crédito CBS: {credito_cbs}\n")
+                documento.adicionar(f"  • Crédito IBS: {credito_ibs}\n")
+                documento.adicionar(f"  • Crédito Presumido Fornecedor: {credito_pres_forn}\n")
+                documento.adicionar(f"  • Crédito Presumido Adquirente: {credito_pres_adq}\n")
+                documento.adicionar(f"  • Tipo de Alíquota: {classificacao.tipo_aliquota}\n")
+                documento.adicionar(f"  • Nomenclatura: {classificacao.nomenclatura}\n")
             
             # Situação Tributária (CST)
-            if primeira_regra[16]:  # SITR_CD
-                self.resultado.insert(tk.END, f"  • CST: {primeira_regra[16]} - {primeira_regra[17]}\n")
+            if classificacao.cst:
+                documento.adicionar(f"  • CST: {classificacao.cst} - {classificacao.cst_descricao}\n")
             
             # Anexo
-            if primeira_regra[18]:  # ANXO_NUMERO
-                self.resultado.insert(tk.END, f"  • Anexo: {primeira_regra[18]}, Item: {primeira_regra[19]}\n")
-                self.resultado.insert(tk.END, f"  • Descrição: {primeira_regra[20]}\n")
+            if regra.anexo:
+                documento.adicionar(f"  • Anexo: {regra.anexo.numero}, Item: {regra.anexo.item}\n")
+                documento.adicionar(f"  • Descrição: {regra.anexo.texto}\n")
             
-            # Tributos, Alíquotas e Reduções - Agrupar para evitar duplicação
-            tributos_aliquotas = {}
-            for regra in regras_grupo:
-                if regra[21]:  # TBTO_SIGLA
-                    tributo_sigla = regra[21]
-                    tributo_nome = regra[22]
-                    aliquota_valor = regra[23]  # ALRE_VALOR
-                    aliquota_inicio = regra[24]  # ALIQUOTA_INICIO
-                    aliquota_fim = regra[25]  # ALIQUOTA_FIM
-                    aliquota_padrao_valor = regra[26]  # ALPA_VALOR
-                    aliquota_padrao_forma = regra[27]  # ALPA_FORMA_APLICACAO
-                    percentual_reducao = regra[28]  # PERCENTUAL_REDUCAO
-                    reducao_inicio = regra[29]  # REDUCAO_INICIO
-                    reducao_fim = regra[30]  # REDUCAO_FIM
-                    
-                    if tributo_sigla not in tributos_aliquotas:
-                        tributos_aliquotas[tributo_sigla] = {
-                            'nome': tributo_nome,
-                            'aliquotas': {},  # Usar dicionário para evitar duplicação por valor
-                            'reducoes': {}    # Usar dicionário para evitar duplicação por valor
-                        }
+            # Tributos, Alíquotas e Reduções (já agrupados pelo relatório)
+            if regra_relatorio.tributos:
+                documento.adicionar(f"  • Tributos, Alíquotas e Reduções Aplicáveis:\n")
+                for tributo, aliquota_efetiva in regra_relatorio.tributos:
+                    documento.adicionar(f"      - {tributo.sigla}: {tributo.nome}\n")
                     
-                    # Adicionar informações de alíquota se existirem (evitar duplicação)
-                    if aliquota_valor is not None:
-                        # Converter para string para usar como chave
-                        aliquota_valor_str = str(aliquota_valor)
-                        aliquota_key = f"{aliquota_valor_str}_{aliquota_inicio}_{aliquota_fim}"
-                        if aliquota_key not in tributos_aliquotas[tributo_sigla]['aliquotas']:
-                            aliquota_info = {
-                                'valor': aliquota_valor,
-                                'inicio': aliquota_inicio,
-                                'fim': aliquota_fim,
-                                'padrao_valor': aliquota_padrao_valor,
-                                'padrao_forma': aliquota_padrao_forma
-                            }
-                            tributos_aliquotas[tributo_sigla]['aliquotas'][aliquota_key] = aliquota_info
-                    
-                    # Adicionar informações de redução se existirem (evitar duplicação)
-                    if percentual_reducao is not None:
-                        # Converter para string para usar como chave
-                        reducao_valor_str = str(percentual_reducao)
-                        reducao_key = f"{reducao_valor_str}_{reducao_inicio}_{reducao_fim}"
-                        if reducao_key not in tributos_aliquotas[tributo_sigla]['reducoes']:
-                            reducao_info = {
-                                'valor': percentual_reducao,
-                                'inicio': reducao_inicio,
-                                'fim': reducao_fim
-                            }
-                            tributos_aliquotas[tributo_sigla]['reducoes'][reducao_key] = reducao_info
-            
-            if tributos_aliquotas:
-                self.resultado.insert(tk.END, f"  • Tributos, Alíquotas e Reduções Aplicáveis:\n")
-                for sigla, info in tributos_aliquotas.items():
-                    self.resultado.insert(tk.END, f"      - {sigla}: {info['nome']}\n")
-                    
-                    # Exibir alíquotas (agora são dicionários)
-                    if info['aliquotas']:
-                        for aliquota_key, aliquota in info['aliquotas'].items():
-                            # Formatar alíquota corretamente
-                            aliquota_formatada = database.formatar_aliquota(aliquota['valor'])
-                            
+                    # Exibir alíquotas
+                    if tributo.aliquotas:
+                        for aliquota in tributo.aliquotas:
                             # Alíquota de referência
-                            self.resultado.insert(tk.END, f"        • Alíquota: {aliquota_formatada}\n")
-                            self.resultado.insert(tk.END, f"          Vigência: {aliquota['inicio']} até {aliquota['fim'] if aliquota['fim'] else 'atual'}\n")
+                            documento.adicionar(f"        • Alíquota: {database.formatar_aliquota(aliquota.valor)}\n")
+                            documento.adicionar(f"          Vigência: {relatorios.formatar_vigencia(aliquota.inicio_vigencia, aliquota.fim_vigencia)}\n")
                             
-                            # Alíquota padrão (se existir)
-                            if aliquota['padrao_valor'] is not None:
-                                aliquota_padrao_formatada = database.formatar_aliquota(aliquota['padrao_valor'])
-                                self.resultado.insert(tk.END, f"        • Alíquota Padrão: {aliquota_padrao_formatada}\n")
-                                if aliquota['padrao_forma']:
-                                    self.resultado.insert(tk.END, f"          Forma de Aplicação: {aliquota['padrao_forma']}\n")
+                            # Alíquotas padrão (se existirem)
+                            for padrao in aliquota.padroes:
+                                documento.adicionar(f"        • Alíquota Padrão: {database.formatar_aliquota(padrao.valor)}\n")
+                                if padrao.forma_aplicacao:
+                                    documento.adicionar(f"          Forma de Aplicação: {padrao.forma_aplicacao}\n")
                     else:
-                        self.resultado.insert(tk.END, f"        • Alíquota não especificada\n")
+                        documento.adicionar(f"        • Alíquota não especificada\n")
                     
-                    # Exibir reduções (agora são dicionários)
-                    if info['reducoes']:
-                        for reducao_key, reducao in info['reducoes'].items():
-                            reducao_formatada = self.formatar_reducao(reducao['valor'])
-                            self.resultado.insert(tk.END, f"        • Redução: {reducao_formatada}\n")
-                            self.resultado.insert(tk.END, f"          Vigência: {reducao['inicio']} até {reducao['fim'] if reducao['fim'] else 'atual'}\n")
+                    # Exibir reduções
+                    for reducao in tributo.reducoes:
+                        documento.adicionar(f"        • Redução: {relatorios.formatar_reducao(reducao.valor, 'Não especificada')}\n")
+                        documento.adicionar(f"          Vigência: {relatorios.formatar_vigencia(reducao.inicio_vigencia, reducao.fim_vigencia)}\n")
                     
-                    # Calcular e exibir alíquota efetiva se houver redução
-                    if info['aliquotas'] and info['reducoes']:
-                        # Para simplificar, pegar a primeira alíquota e primeira redução
-                        aliquota_base = next(iter(info['aliquotas'].values()))['valor']
-                        reducao = next(iter(info['reducoes'].values()))['valor']
-                        if aliquota_base is not None and reducao is not None:
-                            # Calcular alíquota efetiva: aliquota * (1 - reducao/100)
-                            # Nota: reducao está em percentual (ex: 10000% = 100)
-                            try:
-                                aliquota_base_float = float(aliquota_base) if isinstance(aliquota_base, str) else aliquota_base
-                                reducao_float = float(reducao) if isinstance(reducao, str) else reducao
-                                
-                                if reducao_float >= 10000:
-                                    aliquota_efetiva = 0.0
-                                elif reducao_float >= 100:
-                                    # Redução maior que 100% - tratar como isenção
-                                    aliquota_efetiva = 0.0
-                                else:
-                                    aliquota_efetiva = aliquota_base_float * (1 - reducao_float/100)
-                                
-                                aliquota_efetiva_formatada = database.formatar_aliquota(aliquota_efetiva)
-                                self.resultado.insert(tk.END, f"        • Alíquota Efetiva (com redução): {aliquota_efetiva_formatada}\n")
-                            except (ValueError, TypeError):
-                                pass
+                    # Alíquota efetiva (primeira alíquota com a primeira redução)
+                    if aliquota_efetiva is not None:
+                        documento.adicionar(f"        • Alíquota Efetiva (com redução): {database.formatar_aliquota(aliquota_efetiva)}\n")
             
-            self.resultado.insert(tk.END, "\n" + "-" * 120 + "\n\n")
-    
-    def atualizar_lista(self, ncms):
-        """Atualiza a lista de NCMs no combobox."""
-        if not ncms:
-            self.lista_ncm['values'] = []
-            self.lista_ncm.set('')
-            return
-        
-        # Formatar cada NCM para exibição
-        valores = []
-        for codigo, descricao in ncms:
-            # Limitar descrição para não ficar muito longa
-            desc_curta = descricao[:80] + "..." if len(descricao) > 80 else descricao
-            valores.append(f"{codigo} - {desc_curta}")
+            documento.adicionar("\n" + "-" * 120 + "\n\n")
         
-        self.lista_ncm['values'] = valores
-        self.lista_ncm.set('')
+        aplicar_no_widget(self.resultado, documento)
+    
+    def atualizar_lista(self, ncms, ordenado_por_codigo=False):
+        """Atualiza a lista de NCMs (a lista é referenciada, não copiada)."""
+        self.lista_ncm.definir_itens(ncms or [], ordenado_por_codigo=ordenado_por_codigo)
     
     def carregar_lista_todos_com_status(self):
-        """Carrega todos os NCMs do banco de dados com atualização de status."""
+        """Carrega todos os NCMs do snapshot em memória (custo constante na lista)."""
         self.status_label.config(text="Carregando todos os NCMs...")
-        self.janela.update()
         
-        try:
-            ncms = database.buscar_ncms()
-            self.atualizar_lista(ncms)
-            
-            if ncms:
-                self.status_label.config(text=f"Carregados {len(ncms)} NCMs")
-            else:
-                self.status_label.config(text="Nenhum NCM encontrado no banco de dados")
-        except Exception as e:
-            self.status_label.config(text=f"Erro ao carregar NCMs: {str(e)}")
-            messagebox.showerror("Erro", f"Erro ao carregar NCMs: {str(e)}")
+        # A primeira carga do snapshot roda em segundo plano
+        self.executor.submeter(CANAL_BUSCA, database.buscar_ncms, usar_snapshot=True,
+                               ao_concluir=self.concluir_carregar_lista,
+                               ao_erro=lambda erro: self.exibir_erro("Erro ao carregar NCMs", erro))
     
-    def acao_selecionar(self, event=None):
+    def concluir_carregar_lista(self, ncms):
+        """Exibe a lista completa de NCMs."""
+        self.atualizar_lista(ncms, ordenado_por_codigo=True)
+        
+        if ncms:
+            self.status_label.config(text=f"Carregados {len(ncms)} NCMs (digite um código na lista para ir até ele)")
+        else:
+            self.status_label.config(text="Nenhum NCM encontrado no banco de dados")
+    
+    def acao_selecionar(self, item):
         """Ação executada quando um NCM é selecionado na lista."""
-        selecionado = self.lista_ncm.get()
-        if not selecionado:
-            return
+        self.entry_codigo.delete(0, tk.END)
+        self.entry_codigo.insert(0, item[0])
         
-        # Extrair o código NCM da string selecionada
-        partes = selecionado.split(' - ')
-        if len(partes) > 0:
-            codigo = partes[0].strip()
-            self.entry_codigo.delete(0, tk.END)
-            self.entry_codigo.insert(0, codigo)
-            
-            # Executar busca automática
-            self.acao_buscar_codigo_com_status()
+        # Executar busca automática
+        self.acao_buscar_codigo_com_status()
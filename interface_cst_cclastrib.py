@@ -5,7 +5,8 @@ Interface simplificada e focada apenas nos dados solicitados.
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import database
+import relatorios
+from documento import Documento, aplicar_no_widget
 
 # Configurações de estilo
 COR_PRIMARIA = "#2c3e50"
@@ -140,33 +141,6 @@ class InterfaceCSTCClasTrib:
         self.entry_ncm.insert(0, ncm)
         self.consultar_ncm()
     
-    def formatar_reducao(self, valor):
-        """Formata o valor da redução para exibição."""
-        if valor is None:
-            return "Sem redução"
-        
-        try:
-            # Converter para float se for string
-            if isinstance(valor, str):
-                # Verificar se é uma data (YYYY-MM-DD)
-                if len(valor) == 10 and valor[4] == '-' and valor[7] == '-':
-                    return f"Data inválida: {valor}"
-                valor_float = float(valor)
-            else:
-                valor_float = float(valor)
-            
-            # Valores como 10000.00% provavelmente são fatores de multiplicação
-            if valor_float >= 10000:
-                return "Isenção total (100%)"
-            elif valor_float >= 100:
-                # Redução maior que 100% - pode ser erro ou fator especial
-                return f"{valor_float:.2f}% (fator especial)"
-            else:
-                return f"{valor_float:.2f}%"
-        except (ValueError, TypeError):
-            # Se não puder converter, retornar como string
-            return str(valor)
-    
     def consultar_ncm(self):
         """Consulta o NCM e exibe os resultados."""
         codigo = self.entry_ncm.get().strip()
@@ -178,111 +152,73 @@ class InterfaceCSTCClasTrib:
         self.status_label.config(text=f"Consultando NCM: {codigo}...")
         self.janela.update()
         
-        # Limpar área de resultados
-        self.resultado_texto.delete("1.0", tk.END)
-        
-        # Buscar os dados
-        resultados = database.buscar_cst_cclastrib_reducao_ncm(codigo)
-        
-        if not resultados:
-            self.resultado_texto.insert(tk.END, f"🔍 CONSULTA: NCM {codigo}\n", "titulo")
-            self.resultado_texto.insert(tk.END, "=" * 70 + "\n\n")
-            self.resultado_texto.insert(tk.END, "❌ NENHUM RESULTADO ENCONTRADO\n\n", "destaque")
-            self.resultado_texto.insert(tk.END, "Possíveis causas:\n", "subtitulo")
-            self.resultado_texto.insert(tk.END, "1. O código NCM pode estar incorreto\n")
-            self.resultado_texto.insert(tk.END, "2. O NCM pode não ter regras tributárias cadastradas\n")
-            self.resultado_texto.insert(tk.END, "3. Verifique a formatação (ex: 30049099 em vez de 3004.90.99)\n")
+        # Buscar o relatório, já agrupado por NCM + CST + CClasTrib
+        relatorio = relatorios.relatorio_cst_cclastrib(codigo)
+        
+        # O relatório é montado em memória e aplicado ao widget de uma vez
+        documento = Documento()
+        
+        if relatorio is None:
+            documento.adicionar(f"🔍 CONSULTA: NCM {codigo}\n", "titulo")
+            documento.adicionar("=" * 70 + "\n\n")
+            documento.adicionar("❌ NENHUM RESULTADO ENCONTRADO\n\n", "destaque")
+            documento.adicionar("Possíveis causas:\n", "subtitulo")
+            documento.adicionar("1. O código NCM pode estar incorreto\n")
+            documento.adicionar("2. O NCM pode não ter regras tributárias cadastradas\n")
+            documento.adicionar("3. Verifique a formatação (ex: 30049099 em vez de 3004.90.99)\n")
+            aplicar_no_widget(self.resultado_texto, documento)
             self.status_label.config(text=f"Nenhum resultado para NCM: {codigo}")
             return
         
-        # Agrupar resultados por classificação tributária
-        resultados_agrupados = {}
-        for resultado in resultados:
-            ncm_cd, ncm_desc, sitr_cd, sitr_desc, cltr_cd, cltr_desc, pere_valor, tbto_sigla, tbto_nome = resultado
-            
-            # Chave única para agrupamento: NCM + CST + CClasTrib
-            chave = (ncm_cd, sitr_cd, cltr_cd)
-            
-            if chave not in resultados_agrupados:
-                resultados_agrupados[chave] = {
-                    'ncm_descricao': ncm_desc,
-                    'sitr_descricao': sitr_desc,
-                    'cltr_descricao': cltr_desc,
-                    'reducoes': []
-                }
-            
-            # Adicionar redução se existir
-            if pere_valor is not None:
-                reducao_formatada = self.formatar_reducao(pere_valor)
-                tributo_info = f"{tbto_sigla} ({tbto_nome})" if tbto_sigla else "Tributo não especificado"
-                resultados_agrupados[chave]['reducoes'].append({
-                    'valor': pere_valor,
-                    'formatado': reducao_formatada,
-                    'tributo': tributo_info
-                })
+        combinacoes = relatorio.combinacoes
         
         # Exibir resultados
-        self.resultado_texto.insert(tk.END, f"✅ CONSULTA: NCM {codigo}\n", "titulo")
-        self.resultado_texto.insert(tk.END, "=" * 70 + "\n\n")
+        documento.adicionar(f"✅ CONSULTA: NCM {codigo}\n", "titulo")
+        documento.adicionar("=" * 70 + "\n\n")
         
-        if len(resultados_agrupados) == 1:
-            self.resultado_texto.insert(tk.END, f"📋 1 COMBINAÇÃO ENCONTRADA\n\n", "subtitulo")
+        if len(combinacoes) == 1:
+            documento.adicionar(f"📋 1 COMBINAÇÃO ENCONTRADA\n\n", "subtitulo")
         else:
-            self.resultado_texto.insert(tk.END, f"📋 {len(resultados_agrupados)} COMBINAÇÕES ENCONTRADAS\n\n", "subtitulo")
+            documento.adicionar(f"📋 {len(combinacoes)} COMBINAÇÕES ENCONTRADAS\n\n", "subtitulo")
         
-        for i, (chave, dados) in enumerate(resultados_agrupados.items(), 1):
-            ncm_cd, sitr_cd, cltr_cd = chave
-            
-            self.resultado_texto.insert(tk.END, f"\n{i}. ", "subtitulo")
-            self.resultado_texto.insert(tk.END, f"NCM: {ncm_cd}\n", "normal")
+        for i, combinacao in enumerate(combinacoes, 1):
+            documento.adicionar(f"\n{i}. ", "subtitulo")
+            documento.adicionar(f"NCM: {combinacao.ncm}\n", "normal")
             
             # Descrição do NCM (limitada)
-            desc_ncm = dados['ncm_descricao']
+            desc_ncm = combinacao.ncm_descricao
             if len(desc_ncm) > 100:
                 desc_ncm = desc_ncm[:100] + "..."
-            self.resultado_texto.insert(tk.END, f"   Descrição: {desc_ncm}\n", "info")
+            documento.adicionar(f"   Descrição: {desc_ncm}\n", "info")
             
             # CST
-            self.resultado_texto.insert(tk.END, f"   CST: ", "normal")
-            self.resultado_texto.insert(tk.END, f"{sitr_cd} - {dados['sitr_descricao']}\n", "destaque")
+            documento.adicionar(f"   CST: ", "normal")
+            documento.adicionar(f"{combinacao.cst} - {combinacao.cst_descricao}\n", "destaque")
             
             # CClasTrib
-            self.resultado_texto.insert(tk.END, f"   CClasTrib: ", "normal")
-            self.resultado_texto.insert(tk.END, f"{cltr_cd} - {dados['cltr_descricao']}\n", "destaque")
+            documento.adicionar(f"   CClasTrib: ", "normal")
+            documento.adicionar(f"{combinacao.cclasstrib} - {combinacao.cclasstrib_descricao}\n", "destaque")
             
             # Reduções
-            if dados['reducoes']:
-                self.resultado_texto.insert(tk.END, f"   Reduções aplicáveis:\n", "normal")
-                for reducao in dados['reducoes']:
-                    self.resultado_texto.insert(tk.END, f"     • {reducao['tributo']}: ", "normal")
-                    self.resultado_texto.insert(tk.END, f"{reducao['formatado']}\n", "destaque")
+            if combinacao.reducoes:
+                documento.adicionar(f"   Reduções aplicáveis:\n", "normal")
+                for reducao in combinacao.reducoes:
+                    documento.adicionar(f"     • {reducao.tributo}: ", "normal")
+                    documento.adicionar(f"{reducao.formatado}\n", "destaque")
             else:
-                self.resultado_texto.insert(tk.END, f"   Redução: Sem redução cadastrada\n", "info")
+                documento.adicionar(f"   Redução: Sem redução cadastrada\n", "info")
             
-            self.resultado_texto.insert(tk.END, "-" * 70 + "\n", "info")
+            documento.adicionar("-" * 70 + "\n", "info")
         
         # Resumo final
-        self.resultado_texto.insert(tk.END, f"\n📊 RESUMO:\n", "subtitulo")
-        self.resultado_texto.insert(tk.END, f"• Total de combinações: {len(resultados_agrupados)}\n", "normal")
-        
-        # Contar reduções totais
-        total_reducoes = sum(len(dados['reducoes']) for dados in resultados_agrupados.values())
-        self.resultado_texto.insert(tk.END, f"• Total de reduções: {total_reducoes}\n", "normal")
-        
-        # Contar reduções com 100%
-        reducoes_100 = 0
-        for dados in resultados_agrupados.values():
-            for reducao in dados['reducoes']:
-                try:
-                    valor = float(reducao['valor'])
-                    if valor >= 100:
-                        reducoes_100 += 1
-                except:
-                    pass
-        
-        if reducoes_100 > 0:
-            self.resultado_texto.insert(tk.END, f"• Reduções de 100% (isenção): {reducoes_100}\n", "normal")
+        documento.adicionar(f"\n📊 RESUMO:\n", "subtitulo")
+        documento.adicionar(f"• Total de combinações: {len(combinacoes)}\n", "normal")
+        documento.adicionar(f"• Total de reduções: {relatorio.total_reducoes}\n", "normal")
+        
+        if relatorio.reducoes_isencao > 0:
+            documento.adicionar(f"• Reduções de 100% (isenção): {relatorio.reducoes_isencao}\n", "normal")
         
+        aplicar_no_widget(self.resultado_texto, documento)
         self.status_label.config(text=f"Consulta concluída para NCM: {codigo}")
 
 def main():
@@ -0,0 +1,245 @@
+"""
+Lista virtualizada para Tkinter.
+Mantém os itens num array em memória e materializa no Listbox apenas a janela
+de linhas visíveis; a rolagem apenas troca essas poucas linhas. Abrir uma lista
+de 15 mil NCMs custa o mesmo que abrir uma de dez.
+"""
+
+import time
+import tkinter as tk
+from bisect import bisect_left
+from tkinter import font as tkfont
+
+# Tempo, em segundos, para acumular dígitos digitados na lista (busca por código)
+INTERVALO_DIGITACAO = 1.0
+
+# Teclas de navegação tratadas pela lista: tecla -> (deslocamento, em páginas?)
+_TECLAS_NAVEGACAO = {
+    "Up": (-1, False),
+    "Down": (1, False),
+    "Prior": (-1, True),
+    "Next": (1, True),
+}
+
+
+def formatar_item_ncm(item, tamanho_descricao=80):
+    """Formata (codigo, descricao, ...) como 'codigo - descricao' com a descrição limitada."""
+    codigo, descricao = item[0], item[1]
+    if len(descricao) > tamanho_descricao:
+        descricao = descricao[:tamanho_descricao] + "..."
+    return f"{codigo} - {descricao}"
+
+
+class ListaVirtual(tk.Frame):
+    """
+    Lista rolável que exibe apenas as linhas visíveis de um array de itens.
+
+    Args:
+        master: Widget pai
+        altura: Quantidade inicial de linhas visíveis
+        largura: Largura do Listbox, em caracteres
+        formatar: Função item -> texto exibido (padrão: formatar_item_ncm)
+        ao_selecionar: Função chamada com o item selecionado (clique ou Enter)
+        opcoes_lista: Opções repassadas ao tk.Listbox (fonte, cores, borda)
+    """
+
+    def __init__(self, master, altura=6, largura=100, formatar=formatar_item_ncm,
+                 ao_selecionar=None, **opcoes_lista):
+        super().__init__(master, bg=opcoes_lista.get("bg", master.cget("bg")))
+        self.formatar = formatar
+        self.ao_selecionar = ao_selecionar
+        self._itens = []
+        self._ordenado_por_codigo = False
+        self._mensagem = ""
+        self._inicio = 0
+        self._linhas_visiveis = altura
+        self._selecionado = None
+        self._digitado = ""
+        self._ultima_tecla = 0.0
+
+        self.scrollbar_vertical = tk.Scrollbar(self, command=self._rolar)
+        self.scrollbar_vertical.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar_horizontal = tk.Scrollbar(self, orient=tk.HORIZONTAL)
+        self.scrollbar_horizontal.pack(side=tk.BOTTOM, fill=tk.X)
+
+        self.listbox = tk.Listbox(self, height=altura, width=largura, selectmode=tk.SINGLE,
+                                  exportselection=False, activestyle="none",
+                                  xscrollcommand=self.scrollbar_horizontal.set, **opcoes_lista)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar_horizontal.config(command=self.listbox.xview)
+
+        self._altura_linha = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace") + 1
+
+        self.listbox.bind("<Configure>", self._ao_redimensionar)
+        self.listbox.bind("<<ListboxSelect>>", self._ao_clicar)
+        self.listbox.bind("<Return>", lambda event: self._notificar_selecao())
+        self.listbox.bind("<MouseWheel>", self._ao_rolar_mouse)
+        self.listbox.bind("<Button-4>", lambda event: self.rolar(-3))
+        self.listbox.bind("<Button-5>", lambda event: self.rolar(3))
+        self.listbox.bind("<Home>", lambda event: self._ir_para_indice(0) or "break")
+        self.listbox.bind("<End>", lambda event: self._ir_para_indice(len(self._itens) - 1) or "break")
+        for tecla, (passo, pagina) in _TECLAS_NAVEGACAO.items():
+            self.listbox.bind(f"<{tecla}>", lambda event, p=passo, pg=pagina: self._mover_selecao(p, pg) or "break")
+        self.listbox.bind("<KeyPress>", self._ao_digitar)
+
+    # Dados
+
+    def definir_itens(self, itens, ordenado_por_codigo=False, mensagem_vazia=""):
+        """
+        Substitui os itens exibidos. A lista é referenciada, não copiada.
+
+        Args:
+            itens: Sequência de tuplas (codigo, descricao, ...)
+            ordenado_por_codigo: Se True, ir_para_codigo usa busca binária
+            mensagem_vazia: Texto exibido quando não há itens
+        """
+        self._itens = itens
+        self._ordenado_por_codigo = ordenado_por_codigo
+        self._mensagem = mensagem_vazia
+        self._inicio = 0
+        self._selecionado = None
+        self._renderizar()
+
+    def limpar(self, mensagem=""):
+        """Remove todos os itens, opcionalmente exibindo uma mensagem."""
+        self.definir_itens([], mensagem_vazia=mensagem)
+
+    def __len__(self):
+        return len(self._itens)
+
+    def item_selecionado(self):
+        """Retorna o item selecionado ou None."""
+        if self._selecionado is None:
+            return None
+        return self._itens[self._selecionado]
+
+    # Navegação
+
+    def rolar(self, linhas):
+        """Desloca a janela visível em linhas (negativo para cima)."""
+        self._definir_inicio(self._inicio + linhas)
+
+    def pagina_anterior(self):
+        """Volta uma página de linhas visíveis."""
+        self.rolar(-self._linhas_visiveis)
+
+    def proxima_pagina(self):
+        """Avança uma página de linhas visíveis."""
+        self.rolar(self._linhas_visiveis)
+
+    def pagina_atual(self):
+        """Retorna (página atual, total de páginas), contando a partir de 1."""
+        total = max(1, -(-len(self._itens) // self._linhas_visiveis))
+        return min(total, self._inicio // self._linhas_visiveis + 1), total
+
+    def ir_para_codigo(self, codigo, selecionar=True):
+        """
+        Posiciona a lista no primeiro item cujo código começa com o código informado.
+
+        Returns:
+            Índice do item encontrado, ou None
+        """
+        if self._ordenado_por_codigo:
+            indice = bisect_left(self._itens, codigo, key=lambda item: item[0])
+            if indice >= len(self._itens) or not self._itens[indice][0].startswith(codigo):
+                return None
+        else:
+            indice = next((i for i, item in enumerate(self._itens) if item[0].startswith(codigo)), None)
+            if indice is None:
+                return None
+
+        if selecionar:
+            self._ir_para_indice(indice)
+        else:
+            self._definir_inicio(indice)
+        return indice
+
+    # Implementação
+
+    def _definir_inicio(self, inicio):
+        maximo = max(0, len(self._itens) - self._linhas_visiveis)
+        inicio = min(max(0, inicio), maximo)
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._renderizar()
+
+    def _ir_para_indice(self, indice):
+        """Seleciona o item e rola o mínimo necessário para deixá-lo visível."""
+        if not self._itens:
+            return
+        indice = min(max(0, indice), len(self._itens) - 1)
+        self._selecionado = indice
+        if indice < self._inicio:
+            self._definir_inicio(indice)
+        elif indice >= self._inicio + self._linhas_visiveis:
+            self._definir_inicio(indice - self._linhas_visiveis + 1)
+        self._renderizar()
+
+    def _renderizar(self):
+        """Materializa no Listbox somente as linhas da janela visível."""
+        fim = min(len(self._itens), self._inicio + self._linhas_visiveis)
+        self.listbox.delete(0, tk.END)
+        if self._itens:
+            self.listbox.insert(tk.END, *(self.formatar(item) for item in self._itens[self._inicio:fim]))
+            if self._selecionado is not None and self._inicio <= self._selecionado < fim:
+                self.listbox.selection_set(self._selecionado - self._inicio)
+                self.listbox.activate(self._selecionado - self._inicio)
+        elif self._mensagem:
+            self.listbox.insert(tk.END, self._mensagem)
+
+        total = len(self._itens)
+        if total:
+            self.scrollbar_vertical.set(self._inicio / total, fim / total)
+        else:
+            self.scrollbar_vertical.set(0.0, 1.0)
+
+    def _rolar(self, acao, quantidade, unidade=None):
+        """Comando da barra de rolagem vertical (moveto/scroll)."""
+        if acao == tk.MOVETO:
+            self._definir_inicio(int(float(quantidade) * len(self._itens)))
+        elif acao == tk.SCROLL:
+            passo = int(quantidade)
+            if unidade == tk.PAGES:
+                passo *= self._linhas_visiveis
+            self.rolar(passo)
+
+    def _ao_redimensionar(self, event):
+        linhas = max(1, event.height // self._altura_linha)
+        if linhas != self._linhas_visiveis:
+            self._linhas_visiveis = linhas
+            self._definir_inicio(self._inicio)
+            self._renderizar()
+
+    def _ao_rolar_mouse(self, event):
+        self.rolar(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _mover_selecao(self, passo, pagina):
+        if pagina:
+            passo *= self._linhas_visiveis
+        atual = self._selecionado if self._selecionado is not None else self._inicio - 1
+        self._ir_para_indice(atual + passo)
+
+    def _ao_clicar(self, event):
+        selecao = self.listbox.curselection()
+        if not selecao or not self._itens:
+            return
+        self._selecionado = self._inicio + selecao[0]
+        self._notificar_selecao()
+
+    def _notificar_selecao(self):
+        item = self.item_selecionado()
+        if item is not None and self.ao_selecionar:
+            self.ao_selecionar(item)
+
+    def _ao_digitar(self, event):
+        """Digitar um código com a lista em foco posiciona no item correspondente."""
+        if not event.char or not event.char.isdigit():
+            return
+        agora = time.monotonic()
+        if agora - self._ultima_tecla > INTERVALO_DIGITACAO:
+            self._digitado = ""
+        self._ultima_tecla = agora
+        self._digitado += event.char
+        self.ir_para_codigo(self._digitado)
+        return "break"
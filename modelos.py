@@ -0,0 +1,155 @@
+"""
+Modelo de resultado das consultas de NCM e NBS.
+Tuplas nomeadas (sem __dict__ por instância) montadas uma única vez pelas
+consultas do database.py e pelo snapshot em memória, com os valores numéricos
+já convertidos para float.
+"""
+
+from typing import NamedTuple, Optional
+
+
+def para_numero(valor):
+    """Converte o valor do banco para float (None permanece None)."""
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        valor = valor.replace(',', '.')
+    return float(valor)
+
+
+class NcmInfo(NamedTuple):
+    """Dados básicos do NCM."""
+    codigo: str
+    descricao: str
+    inicio_vigencia: str
+    fim_vigencia: Optional[str]
+
+
+class NbsInfo(NamedTuple):
+    """Dados básicos da NBS, com o item da lista de serviços da LC 116/2003."""
+    codigo: str
+    descricao: str
+    item_lc116: Optional[str]
+    inicio_vigencia: str
+    fim_vigencia: Optional[str]
+
+
+class Classificacao(NamedTuple):
+    """Classificação tributária (cClassTrib) com a situação tributária (CST) vinculada."""
+    codigo: str
+    descricao: str
+    memoria_calculo: Optional[str]
+    credito_cbs: bool
+    credito_ibs: bool
+    credito_presumido_fornecedor: bool
+    credito_presumido_adquirente: bool
+    tipo_aliquota: Optional[str]
+    nomenclatura: Optional[str]
+    cst: Optional[str]
+    cst_descricao: Optional[str]
+
+
+class Anexo(NamedTuple):
+    """Item de anexo da legislação que fundamenta a regra."""
+    numero: str
+    item: Optional[str]
+    texto: Optional[str]
+
+
+class AliquotaPadrao(NamedTuple):
+    """Alíquota padrão (UF/município) associada a uma alíquota de referência."""
+    valor: float
+    forma_aplicacao: Optional[str]
+    inicio_vigencia: str
+    fim_vigencia: Optional[str]
+
+
+class Aliquota(NamedTuple):
+    """Alíquota de referência do tributo, com as alíquotas padrão vinculadas."""
+    valor: float
+    inicio_vigencia: str
+    fim_vigencia: Optional[str]
+    padroes: tuple
+
+
+class Reducao(NamedTuple):
+    """Percentual de redução da classificação para o tributo."""
+    valor: float
+    inicio_vigencia: str
+    fim_vigencia: Optional[str]
+
+    @property
+    def isencao_total(self):
+        """Indica redução de 100% ou mais."""
+        return self.valor >= 100
+
+
+class TributoAliquota(NamedTuple):
+    """Tributo aplicável à regra com suas alíquotas e reduções."""
+    sigla: str
+    nome: str
+    aliquotas: tuple
+    reducoes: tuple
+
+
+class RegraAplicavel(NamedTuple):
+    """Regra de NCM_APLICAVEL (ou NBS_APLICAVEL) já resolvida em classificação, anexo e tributos."""
+    id: int
+    inicio_vigencia: str
+    fim_vigencia: Optional[str]
+    classificacao: Classificacao
+    anexo: Optional[Anexo]
+    tributos: tuple
+
+
+# Todos os modelos de resultado (o cache_persistente só recria estes tipos)
+MODELOS = (NcmInfo, NbsInfo, Classificacao, Anexo, AliquotaPadrao, Aliquota, Reducao,
+           TributoAliquota, RegraAplicavel)
+
+
+def criar_ncm(linha):
+    """Cria o NcmInfo a partir de (NCM_CD, NCM_DESCRICAO, INICIO, FIM)."""
+    return NcmInfo(*linha)
+
+
+def criar_nbs(linha):
+    """Cria o NbsInfo a partir de (NBS_CD, NBS_DESCRICAO, NBS_LC_116, INICIO, FIM)."""
+    return NbsInfo(*linha)
+
+
+def criar_classificacao(colunas, situacao=None):
+    """
+    Cria a Classificacao.
+
+    Args:
+        colunas: (CLTR_CD, DESCRICAO, MEMORIA_CALCULO, 4 indicadores de crédito,
+                  TIPO_ALIQUOTA, NOMENCLATURA)
+        situacao: (SITR_CD, SITR_DESCRICAO) ou None
+    """
+    codigo, descricao, memoria, cbs, ibs, presumido_forn, presumido_adq, tipo, nomenclatura = colunas
+    cst, cst_descricao = situacao or (None, None)
+    return Classificacao(codigo, descricao, memoria,
+                         cbs == 1, ibs == 1, presumido_forn == 1, presumido_adq == 1,
+                         tipo, nomenclatura, cst, cst_descricao)
+
+
+def criar_anexo(numero, item, texto):
+    """Cria o Anexo, ou retorna None quando a regra não tem anexo."""
+    if numero is None:
+        return None
+    return Anexo(numero, item, texto)
+
+
+def criar_padrao(valor, forma_aplicacao, inicio, fim):
+    """Cria a AliquotaPadrao com o valor já convertido."""
+    return AliquotaPadrao(para_numero(valor), forma_aplicacao, inicio, fim)
+
+
+def criar_aliquota(valor, inicio, fim, padroes=()):
+    """Cria a Aliquota com o valor já convertido."""
+    return Aliquota(para_numero(valor), inicio, fim, tuple(padroes))
+
+
+def criar_reducao(valor, inicio, fim):
+    """Cria a Reducao com o valor já convertido."""
+    return Reducao(para_numero(valor), inicio, fim)
@@ -0,0 +1,148 @@
+"""
+Modelos compilados da memória de cálculo (CLTR_MEMORIA_CALCULO).
+Cada texto distinto é dividido uma única vez em segmentos — trechos fixos e
+marcadores como [base_calculo] — e a renderização é um único join, sem
+substituições encadeadas nem expressão regular por chamada. Há poucos textos
+distintos na base (as 168 classificações compartilham menos de uma dezena),
+então os modelos ficam em cache pelo próprio texto, o que também os mantém
+válidos entre versões da base.
+
+Marcadores sem valor informado (ou desconhecidos) viram "não especificado".
+"""
+
+import re
+import threading
+
+# Qualquer trecho entre colchetes é um marcador
+_MARCADOR = re.compile(r'\[.*?\]')
+
+TEXTO_NAO_ESPECIFICADO = "não especificado"
+TEXTO_INDISPONIVEL = "Memória de cálculo não disponível"
+
+# Marcadores numéricos, formatados com duas casas decimais
+MARCADORES_NUMERICOS = frozenset({
+    'percentual_reducao', 'aliquota_ad_valorem', 'base_calculo', 'aliquota_ad_rem', 'quantidade',
+})
+
+# Marcadores de texto, inseridos como informados
+MARCADORES_TEXTO = frozenset({'norma', 'tratamento', 'unidade'})
+
+_modelos = {}
+_trava_modelos = threading.Lock()
+
+
+def formatar_numero(valor):
+    """Formata o valor com duas casas decimais; valores não numéricos ficam como texto."""
+    try:
+        if isinstance(valor, str):
+            valor = float(valor)
+        return f'{valor:.2f}'
+    except (ValueError, TypeError):
+        return str(valor)
+
+
+def _formatar(nome, valor):
+    if valor is None:
+        return TEXTO_NAO_ESPECIFICADO
+    if nome in MARCADORES_NUMERICOS:
+        return formatar_numero(valor)
+    return valor
+
+
+class ModeloMemoria:
+    """
+    Memória de cálculo compilada em segmentos.
+
+    Args:
+        texto: Texto da memória de cálculo com marcadores entre colchetes
+    """
+
+    __slots__ = ('texto', 'segmentos', 'marcadores', '_posicoes')
+
+    def __init__(self, texto):
+        segmentos = []
+        posicoes = []
+        inicio = 0
+        for marcador in _MARCADOR.finditer(texto):
+            segmentos.append(texto[inicio:marcador.start()])
+            nome = marcador.group()[1:-1]
+            if nome in MARCADORES_NUMERICOS or nome in MARCADORES_TEXTO:
+                posicoes.append((len(segmentos), nome))
+                segmentos.append(None)
+            else:
+                segmentos.append(TEXTO_NAO_ESPECIFICADO)
+            inicio = marcador.end()
+        segmentos.append(texto[inicio:])
+
+        self.texto = texto
+        self.segmentos = tuple(segmentos)
+        self.marcadores = frozenset(nome for _, nome in posicoes)
+        self._posicoes = tuple(posicoes)
+
+    def renderizar(self, valores):
+        """
+        Preenche os marcadores com os valores.
+
+        Args:
+            valores: Dicionário {marcador: valor} (ex.: {'base_calculo': 100.0, 'norma': 'LC 214/2025'})
+
+        Returns:
+            Texto da memória de cálculo
+        """
+        if not self._posicoes:
+            return ''.join(self.segmentos)
+        partes = list(self.segmentos)
+        for posicao, nome in self._posicoes:
+            partes[posicao] = _formatar(nome, valores.get(nome))
+        return ''.join(partes)
+
+    def renderizar_itens(self, itens):
+        """
+        Renderiza o mesmo modelo para vários itens (relatórios de auditoria).
+
+        Args:
+            itens: Iterável de dicionários {marcador: valor}
+
+        Returns:
+            Lista com o texto de cada item
+        """
+        segmentos = self.segmentos
+        posicoes = self._posicoes
+        textos = []
+        for valores in itens:
+            partes = list(segmentos)
+            for posicao, nome in posicoes:
+                partes[posicao] = _formatar(nome, valores.get(nome))
+            textos.append(''.join(partes))
+        return textos
+
+    def __repr__(self):
+        return f"ModeloMemoria({self.texto[:40]!r}, marcadores={sorted(self.marcadores)})"
+
+
+def compilar_memoria(texto):
+    """Retorna o modelo compilado do texto, compilando-o na primeira vez."""
+    modelo = _modelos.get(texto)
+    if modelo is None:
+        with _trava_modelos:
+            modelo = _modelos.get(texto)
+            if modelo is None:
+                modelo = _modelos[texto] = ModeloMemoria(texto)
+    return modelo
+
+
+def renderizar_memoria(texto, valores):
+    """
+    Renderiza a memória de cálculo do texto com os valores informados.
+
+    Returns:
+        Texto renderizado, ou TEXTO_INDISPONIVEL se não houver memória
+    """
+    if not texto:
+        return TEXTO_INDISPONIVEL
+    return compilar_memoria(texto).renderizar(valores)
+
+
+def estatisticas():
+    """Retorna a quantidade de modelos compilados."""
+    return {'modelos': len(_modelos)}
@@ -0,0 +1,157 @@
+"""
+Pool de conexões SQLite somente leitura da Calculadora Tributária.
+Mantém uma conexão persistente por thread, com PRAGMAs ajustados para leitura
+e cache de instruções preparadas, evitando abrir e fechar o banco a cada consulta.
+"""
+
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+
+# Tamanho do cache de instruções preparadas por conexão (padrão do sqlite3 é 128)
+TAMANHO_CACHE_INSTRUCOES = 256
+
+# PRAGMAs aplicados a cada nova conexão de leitura
+PRAGMAS_LEITURA = (
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 67108864",   # 64 MB - o banco inteiro cabe mapeado em memória
+    "PRAGMA cache_size = -16384",    # 16 MB de cache de páginas
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class _ConexaoThread:
+    """Conexão guardada no thread-local; quando a thread termina, é coletada e a conexão, fechada."""
+    __slots__ = ("conexao", "geracao", "finalizador", "__weakref__")
+
+    def __init__(self, conexao, geracao):
+        self.conexao = conexao
+        self.geracao = geracao
+        self.finalizador = None
+
+
+class PoolConexoes:
+    """
+    Pool de conexões com afinidade por thread.
+
+    Cada thread recebe sempre a mesma conexão, aberta na primeira utilização
+    e reaproveitada até que o pool seja invalidado ou fechado ou a thread termine.
+    """
+
+    def __init__(self, caminho, somente_leitura=True):
+        self.caminho = caminho
+        self.somente_leitura = somente_leitura
+        self._local = threading.local()
+        self._trava = threading.Lock()
+        self._conexoes = []
+        self._geracao = 0
+        self._aberturas = 0
+        self._emprestimos = 0
+
+    def _abrir(self):
+        """Abre uma nova conexão configurada para o pool."""
+        if self.somente_leitura:
+            uri = Path(self.caminho).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=TAMANHO_CACHE_INSTRUCOES)
+            for pragma in PRAGMAS_LEITURA:
+                conn.execute(pragma)
+        else:
+            conn = sqlite3.connect(self.caminho, check_same_thread=False,
+                                   cached_statements=TAMANHO_CACHE_INSTRUCOES)
+        return conn
+
+    def obter(self):
+        """Retorna a conexão da thread atual, abrindo-a se necessário."""
+        registro = getattr(self._local, "registro", None)
+        if registro is None or registro.geracao != self._geracao:
+            if registro is not None:
+                # Conexão de uma geração anterior: fechada pela própria thread, que não a usa mais
+                registro.finalizador()
+            conn = self._abrir()
+            with self._trava:
+                registro = _ConexaoThread(conn, self._geracao)
+                self._conexoes.append(conn)
+                self._aberturas += 1
+            # Fecha a conexão quando o thread-local da thread for descartado
+            registro.finalizador = weakref.finalize(registro, self._liberar, conn)
+            self._local.registro = registro
+        with self._trava:
+            self._emprestimos += 1
+        return registro.conexao
+
+    def _liberar(self, conn):
+        """Fecha a conexão de uma thread encerrada (ou de uma geração anterior do pool)."""
+        with self._trava:
+            if conn in self._conexoes:
+                self._conexoes.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def liberar(self):
+        """Fecha a conexão da thread atual, se houver (reaberta se a thread voltar a consultar)."""
+        registro = getattr(self._local, "registro", None)
+        if registro is not None:
+            self._local.registro = None
+            registro.finalizador()
+
+    @contextmanager
+    def conexao(self):
+        """
+        Gerenciador de contexto que empresta a conexão da thread atual.
+        A conexão não é fechada ao final do bloco.
+        """
+        yield self.obter()
+
+    def invalidar(self):
+        """
+        Descarta as conexões abertas (ex.: após a troca do arquivo do banco) sem
+        fechá-las aqui: cada thread fecha a sua e abre outra na próxima chamada a
+        obter(), e a de uma thread que não volta a consultar é fechada quando ela
+        termina. Pode ser chamado com outras threads consultando.
+        """
+        with self._trava:
+            self._geracao += 1
+
+    def fechar(self):
+        """
+        Fecha todas as conexões abertas; as threads reabrem sob demanda.
+
+        Só deve ser chamado no encerramento, sem outras threads consultando:
+        as conexões delas são fechadas mesmo durante uma consulta. Para
+        descartar as conexões com o pool em uso, use invalidar().
+        """
+        with self._trava:
+            conexoes, self._conexoes = self._conexoes, []
+            self._geracao += 1
+        for conn in conexoes:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def estatisticas(self):
+        """
+        Retorna as estatísticas de uso do pool.
+
+        Returns:
+            Dicionário com conexões abertas, total de aberturas, empréstimos
+            e reaproveitamentos de conexão
+        """
+        with self._trava:
+            abertas = len(self._conexoes)
+            aberturas = self._aberturas
+            emprestimos = self._emprestimos
+        return {
+            'caminho': self.caminho,
+            'somente_leitura': self.somente_leitura,
+            'conexoes_abertas': abertas,
+            'aberturas': aberturas,
+            'emprestimos': emprestimos,
+            'reaproveitamentos': max(emprestimos - aberturas, 0),
+            'cache_instrucoes': TAMANHO_CACHE_INSTRUCOES,
+        }
@@ -0,0 +1,345 @@
+"""
+Camada de relatórios compartilhada pelas interfaces.
+Recebe o resultado das consultas do database uma única vez, faz o agrupamento
+(por CST/CClasTrib, por classificação, por regra e tributo), a formatação das
+reduções e o cálculo das alíquotas efetivas, e entrega uma estrutura imutável
+(tuplas nomeadas) que cada tela apenas desenha. Os relatórios ficam num cache
+LRU por (tipo, código, data de referência, versão da base): o agrupamento é
+feito uma vez por NCM e por versão, e não uma vez por tela.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import database
+import modelos
+import vigencia
+from taxas_efetivas import calcular_aliquota_efetiva
+
+# Quantidade de relatórios mantidos em cache
+TAMANHO_CACHE = 256
+
+TIPO_CST_CCLASSTRIB = "cst_cclastrib"
+TIPO_REDUCOES = "reducoes"
+TIPO_COMPLETO = "completo"
+
+# Texto padrão das memórias de cálculo (ainda não vem do banco)
+NORMA_PADRAO = "LC 214/2025"
+TRATAMENTO_PADRAO = "Tributação integral"
+
+
+# Formatação compartilhada
+
+def formatar_vigencia(inicio, fim):
+    """Formata a vigência como 'inicio até fim' ('atual' quando não há fim)."""
+    return f"{inicio} até {fim if fim else 'atual'}"
+
+
+def formatar_reducao(valor, sem_valor="Sem redução"):
+    """
+    Formata o percentual de redução para exibição.
+
+    Args:
+        valor: Percentual (float, texto do banco ou None)
+        sem_valor: Texto exibido quando não há valor
+    """
+    if valor is None:
+        return sem_valor
+
+    if isinstance(valor, str):
+        # Datas (YYYY-MM-DD) em coluna de valor indicam cadastro inconsistente
+        if len(valor) == 10 and valor[4] == '-' and valor[7] == '-':
+            return f"Data inválida: {valor}"
+        try:
+            valor = modelos.para_numero(valor)
+        except ValueError:
+            return valor
+
+    # Valores como 10000.00% provavelmente são fatores de multiplicação
+    if valor >= 10000:
+        return "Isenção total (100%)"
+    elif valor >= 100:
+        # Redução maior que 100% - pode ser erro ou fator especial
+        return f"{valor:.2f}% (fator especial)"
+    else:
+        return f"{valor:.2f}%"
+
+
+def _numero_ou_none(valor):
+    try:
+        return modelos.para_numero(valor)
+    except (ValueError, TypeError):
+        return None
+
+
+# Relatório de CST, CClasTrib e redução
+
+class ReducaoTributo(NamedTuple):
+    """Redução de um tributo numa combinação CST/CClasTrib."""
+    tributo: str
+    valor: Optional[float]
+    formatado: str
+
+
+class CombinacaoCst(NamedTuple):
+    """Combinação NCM + CST + CClasTrib com as reduções aplicáveis."""
+    ncm: str
+    ncm_descricao: str
+    cst: str
+    cst_descricao: str
+    cclasstrib: str
+    cclasstrib_descricao: str
+    reducoes: tuple
+
+
+class RelatorioCst(NamedTuple):
+    """Relatório de CST, CClasTrib e redução de um NCM."""
+    codigo: str
+    combinacoes: tuple
+    total_reducoes: int
+    reducoes_isencao: int
+
+
+def montar_relatorio_cst(codigo, linhas):
+    """
+    Agrupa as linhas de buscar_cst_cclastrib_reducao_ncm por NCM + CST + CClasTrib.
+
+    Returns:
+        RelatorioCst, ou None se não houver linhas
+    """
+    if not linhas:
+        return None
+
+    grupos = {}
+    for ncm_cd, ncm_desc, sitr_cd, sitr_desc, cltr_cd, cltr_desc, pere_valor, tbto_sigla, tbto_nome in linhas:
+        chave = (ncm_cd, sitr_cd, cltr_cd)
+        grupo = grupos.get(chave)
+        if grupo is None:
+            grupo = grupos[chave] = (ncm_desc, sitr_desc, cltr_desc, [])
+
+        if pere_valor is not None:
+            tributo = f"{tbto_sigla} ({tbto_nome})" if tbto_sigla else "Tributo não especificado"
+            grupo[3].append(ReducaoTributo(tributo, _numero_ou_none(pere_valor), formatar_reducao(pere_valor)))
+
+    combinacoes = tuple(
+        CombinacaoCst(ncm_cd, ncm_desc, sitr_cd, sitr_desc, cltr_cd, cltr_desc, tuple(reducoes))
+        for (ncm_cd, sitr_cd, cltr_cd), (ncm_desc, sitr_desc, cltr_desc, reducoes) in grupos.items()
+    )
+    reducoes = [reducao for combinacao in combinacoes for reducao in combinacao.reducoes]
+    isencoes = sum(1 for reducao in reducoes if reducao.valor is not None and reducao.valor >= 100)
+    return RelatorioCst(codigo, combinacoes, len(reducoes), isencoes)
+
+
+# Relatório de reduções
+
+class ReducaoAliquota(NamedTuple):
+    """Redução de um tributo com a alíquota de referência e a alíquota efetiva."""
+    sigla: Optional[str]
+    nome: Optional[str]
+    aliquota: Optional[float]
+    reducao: Optional[float]
+    reducao_inicio: Optional[str]
+    reducao_fim: Optional[str]
+    aliquota_inicio: Optional[str]
+    aliquota_fim: Optional[str]
+    aliquota_efetiva: Optional[float]
+
+
+class GrupoReducoes(NamedTuple):
+    """Reduções de uma classificação tributária."""
+    cclasstrib: str
+    descricao: str
+    tributos: tuple
+
+
+class RelatorioReducoes(NamedTuple):
+    """Relatório das reduções de um NCM, agrupadas por classificação."""
+    codigo: str
+    total: int
+    classificacoes: tuple
+
+
+def montar_relatorio_reducoes(codigo, linhas):
+    """
+    Agrupa as linhas de buscar_reducoes_ncm por classificação tributária.
+
+    Returns:
+        RelatorioReducoes (com classificacoes vazio se não houver linhas)
+    """
+    grupos = {}
+    for (_, cltr_cd, cltr_desc, sigla, nome, aliquota, reducao,
+         reducao_inicio, reducao_fim, aliquota_inicio, aliquota_fim) in linhas:
+        grupo = grupos.get(cltr_cd)
+        if grupo is None:
+            grupo = grupos[cltr_cd] = (cltr_desc, [])
+
+        aliquota = _numero_ou_none(aliquota)
+        reducao = _numero_ou_none(reducao)
+        grupo[1].append(ReducaoAliquota(sigla, nome, aliquota, reducao, reducao_inicio, reducao_fim,
+                                        aliquota_inicio, aliquota_fim,
+                                        calcular_aliquota_efetiva(aliquota, reducao)))
+
+    classificacoes = tuple(GrupoReducoes(cltr_cd, descricao, tuple(tributos))
+                           for cltr_cd, (descricao, tributos) in grupos.items())
+    return RelatorioReducoes(codigo, len(linhas), classificacoes)
+
+
+# Relatório completo
+
+class TributoRelatorio(NamedTuple):
+    """Tributo da regra com a alíquota efetiva (primeira alíquota com a primeira redução)."""
+    tributo: modelos.TributoAliquota
+    aliquota_efetiva: Optional[float]
+
+
+class RegraRelatorio(NamedTuple):
+    """Regra aplicável com a memória de cálculo já processada."""
+    regra: modelos.RegraAplicavel
+    memoria_calculo: Optional[str]
+    tributos: tuple
+
+
+class RelatorioCompleto(NamedTuple):
+    """Relatório completo de um NCM: regras, tributos e resumo."""
+    ncm: Optional[modelos.NcmInfo]
+    regras: tuple
+    tributos: tuple
+    tem_iss: bool
+
+
+def _montar_regra(regra):
+    tributos = []
+    for tributo in regra.tributos:
+        efetiva = None
+        if tributo.aliquotas and tributo.reducoes:
+            efetiva = calcular_aliquota_efetiva(tributo.aliquotas[0].valor, tributo.reducoes[0].valor)
+        tributos.append(TributoRelatorio(tributo, efetiva))
+
+    # A memória de cálculo é da classificação, comum a todos os tributos da regra
+    memoria = regra.classificacao.memoria_calculo
+    if memoria:
+        memoria = database.processar_memoria_calculo(
+            memoria_calculo=memoria,
+            norma=NORMA_PADRAO,
+            tratamento=TRATAMENTO_PADRAO
+        )
+    return RegraRelatorio(regra, memoria, tuple(tributos))
+
+
+def montar_relatorio_completo(ncm, regras):
+    """
+    Monta o relatório completo a partir de buscar_informacoes_estruturadas_ncm.
+
+    Returns:
+        RelatorioCompleto (ncm None quando o NCM não existe)
+    """
+    if not ncm:
+        return RelatorioCompleto(None, (), (), False)
+
+    regras_relatorio = tuple(_montar_regra(regra) for regra in regras)
+    siglas = tuple(sorted({tributo.sigla for regra in regras for tributo in regra.tributos}))
+    return RelatorioCompleto(ncm, regras_relatorio, siglas, any('ISS' in sigla for sigla in siglas))
+
+
+# Motor com cache
+
+class MotorRelatorios:
+    """
+    Monta relatórios sob demanda e os mantém em cache por (tipo, código, data, versão).
+
+    Args:
+        obter_versao: Função que retorna a versão atual da base (por padrão, a
+            assinatura já acompanhada pelo cache de consultas, sem consulta SQL)
+        tamanho_cache: Quantidade de relatórios mantidos (LRU)
+    """
+
+    def __init__(self, obter_versao=database.assinatura_base, tamanho_cache=TAMANHO_CACHE):
+        self._obter_versao = obter_versao
+        self._tamanho_cache = tamanho_cache
+        self._cache = OrderedDict()
+        self._trava = threading.Lock()
+        self.montados = 0
+        self.acertos = 0
+
+    def _obter(self, tipo, codigo, data_referencia, montar):
+        chave = (tipo, codigo, data_referencia, self._obter_versao())
+        with self._trava:
+            if chave in self._cache:
+                self._cache.move_to_end(chave)
+                self.acertos += 1
+                return self._cache[chave]
+
+        relatorio = montar()
+
+        with self._trava:
+            self.montados += 1
+            self._cache[chave] = relatorio
+            while len(self._cache) > self._tamanho_cache:
+                self._cache.popitem(last=False)
+        return relatorio
+
+    def relatorio_cst_cclastrib(self, codigo, data_referencia=None):
+        """
+        Relatório de CST, CClasTrib e redução do NCM (None se não houver resultado).
+        Com data_referencia (YYYY-MM-DD), apenas os registros vigentes na data.
+        """
+        data_referencia = vigencia.validar_data_referencia(data_referencia)
+        return self._obter(TIPO_CST_CCLASSTRIB, codigo, data_referencia, lambda: montar_relatorio_cst(
+            codigo, database.buscar_cst_cclastrib_reducao_ncm(codigo, data_referencia=data_referencia)))
+
+    def relatorio_reducoes(self, codigo):
+        """Relatório das reduções do NCM, agrupadas por classificação."""
+        return self._obter(TIPO_REDUCOES, codigo, None, lambda: montar_relatorio_reducoes(
+            codigo, database.buscar_reducoes_ncm(codigo)))
+
+    def relatorio_completo(self, codigo, data_referencia=None):
+        """
+        Relatório completo do NCM (regras, alíquotas, reduções e memória de cálculo).
+        Com data_referencia (YYYY-MM-DD), apenas os registros vigentes na data.
+        """
+        data_referencia = vigencia.validar_data_referencia(data_referencia)
+        return self._obter(TIPO_COMPLETO, codigo, data_referencia, lambda: montar_relatorio_completo(
+            *database.buscar_informacoes_estruturadas_ncm(codigo, data_referencia=data_referencia)))
+
+    def limpar(self):
+        """Descarta os relatórios em cache."""
+        with self._trava:
+            self._cache.clear()
+
+    def estatisticas(self):
+        """Retorna os contadores do cache de relatórios."""
+        return {
+            'relatorios_em_cache': len(self._cache),
+            'montados': self.montados,
+            'acertos': self.acertos,
+        }
+
+
+_motor = None
+_trava_motor = threading.Lock()
+
+
+def obter_motor():
+    """Retorna o motor de relatórios compartilhado pelas interfaces."""
+    global _motor
+    if _motor is None:
+        with _trava_motor:
+            if _motor is None:
+                _motor = MotorRelatorios()
+    return _motor
+
+
+def relatorio_cst_cclastrib(codigo, data_referencia=None):
+    """Atalho para obter_motor().relatorio_cst_cclastrib."""
+    return obter_motor().relatorio_cst_cclastrib(codigo, data_referencia)
+
+
+def relatorio_reducoes(codigo):
+    """Atalho para obter_motor().relatorio_reducoes."""
+    return obter_motor().relatorio_reducoes(codigo)
+
+
+def relatorio_completo(codigo, data_referencia=None):
+    """Atalho para obter_motor().relatorio_completo."""
+    return obter_motor().relatorio_completo(codigo, data_referencia)
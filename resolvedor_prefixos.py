@@ -0,0 +1,162 @@
+"""
+Resolvedor hierárquico de regras de aplicabilidade por prefixo de código.
+As regras de NCM_APLICAVEL são cadastradas para capítulos, posições e subposições
+(códigos de 2 a 8 dígitos); um item herda as regras de todos os seus ancestrais,
+menos as exceções cadastradas em EXCECAO_NCM_APLICAVEL. As NBS seguem a mesma
+hierarquia (NBS_APLICAVEL e EXCECAO_NBS_APLICAVEL), com os códigos sem pontos.
+"""
+
+
+class NoTrie:
+    """Nó da árvore de prefixos: filhos por dígito, regras e exceções do prefixo."""
+
+    __slots__ = ('filhos', 'regras', 'excecoes')
+
+    def __init__(self):
+        self.filhos = {}
+        self.regras = []
+        self.excecoes = []
+
+
+class TriePrefixos:
+    """Árvore de prefixos (trie) sobre códigos numéricos."""
+
+    def __init__(self):
+        self.raiz = NoTrie()
+        self.total_nos = 1
+
+    def no(self, codigo):
+        """Retorna o nó do código, criando o caminho se necessário."""
+        atual = self.raiz
+        for digito in codigo:
+            proximo = atual.filhos.get(digito)
+            if proximo is None:
+                proximo = atual.filhos[digito] = NoTrie()
+                self.total_nos += 1
+            atual = proximo
+        return atual
+
+    def caminho(self, codigo):
+        """Retorna os nós existentes do prefixo mais curto até o código completo."""
+        nos = []
+        atual = self.raiz
+        for digito in codigo:
+            atual = atual.filhos.get(digito)
+            if atual is None:
+                break
+            nos.append(atual)
+        return nos
+
+
+def vigente_em(inicio, fim, data):
+    """Indica se o intervalo [inicio, fim] contém a data (datas ISO; fim nulo = atual)."""
+    if data is None:
+        return True
+    return inicio <= data and (fim is None or data <= fim)
+
+
+class ResolvedorAplicabilidade:
+    """
+    Resolve as regras aplicáveis a um código, incluindo as herdadas dos prefixos.
+
+    Args:
+        regras: Linhas (ID, CODIGO, CLTR_ID, ANXO_ID, INICIO_VIGENCIA, FIM_VIGENCIA)
+        excecoes: Linhas (CODIGO, ID_REGRA, INICIO_VIGENCIA, FIM_VIGENCIA)
+    """
+
+    def __init__(self, regras, excecoes=()):
+        self.trie = TriePrefixos()
+        self.regras_por_id = {}
+        self.total_excecoes = 0
+
+        for regra in regras:
+            self.trie.no(regra[1]).regras.append(regra)
+            self.regras_por_id[regra[0]] = regra
+
+        for codigo, id_regra, inicio, fim in excecoes:
+            self.trie.no(codigo).excecoes.append((id_regra, inicio, fim))
+            self.total_excecoes += 1
+
+    def regras_aplicaveis(self, codigo, data=None):
+        """
+        Retorna as regras aplicáveis ao código numa única descida pela árvore.
+
+        Args:
+            codigo: Código a resolver (apenas dígitos)
+            data: Data de referência (YYYY-MM-DD) para filtrar vigências, opcional
+
+        Returns:
+            Lista de regras, da mais específica (prefixo mais longo) para a mais genérica
+        """
+        nos = self.trie.caminho(codigo)
+        excluidas = set()
+        for no in nos:
+            for id_regra, inicio, fim in no.excecoes:
+                if vigente_em(inicio, fim, data):
+                    excluidas.add(id_regra)
+
+        resultado = []
+        for no in reversed(nos):
+            for regra in no.regras:
+                if regra[0] not in excluidas and vigente_em(regra[4], regra[5], data):
+                    resultado.append(regra)
+        return resultado
+
+    def intervalos_vigencia(self, codigo):
+        """
+        Retorna os intervalos (inicio, fim) das regras e exceções do caminho do código;
+        o resultado de regras_aplicaveis só muda nos limites desses intervalos.
+        """
+        intervalos = set()
+        for no in self.trie.caminho(codigo):
+            intervalos.update(regra[4:6] for regra in no.regras)
+            intervalos.update((inicio, fim) for _, inicio, fim in no.excecoes)
+        return intervalos
+
+    def ids_aplicaveis(self, codigo, data=None):
+        """Retorna apenas os IDs das regras aplicáveis ao código."""
+        return [r[0] for r in self.regras_aplicaveis(codigo, data)]
+
+    def estatisticas(self):
+        """Retorna o tamanho do índice carregado."""
+        return {
+            'regras': len(self.regras_por_id),
+            'excecoes': self.total_excecoes,
+            'nos': self.trie.total_nos,
+        }
+
+
+def carregar_resolvedor_ncm(conn):
+    """Carrega NCM_APLICAVEL e EXCECAO_NCM_APLICAVEL num resolvedor em memória."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT NCMA_ID, NCMA_NCM_CD, NCMA_CLTR_ID, NCMA_ANXO_ID,
+               NCMA_INICIO_VIGENCIA, NCMA_FIM_VIGENCIA
+        FROM NCM_APLICAVEL
+        ORDER BY NCMA_INICIO_VIGENCIA DESC, NCMA_ID
+    """)
+    regras = cur.fetchall()
+    cur.execute("""
+        SELECT ENCM_NCM_CD, ENCM_NCMA_ID, ENCM_INICIO_VIGENCIA, ENCM_FIM_VIGENCIA
+        FROM EXCECAO_NCM_APLICAVEL
+    """)
+    excecoes = cur.fetchall()
+    return ResolvedorAplicabilidade(regras, excecoes)
+
+
+def carregar_resolvedor_nbs(conn):
+    """Carrega NBS_APLICAVEL e EXCECAO_NBS_APLICAVEL num resolvedor em memória."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT NBSA_ID, NBSA_NBS_CD, NBSA_CLTR_ID, NBSA_ANXO_ID,
+               NBSA_INICIO_VIGENCIA, NBSA_FIM_VIGENCIA
+        FROM NBS_APLICAVEL
+        ORDER BY NBSA_INICIO_VIGENCIA DESC, NBSA_ID
+    """)
+    regras = cur.fetchall()
+    cur.execute("""
+        SELECT ENBS_NBS_CD, ENBS_NBSA_ID, ENBS_INICIO_VIGENCIA, ENBS_FIM_VIGENCIA
+        FROM EXCECAO_NBS_APLICAVEL
+    """)
+    excecoes = cur.fetchall()
+    return ResolvedorAplicabilidade(regras, excecoes)
@@ -0,0 +1,441 @@
+"""
+Serviço HTTP local de consultas em JSON.
+Mantém o interpretador, o snapshot, o índice de busca e os relatórios
+carregados entre as consultas, evitando abrir o Python, o Tk e o banco a cada
+consulta feita por uma integração.
+
+Rotas:
+    GET  /ncm/{codigo}[?data=AAAA-MM-DD]        Relatório completo do NCM
+    GET  /ncm/{codigo}/cst[?data=AAAA-MM-DD]    CST, CClasTrib e reduções
+    GET  /ncm/{codigo}/reducoes                 Reduções por classificação
+    GET  /busca?q=texto[&limite=N]              Busca de NCM pela descrição
+    GET  /saude                                 Versão da base e estatísticas
+    POST /lote                                  {"codigos": [...], "tipo": "completo|cst|reducoes",
+                                                 "data_referencia": "AAAA-MM-DD"}
+
+As respostas já serializadas ficam num cache LRU por (rota, código, data,
+versão da base). As conexões HTTP/1.1 são mantidas abertas (keep-alive) e
+atendidas por um conjunto fixo de threads, cada uma com a sua conexão SQLite;
+para que clientes ociosos não ocupem todas as threads, a conexão é fechada
+após TEMPO_OCIOSO sem que uma nova requisição comece, ou logo após a
+resposta quando há conexões esperando por uma thread. Uma requisição já
+iniciada tem até TEMPO_LEITURA para chegar por inteiro.
+
+Uso:
+    python servidor_http.py [--host 127.0.0.1] [--porta 8765] [--trabalhadores 16]
+A vazão pode ser medida com o gerador de carga de testar_servidor_http.py.
+"""
+
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import database
+import relatorios
+import vigencia
+
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8765
+
+# Threads que atendem as conexões (cada uma mantém uma conexão SQLite)
+TRABALHADORES_PADRAO = 16
+
+# Conexões keep-alive ociosas por mais que isso (segundos) são fechadas: cada
+# uma ocupa uma thread do conjunto enquanto espera a próxima requisição
+TEMPO_OCIOSO = 0.25
+
+# Prazo (segundos) de cada leitura de uma requisição já iniciada (linha, cabeçalhos e corpo)
+TEMPO_LEITURA = 30.0
+
+# Quantidade de respostas serializadas mantidas em cache
+TAMANHO_CACHE_RESPOSTAS = 2048
+
+# Limites do lote
+LIMITE_CODIGOS_LOTE = 1000
+LIMITE_CORPO = 1024 * 1024
+
+LIMITE_BUSCA_PADRAO = 50
+
+TIPOS_LOTE = ("completo", "cst", "reducoes")
+
+
+class ErroConsulta(Exception):
+    """Erro com status HTTP a ser devolvido ao cliente."""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+def para_json(valor):
+    """Converte relatórios (tuplas nomeadas aninhadas) em estruturas serializáveis em JSON."""
+    if isinstance(valor, tuple) and hasattr(valor, '_fields'):
+        return {campo: para_json(getattr(valor, campo)) for campo in valor._fields}
+    if isinstance(valor, (list, tuple)):
+        return [para_json(item) for item in valor]
+    if isinstance(valor, dict):
+        return {chave: para_json(item) for chave, item in valor.items()}
+    return valor
+
+
+def serializar(dados):
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class CacheRespostas:
+    """
+    Respostas serializadas por (rota, código, data, versão da base), em LRU.
+
+    Args:
+        obter_versao: Função que retorna a versão atual da base
+        tamanho: Quantidade de respostas mantidas
+    """
+
+    def __init__(self, obter_versao=database.assinatura_base, tamanho=TAMANHO_CACHE_RESPOSTAS):
+        self._obter_versao = obter_versao
+        self._tamanho = tamanho
+        self._cache = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, rota, codigo, data_referencia, montar):
+        """
+        Retorna (status, corpo) da resposta, montando-a com montar() se não estiver em cache.
+        Erros (ErroConsulta) também ficam em cache: um NCM inexistente continua inexistente na versão.
+        """
+        chave = (rota, codigo, data_referencia, self._obter_versao())
+        with self._trava:
+            resposta = self._cache.get(chave)
+            if resposta is not None:
+                self._cache.move_to_end(chave)
+                self.acertos += 1
+                return resposta
+
+        try:
+            resposta = (200, serializar(montar()))
+        except ErroConsulta as erro:
+            resposta = (erro.status, serializar({'erro': erro.mensagem}))
+
+        with self._trava:
+            self.falhas += 1
+            self._cache[chave] = resposta
+            while len(self._cache) > self._tamanho:
+                self._cache.popitem(last=False)
+        return resposta
+
+    def estatisticas(self):
+        """Retorna os contadores do cache de respostas."""
+        return {
+            'respostas_em_cache': len(self._cache),
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+        }
+
+
+# Montagem das respostas
+
+def _exigir_ncm(codigo, data_referencia=None):
+    if database.obter_snapshot().buscar_ncm(codigo, data_referencia) is None:
+        raise ErroConsulta(404, f"NCM {codigo} não encontrado")
+
+
+def consultar_completo(codigo, data_referencia=None):
+    """Relatório completo do NCM em estrutura JSON."""
+    _exigir_ncm(codigo, data_referencia)
+    return para_json(relatorios.relatorio_completo(codigo, data_referencia))
+
+
+def consultar_cst(codigo, data_referencia=None):
+    """Relatório de CST/CClasTrib/redução do NCM em estrutura JSON."""
+    _exigir_ncm(codigo, data_referencia)
+    relatorio = relatorios.relatorio_cst_cclastrib(codigo, data_referencia)
+    if relatorio is None:
+        return {'codigo': codigo, 'combinacoes': [], 'total_reducoes': 0, 'reducoes_isencao': 0}
+    return para_json(relatorio)
+
+
+def consultar_reducoes(codigo, data_referencia=None):
+    """Relatório de reduções do NCM em estrutura JSON (sem data de referência)."""
+    _exigir_ncm(codigo)
+    return para_json(relatorios.relatorio_reducoes(codigo))
+
+
+CONSULTAS_NCM = {
+    "completo": consultar_completo,
+    "cst": consultar_cst,
+    "reducoes": consultar_reducoes,
+}
+
+
+def consultar_busca(texto, limite):
+    """Busca de NCM pela descrição em estrutura JSON."""
+    resultado = database.buscar_por_descricao_incremental(texto, limite)
+    return {
+        'itens': [{'codigo': codigo, 'descricao': descricao} for codigo, descricao in resultado.itens],
+        'total': resultado.total,
+        'ha_mais': resultado.ha_mais,
+    }
+
+
+# Servidor
+
+class ManipuladorConsultas(BaseHTTPRequestHandler):
+    """Atende as rotas de consulta; a instância do servidor guarda o cache de respostas."""
+
+    protocol_version = "HTTP/1.1"
+    timeout = TEMPO_LEITURA
+    # Cabeçalhos e corpo saem em duas escritas: sem isso o Nagle + ACK atrasado
+    # do cliente seguram cada resposta keep-alive por ~40 ms
+    disable_nagle_algorithm = True
+    server_version = "ConsultaNcm/1.0"
+
+    def handle(self):
+        # Como em BaseHTTPRequestHandler.handle, mas o tempo ocioso vale só para a
+        # espera pelo início de cada requisição, não para a leitura dela
+        self.close_connection = False
+        while not self.close_connection and self._aguardar_requisicao():
+            self.handle_one_request()
+
+    def _aguardar_requisicao(self):
+        """Espera até TEMPO_OCIOSO pelo primeiro byte da próxima requisição; False se não chegar."""
+        self.connection.settimeout(TEMPO_OCIOSO)
+        try:
+            chegou = bool(self.rfile.peek(1))
+        except OSError:
+            # Inclui o estouro do prazo (TimeoutError)
+            chegou = False
+        self.connection.settimeout(self.timeout)
+        return chegou
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        partes = [unquote(parte) for parte in url.path.strip('/').split('/') if parte]
+        self._atender(lambda: self._rotear_get(partes, parse_qs(url.query)))
+
+    def do_POST(self):
+        # O corpo é lido antes de tudo para que a conexão possa ser reaproveitada
+        self._atender(lambda: self._rotear_post(urlsplit(self.path).path.strip('/'), self._ler_corpo()))
+
+    def _atender(self, rotear):
+        try:
+            status, corpo = rotear()
+        except ErroConsulta as erro:
+            status, corpo = erro.status, serializar({'erro': erro.mensagem})
+        except Exception as erro:
+            self.log_error("Erro ao atender %s: %r", self.path, erro)
+            status, corpo = 500, serializar({'erro': "Erro interno"})
+        self._responder(status, corpo)
+
+    def _rotear_post(self, rota, pedido):
+        if rota != "lote":
+            raise ErroConsulta(404, "Rota não encontrada")
+        return 200, self._consultar_lote(pedido)
+
+    def _rotear_get(self, partes, parametros):
+        cache = self.server.cache
+        if len(partes) in (2, 3) and partes[0] == "ncm":
+            codigo = partes[1]
+            tipo = "completo" if len(partes) == 2 else partes[2]
+            if tipo not in CONSULTAS_NCM:
+                raise ErroConsulta(404, "Rota não encontrada")
+            data_referencia = _data_parametro(parametros) if tipo != "reducoes" else None
+            consulta = CONSULTAS_NCM[tipo]
+            return cache.obter(tipo, codigo, data_referencia, lambda: consulta(codigo, data_referencia))
+
+        if partes == ["busca"]:
+            texto = _parametro(parametros, 'q', '').strip()
+            if not texto:
+                raise ErroConsulta(400, "Informe o texto da busca em ?q=")
+            limite = _inteiro_parametro(parametros, 'limite', LIMITE_BUSCA_PADRAO)
+            return cache.obter("busca", texto, limite, lambda: consultar_busca(texto, limite))
+
+        if partes == ["saude"]:
+            return 200, serializar({
+                'versao': database.obter_versao_base(),
+                'cache': cache.estatisticas(),
+                'relatorios': relatorios.obter_motor().estatisticas(),
+                'pool': database.estatisticas_pool(),
+            })
+
+        raise ErroConsulta(404, "Rota não encontrada")
+
+    def _ler_corpo(self):
+        try:
+            tamanho = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            tamanho = -1
+        if tamanho < 0:
+            # Sem um tamanho válido não há como saber onde o corpo termina
+            self.close_connection = True
+            raise ErroConsulta(400, "Content-Length inválido")
+        if tamanho > LIMITE_CORPO:
+            # O corpo não é lido: a conexão não pode ser reaproveitada
+            self.close_connection = True
+            raise ErroConsulta(413, f"Corpo maior que {LIMITE_CORPO} bytes")
+        try:
+            return json.loads(self.rfile.read(tamanho) or b'{}')
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ErroConsulta(400, "Corpo não é um JSON válido") from None
+
+    def _consultar_lote(self, pedido):
+        """Monta a resposta do lote juntando os corpos já serializados de cada código."""
+        if not isinstance(pedido, dict) or not isinstance(pedido.get('codigos'), list):
+            raise ErroConsulta(400, 'Informe {"codigos": [...]}')
+        codigos = [str(codigo) for codigo in pedido['codigos']]
+        if len(codigos) > LIMITE_CODIGOS_LOTE:
+            raise ErroConsulta(413, f"Lote limitado a {LIMITE_CODIGOS_LOTE} códigos")
+        tipo = pedido.get('tipo', "completo")
+        if tipo not in TIPOS_LOTE:
+            raise ErroConsulta(400, f"Tipo inválido: {tipo} (use {', '.join(TIPOS_LOTE)})")
+        data_referencia = _validar_data(pedido.get('data_referencia')) if tipo != "reducoes" else None
+
+        consulta = CONSULTAS_NCM[tipo]
+        resultados = []
+        nao_encontrados = []
+        for codigo in codigos:
+            status, corpo = self.server.cache.obter(
+                tipo, codigo, data_referencia, lambda codigo=codigo: consulta(codigo, data_referencia))
+            if status == 200:
+                resultados.append(b'{"codigo":' + serializar(codigo) + b',"resultado":' + corpo + b'}')
+            else:
+                nao_encontrados.append(codigo)
+        return b''.join((
+            b'{"tipo":', serializar(tipo), b',"data_referencia":', serializar(data_referencia),
+            b',"resultados":[', b','.join(resultados), b'],"nao_encontrados":', serializar(nao_encontrados), b'}',
+        ))
+
+    def _responder(self, status, corpo):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        if self.server.ha_conexoes_esperando():
+            # Todas as threads ocupadas: libera esta para a próxima conexão
+            self.close_connection = True
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_request(self, code='-', size='-'):
+        # Sem registro por requisição (apenas erros): o custo da escrita limitaria a vazão
+        pass
+
+
+def _parametro(parametros, nome, padrao=None):
+    valores = parametros.get(nome)
+    return valores[0] if valores else padrao
+
+
+def _inteiro_parametro(parametros, nome, padrao):
+    valor = _parametro(parametros, nome)
+    if valor is None:
+        return padrao
+    try:
+        return max(1, int(valor))
+    except ValueError:
+        raise ErroConsulta(400, f"Parâmetro {nome} deve ser inteiro") from None
+
+
+def _validar_data(valor):
+    try:
+        return vigencia.validar_data_referencia(valor)
+    except (ValueError, TypeError):
+        raise ErroConsulta(400, f"Data inválida: {valor} (use AAAA-MM-DD)") from None
+
+
+def _data_parametro(parametros):
+    return _validar_data(_parametro(parametros, 'data'))
+
+
+class ServidorConsultas(HTTPServer):
+    """
+    Servidor HTTP com um conjunto fixo de threads: cada conexão é atendida por
+    uma thread do conjunto, que reaproveita a sua conexão SQLite do pool.
+
+    Args:
+        endereco: (host, porta); porta 0 escolhe uma porta livre
+        trabalhadores: Quantidade de conexões atendidas em paralelo
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, endereco=(HOST_PADRAO, PORTA_PADRAO), trabalhadores=TRABALHADORES_PADRAO):
+        super().__init__(endereco, ManipuladorConsultas)
+        self.cache = CacheRespostas()
+        self._quantidade_trabalhadores = trabalhadores
+        self._trabalhadores = ThreadPoolExecutor(max_workers=trabalhadores,
+                                                 thread_name_prefix="servidor-http")
+        # Conexões aceitas e ainda não encerradas (em atendimento ou na fila)
+        self._conexoes_ativas = 0
+        self._trava = threading.Lock()
+
+    def process_request(self, requisicao, endereco_cliente):
+        with self._trava:
+            self._conexoes_ativas += 1
+        self._trabalhadores.submit(self._atender, requisicao, endereco_cliente)
+
+    def _atender(self, requisicao, endereco_cliente):
+        try:
+            self.finish_request(requisicao, endereco_cliente)
+        except Exception:
+            self.handle_error(requisicao, endereco_cliente)
+        finally:
+            self.shutdown_request(requisicao)
+            with self._trava:
+                self._conexoes_ativas -= 1
+
+    def ha_conexoes_esperando(self):
+        """True se há conexões aceitas aguardando uma thread livre."""
+        return self._conexoes_ativas > self._quantidade_trabalhadores
+
+    def server_close(self):
+        super().server_close()
+        self._trabalhadores.shutdown(wait=False, cancel_futures=True)
+
+
+def aquecer():
+    """
+    Carrega o snapshot, os índices de vigência e o índice de busca antes da
+    primeira consulta e regrava em segundo plano o cache persistente, se desatualizado.
+    """
+    database.aquecer_cache_persistente()
+    database.obter_snapshot().indices_vigencia()
+    database.buscar_por_descricao_incremental("aquecimento", 1)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de consultas de NCM em JSON")
+    parser.add_argument("--host", default=HOST_PADRAO)
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--trabalhadores", type=int, default=TRABALHADORES_PADRAO)
+    argumentos = parser.parse_args(argumentos)
+
+    sucesso, mensagem = database.testar_conexao()
+    print(mensagem)
+    if not sucesso:
+        return 1
+
+    aquecer()
+    servidor = ServidorConsultas((argumentos.host, argumentos.porta), argumentos.trabalhadores)
+    print(f"Servindo em http://{argumentos.host}:{servidor.server_address[1]} "
+          f"({argumentos.trabalhadores} trabalhadores)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        database.fechar_conexoes()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,525 @@
+"""
+Snapshot em memória do banco da Calculadora Tributária.
+Carrega de uma só vez as tabelas usadas pelas consultas de NCM e NBS em estruturas
+indexadas (dicionários e tuplas), permitindo responder às consultas sem SQL.
+As NBS usam o mesmo caminho das NCM: regras de NBS_APLICAVEL resolvidas por
+prefixo, com as mesmas classificações, tributos, alíquotas e reduções.
+O snapshot é identificado pela versão da base (VERSAO_BASE_DADO) e pela
+assinatura do arquivo do banco, de modo que uma alteração sem troca de versão
+também o recarrega.
+As consultas aceitam uma data de referência, respondida pelos índices de
+vigência (vigencia.IndiceIntervalos) montados na primeira consulta com data.
+"""
+
+import os
+from bisect import bisect_left
+from typing import NamedTuple
+
+import modelos
+import vigencia
+from resolvedor_prefixos import ResolvedorAplicabilidade, carregar_resolvedor_nbs, vigente_em
+
+# Snapshots já carregados, por (versão da base, assinatura do arquivo)
+_snapshots = {}
+
+LINHA_SEM_ANEXO = (None, None, None)
+LINHA_SEM_SITUACAO = (None, None)
+LINHA_SEM_TRIBUTO = (None, None)
+LINHA_SEM_REDUCAO = (None, None, None, None)
+
+
+def normalizar_codigo_nbs(codigo):
+    """Remove pontos, hífens e espaços do código da NBS (1.0101.11.00 -> 101011100)."""
+    return ''.join(caractere for caractere in str(codigo) if caractere.isdigit())
+
+
+def assinatura_banco(caminho_banco):
+    """
+    Retorna (mtime, tamanho, (mtime, tamanho) do -wal) do arquivo do banco; muda
+    a cada escrita. Um -wal vazio (truncado ao abrir ou fechar o banco) não
+    guarda dados e é tratado como ausente.
+
+    Raises:
+        OSError: Se o arquivo do banco não existir
+    """
+    estado = os.stat(caminho_banco)
+    return (estado.st_mtime_ns, estado.st_size, _estado_wal(caminho_banco))
+
+
+def _estado_wal(caminho_banco):
+    """(mtime, tamanho) do -wal do banco, ou None se ele não existir ou estiver vazio."""
+    try:
+        wal = os.stat(caminho_banco + "-wal")
+    except OSError:
+        return None
+    return (wal.st_mtime_ns, wal.st_size) if wal.st_size else None
+
+
+def _assinatura_conexao(conn):
+    """Assinatura do arquivo principal da conexão (None para bancos em memória)."""
+    caminho = conn.execute("PRAGMA database_list").fetchone()[2]
+    try:
+        return assinatura_banco(caminho) if caminho else None
+    except OSError:
+        return None
+
+
+def ler_versao_base(conn):
+    """Retorna a versão mais recente registrada em VERSAO_BASE_DADO."""
+    linha = conn.execute("""
+        SELECT VRBD_VERSAO_BASE_DADO
+        FROM VERSAO_BASE_DADO
+        ORDER BY VRBD_ID DESC
+        LIMIT 1
+    """).fetchone()
+    return linha[0] if linha else None
+
+
+class IndicesVigencia(NamedTuple):
+    """Índices de vigência das tabelas do snapshot e os pontos de mudança de alíquotas e reduções."""
+    ncm: vigencia.IndiceIntervalos
+    regras: vigencia.IndiceIntervalos
+    aliquotas: vigencia.IndiceIntervalos
+    padroes: vigencia.IndiceIntervalos
+    reducoes: vigencia.IndiceIntervalos
+    pontos: list
+    nbs: vigencia.IndiceIntervalos
+    regras_nbs: vigencia.IndiceIntervalos
+
+
+def _agrupar(linhas, indice_chave):
+    """Agrupa linhas numa lista por valor da coluna indicada."""
+    grupos = {}
+    for linha in linhas:
+        grupos.setdefault(linha[indice_chave], []).append(linha)
+    return grupos
+
+
+class SnapshotBanco:
+    """Cópia indexada em memória das tabelas de NCM, NBS, regras, tributos, alíquotas e reduções."""
+
+    def __init__(self, conn, versao=None):
+        self.versao = versao if versao is not None else ler_versao_base(conn)
+        cur = conn.cursor()
+
+        cur.execute("""
+            SELECT NCM_CD, NCM_DESCRICAO, NCM_INICIO_VIGENCIA, NCM_FIM_VIGENCIA
+            FROM NCM ORDER BY NCM_CD
+        """)
+        self.ncms = cur.fetchall()
+        self.ncm_por_codigo = {linha[0]: linha for linha in self.ncms}
+
+        # (NCMA_ID, NCMA_NCM_CD, NCMA_CLTR_ID, NCMA_ANXO_ID, INICIO, FIM)
+        cur.execute("""
+            SELECT NCMA_ID, NCMA_NCM_CD, NCMA_CLTR_ID, NCMA_ANXO_ID,
+                   NCMA_INICIO_VIGENCIA, NCMA_FIM_VIGENCIA
+            FROM NCM_APLICAVEL
+            ORDER BY NCMA_INICIO_VIGENCIA DESC, NCMA_ID
+        """)
+        regras = cur.fetchall()
+        self.regras_por_ncm = _agrupar(regras, 1)
+
+        cur.execute("""
+            SELECT ENCM_NCM_CD, ENCM_NCMA_ID, ENCM_INICIO_VIGENCIA, ENCM_FIM_VIGENCIA
+            FROM EXCECAO_NCM_APLICAVEL
+        """)
+        self.resolvedor = ResolvedorAplicabilidade(regras, cur.fetchall())
+
+        cur.execute("""
+            SELECT NBS_CD, NBS_DESCRICAO, NBS_LC_116, NBS_INICIO_VIGENCIA, NBS_FIM_VIGENCIA
+            FROM NBS ORDER BY NBS_CD
+        """)
+        self.nbss = cur.fetchall()
+        self.nbs_por_codigo = {linha[0]: linha for linha in self.nbss}
+        # Item da LC 116 -> [linha da NBS, ...]
+        self.nbs_por_lc116 = _agrupar((linha for linha in self.nbss if linha[2]), 2)
+
+        # (NBSA_ID, NBSA_NBS_CD, NBSA_CLTR_ID, NBSA_ANXO_ID, INICIO, FIM)
+        self.resolvedor_nbs = carregar_resolvedor_nbs(conn)
+        self.regras_por_nbs = _agrupar(self.resolvedor_nbs.regras_por_id.values(), 1)
+
+        # Alíquotas ad valorem do IS sobre serviços, resolvidas por prefixo da NBS como as regras:
+        # (AAVS_ID, AAVS_NBS_CD, AADV_ID, None, INICIO, FIM), menos EXCECAO_AD_VALOREM_SERVICO
+        cur.execute("""
+            SELECT AAVS_ID, AAVS_NBS_CD, AAVS_AADV_ID, NULL,
+                   AAVS_INICIO_VIGENCIA, AAVS_FIM_VIGENCIA
+            FROM ALIQUOTA_AD_VALOREM_SERVICO
+            ORDER BY AAVS_INICIO_VIGENCIA DESC, AAVS_ID
+        """)
+        aliquotas_servico = cur.fetchall()
+        cur.execute("""
+            SELECT EAVS_NBS_CD, EAVS_AAVS_ID, EAVS_INICIO_VIGENCIA, EAVS_FIM_VIGENCIA
+            FROM EXCECAO_AD_VALOREM_SERVICO
+        """)
+        self.resolvedor_aliquotas_servico = ResolvedorAplicabilidade(aliquotas_servico, cur.fetchall())
+
+        # AADV_ID -> (VALOR, TBTO_ID, INICIO, FIM)
+        cur.execute("""
+            SELECT AADV_ID, AADV_VALOR, AADV_TBTO_ID, AADV_INICIO_VIGENCIA, AADV_FIM_VIGENCIA
+            FROM ALIQUOTA_AD_VALOREM
+        """)
+        self.aliquotas_ad_valorem = {linha[0]: linha[1:] for linha in cur.fetchall()}
+
+        # CLTR_ID -> (CLTR_CD, DESCRICAO, MEMORIA, 4 indicadores de crédito,
+        #             TIPO_ALIQUOTA, NOMENCLATURA, SITR_ID)
+        cur.execute("""
+            SELECT CLTR_ID, CLTR_CD, CLTR_DESCRICAO, CLTR_MEMORIA_CALCULO,
+                   CLTR_IN_APROPRIACAO_CREDITOS_ADQUIRENTES_CBS,
+                   CLTR_IN_APROPRIACAO_CREDITOS_ADQUIRENTES_IBS,
+                   CLTR_IN_CREDITO_PRESUMIDO_FORNECEDOR,
+                   CLTR_IN_CREDITO_PRESUMIDO_ADQUIRENTE,
+                   CLTR_TIPO_ALIQUOTA, CLTR_NOMENCLATURA, CLTR_SITR_ID
+            FROM CLASSIFICACAO_TRIBUTARIA
+        """)
+        self.classificacoes = {linha[0]: linha[1:] for linha in cur.fetchall()}
+
+        cur.execute("SELECT SITR_ID, SITR_CD, SITR_DESCRICAO FROM SITUACAO_TRIBUTARIA")
+        self.situacoes = {linha[0]: linha[1:] for linha in cur.fetchall()}
+
+        cur.execute("""
+            SELECT ANXO_ID, ANXO_NUMERO, ANXO_NUMERO_ITEM, ANXO_TEXTO_ITEM
+            FROM ANEXO
+        """)
+        self.anexos = {linha[0]: linha[1:] for linha in cur.fetchall()}
+
+        cur.execute("SELECT TBTO_ID, TBTO_SIGLA, TBTO_NOME FROM TRIBUTO")
+        self.tributos = {linha[0]: linha[1:] for linha in cur.fetchall()}
+
+        # SITR_ID -> [TBTO_ID, ...]
+        cur.execute("""
+            SELECT TRST_SITR_ID, TRST_TBTO_ID
+            FROM TRIBUTO_SITUACAO_TRIBUTARIA
+            ORDER BY TRST_ID
+        """)
+        self.tributos_por_situacao = {}
+        for sitr_id, tbto_id in cur.fetchall():
+            self.tributos_por_situacao.setdefault(sitr_id, []).append(tbto_id)
+
+        # TBTO_ID -> [(ALRE_ID, VALOR, INICIO, FIM), ...]
+        cur.execute("""
+            SELECT ALRE_TBTO_ID, ALRE_ID, ALRE_VALOR, ALRE_INICIO_VIGENCIA, ALRE_FIM_VIGENCIA
+            FROM ALIQUOTA_REFERENCIA
+            ORDER BY ALRE_INICIO_VIGENCIA, ALRE_ID
+        """)
+        self.aliquotas_por_tributo = {}
+        for linha in cur.fetchall():
+            self.aliquotas_por_tributo.setdefault(linha[0], []).append(linha[1:])
+
+        # ALRE_ID -> [(VALOR, FORMA_APLICACAO, INICIO, FIM), ...]
+        cur.execute("""
+            SELECT ALPA_ALRE_ID, ALPA_VALOR, ALPA_FORMA_APLICACAO,
+                   ALPA_INICIO_VIGENCIA, ALPA_FIM_VIGENCIA
+            FROM ALIQUOTA_PADRAO
+            ORDER BY ALPA_ID
+        """)
+        self.padroes_por_aliquota = {}
+        for linha in cur.fetchall():
+            self.padroes_por_aliquota.setdefault(linha[0], []).append(linha[1:])
+
+        # CLTR_ID -> [(TBTO_ID, VALOR, INICIO, FIM), ...]
+        cur.execute("""
+            SELECT PERE_CLTR_ID, PERE_TBTO_ID, PERE_VALOR,
+                   PERE_INICIO_VIGENCIA, PERE_FIM_VIGENCIA
+            FROM PERCENTUAL_REDUCAO
+            ORDER BY PERE_ID
+        """)
+        self.reducoes_por_classificacao = {}
+        for linha in cur.fetchall():
+            self.reducoes_por_classificacao.setdefault(linha[0], []).append(linha[1:])
+
+        # Objetos de modelos.* montados sob demanda e compartilhados entre os NCMs
+        self._modelos_classificacao = {}
+        self._modelos_aliquotas = {}
+        self._modelos_tributos = {}
+        self._indices_vigencia = None
+
+    def indices_vigencia(self):
+        """Retorna os índices de vigência, montando-os na primeira utilização."""
+        if self._indices_vigencia is None:
+            aliquotas = vigencia.IndiceIntervalos(
+                (tbto_id, linha[2], linha[3], linha)
+                for tbto_id, linhas in self.aliquotas_por_tributo.items() for linha in linhas)
+            padroes = vigencia.IndiceIntervalos(
+                (alre_id, linha[2], linha[3], linha)
+                for alre_id, linhas in self.padroes_por_aliquota.items() for linha in linhas)
+            reducoes = vigencia.IndiceIntervalos(
+                (cltr_id, linha[2], linha[3], linha)
+                for cltr_id, linhas in self.reducoes_por_classificacao.items() for linha in linhas)
+            self._indices_vigencia = IndicesVigencia(
+                vigencia.IndiceIntervalos((linha[0], linha[2], linha[3], linha) for linha in self.ncms),
+                vigencia.IndiceIntervalos(
+                    (codigo, regra[4], regra[5], regra)
+                    for codigo, regras in self.regras_por_ncm.items() for regra in regras),
+                aliquotas, padroes, reducoes,
+                sorted(aliquotas.pontos() | padroes.pontos() | reducoes.pontos()),
+                vigencia.IndiceIntervalos((linha[0], linha[3], linha[4], linha) for linha in self.nbss),
+                vigencia.IndiceIntervalos(
+                    (codigo, regra[4], regra[5], regra)
+                    for codigo, regras in self.regras_por_nbs.items() for regra in regras),
+            )
+        return self._indices_vigencia
+
+    def regras_ncm(self, codigo, incluir_herdadas=False, data_referencia=None):
+        """
+        Retorna as linhas de NCM_APLICAVEL do NCM (exatas ou incluindo as herdadas).
+        Com data_referencia, apenas as regras (e exceções) vigentes na data.
+        """
+        if incluir_herdadas:
+            return self.resolvedor.regras_aplicaveis(codigo, data_referencia)
+        if data_referencia is not None:
+            return self.indices_vigencia().regras.vigentes(codigo, data_referencia)
+        return self.regras_por_ncm.get(codigo, [])
+
+    def buscar_ncm(self, codigo, data_referencia=None):
+        """
+        Retorna (NCM_CD, NCM_DESCRICAO, NCM_INICIO_VIGENCIA, NCM_FIM_VIGENCIA) ou None.
+        Com data_referencia, retorna None se o NCM não estiver vigente na data.
+        """
+        if data_referencia is not None:
+            vigentes = self.indices_vigencia().ncm.vigentes(codigo, data_referencia)
+            return vigentes[0] if vigentes else None
+        return self.ncm_por_codigo.get(codigo)
+
+    def informacoes_estruturadas(self, codigo, incluir_herdadas=False, data_referencia=None):
+        """
+        Equivalente em memória de database.buscar_informacoes_estruturadas_ncm.
+        Classificações, alíquotas e tributos são instâncias únicas reaproveitadas
+        por todos os NCMs que as referenciam.
+        Com data_referencia, considera apenas o NCM, as regras, alíquotas
+        (referência e padrão) e reduções vigentes na data.
+        """
+        dados_ncm = self.buscar_ncm(codigo, data_referencia)
+        if not dados_ncm:
+            return None, None
+        regras = self.regras_ncm(codigo, incluir_herdadas, data_referencia)
+        return modelos.criar_ncm(dados_ncm), self._regras_modelo(regras, data_referencia)
+
+    def _regras_modelo(self, regras, data_referencia=None):
+        """
+        Converte linhas (ID, CODIGO, CLTR_ID, ANXO_ID, INICIO, FIM) de NCM_APLICAVEL
+        ou NBS_APLICAVEL em modelos.RegraAplicavel, na ordem da consulta SQL.
+        """
+        modelos_regras = []
+        for regra_id, _, cltr_id, anxo_id, inicio, fim in regras:
+            classificacao = self._classificacao_modelo(cltr_id)
+            if classificacao is None:
+                continue
+            anexo = self.anexos.get(anxo_id, LINHA_SEM_ANEXO)
+            modelos_regras.append(modelos.RegraAplicavel(
+                regra_id, inicio, fim, classificacao,
+                modelos.criar_anexo(*anexo),
+                self._tributos_modelo(cltr_id, data_referencia),
+            ))
+
+        # ORDER BY INICIO_VIGENCIA DESC, CLTR_CD, ID
+        modelos_regras.sort(key=lambda r: (r.classificacao.codigo, r.id))
+        modelos_regras.sort(key=lambda r: r.inicio_vigencia, reverse=True)
+        return modelos_regras
+
+    def _classificacao_modelo(self, cltr_id):
+        """Retorna a modelos.Classificacao do CLTR_ID (None se não existir)."""
+        modelo = self._modelos_classificacao.get(cltr_id)
+        if modelo is None and cltr_id in self.classificacoes:
+            classificacao = self.classificacoes[cltr_id]
+            modelo = modelos.criar_classificacao(classificacao[:9], self.situacoes.get(classificacao[9]))
+            self._modelos_classificacao[cltr_id] = modelo
+        return modelo
+
+    def _data_modelo(self, data_referencia):
+        """
+        Converte a data de referência no ponto de mudança de vigência que a contém.
+        Datas com o mesmo ponto têm as mesmas alíquotas e reduções, então os
+        modelos montados para uma servem para todas (e o cache não cresce por data).
+        """
+        if data_referencia is None:
+            return None
+        return vigencia.normalizar_data(self.indices_vigencia().pontos, data_referencia)
+
+    def _aliquotas_modelo(self, tbto_id, data_referencia=None):
+        """Retorna a tupla de modelos.Aliquota do tributo (vigentes na data, se informada)."""
+        data = self._data_modelo(data_referencia)
+        chave = tbto_id if data is None else (tbto_id, data)
+        modelo = self._modelos_aliquotas.get(chave)
+        if modelo is None:
+            if data is None:
+                aliquotas = self.aliquotas_por_tributo.get(tbto_id, [])
+                padroes_vigentes = lambda alre_id: self.padroes_por_aliquota.get(alre_id, [])
+            else:
+                indices = self.indices_vigencia()
+                aliquotas = indices.aliquotas.vigentes(tbto_id, data)
+                padroes_vigentes = lambda alre_id: indices.padroes.vigentes(alre_id, data)
+            modelo = self._modelos_aliquotas[chave] = tuple(
+                modelos.criar_aliquota(valor, inicio, fim, (
+                    modelos.criar_padrao(*padrao) for padrao in padroes_vigentes(alre_id)
+                ))
+                for alre_id, valor, inicio, fim in aliquotas
+            )
+        return modelo
+
+    def _tributos_modelo(self, cltr_id, data_referencia=None):
+        """Retorna a tupla de modelos.TributoAliquota da classificação, com as reduções."""
+        data = self._data_modelo(data_referencia)
+        chave = cltr_id if data is None else (cltr_id, data)
+        modelo = self._modelos_tributos.get(chave)
+        if modelo is None:
+            sitr_id = self.classificacoes[cltr_id][9]
+            tributos = self.tributos_por_situacao.get(sitr_id, []) if sitr_id in self.situacoes else []
+            if data is None:
+                reducoes = self.reducoes_por_classificacao.get(cltr_id, [])
+            else:
+                reducoes = self.indices_vigencia().reducoes.vigentes(cltr_id, data)
+            reducoes = sorted(reducoes, key=lambda r: -r[1])
+            modelo = tuple(sorted((
+                modelos.TributoAliquota(
+                    self.tributos[tbto_id][0], self.tributos[tbto_id][1],
+                    self._aliquotas_modelo(tbto_id, data),
+                    tuple(modelos.criar_reducao(*r[1:]) for r in reducoes if r[0] == tbto_id),
+                )
+                for tbto_id in tributos if tbto_id in self.tributos
+            ), key=lambda t: t.sigla))
+            self._modelos_tributos[chave] = modelo
+        return modelo
+
+    def cst_cclastrib_reducao(self, codigo, incluir_herdadas=False, data_referencia=None):
+        """
+        Equivalente em memória de database.buscar_cst_cclastrib_reducao_ncm.
+        Com data_referencia, considera apenas o NCM, as regras e as reduções vigentes na data.
+        """
+        dados_ncm = self.buscar_ncm(codigo, data_referencia)
+        if not dados_ncm:
+            return []
+        regras = self.regras_ncm(codigo, incluir_herdadas, data_referencia)
+        return self._linhas_cst(dados_ncm[:2], regras, data_referencia)
+
+    def _linhas_cst(self, dados, regras, data_referencia=None):
+        """
+        Monta as linhas (CODIGO, DESCRICAO, SITR_CD, SITR_DESCRICAO, CLTR_CD,
+        CLTR_DESCRICAO, PERE_VALOR, TBTO_SIGLA, TBTO_NOME) distintas das regras.
+        """
+        vistos = set()
+        resultados = []
+        for regra in regras:
+            classificacao = self.classificacoes.get(regra[2])
+            if classificacao is None:
+                continue
+            situacao = self.situacoes.get(classificacao[9], LINHA_SEM_SITUACAO)
+            base = dados + situacao + classificacao[:2]
+            if data_referencia is None:
+                reducoes = self.reducoes_por_classificacao.get(regra[2])
+            else:
+                reducoes = self.indices_vigencia().reducoes.vigentes(regra[2], data_referencia)
+            reducoes = reducoes or [LINHA_SEM_REDUCAO]
+            for tbto_id, valor, _, _ in reducoes:
+                linha = base + (valor,) + self.tributos.get(tbto_id, LINHA_SEM_TRIBUTO)
+                if linha not in vistos:
+                    vistos.add(linha)
+                    resultados.append(linha)
+
+        # ORDER BY CLTR_CD, TBTO_SIGLA, PERE_VALOR DESC NULLS LAST
+        resultados.sort(key=lambda r: (r[6] is None, -(r[6] or 0)))
+        resultados.sort(key=lambda r: (r[4], r[7] is not None, r[7] or ""))
+        return resultados
+
+    # NBS
+
+    def regras_nbs(self, codigo, incluir_herdadas=False, data_referencia=None):
+        """
+        Retorna as linhas de NBS_APLICAVEL da NBS (exatas ou incluindo as herdadas
+        dos níveis superiores da nomenclatura), vigentes na data se informada.
+        """
+        if incluir_herdadas:
+            return self.resolvedor_nbs.regras_aplicaveis(codigo, data_referencia)
+        if data_referencia is not None:
+            return self.indices_vigencia().regras_nbs.vigentes(codigo, data_referencia)
+        return self.regras_por_nbs.get(codigo, [])
+
+    def buscar_nbs(self, codigo, data_referencia=None):
+        """
+        Retorna (NBS_CD, NBS_DESCRICAO, NBS_LC_116, INICIO, FIM) ou None.
+        Com data_referencia, retorna None se a NBS não estiver vigente na data.
+        """
+        if data_referencia is not None:
+            vigentes = self.indices_vigencia().nbs.vigentes(codigo, data_referencia)
+            return vigentes[0] if vigentes else None
+        return self.nbs_por_codigo.get(codigo)
+
+    def nbs_por_prefixo(self, prefixo):
+        """Retorna as linhas das NBS cujo código começa pelo prefixo (o nível e seus subníveis)."""
+        inicio = bisect_left(self.nbss, (prefixo,))
+        fim = bisect_left(self.nbss, (prefixo + "\uffff",))
+        return self.nbss[inicio:fim]
+
+    def informacoes_estruturadas_nbs(self, codigo, incluir_herdadas=False, data_referencia=None):
+        """
+        Equivalente de informacoes_estruturadas para NBS.
+
+        Returns:
+            Tupla (modelos.NbsInfo, [modelos.RegraAplicavel]), ou (None, None) se a NBS
+            não existir (ou não estiver vigente na data)
+        """
+        dados_nbs = self.buscar_nbs(codigo, data_referencia)
+        if not dados_nbs:
+            return None, None
+        regras = self.regras_nbs(codigo, incluir_herdadas, data_referencia)
+        return modelos.criar_nbs(dados_nbs), self._regras_modelo(regras, data_referencia)
+
+    def cst_cclastrib_reducao_nbs(self, codigo, incluir_herdadas=False, data_referencia=None):
+        """Equivalente de cst_cclastrib_reducao para NBS (NBS_CD e NBS_DESCRICAO nas duas primeiras colunas)."""
+        dados_nbs = self.buscar_nbs(codigo, data_referencia)
+        if not dados_nbs:
+            return []
+        regras = self.regras_nbs(codigo, incluir_herdadas, data_referencia)
+        return self._linhas_cst(dados_nbs[:2], regras, data_referencia)
+
+    def aliquotas_servico(self, codigo, data_referencia=None):
+        """
+        Retorna as alíquotas ad valorem do IS aplicáveis ao serviço, herdadas dos
+        níveis superiores da NBS e descontadas as exceções.
+
+        Returns:
+            Lista de (TBTO_SIGLA, AADV_VALOR, INICIO, FIM), com a vigência do vínculo
+            com a NBS, da mais específica para a mais genérica
+        """
+        resultado = []
+        for _, _, aadv_id, _, inicio, fim in self.resolvedor_aliquotas_servico.regras_aplicaveis(
+                codigo, data_referencia):
+            aliquota = self.aliquotas_ad_valorem.get(aadv_id)
+            if aliquota is None or not vigente_em(aliquota[2], aliquota[3], data_referencia):
+                continue
+            sigla = self.tributos.get(aliquota[1], LINHA_SEM_TRIBUTO)[0]
+            resultado.append((sigla, aliquota[0], inicio, fim))
+        return resultado
+
+    def estatisticas(self):
+        """Retorna a quantidade de registros carregados por estrutura."""
+        return {
+            'versao': self.versao,
+            'ncms': len(self.ncms),
+            'regras': len(self.resolvedor.regras_por_id),
+            'nbs': len(self.nbss),
+            'regras_nbs': len(self.resolvedor_nbs.regras_por_id),
+            'aliquotas_servico': len(self.resolvedor_aliquotas_servico.regras_por_id),
+            'classificacoes': len(self.classificacoes),
+            'situacoes': len(self.situacoes),
+            'anexos': len(self.anexos),
+            'tributos': len(self.tributos),
+            'aliquotas_referencia': sum(len(v) for v in self.aliquotas_por_tributo.values()),
+            'aliquotas_padrao': sum(len(v) for v in self.padroes_por_aliquota.values()),
+            'reducoes': sum(len(v) for v in self.reducoes_por_classificacao.values()),
+        }
+
+
+def carregar_snapshot(conn):
+    """
+    Retorna o snapshot da versão atual da base, carregando-o se ainda não existir
+    ou se o arquivo do banco mudou desde a carga, mesmo sem troca de versão.
+    Snapshots anteriores são descartados.
+    """
+    versao = ler_versao_base(conn)
+    chave = (versao, _assinatura_conexao(conn))
+    snapshot = _snapshots.get(chave)
+    if snapshot is None:
+        snapshot = SnapshotBanco(conn, versao)
+        _snapshots.clear()
+        _snapshots[chave] = snapshot
+    return snapshot
@@ -0,0 +1,339 @@
+"""
+Tabela materializada das alíquotas efetivas por NCM, classificação e tributo.
+Para cada NCM, cada classificação tributária aplicável (incluindo as herdadas
+dos prefixos) e cada tributo, a alíquota efetiva — alíquota de referência com
+o percentual de redução aplicado — é calculada uma única vez por segmento de
+vigência e gravada num arquivo SQLite separado, ao lado do banco principal.
+A validação de um item de nota fiscal vira uma única busca pela chave primária
+(NCM, cClassTrib, tributo, início da vigência), sem JOIN nem aritmética.
+A tabela é reconstruída automaticamente quando a versão da base ou o arquivo
+do banco (assinatura de snapshot.assinatura_banco) mudam.
+
+As alíquotas padrão (ALIQUOTA_PADRAO) são definidas por UF/município e não
+entram no cálculo: a coluna TEM_PADRAO apenas indica que há alíquota local
+vigente para o tributo no segmento. A alíquota por localidade é resolvida
+por aliquotas_locais.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import modelos
+import snapshot
+import vigencia
+from pool_conexoes import PoolConexoes
+
+# Sufixo do arquivo da tabela (calculadora.db -> calculadora_taxas.db)
+SUFIXO_ARQUIVO = "_taxas"
+
+# Intervalo mínimo, em segundos, entre verificações da versão da base
+INTERVALO_VERIFICACAO_VERSAO = 5.0
+
+
+def calcular_aliquota_efetiva(aliquota, reducao):
+    """
+    Calcula a alíquota com a redução aplicada: aliquota * (1 - reducao/100).
+    Reduções de 100% ou mais são tratadas como isenção total.
+
+    Returns:
+        Alíquota efetiva, ou None se faltar a alíquota ou a redução
+    """
+    if aliquota is None or reducao is None:
+        return None
+    if reducao >= 100:
+        return 0.0
+    return aliquota * (1 - reducao / 100)
+
+
+class TaxaEfetiva(NamedTuple):
+    """Alíquota efetiva de um tributo para NCM + cClassTrib num segmento de vigência."""
+    ncm: str
+    cclasstrib: str
+    tributo: str
+    inicio_vigencia: str
+    fim_vigencia: Optional[str]
+    aliquota: float
+    reducao: Optional[float]
+    aliquota_efetiva: float
+    tem_padrao: bool
+
+
+def caminho_tabela(caminho_banco):
+    """Retorna o caminho do arquivo da tabela para o banco informado."""
+    caminho = Path(caminho_banco)
+    return str(caminho.with_name(caminho.stem + SUFIXO_ARQUIVO + caminho.suffix))
+
+
+# Materialização
+
+def _taxas_classificacao(base, cltr_id, data):
+    """Retorna [((CLTR_CD, TBTO_SIGLA), (aliquota, reducao, efetiva, tem_padrao))] vigentes na data."""
+    indices = base.indices_vigencia()
+    classificacao = base.classificacoes[cltr_id]
+    sitr_id = classificacao[9]
+    tributos = base.tributos_por_situacao.get(sitr_id, []) if sitr_id in base.situacoes else []
+    reducoes = indices.reducoes.vigentes(cltr_id, data)
+
+    taxas = []
+    for tbto_id in tributos:
+        tributo = base.tributos.get(tbto_id)
+        aliquotas = indices.aliquotas.vigentes(tbto_id, data)
+        if tributo is None or not aliquotas:
+            continue
+        # A alíquota de referência iniciada por último prevalece
+        alre_id, valor = aliquotas[-1][:2]
+        aliquota = modelos.para_numero(valor)
+        if aliquota is None:
+            continue
+        valores = [modelos.para_numero(r[1]) for r in reducoes if r[0] == tbto_id and r[1] is not None]
+        reducao = max(valores) if valores else None
+        efetiva = calcular_aliquota_efetiva(aliquota, reducao if reducao is not None else 0.0)
+        tem_padrao = bool(indices.padroes.vigentes(alre_id, data))
+        taxas.append(((classificacao[0], tributo[0]), (aliquota, reducao, efetiva, tem_padrao)))
+    return taxas
+
+
+def calcular_taxas_ncm(base, codigo, incluir_herdadas=True, cache=None):
+    """
+    Calcula os segmentos de alíquota efetiva de um NCM.
+    O NCM é avaliado em cada data em que algo pode mudar (vigência do NCM, das
+    regras e exceções do caminho, das alíquotas e das reduções); segmentos
+    consecutivos com os mesmos valores são unidos.
+
+    Args:
+        base: snapshot.SnapshotBanco
+        codigo: Código do NCM
+        incluir_herdadas: Se True, considera também as regras dos prefixos do NCM
+        cache: Dicionário opcional compartilhado entre NCMs para as taxas por classificação
+
+    Returns:
+        Lista de tuplas (NCM_CD, CLTR_CD, TBTO_SIGLA, INICIO, FIM, ALIQUOTA, REDUCAO,
+                         ALIQUOTA_EFETIVA, TEM_PADRAO)
+    """
+    dados_ncm = base.ncm_por_codigo.get(codigo)
+    if dados_ncm is None:
+        return []
+    if cache is None:
+        cache = {}
+
+    indices = base.indices_vigencia()
+    if incluir_herdadas:
+        intervalos = base.resolvedor.intervalos_vigencia(codigo)
+    else:
+        intervalos = {regra[4:6] for regra in base.regras_por_ncm.get(codigo, [])}
+    intervalos.add(dados_ncm[2:4])
+
+    pontos = set(indices.pontos)
+    for inicio, fim in intervalos:
+        pontos.add(inicio or vigencia.INICIO_INDEFINIDO)
+        if fim:
+            pontos.add(vigencia.dia_seguinte(fim))
+    pontos.discard(None)
+
+    linhas = []
+    abertos = {}
+    for ponto in sorted(pontos):
+        estado = {}
+        if base.buscar_ncm(codigo, ponto):
+            data_modelo = vigencia.normalizar_data(indices.pontos, ponto)
+            for regra in base.regras_ncm(codigo, incluir_herdadas, ponto):
+                cltr_id = regra[2]
+                if cltr_id not in base.classificacoes:
+                    continue
+                chave_cache = (cltr_id, data_modelo)
+                taxas = cache.get(chave_cache)
+                if taxas is None:
+                    taxas = cache[chave_cache] = _taxas_classificacao(base, cltr_id, ponto)
+                for chave, valores in taxas:
+                    estado.setdefault(chave, valores)
+
+        for chave, (inicio, valores) in list(abertos.items()):
+            if estado.get(chave) != valores:
+                linhas.append((codigo,) + chave + (inicio, vigencia.dia_anterior(ponto)) + valores)
+                del abertos[chave]
+        for chave, valores in estado.items():
+            if chave not in abertos:
+                abertos[chave] = (ponto, valores)
+
+    for chave, (inicio, valores) in abertos.items():
+        linhas.append((codigo,) + chave + (inicio, None) + valores)
+    return linhas
+
+
+def construir_tabela(conn_banco, caminho, versao, incluir_herdadas=True, assinatura=None):
+    """
+    Cria o arquivo da tabela de alíquotas efetivas a partir do snapshot da base.
+    A versão e a assinatura do banco ficam gravadas em META.
+    A tabela é gravada num arquivo temporário e só então substitui a anterior
+    (os.replace), de modo que leitores nunca veem uma tabela incompleta.
+
+    Returns:
+        Quantidade de linhas gravadas
+    """
+    base = snapshot.carregar_snapshot(conn_banco)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    conn = sqlite3.connect(temporario)
+    total = 0
+    try:
+        conn.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE META (CHAVE TEXT PRIMARY KEY, VALOR TEXT);
+            CREATE TABLE TAXA_EFETIVA (
+                NCM_CD TEXT NOT NULL,
+                CLTR_CD TEXT NOT NULL,
+                TBTO_SIGLA TEXT NOT NULL,
+                INICIO_VIGENCIA TEXT NOT NULL,
+                FIM_VIGENCIA TEXT,
+                ALIQUOTA REAL NOT NULL,
+                REDUCAO REAL,
+                ALIQUOTA_EFETIVA REAL NOT NULL,
+                TEM_PADRAO INTEGER NOT NULL,
+                PRIMARY KEY (NCM_CD, CLTR_CD, TBTO_SIGLA, INICIO_VIGENCIA)
+            ) WITHOUT ROWID;
+        """)
+        cache = {}
+        for dados_ncm in base.ncms:
+            linhas = calcular_taxas_ncm(base, dados_ncm[0], incluir_herdadas, cache)
+            conn.executemany("INSERT INTO TAXA_EFETIVA VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas)
+            total += len(linhas)
+        conn.executemany("INSERT INTO META (CHAVE, VALOR) VALUES (?, ?)", (
+            ('versao', versao),
+            ('assinatura', assinatura),
+            ('incluir_herdadas', '1' if incluir_herdadas else '0'),
+        ))
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(temporario, caminho)
+    return total
+
+
+def ler_meta_tabela(caminho):
+    """Retorna o META da tabela ({chave: valor}), vazio se ela não existir/for inválida."""
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        conn = sqlite3.connect(Path(caminho).resolve().as_uri() + "?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT CHAVE, VALOR FROM META"))
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return {}
+
+
+def ler_versao_tabela(caminho):
+    """Retorna a versão da base gravada na tabela, ou None se ela não existir/for inválida."""
+    return ler_meta_tabela(caminho).get('versao')
+
+
+# Consulta
+
+class TabelaTaxasEfetivas:
+    """
+    Tabela de alíquotas efetivas, mantida em sincronia com a versão da base.
+
+    Args:
+        caminho_banco: Caminho do banco principal (calculadora.db)
+        obter_conexao_banco: Função que retorna uma conexão de leitura do banco principal
+    """
+
+    def __init__(self, caminho_banco, obter_conexao_banco):
+        self.caminho_banco = caminho_banco
+        self.caminho = caminho_tabela(caminho_banco)
+        self._obter_conexao_banco = obter_conexao_banco
+        self._pool = PoolConexoes(self.caminho)
+        self._trava = threading.Lock()
+        self._versao = None
+        self._assinatura = None
+        self._ultima_verificacao = 0.0
+        self.reconstrucoes = 0
+
+    def garantir_atualizado(self):
+        """Reconstrói a tabela se ela não existir ou se a versão ou o arquivo da base mudaram."""
+        agora = time.monotonic()
+        if self._versao is not None and agora - self._ultima_verificacao < INTERVALO_VERIFICACAO_VERSAO:
+            return
+
+        with self._trava:
+            conn_banco = self._obter_conexao_banco()
+            versao_base = snapshot.ler_versao_base(conn_banco)
+            assinatura = str(snapshot.assinatura_banco(self.caminho_banco))
+            if (self._versao, self._assinatura) != (versao_base, assinatura):
+                meta = ler_meta_tabela(self.caminho)
+                if (meta.get('versao'), meta.get('assinatura')) != (versao_base, assinatura):
+                    construir_tabela(conn_banco, self.caminho, versao_base, assinatura=assinatura)
+                    self.reconstrucoes += 1
+                # Conexões abertas no arquivo anterior são descartadas; cada thread fecha a sua
+                # na próxima consulta, sem interromper as que estão em andamento
+                self._pool.invalidar()
+                self._versao = versao_base
+                self._assinatura = assinatura
+            self._ultima_verificacao = agora
+
+    def consultar(self, codigo, cclasstrib, tributo, data_referencia):
+        """
+        Retorna a alíquota efetiva de um item: uma busca pela chave primária.
+
+        Args:
+            codigo: Código do NCM
+            cclasstrib: Código da classificação tributária (CLTR_CD)
+            tributo: Sigla do tributo (CBS, IBSUF, IBSMun)
+            data_referencia: Data (YYYY-MM-DD) da operação
+
+        Returns:
+            TaxaEfetiva vigente na data, ou None se não houver
+        """
+        data_referencia = vigencia.validar_data_referencia(data_referencia)
+        self.garantir_atualizado()
+        linha = self._pool.obter().execute("""
+            SELECT * FROM TAXA_EFETIVA
+            WHERE NCM_CD = ? AND CLTR_CD = ? AND TBTO_SIGLA = ? AND INICIO_VIGENCIA <= ?
+            ORDER BY INICIO_VIGENCIA DESC
+            LIMIT 1
+        """, (codigo, cclasstrib, tributo, data_referencia)).fetchone()
+        if linha is None or (linha[4] is not None and linha[4] < data_referencia):
+            return None
+        return _criar_taxa(linha)
+
+    def consultar_ncm(self, codigo, data_referencia):
+        """
+        Retorna todas as alíquotas efetivas do NCM vigentes na data.
+
+        Returns:
+            Lista de TaxaEfetiva ordenada por cClassTrib e tributo
+        """
+        data_referencia = vigencia.validar_data_referencia(data_referencia)
+        self.garantir_atualizado()
+        return [_criar_taxa(linha) for linha in self._pool.obter().execute("""
+            SELECT * FROM TAXA_EFETIVA
+            WHERE NCM_CD = ? AND INICIO_VIGENCIA <= ?
+              AND (FIM_VIGENCIA IS NULL OR FIM_VIGENCIA >= ?)
+            ORDER BY CLTR_CD, TBTO_SIGLA
+        """, (codigo, data_referencia, data_referencia))]
+
+    def fechar(self):
+        """Fecha as conexões abertas no arquivo da tabela."""
+        self._pool.fechar()
+
+    def estatisticas(self):
+        """Retorna o estado da tabela."""
+        return {
+            'caminho': self.caminho,
+            'versao': self._versao,
+            'reconstrucoes': self.reconstrucoes,
+            'existe': os.path.exists(self.caminho),
+        }
+
+
+def _criar_taxa(linha):
+    return TaxaEfetiva(*linha[:8], bool(linha[8]))
@@ -0,0 +1,135 @@
+"""
+Teste das alíquotas por UF/município: ajustes de ALIQUOTA_PADRAO iguais aos
+calculados por consulta SQL, validação da localidade e resolução em lote de
+itens de vendas para todo o país.
+"""
+import random
+import time
+import database
+import aliquotas_locais
+
+_SQL_AJUSTES = """
+    SELECT ar.ALRE_VALOR, ap.ALPA_VALOR, ap.ALPA_FORMA_APLICACAO, ap.ALPA_UF_CD
+    FROM ALIQUOTA_REFERENCIA ar
+    JOIN TRIBUTO t ON t.TBTO_ID = ar.ALRE_TBTO_ID
+    LEFT JOIN ALIQUOTA_PADRAO ap ON ap.ALPA_ALRE_ID = ar.ALRE_ID
+         AND (ap.ALPA_UF_CD = :uf OR ap.ALPA_MUNI_CD = :municipio)
+         AND ap.ALPA_INICIO_VIGENCIA <= :data
+         AND (ap.ALPA_FIM_VIGENCIA IS NULL OR ap.ALPA_FIM_VIGENCIA >= :data)
+    WHERE t.TBTO_SIGLA = :tributo
+      AND ar.ALRE_INICIO_VIGENCIA <= :data
+      AND (ar.ALRE_FIM_VIGENCIA IS NULL OR ar.ALRE_FIM_VIGENCIA >= :data)
+    ORDER BY ar.ALRE_INICIO_VIGENCIA DESC, ap.ALPA_UF_CD IS NULL, ap.ALPA_ID
+"""
+
+
+def _aliquota_sql(cur, tributo, uf, municipio, data):
+    """Alíquota local calculada direto no banco (referência mais recente e seus ajustes)."""
+    linhas = cur.execute(_SQL_AJUSTES, {'tributo': tributo, 'uf': uf, 'municipio': municipio,
+                                        'data': data}).fetchall()
+    if not linhas:
+        return None
+    aliquota = linhas[0][0]
+    for referencia, valor, forma, _ in linhas:
+        if referencia == linhas[0][0] and forma is not None:
+            aliquota = aliquotas_locais.aplicar_ajuste(aliquota, valor, forma)
+    return aliquota
+
+
+def testar_ajustes():
+    """Alíquota de cada tributo, localidade e data igual à calculada por SQL."""
+    print("=== Testando ajustes por UF e município ===")
+    resolvedor = database.obter_aliquotas_locais()
+    cur = database.obter_conexao().cursor()
+    localidades = [(None, None), (43, None), (43, 4314902), (43, 4300034), (35, 3550308)]
+    datas = ["2026-06-01", "2027-12-31", "2028-01-01", "2028-07-15", "2029-01-01", "2033-06-30"]
+    divergencias = []
+    ajustadas = 0
+    for tributo in ("CBS", "IBSUF", "IBSMun"):
+        tbto_id = resolvedor._tributo_por_sigla[tributo]
+        for uf, municipio in localidades:
+            for data in datas:
+                local = resolvedor.aliquota_local(tbto_id, uf, municipio, data)
+                obtido = local[2] if local else None
+                esperado = _aliquota_sql(cur, tributo, uf, municipio, data)
+                ajustadas += bool(local and local[1])
+                if obtido is None or esperado is None:
+                    if obtido != esperado:
+                        divergencias.append((tributo, uf, municipio, data, obtido, esperado))
+                elif abs(obtido - esperado) > 1e-9:
+                    divergencias.append((tributo, uf, municipio, data, obtido, esperado))
+
+    porto_alegre = database.buscar_aliquotas_locais_ncm("30049069", "2028-06-01", "RS", 4314902)
+    porto_alegre = {a.tributo: a.aliquota for a in porto_alegre if a.cclasstrib == porto_alegre[0].cclasstrib}
+    print(f"{ajustadas} combinações com ajuste; 30049069 em Porto Alegre (2028): {porto_alegre}")
+    if not divergencias and ajustadas > 0:
+        print("✅ Alíquotas locais iguais às calculadas por SQL")
+    else:
+        print(f"❌ FAIL: {divergencias[:5]}")
+    print()
+
+
+def testar_localidade():
+    """Sigla ou código da UF, município sem UF e combinações inválidas."""
+    print("=== Testando validação da localidade ===")
+    resolvedor = database.obter_aliquotas_locais()
+    falhas = []
+    for uf, municipio, esperado in (("rs", None, (43, None)), ("43", None, (43, None)),
+                                    (None, "4314902", (43, 4314902)), ("RS", 4314902, (43, 4314902)),
+                                    (None, None, (None, None))):
+        if resolvedor.normalizar_local(uf, municipio) != esperado:
+            falhas.append((uf, municipio))
+    for uf, municipio in (("XX", None), ("SP", 4314902), (None, 1)):
+        try:
+            resolvedor.normalizar_local(uf, municipio)
+            falhas.append((uf, municipio))
+        except ValueError:
+            pass
+    if not falhas:
+        print("✅ Localidades normalizadas e inválidas rejeitadas")
+    else:
+        print(f"❌ FAIL: {falhas}")
+    print()
+
+
+def testar_lote():
+    """Itens de vendas de todo o país resolvidos sem SQL, iguais à consulta individual."""
+    print("=== Testando resolução em lote ===")
+    resolvedor = database.obter_aliquotas_locais()
+    aleatorio = random.Random(22)
+    ncms = [ncm[0] for ncm in aleatorio.sample(database.buscar_ncms(usar_snapshot=True), 300)]
+    municipios = aleatorio.sample(sorted(resolvedor.uf_por_municipio), 200) + [4314902]
+    datas = ["2027-03-10", "2028-05-20", "2029-11-30"]
+    itens = []
+    for _ in range(200000):
+        ncm = aleatorio.choice(ncms)
+        regras = database.obter_snapshot().regras_ncm(ncm, True)
+        cclasstrib = None
+        if regras and aleatorio.random() < 0.7:
+            cclasstrib = database.obter_snapshot().classificacoes[aleatorio.choice(regras)[2]][0]
+        itens.append((ncm, cclasstrib, aleatorio.choice(datas), None, aleatorio.choice(municipios)))
+
+    inicio = time.perf_counter()
+    resultados = resolvedor.resolver_lote(itens)
+    segundos = time.perf_counter() - inicio
+
+    divergencias = sum(resolvedor.taxas(*item) != resultado
+                       for item, resultado in zip(itens[:2000], resultados[:2000]))
+    resolvidos = sum(resultado is not None for resultado in resultados)
+    print(f"{len(itens)} itens em {segundos:.2f} s ({len(itens) / segundos:,.0f} itens/s), "
+          f"{resolvidos} resolvidos | {resolvedor.estatisticas()}")
+    if divergencias == 0 and len(resultados) == len(itens):
+        print("✅ Lote igual à consulta individual")
+    else:
+        print(f"❌ FAIL: {divergencias} divergências")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DAS ALÍQUOTAS POR UF/MUNICÍPIO\n")
+    testar_ajustes()
+    testar_localidade()
+    testar_lote()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
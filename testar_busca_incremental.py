@@ -0,0 +1,93 @@
+"""
+Teste da busca incremental: refinamento em memória, cache LRU, limite de
+resultados e debounce.
+"""
+import time
+import database
+import busca_incremental
+
+
+def testar_refinamento():
+    """Digita letra a letra e compara cada resultado com a busca direta no índice."""
+    print("=== Testando refinamento em memória ===")
+    motor = database.obter_busca_incremental()
+    motor.limpar()
+    indice = database.obter_indice_busca()
+    digitado = "parafusos de aco"
+    divergencias = 0
+    inicio = time.perf_counter()
+    for fim in range(2, len(digitado) + 1):
+        texto = digitado[:fim]
+        resultado = database.buscar_por_descricao_incremental(texto)
+        esperado = {linha[:2] for linha in indice.buscar(texto, limite=-1)}
+        if set(database.buscar_por_descricao(texto)) != esperado or resultado.total != len(esperado):
+            divergencias += 1
+    tempo = time.perf_counter() - inicio
+
+    if divergencias == 0:
+        print(f"✅ {len(digitado) - 1} buscas iguais ao índice em {tempo * 1000:.1f} ms")
+    else:
+        print(f"❌ FAIL: {divergencias} buscas divergentes")
+    print(f"Estatísticas: {motor.estatisticas()}")
+    print()
+
+
+def testar_limite_e_cache():
+    """Confere o limite de itens, o indicador ha_mais e o descarte do LRU."""
+    print("=== Testando limite e cache LRU ===")
+    resultado = database.buscar_por_descricao_incremental("carne", limite=5)
+    print(f"'carne': {len(resultado.itens)} de {resultado.total} itens, ha_mais={resultado.ha_mais}")
+
+    motor = busca_incremental.BuscaIncremental(lambda texto: [("1", texto)], tamanho_cache=3)
+    for texto in ("um", "dois", "tres", "quatro"):
+        motor.buscar(texto)
+    motor.buscar("um")
+    estatisticas = motor.estatisticas()
+    if estatisticas['consultas_em_cache'] == 3 and estatisticas['consultas_banco'] == 5:
+        print("✅ Consulta mais antiga descartada do cache")
+    else:
+        print(f"❌ FAIL: {estatisticas}")
+    print()
+
+
+class WidgetFalso:
+    """Simula after/after_cancel do Tk para testar o debounce sem interface gráfica."""
+
+    def __init__(self):
+        self.agendados = {}
+        self.proximo = 0
+
+    def after(self, atraso, funcao, *args):
+        self.proximo += 1
+        self.agendados[self.proximo] = (funcao, args)
+        return self.proximo
+
+    def after_cancel(self, identificador):
+        self.agendados.pop(identificador, None)
+
+    def executar_pendentes(self):
+        for funcao, args in list(self.agendados.values()):
+            funcao(*args)
+        self.agendados.clear()
+
+
+def testar_debounce():
+    """Várias teclas seguidas devem gerar uma única busca."""
+    print("=== Testando debounce ===")
+    widget = WidgetFalso()
+    chamadas = []
+    debounce = busca_incremental.Debounce(widget, chamadas.append)
+    for texto in ("a", "ar", "arr", "arro", "arroz"):
+        debounce.agendar(texto)
+    widget.executar_pendentes()
+    if chamadas == ["arroz"]:
+        print("✅ Apenas a última tecla disparou a busca")
+    else:
+        print(f"❌ FAIL: chamadas {chamadas}")
+    print()
+
+
+if __name__ == "__main__":
+    testar_refinamento()
+    testar_limite_e_cache()
+    testar_debounce()
@@ -0,0 +1,316 @@
+"""
+Teste do cache persistente dos resultados por NCM: resultados gravados iguais
+às consultas ao banco e recriados como modelos, primeira consulta de um
+processo novo sem abrir o banco, validação pelo código, pela assinatura, pela
+versão e pelo conteúdo, reconstrução só quando pedida (inclusive por
+gravações simultâneas e na partida da consulta em lote) e falhas de gravação.
+"""
+import contextlib
+import io
+import marshal
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import database
+import cache_persistente
+import modelos
+
+CONSULTAS = ["buscar_informacoes_estruturadas_ncm", "buscar_cst_cclastrib_reducao_ncm",
+             "buscar_reducoes_ncm", "obter_relacoes_tabelas_ncm"]
+
+_SCRIPT_PARTIDA = """
+import time
+import database
+importado = time.perf_counter()
+database.buscar_informacoes_estruturadas_ncm("04011010")
+primeira = time.perf_counter()
+aberturas = database.estatisticas_pool()['aberturas']
+database.buscar_informacoes_estruturadas_ncm.sem_cache("22071000")
+banco_frio = time.perf_counter()
+database.buscar_informacoes_estruturadas_ncm.sem_cache("04011010")
+banco_quente = time.perf_counter()
+print((primeira - importado) * 1e6, (banco_frio - primeira) * 1e6, (banco_quente - banco_frio) * 1e6, aberturas)
+"""
+
+
+def _garantir_arquivo():
+    if not database.estatisticas_cache_persistente()['mapeado']:
+        database.aquecer_cache_persistente(esperar=True)
+
+
+def testar_equivalencia():
+    """Cada resultado gravado é igual ao da consulta ao banco, para todos os NCMs."""
+    print("=== Testando equivalência com o banco ===")
+    _garantir_arquivo()
+    persistente = database._cache_persistente
+    codigos = [ncm[0] for ncm in database.obter_snapshot().ncms]
+    divergencias = []
+    for nome in CONSULTAS:
+        consultar = getattr(database, nome).sem_cache
+        for codigo in codigos:
+            encontrado, resultado = persistente.obter(nome, codigo)
+            if not encontrado or resultado != consultar(codigo):
+                divergencias.append((nome, codigo))
+    ausente = persistente.obter(CONSULTAS[0], "99999999")
+    estatisticas = database.estatisticas_cache_persistente()
+    print(f"{len(codigos)} NCMs x {len(CONSULTAS)} consultas; {estatisticas['bytes'] / 1e6:.1f} MB")
+    if not divergencias and ausente == (False, None):
+        print("✅ Resultados gravados iguais às consultas ao banco")
+    else:
+        print(f"❌ FAIL: {len(divergencias)} divergências, ex.: {divergencias[:3]}")
+
+    # Os resultados são gravados como dados simples e recriados como modelos
+    _, (ncm, regras) = persistente.obter(CONSULTAS[0], "30049069")
+    tipos_recriados = (type(ncm) is modelos.NcmInfo and regras
+                       and all(type(regra) is modelos.RegraAplicavel for regra in regras)
+                       and type(regras[0].classificacao) is modelos.Classificacao)
+    dados = marshal.loads(marshal.dumps(cache_persistente.codificar((ncm, regras), modelos.MODELOS)))
+    recriado = cache_persistente.decodificar(dados, {'tuple': tuple, 'list': list,
+                                                     **{tipo.__name__: tipo._make for tipo in modelos.MODELOS}})
+    try:
+        cache_persistente.codificar([{'regra': regras[0]}], modelos.MODELOS)
+        rejeitado = False
+    except TypeError:
+        rejeitado = True
+    if tipos_recriados and recriado == (ncm, regras) and rejeitado:
+        print("✅ Modelos recriados a partir de dados simples (sem pickle)")
+    else:
+        print(f"❌ FAIL: tipos {tipos_recriados}, ida e volta {recriado == (ncm, regras)}, rejeitado {rejeitado}")
+    print()
+
+
+def testar_argumentos():
+    """Só as chamadas com os argumentos padrão são respondidas pelo arquivo."""
+    print("=== Testando argumentos ===")
+    _garantir_arquivo()
+    consulta = database.buscar_cst_cclastrib_reducao_ncm.__wrapped__
+    antes = database.estatisticas_cache_persistente()['acertos']
+    padrao = [consulta("04011010"), consulta(codigo="04011010"), consulta("04011010", False, data_referencia=None)]
+    acertos = database.estatisticas_cache_persistente()['acertos'] - antes
+    datada = consulta("04011010", data_referencia="2027-01-01")
+    herdadas = consulta("04011010", True)
+    depois = database.estatisticas_cache_persistente()['acertos'] - antes
+    esperado_datada = consulta.sem_cache("04011010", data_referencia="2027-01-01")
+    print(f"Chamadas padrão servidas pelo arquivo: {acertos}; demais: {depois - acertos}")
+    if (acertos == 3 and depois == 3 and padrao[0] == padrao[1] == padrao[2]
+            and datada == esperado_datada and herdadas is not None):
+        print("✅ Argumentos padrão pelo arquivo; os demais pelo banco")
+    else:
+        print("❌ FAIL: argumentos não respeitados")
+    print()
+
+
+def testar_partida_a_frio():
+    """Num processo novo, a primeira consulta vem do arquivo, sem abrir o banco."""
+    print("=== Testando partida a frio ===")
+    _garantir_arquivo()
+    medidas = []
+    for _ in range(3):
+        saida = subprocess.run([sys.executable, "-c", _SCRIPT_PARTIDA], capture_output=True, text=True,
+                               check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        medidas.append([float(valor) for valor in saida.stdout.split()])
+    primeira, banco_frio, banco_quente, aberturas = (min(medida[indice] for medida in medidas) for indice in range(4))
+    print(f"Primeira consulta: {primeira:.0f} µs; banco a frio: {banco_frio:.0f} µs; "
+          f"banco já aberto: {banco_quente:.0f} µs; conexões abertas antes do banco: {aberturas:.0f}")
+    if aberturas == 0 and primeira < banco_frio:
+        print("✅ Primeira consulta do processo servida pelo arquivo mapeado")
+    else:
+        print("❌ FAIL: primeira consulta não usou o arquivo")
+    print()
+
+
+def testar_validacao_e_reconstrucao():
+    """
+    Arquivo vale pela assinatura ou pela versão com o mesmo conteúdo, e só com o
+    mesmo código; arquivo ausente ou desatualizado só é reconstruído a pedido.
+    """
+    print("=== Testando validação e reconstrução ===")
+    pasta = tempfile.mkdtemp()
+    try:
+        copia = os.path.join(pasta, "calculadora.db")
+        shutil.copy(database.DB_PATH, copia)
+        codigo_extra = os.path.join(pasta, "modelo_extra.py")
+        with open(codigo_extra, "w") as arquivo:
+            arquivo.write("VERSAO = 1\n")
+        estado = {'versao': "v0001", 'leituras': 0, 'liberacoes': 0}
+
+        def ler_versao():
+            estado['leituras'] += 1
+            return estado['versao']
+
+        def liberar():
+            estado['liberacoes'] += 1
+
+        def criar_cache(caminho=None):
+            cache = cache_persistente.CachePersistente(copia, ler_versao, lambda: ["01", "0101", "04011010"],
+                                                       caminho=caminho, arquivos_codigo=(codigo_extra,),
+                                                       liberar_recursos=liberar)
+
+            def descrever(codigo):
+                return (codigo, estado['versao'])
+
+            return cache, cache.memorizar(descrever)
+
+        falhas = []
+        threads = threading.active_count()
+        cache, descrever = criar_cache()
+        if cache.abrir():
+            falhas.append("arquivo inexistente mapeado")
+        if descrever("0101") != ("0101", "v0001") or threading.active_count() != threads:
+            falhas.append("consulta sem arquivo não deveria reconstruí-lo")
+        cache.aquecer(esperar=True)
+        if (not cache.estatisticas()['mapeado'] or estado['liberacoes'] != 1
+                or cache.obter(descrever.__qualname__, "0101") != (True, ("0101", "v0001"))):
+            falhas.append("arquivo construído")
+
+        leituras = estado['leituras']
+        cache, descrever = criar_cache()
+        if not cache.abrir() or estado['leituras'] != leituras:
+            falhas.append("assinatura igual deveria dispensar a versão")
+
+        modificacao = os.stat(copia).st_mtime_ns + 5_000_000_000
+        os.utime(copia, ns=(modificacao, modificacao))
+        cache, descrever = criar_cache()
+        if not cache.abrir() or estado['leituras'] != leituras + 1 or cache.versao_confirmada() != "v0001":
+            falhas.append("banco tocado com a mesma versão e o mesmo conteúdo")
+
+        # Banco editado sem trocar VERSAO_BASE_DADO
+        conn = sqlite3.connect(copia)
+        conn.execute("CREATE TABLE EDICAO_TESTE (ID INTEGER)")
+        conn.commit()
+        conn.close()
+        cache.verificar()
+        if cache.estatisticas()['mapeado']:
+            falhas.append("conteúdo alterado com a mesma versão")
+        cache.fechar()
+        cache.aquecer(esperar=True)
+
+        # Nova versão da base (a atualização também altera o arquivo do banco)
+        estado['versao'] = "v0002"
+        os.utime(copia, ns=(modificacao + 5_000_000_000, modificacao + 5_000_000_000))
+        cache, descrever = criar_cache()
+        if cache.abrir():
+            falhas.append("versão nova com arquivo antigo")
+        if descrever("04011010") != ("04011010", "v0002"):
+            falhas.append("consulta pelo banco com o arquivo desatualizado")
+        cache.reconstruir(esperar=True)
+        if cache.obter(descrever.__qualname__, "04011010") != (True, ("04011010", "v0002")):
+            falhas.append("reconstrução")
+        cache.fechar()
+
+        # Código alterado: resultados gravados pelo código anterior não valem
+        with open(codigo_extra, "w") as arquivo:
+            arquivo.write("VERSAO = 2\n")
+        cache, descrever = criar_cache()
+        if cache.abrir():
+            falhas.append("código alterado com arquivo antigo")
+
+        # Falha de gravação: registrada, sem exceção na thread, e a conexão é liberada
+        liberacoes = estado['liberacoes']
+        cache, descrever = criar_cache(os.path.join(pasta, "inexistente", "resultados.bin"))
+        erros = io.StringIO()
+        with contextlib.redirect_stderr(erros):
+            cache.aquecer(esperar=True)
+        estatisticas = cache.estatisticas()
+        if (estatisticas['erro'] is None or estatisticas['mapeado'] or "cache persistente" not in erros.getvalue()
+                or estado['liberacoes'] != liberacoes + 1 or descrever("01") != ("01", "v0002")):
+            falhas.append(f"falha de gravação {estatisticas}")
+        print(f"Leituras da versão: {estado['leituras']}; liberações: {estado['liberacoes']}; "
+              f"erro de gravação: {estatisticas['erro']}")
+        if not falhas:
+            print("✅ Validação pelo código, assinatura, versão e conteúdo; reconstrução só a pedido")
+        else:
+            print(f"❌ FAIL: {falhas}")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    print()
+
+
+def testar_liberacao_conexao():
+    """A thread de reconstrução fecha a sua conexão do pool ao terminar."""
+    print("=== Testando liberação da conexão ===")
+    database.obter_conexao()
+    antes = database.estatisticas_pool()['conexoes_abertas']
+    database.reconstruir_cache_persistente(esperar=True)
+    depois = database.estatisticas_pool()['conexoes_abertas']
+    estatisticas = database.estatisticas_cache_persistente()
+    print(f"Conexões abertas antes: {antes}; depois: {depois}; {estatisticas['reconstrucoes']} reconstruções")
+    if depois == antes and estatisticas['mapeado'] and estatisticas['erro'] is None:
+        print("✅ Conexão da reconstrução liberada")
+    else:
+        print("❌ FAIL: conexão da reconstrução mantida aberta")
+    print()
+
+
+def testar_gravacoes_simultaneas():
+    """Dois construtores do mesmo arquivo ao mesmo tempo não disputam o temporário."""
+    print("=== Testando gravações simultâneas ===")
+    pasta = tempfile.mkdtemp()
+    try:
+        copia = os.path.join(pasta, "calculadora.db")
+        shutil.copy(database.DB_PATH, copia)
+        codigos = [str(numero) for numero in range(10000, 12000)]
+        caches = [cache_persistente.CachePersistente(copia, lambda: "v0001", lambda: codigos) for _ in range(3)]
+        for cache in caches:
+            cache.memorizar(lambda codigo: (codigo, "x" * 200))
+        for cache in caches:
+            cache.reconstruir()
+        for cache in caches:
+            cache.reconstruir(esperar=True)
+        erros = [cache.estatisticas()['erro'] for cache in caches if cache.estatisticas()['erro']]
+        leitor = cache_persistente.CachePersistente(copia, lambda: "v0001", lambda: codigos)
+        consultar = leitor.memorizar(lambda codigo: (codigo, "x" * 200))
+        valido = leitor.abrir() and leitor.obter(consultar.__qualname__, "11999") == (True, ("11999", "x" * 200))
+        sobras = [nome for nome in os.listdir(pasta) if nome.endswith((".novo", ".tmp"))]
+        for cache in caches + [leitor]:
+            cache.fechar()
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    print(f"3 gravações simultâneas: erros {erros}, arquivo válido {valido}, temporários restantes {sobras}")
+    if not erros and valido and not sobras:
+        print("✅ Cada construtor grava no seu temporário; o arquivo final é válido")
+    else:
+        print("❌ FAIL: gravações simultâneas interferiram")
+    print()
+
+
+def testar_partida_lote_cli():
+    """A consulta em lote regrava o arquivo ausente na partida, antes de processar."""
+    print("=== Testando partida da consulta em lote ===")
+    database.fechar_conexoes()
+    caminho = database.estatisticas_cache_persistente()['caminho']
+    reserva = caminho + ".reserva"
+    os.replace(caminho, reserva)
+    try:
+        saida = subprocess.run([sys.executable, "consulta_lote_cli.py", "-"], input="ncm\n04011010\n",
+                               capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        recriado = os.path.exists(caminho)
+    finally:
+        if not os.path.exists(caminho):
+            os.replace(reserva, caminho)
+        elif os.path.exists(reserva):
+            os.remove(reserva)
+    print(saida.stderr.strip())
+    if saida.returncode == 0 and recriado and "regravado" in saida.stderr and '"04011010"' in saida.stdout:
+        print("✅ Arquivo regravado na partida da consulta em lote")
+    else:
+        print(f"❌ FAIL: código {saida.returncode}, recriado {recriado}")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO CACHE PERSISTENTE DE RESULTADOS\n")
+    testar_equivalencia()
+    testar_argumentos()
+    testar_partida_a_frio()
+    testar_validacao_e_reconstrucao()
+    testar_liberacao_conexao()
+    testar_gravacoes_simultaneas()
+    testar_partida_lote_cli()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
@@ -0,0 +1,224 @@
+"""
+Teste do cache dos resultados das consultas: acertos e falhas, cópia das
+partes mutáveis dos resultados, limites de entradas e bytes, descarte LRU e
+LFU, invalidação pela versão e pela data de modificação do banco, propagação
+da invalidação às estruturas derivadas e custo de uma consulta repetida.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import database
+import cache_resultados
+import indice_busca
+import snapshot
+
+EXEMPLOS = ["04011010", "22071000", "30049069", "10062010"]
+
+
+def _cache_temporario(**opcoes):
+    """Cache sobre um arquivo temporário com versão controlada pelo teste."""
+    arquivo = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    arquivo.close()
+    estado = {'versao': "v0001", 'invalidado': 0}
+
+    def ao_invalidar():
+        estado['invalidado'] += 1
+
+    cache = cache_resultados.CacheResultados(arquivo.name, lambda: estado['versao'],
+                                             ao_invalidar=ao_invalidar, intervalo_verificacao=0, **opcoes)
+    return cache, arquivo.name, estado
+
+
+def testar_acertos():
+    """Consultas repetidas vêm do cache, iguais às consultas sem cache."""
+    print("=== Testando acertos e falhas ===")
+    database.limpar_cache()
+    antes = database.estatisticas_cache()
+    primeiros = [database.buscar_informacoes_completas_ncm(codigo, True) for codigo in EXEMPLOS]
+    repetidos = [database.buscar_informacoes_completas_ncm(codigo, True) for codigo in EXEMPLOS]
+    sem_cache = [database.buscar_informacoes_completas_ncm.sem_cache(codigo, True) for codigo in EXEMPLOS]
+    depois = database.estatisticas_cache()
+    acertos = depois['acertos'] - antes['acertos']
+    falhas = depois['falhas'] - antes['falhas']
+    print(f"{acertos} acertos, {falhas} falhas | {depois}")
+    if acertos == len(EXEMPLOS) and falhas == len(EXEMPLOS) and primeiros == repetidos == sem_cache:
+        print("✅ Repetições servidas pelo cache, iguais às consultas sem cache")
+    else:
+        print("❌ FAIL: contadores ou resultados inesperados")
+
+    # Quem recebe o resultado pode alterá-lo sem afetar o cache
+    repetidos[0][1].clear()
+    primeiros[0][1].append(None)
+    alterado = database.buscar_informacoes_completas_ncm(EXEMPLOS[0], True)
+    if alterado == sem_cache[0] and alterado[1] and alterado[1] is not repetidos[0][1]:
+        print("✅ Listas do resultado entregues como cópias")
+    else:
+        print("❌ FAIL: alteração de quem consultou chegou ao cache")
+
+    # Argumentos não hasheáveis consultam direto; os lotes não passam pelo cache
+    cache, caminho, _ = _cache_temporario()
+    contar = cache.memorizar(lambda codigos: len(codigos))
+    lista_ignorada = contar(EXEMPLOS) == len(EXEMPLOS) and cache.ignoradas == 1
+    os.unlink(caminho)
+    lotes = [database.buscar_informacoes_estruturadas_lote(iter(EXEMPLOS)) for _ in range(2)]
+    lotes_iguais = lotes[0] == lotes[1] and sorted(lotes[0]) == sorted(EXEMPLOS)
+    if lista_ignorada and lotes_iguais:
+        print("✅ Listas ignoradas pelo cache; lotes de iteráveis sempre consultados")
+    else:
+        print(f"❌ FAIL: lista ignorada {lista_ignorada}, lotes {lotes_iguais}")
+    print()
+
+
+def testar_limites():
+    """Entradas e bytes limitados; LRU descarta o menos recente, LFU o menos consultado."""
+    print("=== Testando limites e políticas de descarte ===")
+    falhas = []
+    mantidos = {}
+    for politica in cache_resultados.POLITICAS:
+        cache, caminho, _ = _cache_temporario(max_entradas=3, politica=politica)
+        consultar = cache.memorizar(lambda codigo: codigo * 2)
+        for codigo in ("a", "b", "c", "a", "a", "b", "c", "c", "d"):
+            consultar(codigo)
+        mantidos[politica] = sorted(chave[1][0] for chave in cache._resultados)
+        if cache.descartes != 1 or len(cache._resultados) != 3:
+            falhas.append(f"{politica}: {cache.estatisticas()}")
+        os.unlink(caminho)
+    # LRU: "a" foi o menos recente; LFU: "b" foi o menos consultado
+    if mantidos != {'lru': ["b", "c", "d"], 'lfu': ["a", "c", "d"]}:
+        falhas.append(f"descartes {mantidos}")
+
+    limite = 20000
+    cache, caminho, _ = _cache_temporario(max_bytes=limite)
+    consultar = cache.memorizar(lambda tamanho: "x" * tamanho)
+    for indice in range(50):
+        consultar(1000 + indice)
+    consultar(limite * 2)
+    if cache.bytes > limite or cache.ignoradas != 1 or cache.descartes == 0:
+        falhas.append(f"bytes {cache.estatisticas()}")
+    os.unlink(caminho)
+
+    print(f"Mantidos após o descarte: {mantidos}; bytes {cache.bytes}/{limite}")
+    if not falhas:
+        print("✅ Limites respeitados e descarte conforme a política")
+    else:
+        print(f"❌ FAIL: {falhas}")
+    print()
+
+
+def testar_invalidacao():
+    """Mudança da versão ou da data de modificação do arquivo esvazia o cache."""
+    print("=== Testando invalidação ===")
+    cache, caminho, estado = _cache_temporario()
+    chamadas = []
+    consultar = cache.memorizar(lambda codigo: chamadas.append(codigo) or len(chamadas))
+    consultar("x")
+    consultar("x")
+    estado['versao'] = "v0002"
+    consultar("x")
+    consultar("x")
+    modificacao = os.stat(caminho).st_mtime_ns + 5_000_000_000
+    os.utime(caminho, ns=(modificacao, modificacao))
+    consultar("x")
+
+    lento = cache_resultados.CacheResultados(caminho, lambda: estado['versao'], intervalo_verificacao=60)
+    consultar_lento = lento.memorizar(lambda codigo: chamadas.append(codigo) or len(chamadas))
+    consultar_lento("y")
+    estado['versao'] = "v0003"
+    mantido = consultar_lento("y") == consultar_lento("y") and lento.verificar(forcar=True)
+    os.unlink(caminho)
+
+    print(f"Consultas executadas: {len(chamadas)}; invalidações {cache.invalidacoes}, "
+          f"avisos {estado['invalidado']}")
+    if len(chamadas) == 4 and cache.invalidacoes == 2 and estado['invalidado'] == 2 and mantido:
+        print("✅ Cache invalidado pela versão e pelo arquivo, verificando no intervalo configurado")
+    else:
+        print("❌ FAIL: invalidação não ocorreu como esperado")
+    print()
+
+
+def testar_propagacao():
+    """Banco alterado sem troca de versão: snapshot, índice e estruturas derivadas são refeitos."""
+    print("=== Testando propagação da invalidação ===")
+    falhas = []
+    pasta = tempfile.mkdtemp()
+    try:
+        copia = os.path.join(pasta, "calculadora.db")
+        shutil.copy(database.DB_PATH, copia)
+        conn = sqlite3.connect(copia)
+        primeiro = snapshot.carregar_snapshot(conn)
+        if snapshot.carregar_snapshot(conn) is not primeiro:
+            falhas.append("snapshot recarregado sem mudança")
+        indice = indice_busca.IndiceBusca(copia, lambda: conn)
+        indice.garantir_atualizado()
+
+        modificacao = os.stat(copia).st_mtime_ns + 5_000_000_000
+        os.utime(copia, ns=(modificacao, modificacao))
+        if snapshot.carregar_snapshot(conn) is primeiro:
+            falhas.append("snapshot mantido com o banco alterado")
+        novo_indice = indice_busca.IndiceBusca(copia, lambda: conn)
+        novo_indice.garantir_atualizado()
+        if indice.reconstrucoes != 1 or novo_indice.reconstrucoes != 1:
+            falhas.append(f"índice reconstruído {indice.reconstrucoes}/{novo_indice.reconstrucoes}")
+        indice.fechar()
+        novo_indice.fechar()
+        conn.close()
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    # Estruturas do database descartadas quando o cache percebe a mudança
+    database.obter_taxas_efetivas()
+    database.obter_indice_busca()
+    database.obter_catalogo_tratamentos()
+    database.obter_imposto_seletivo()
+    database.obter_aliquotas_locais()
+    database._cache_consultas._assinatura = ("v0000", 0, None)
+    database._cache_consultas.verificar(forcar=True)
+    restantes = [nome for nome in ("_snapshot", "_resolvedor_ncm", "_indice_busca", "_busca_incremental",
+                                   "_taxas_efetivas", "_catalogo_tratamentos", "_aliquotas_locais",
+                                   "_imposto_seletivo") if getattr(database, nome) is not None]
+    if restantes:
+        falhas.append(f"não descartados: {restantes}")
+
+    if not falhas:
+        print("✅ Snapshot, índice e estruturas derivadas refeitos após a alteração do banco")
+    else:
+        print(f"❌ FAIL: {falhas}")
+    print()
+
+
+def testar_latencia(repeticoes=20000):
+    """Consulta repetida custa microssegundos, frente ao JOIN completo."""
+    print("=== Testando latência ===")
+    database.limpar_cache()
+    inicio = time.perf_counter()
+    for codigo in EXEMPLOS:
+        database.buscar_informacoes_completas_ncm.sem_cache(codigo, True)
+    sem_cache_us = (time.perf_counter() - inicio) / len(EXEMPLOS) * 1e6
+
+    for codigo in EXEMPLOS:
+        database.buscar_informacoes_completas_ncm(codigo, True)
+    inicio = time.perf_counter()
+    for indice in range(repeticoes):
+        database.buscar_informacoes_completas_ncm(EXEMPLOS[indice % len(EXEMPLOS)], True)
+    com_cache_us = (time.perf_counter() - inicio) / repeticoes * 1e6
+
+    print(f"Sem cache: {sem_cache_us:.1f} µs/consulta; repetida: {com_cache_us:.2f} µs/consulta")
+    if com_cache_us * 20 < sem_cache_us:
+        print("✅ Consulta repetida servida pelo cache")
+    else:
+        print("❌ FAIL: consulta repetida lenta")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO CACHE DE RESULTADOS\n")
+    testar_acertos()
+    testar_limites()
+    testar_invalidacao()
+    testar_propagacao()
+    testar_latencia()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
@@ -0,0 +1,145 @@
+"""
+Teste do cálculo de tributos em lote: arredondamento exato para centavos
+(comparado com Decimal.quantize ROUND_HALF_UP), resolução das alíquotas por
+NCM/cClassTrib/data e vazão num lote de 1 milhão de itens.
+"""
+import random
+import time
+from decimal import Decimal
+import database
+import calculo_tributos
+
+DATAS = ["2026-06-15", "2027-03-01", "2030-07-01", "2033-12-31"]
+
+
+def testar_arredondamento():
+    """Frações e arredondamento devem coincidir com Decimal ROUND_HALF_UP."""
+    print("=== Testando arredondamento exato ===")
+    casos = [(0, "0.00"), (0.125, "0.13"), (-0.125, "-0.13"), (2.675, "2.68"), ("1.005", "1.01"),
+             ("1e-2", "0.01"), ("12,345", "12.35"), (Decimal("99.995"), "100.00"), (7, "7.00")]
+    falhas = []
+    for valor, esperado in casos:
+        numerador, denominador = calculo_tributos.para_fracao(valor)
+        obtido = calculo_tributos.centavos_para_decimal(
+            calculo_tributos.arredondar_centavos(numerador * 100, denominador))
+        if str(obtido) != esperado:
+            falhas.append((valor, esperado, obtido))
+
+    aleatorio = random.Random(15)
+    divergencias = 0
+    for _ in range(20000):
+        base = f"{aleatorio.randint(-10**6, 10**7)}.{aleatorio.randint(0, 99):02d}"
+        aliquota = f"{aleatorio.randint(0, 30)}.{aleatorio.randint(0, 999):03d}"
+        reducao = aleatorio.choice([None, 0.0, 30.0, 40.0, 60.0, 100.0, 33.33])
+        numerador, denominador = calculo_tributos.fracao_aliquota_efetiva(aliquota, reducao)
+        bn, bd = calculo_tributos.para_fracao(base)
+        obtido = calculo_tributos.centavos_para_decimal(
+            calculo_tributos.arredondar_centavos(bn * numerador, bd * denominador))
+        efetiva = Decimal(aliquota)
+        if reducao is not None:
+            efetiva = Decimal(0) if reducao >= 100 else efetiva * (100 - Decimal(str(reducao))) / 100
+        esperado = calculo_tributos.quantizar(Decimal(base) * efetiva / 100)
+        divergencias += obtido != esperado
+
+    if not falhas and divergencias == 0:
+        print(f"✅ {len(casos)} casos de borda e 20000 valores aleatórios iguais ao Decimal")
+    else:
+        print(f"❌ FAIL: {falhas}, {divergencias} divergências")
+    print()
+
+
+def testar_resolucao():
+    """Os valores do lote devem usar as alíquotas efetivas da tabela materializada."""
+    print("=== Testando resolução das alíquotas ===")
+    snap = database.obter_snapshot()
+    tabela = database.obter_taxas_efetivas()
+    resolvedor = calculo_tributos.ResolvedorTaxas()
+
+    itens = []
+    esperados = []
+    aleatorio = random.Random(7)
+    for codigo in ["30049069"] + [ncm[0] for ncm in aleatorio.sample(snap.ncms, 400)]:
+        for data in DATAS:
+            for taxa in tabela.consultar_ncm(codigo, data)[:3]:
+                base = f"{aleatorio.randint(1, 50000)}.{aleatorio.randint(0, 99):02d}"
+                itens.append((codigo, base, 1, data, taxa.cclasstrib))
+                esperados.append((taxa.tributo, calculo_tributos.quantizar(
+                    Decimal(base) * Decimal(str(taxa.aliquota_efetiva)) / 100)))
+
+    resultado = calculo_tributos.calcular_itens(itens, resolvedor)
+    # A efetiva gravada é float: tolera 1 centavo nos empates de arredondamento
+    divergencias = sum(1 for indice, (sigla, esperado) in enumerate(esperados)
+                       if abs(resultado.item(indice)[sigla] - esperado) > Decimal("0.01"))
+
+    integral = calculo_tributos.calcular_itens(
+        [("30049069", "1000.00", 1, "2027-03-01"), ("99999999", "1000.00", 1, "2027-03-01"),
+         ("30049069", "1000.00", 1, "2027-03-01", "999999")], resolvedor)
+    print(f"{len(itens)} itens, {resolvedor.estatisticas()}")
+    print(f"Tributação integral de R$ 1000,00 em 2027-03-01: {integral.item(0)}")
+
+    if (divergencias == 0 and itens and integral.nao_resolvidos == [1, 2]
+            and integral.item(0)["CBS"] is not None and integral.item(1)["CBS"] is None):
+        print("✅ Valores conferem com a tabela de alíquotas efetivas; não vigentes sinalizados")
+    else:
+        print(f"❌ FAIL: {divergencias} divergências, não resolvidos {integral.nao_resolvidos}")
+
+    invalidos = calculo_tributos.calcular_itens(
+        [("30049069", "1000.00", 1, "2027/03/01"), ("30049069", "1000.00", 1, "2027/03/01", "000001"),
+         ("30049069", "1.000,50", 1, "2027-03-01"), ("30049069", "1000.00", "uma", "2027-03-01"),
+         ("30049069", "1000.00", 1, "2027-03-01")], resolvedor)
+    sem_datas = calculo_tributos.calcular_lote(["30049069"], ["1000.00"])
+    print(f"Itens com data, base ou quantidade inválida: {invalidos.nao_resolvidos}; sem datas: {sem_datas.item(0)}")
+    if (invalidos.nao_resolvidos == [0, 1, 2, 3] and invalidos.item(0)["CBS"] is None
+            and invalidos.item(4)["CBS"] is not None and not sem_datas.nao_resolvidos):
+        print("✅ Datas e valores inválidos sinalizados sem interromper o lote; sem datas, vale hoje")
+    else:
+        print(f"❌ FAIL: inválidos {invalidos.nao_resolvidos}, sem datas {sem_datas.nao_resolvidos}")
+
+    try:
+        calculo_tributos.calcular_lote(["30049069"], [], [], [])
+        print("❌ FAIL: colunas de tamanhos diferentes aceitas")
+    except ValueError:
+        print("✅ Colunas de tamanhos diferentes rejeitadas")
+    print()
+
+
+def testar_vazao(quantidade=1_000_000):
+    """Lote de 1 milhão de itens com NCMs, valores e datas variados."""
+    print(f"=== Testando vazão ({quantidade} itens) ===")
+    snap = database.obter_snapshot()
+    tabela = database.obter_taxas_efetivas()
+    aleatorio = random.Random(1)
+    combinacoes = [(None, None)]
+    for codigo in aleatorio.sample([ncm[0] for ncm in snap.ncms], 300) + ["30049069"]:
+        combinacoes += [(codigo, None)] + [(codigo, taxa.cclasstrib)
+                                           for taxa in tabela.consultar_ncm(codigo, "2027-03-01")[:5]]
+    combinacoes = [combinacao for combinacao in combinacoes if combinacao[0]]
+    escolhidas = aleatorio.choices(combinacoes, k=quantidade)
+    ncms = [codigo for codigo, _ in escolhidas]
+    cclasstribs = [cclasstrib for _, cclasstrib in escolhidas]
+    bases = [f"{aleatorio.randint(1, 99999)}.{aleatorio.randint(0, 99):02d}" for _ in range(quantidade)]
+    datas = aleatorio.choices(DATAS, k=quantidade)
+
+    inicio = time.perf_counter()
+    resultado = calculo_tributos.calcular_lote(ncms, bases, None, datas, cclasstribs)
+    tempo = time.perf_counter() - inicio
+    totais = resultado.totais()
+
+    print(f"{quantidade} itens em {tempo:.2f} s ({quantidade / tempo:,.0f} itens/s); "
+          f"{len(resultado.nao_resolvidos)} não vigentes")
+    print(f"Totais: { {sigla: str(valor) for sigla, valor in totais.items()} }")
+    if len(resultado) == quantidade and tempo < 30:
+        print("✅ Lote calculado em segundos")
+    else:
+        print("❌ FAIL: lote incompleto ou lento")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO CÁLCULO DE TRIBUTOS EM LOTE\n")
+    testar_arredondamento()
+    testar_resolucao()
+    testar_vazao()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
@@ -0,0 +1,69 @@
+"""
+Teste da consulta estruturada de NCM: mesmo conteúdo da consulta completa,
+com muito menos linhas lidas do banco.
+"""
+import time
+import database
+
+EXEMPLOS = ["30049069", "30021590", "0102", "01069000", "10062010"]
+
+
+def testar_linhas_lidas():
+    """Compara a quantidade de linhas da consulta completa e da estruturada."""
+    print("=== Testando linhas lidas (completa x estruturada) ===")
+    for codigo in EXEMPLOS:
+        contagem = database.comparar_linhas_consulta_ncm(codigo)
+        print(f"NCM {codigo}: {contagem['regras']} regras, "
+              f"{contagem['completa']} linhas na consulta completa, "
+              f"{contagem['estruturada']} na estruturada")
+    print()
+
+
+def testar_equivalencia():
+    """Verifica se as combinações tributo/alíquota/redução são as mesmas da consulta completa."""
+    print("=== Testando equivalência com a consulta completa ===")
+    for codigo in EXEMPLOS:
+        _, resultados = database.buscar_informacoes_completas_ncm(codigo)
+        _, regras = database.buscar_informacoes_estruturadas_ncm(codigo)
+        if resultados is None:
+            print(f"⚠️ NCM {codigo} não encontrado")
+            continue
+
+        esperado = {(r[4], r[21], r[23], r[30]) for r in resultados}
+        obtido = set()
+        for regra in regras:
+            if not regra.tributos:
+                obtido.add((regra.id, None, None, None))
+            for tributo in regra.tributos:
+                for aliquota in tributo.aliquotas or [None]:
+                    for reducao in tributo.reducoes or [None]:
+                        obtido.add((regra.id, tributo.sigla,
+                                    aliquota.valor if aliquota else None,
+                                    reducao.valor if reducao else None))
+
+        if esperado == obtido:
+            print(f"✅ NCM {codigo}: {len(obtido)} combinações iguais")
+        else:
+            print(f"❌ FAIL: NCM {codigo} divergente")
+    print()
+
+
+def testar_desempenho():
+    """Mede o tempo médio das duas consultas no NCM com mais linhas."""
+    print("=== Testando desempenho ===")
+    codigo = EXEMPLOS[0]
+    # sem_cache: mede as consultas ao banco, não os acertos do cache de resultados
+    for nome, funcao in (("Completa", database.buscar_informacoes_completas_ncm.sem_cache),
+                         ("Estruturada", database.buscar_informacoes_estruturadas_ncm.sem_cache)):
+        inicio = time.perf_counter()
+        for _ in range(200):
+            funcao(codigo)
+        media = (time.perf_counter() - inicio) / 200
+        print(f"{nome}: {media * 1000:.2f} ms por consulta")
+    print()
+
+
+if __name__ == "__main__":
+    testar_linhas_lidas()
+    testar_equivalencia()
+    testar_desempenho()
@@ -0,0 +1,147 @@
+"""
+Teste da consulta em lote pela linha de comando: leitura de CSV/JSON Lines,
+resultado igual à consulta individual, memória constante em entradas grandes
+e vazão em linhas por segundo.
+"""
+import csv
+import io
+import json
+import random
+import subprocess
+import sys
+import tracemalloc
+import database
+import consulta_lote_cli
+
+
+def _codigos(quantidade, semente=20):
+    existentes = [ncm[0] for ncm in database.buscar_ncms(usar_snapshot=True)]
+    aleatorio = random.Random(semente)
+    return [aleatorio.choice(existentes) for _ in range(quantidade)]
+
+
+def testar_leitura():
+    """Cabeçalho, coluna escolhida, JSON Lines e linhas inválidas."""
+    print("=== Testando leitura da entrada ===")
+    casos = [
+        ("ncm,valor\n30049069,10\n3004.90.69,5\n\nabc,1\n", "auto", "ncm"),
+        ("item,codigo\n1,30049069\n2,3004.90.69\n3,\n4,abc\n", "csv", "codigo"),
+        ("30049069\n3004.90.69\n\nabc\nxyz\n", "auto", "ncm"),
+        ('{"ncm": "30049069"}\n"3004.90.69"\n{"outro": 1}\nnao json\n', "auto", "ncm"),
+    ]
+    falhas = []
+    for texto, formato, coluna in casos:
+        obtido = list(consulta_lote_cli.ler_codigos(io.StringIO(texto), formato, coluna))
+        if obtido[:2] != ["30049069", "30049069"] or any(codigo is not None for codigo in obtido[2:]):
+            falhas.append((texto, obtido))
+    if not falhas and list(consulta_lote_cli.ler_codigos(io.StringIO(""))) == []:
+        print(f"✅ {len(casos)} entradas lidas (CSV com/sem cabeçalho, JSON Lines, linhas inválidas)")
+    else:
+        print(f"❌ FAIL: {falhas}")
+    print()
+
+
+def testar_resultado():
+    """A saída de cada código corresponde à consulta individual, na ordem da entrada."""
+    print("=== Testando resultado ===")
+    codigos = _codigos(500) + ["99999999", "30049069"]
+    entrada = io.StringIO("ncm\n" + "\n".join(codigos) + "\n")
+    saida = io.StringIO()
+    resumo = consulta_lote_cli.processar(entrada, saida, tamanho_bloco=64, data_referencia="2027-01-01")
+    registros = [json.loads(linha) for linha in saida.getvalue().splitlines()]
+
+    divergencias = 0
+    for codigo, registro in zip(codigos, registros):
+        ncm, regras = database.buscar_informacoes_estruturadas_ncm(codigo, data_referencia="2027-01-01")
+        esperado = [regra.classificacao.codigo for regra in regras] if ncm else None
+        obtido = [regra['cclasstrib'] for regra in registro['regras']] if registro['encontrado'] else None
+        divergencias += registro['ncm'] != codigo or obtido != esperado
+
+    saida_csv = io.StringIO()
+    consulta_lote_cli.processar(io.StringIO("\n".join(codigos)), saida_csv, formato_saida="csv")
+    linhas_csv = list(csv.DictReader(io.StringIO(saida_csv.getvalue())))
+    ncms_csv = list(dict.fromkeys(linha['ncm'] for linha in linhas_csv))
+
+    print(f"Resumo: {resumo}; CSV com {len(linhas_csv)} linhas")
+    if (divergencias == 0 and len(registros) == len(codigos) and resumo.nao_encontrados == 1
+            and ncms_csv == list(dict.fromkeys(codigos))):
+        print("✅ JSON Lines e CSV iguais à consulta individual, na ordem da entrada")
+    else:
+        print(f"❌ FAIL: {divergencias} divergências, {len(registros)} registros")
+    print()
+
+
+class _EntradaGerada:
+    """Entrada de N linhas gerada sob demanda (não ocupa memória)."""
+
+    def __init__(self, codigos, quantidade):
+        self.codigos = codigos
+        self.quantidade = quantidade
+
+    def __iter__(self):
+        yield "ncm\n"
+        for indice in range(self.quantidade):
+            yield self.codigos[indice % len(self.codigos)] + "\n"
+
+
+class _SaidaDescartada:
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, texto):
+        self.bytes += len(texto)
+
+    def flush(self):
+        pass
+
+
+def testar_memoria_e_vazao():
+    """O pico de memória não cresce com a entrada; vazão em linhas/s."""
+    print("=== Testando memória constante e vazão ===")
+    codigos = _codigos(5000)
+    database.buscar_informacoes_estruturadas_lote(codigos[:10])  # snapshot carregado antes da medição
+
+    picos = []
+    for quantidade in (50000, 400000):
+        saida = _SaidaDescartada()
+        tracemalloc.start()
+        resumo = consulta_lote_cli.processar(_EntradaGerada(codigos, quantidade), saida)
+        picos.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        print(f"{quantidade} linhas: pico {picos[-1] / 1024:.0f} KB, saída {saida.bytes / 1e6:.1f} MB")
+
+    saida = _SaidaDescartada()
+    resumo = consulta_lote_cli.processar(_EntradaGerada(codigos, 400000), saida)
+    print(f"Sem medição de memória: {resumo.linhas} linhas em {resumo.segundos:.2f} s "
+          f"({resumo.linhas_por_segundo:,.0f} linhas/s)")
+
+    if picos[1] < picos[0] * 1.5 and resumo.linhas == 400000:
+        print("✅ Memória independente do tamanho da entrada")
+    else:
+        print(f"❌ FAIL: picos {picos}")
+    print()
+
+
+def testar_linha_de_comando():
+    """Execução real pelo stdin/stdout, com o resumo no stderr."""
+    print("=== Testando linha de comando ===")
+    processo = subprocess.run(
+        [sys.executable, "consulta_lote_cli.py", "-", "--formato-saida", "csv", "--data", "2027-01-01"],
+        input="30049069\n99999999\n", capture_output=True, text=True, timeout=120)
+    print(f"stderr: {processo.stderr.strip()}")
+    if processo.returncode == 0 and processo.stdout.startswith("ncm,") and "2 linhas" in processo.stderr:
+        print("✅ Entrada padrão processada com o resumo no stderr")
+    else:
+        print(f"❌ FAIL: código {processo.returncode}")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DA CONSULTA EM LOTE PELA LINHA DE COMANDO\n")
+    testar_leitura()
+    testar_resultado()
+    testar_memoria_e_vazao()
+    testar_linha_de_comando()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
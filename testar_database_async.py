@@ -0,0 +1,113 @@
+"""
+Teste da API assíncrona do database: resultados iguais aos da versão
+síncrona, agrupamento de consultas simultâneas (single-flight), isolamento
+de cancelamentos e loop de eventos livre durante as consultas.
+"""
+import asyncio
+import random
+import time
+import database
+import database_async
+
+
+async def testar_equivalencia():
+    """As funções assíncronas devolvem o mesmo que as síncronas."""
+    print("=== Testando equivalência com o database ===")
+    codigos = [ncm[0] for ncm in random.Random(19).sample(database.buscar_ncms(usar_snapshot=True), 30)]
+    codigos.append("30049069")
+    divergencias = 0
+    for codigo in codigos:
+        resultados = await asyncio.gather(
+            database_async.buscar_informacoes_completas_ncm(codigo),
+            database_async.buscar_cst_cclastrib_reducao_ncm(codigo),
+            database_async.buscar_reducoes_ncm(codigo),
+        )
+        esperados = (database.buscar_informacoes_completas_ncm(codigo),
+                     database.buscar_cst_cclastrib_reducao_ncm(codigo),
+                     database.buscar_reducoes_ncm(codigo))
+        divergencias += tuple(resultados) != esperados
+    busca = await database_async.buscar_por_descricao("leite")
+    divergencias += busca != database.buscar_por_descricao("leite")
+
+    if divergencias == 0:
+        print(f"✅ {len(codigos)} NCMs x 3 consultas e a busca iguais à versão síncrona")
+    else:
+        print(f"❌ FAIL: {divergencias} divergências")
+    print()
+
+
+async def testar_agrupamento():
+    """100 pedidos simultâneos do mesmo NCM viram uma única consulta."""
+    print("=== Testando agrupamento (single-flight) ===")
+    consultas = database_async.ConsultasAssincronas(quantidade_threads=2)
+    chamadas = []
+
+    def consulta_lenta(codigo):
+        chamadas.append(codigo)
+        time.sleep(0.05)
+        return database.buscar_cst_cclastrib_reducao_ncm(codigo)
+
+    resultados = await asyncio.gather(*(consultas.executar(consulta_lenta, "30049069") for _ in range(100)))
+    todos_iguais = all(resultado is resultados[0] for resultado in resultados)
+    print(f"100 pedidos -> {len(chamadas)} execução | {consultas.estatisticas()}")
+
+    # Cancelar uma das corrotinas não cancela a consulta das outras
+    tarefas = [asyncio.ensure_future(consultas.executar(consulta_lenta, "01012100")) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    tarefas[0].cancel()
+    restantes = await asyncio.gather(*tarefas[1:])
+    cancelamento_isolado = tarefas[0].cancelled() and all(resultado is not None for resultado in restantes)
+
+    # Depois de concluída, a mesma consulta é executada de novo
+    await consultas.executar(consulta_lenta, "30049069")
+    consultas.encerrar()
+
+    if len(chamadas) == 3 and todos_iguais and cancelamento_isolado:
+        print("✅ Consultas simultâneas agrupadas, cancelamento isolado e nova execução após concluir")
+    else:
+        print(f"❌ FAIL: {len(chamadas)} execuções, iguais {todos_iguais}, cancelamento {cancelamento_isolado}")
+    print()
+
+
+async def testar_loop_livre():
+    """O loop de eventos continua respondendo enquanto as consultas rodam."""
+    print("=== Testando loop de eventos livre ===")
+    atrasos = []
+    rodando = True
+
+    async def relogio():
+        while rodando:
+            inicio = time.perf_counter()
+            await asyncio.sleep(0.005)
+            atrasos.append(time.perf_counter() - inicio - 0.005)
+
+    tarefa_relogio = asyncio.ensure_future(relogio())
+    codigos = [ncm[0] for ncm in database.buscar_ncms(usar_snapshot=True)[:300]]
+    inicio = time.perf_counter()
+    await asyncio.gather(*(database_async.buscar_informacoes_completas_ncm(codigo, True) for codigo in codigos))
+    tempo = time.perf_counter() - inicio
+    rodando = False
+    await tarefa_relogio
+
+    maior_atraso_ms = max(atrasos) * 1000 if atrasos else 0.0
+    print(f"{len(codigos)} consultas em {tempo:.2f} s; {len(atrasos)} ciclos do relógio, "
+          f"maior atraso {maior_atraso_ms:.1f} ms | {database_async.obter_consultas().estatisticas()}")
+    if len(atrasos) > 5:
+        print("✅ Loop de eventos não bloqueado pelas consultas")
+    else:
+        print("❌ FAIL: loop bloqueado")
+    print()
+
+
+async def principal():
+    await testar_equivalencia()
+    await testar_agrupamento()
+    await testar_loop_livre()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DA API ASSÍNCRONA DO DATABASE\n")
+    asyncio.run(principal())
+
+    database_async.encerrar()
+    print("🎉 Testes concluídos!")
@@ -0,0 +1,137 @@
+"""
+Teste do executor de consultas em segundo plano: entrega do resultado pela
+fila, substituição de consultas no mesmo canal (cliques rápidos), erros,
+progresso e cancelamento.
+Usa um widget simulado no lugar do Tk, com o after() executado pelo teste.
+"""
+import time
+import database
+from executor_consultas import CANAL_CONSULTA, ExecutorConsultas, INTERVALO_VERIFICACAO_MS
+
+
+class WidgetSimulado:
+    """Imita after/after_cancel do Tk; os agendamentos rodam em rodar_pendentes."""
+
+    def __init__(self):
+        self.agendados = {}
+        self.proximo_id = 0
+
+    def after(self, atraso_ms, funcao, *args):
+        self.proximo_id += 1
+        self.agendados[self.proximo_id] = (funcao, args)
+        return self.proximo_id
+
+    def after_cancel(self, identificador):
+        self.agendados.pop(identificador, None)
+
+    def report_callback_exception(self, tipo, valor, traceback):
+        print(f"   (erro em callback: {tipo.__name__}: {valor})")
+
+    def rodar_pendentes(self, executor, limite_s=10.0):
+        """Simula o mainloop até o executor ficar ocioso."""
+        fim = time.perf_counter() + limite_s
+        while self.agendados and time.perf_counter() < fim:
+            time.sleep(INTERVALO_VERIFICACAO_MS / 1000)
+            for identificador in list(self.agendados):
+                funcao, args = self.agendados.pop(identificador)
+                funcao(*args)
+        return not executor.ocupado
+
+
+def testar_resultado(widget):
+    """Uma consulta real ao banco deve voltar pelo callback."""
+    print("=== Testando entrega do resultado ===")
+    estados = []
+    executor = ExecutorConsultas(widget, ao_mudar_estado=estados.append)
+    recebidos = []
+    executor.submeter(CANAL_CONSULTA, database.buscar_informacoes_estruturadas_ncm, "30049069",
+                      ao_concluir=recebidos.append)
+    widget.rodar_pendentes(executor)
+
+    if recebidos and recebidos[0][0].codigo == "30049069":
+        print(f"✅ NCM {recebidos[0][0].codigo} com {len(recebidos[0][1])} regras entregue")
+    else:
+        print(f"❌ FAIL: recebidos={recebidos}")
+    print(f"Estados de ocupação: {estados}")
+    executor.encerrar()
+    print()
+
+
+def testar_cliques_rapidos(widget):
+    """Só a última consulta do canal é entregue e a latência dela não cresce com a fila."""
+    print("=== Testando substituição em cliques rápidos ===")
+    executor = ExecutorConsultas(widget)
+
+    def consulta_lenta(codigo):
+        time.sleep(0.05)
+        return database.buscar_informacoes_estruturadas_ncm(codigo)
+
+    # Latência de uma consulta isolada
+    tarefa = executor.submeter(CANAL_CONSULTA, consulta_lenta, "30049069")
+    widget.rodar_pendentes(executor)
+    isolada_ms = tarefa.tempo_ms
+
+    # 30 cliques seguidos: as consultas anteriores são canceladas ou descartadas
+    recebidos = []
+    codigos = [ncm[0] for ncm in database.buscar_ncms(usar_snapshot=True)[:30]]
+    for codigo in codigos:
+        tarefa = executor.submeter(CANAL_CONSULTA, consulta_lenta, codigo,
+                                   ao_concluir=lambda resultado: recebidos.append(resultado[0].codigo))
+    widget.rodar_pendentes(executor)
+
+    print(f"Consulta isolada: {isolada_ms:.1f} ms | última de 30 cliques: {tarefa.tempo_ms:.1f} ms")
+    print(f"Estatísticas: {executor.estatisticas()}")
+    if recebidos == [codigos[-1]] and tarefa.tempo_ms < isolada_ms * 3:
+        print(f"✅ Apenas o último NCM ({codigos[-1]}) foi exibido, sem fila acumulada")
+    else:
+        print(f"❌ FAIL: recebidos={recebidos}")
+    executor.encerrar()
+    print()
+
+
+def testar_erro_progresso_cancelamento(widget):
+    """Erros vão para ao_erro, o progresso chega em ordem e canais cancelados não entregam nada."""
+    print("=== Testando erro, progresso e cancelamento ===")
+    executor = ExecutorConsultas(widget)
+
+    erros = []
+    executor.submeter("erro", lambda: 1 / 0, ao_erro=erros.append)
+
+    progresso = []
+
+    def contar(total, tarefa):
+        for atual in range(1, total + 1):
+            tarefa.verificar_cancelamento()
+            tarefa.informar_progresso(atual, total)
+        return total
+
+    concluidas = []
+    executor.submeter("progresso", contar, 5, ao_progresso=lambda atual, total, mensagem: progresso.append(atual),
+                      ao_concluir=concluidas.append)
+
+    cancelados = []
+    executor.submeter("cancelado", time.sleep, 0.1, ao_concluir=cancelados.append)
+    executor.cancelar("cancelado")
+
+    ocioso = widget.rodar_pendentes(executor)
+    print(f"Erros: {[type(e).__name__ for e in erros]} | progresso: {progresso} | concluídas: {concluidas}")
+    if (ocioso and len(erros) == 1 and isinstance(erros[0], ZeroDivisionError)
+            and progresso == [1, 2, 3, 4, 5] and concluidas == [5] and not cancelados):
+        print("✅ Erro, progresso e cancelamento tratados")
+    else:
+        print(f"❌ FAIL: ocioso={ocioso}, cancelados={cancelados}")
+    executor.encerrar()
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO EXECUTOR DE CONSULTAS\n")
+    widget = WidgetSimulado()
+    database.obter_snapshot()
+
+    testar_resultado(widget)
+    testar_cliques_rapidos(widget)
+    testar_erro_progresso_cancelamento(widget)
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
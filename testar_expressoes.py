@@ -0,0 +1,146 @@
+"""
+Teste do compilador de expressões do TRATAMENTO_TRIBUTARIO: sintaxe e
+precedência, avaliação por item e por colunas, compilação de todos os
+tratamentos da base e custo por item.
+"""
+import random
+import time
+from decimal import Decimal
+import database
+import expressoes
+
+
+def testar_sintaxe():
+    """Precedência, parênteses, sinais e erros de sintaxe."""
+    print("=== Testando sintaxe e precedência ===")
+    variaveis = {'a': 2.0, 'b': 3.0, 'c': 4.0}
+    casos = [
+        ("a+b*c", 14.0), ("(a+b)*c", 20.0), ("a-b-c", -5.0), ("c/a/a", 1.0),
+        ("-a*b", -6.0), ("-(a+b)", -5.0), ("a*-b", -6.0), ("+a", 2.0),
+        ("1-100/100", 0.0), ("2.08/100*c", 0.0832), (" a * ( 1 - 0.5 ) ", 1.0),
+    ]
+    falhas = [(texto, esperado, expressoes.compilar(texto).avaliar(variaveis))
+              for texto, esperado in casos
+              if abs(expressoes.compilar(texto).avaliar(variaveis) - esperado) > 1e-12]
+
+    invalidas = ["a+", "(a+b", "a b", "a+*b", "a^2", "1.2.3", "__import__('os')", ")"]
+    aceitas = []
+    for texto in invalidas:
+        try:
+            expressoes.compilar(texto)
+            aceitas.append(texto)
+        except expressoes.ExpressaoInvalida:
+            pass
+
+    constante = expressoes.compilar("(1-100/100)*3")
+    vazias = (expressoes.compilar(""), expressoes.compilar(None))
+    if not falhas and not aceitas and constante.constante == 0.0 and vazias == (None, None):
+        print(f"✅ {len(casos)} expressões corretas, {len(invalidas)} inválidas rejeitadas, constantes calculadas")
+    else:
+        print(f"❌ FAIL: {falhas}, aceitas {aceitas}, constante {constante.constante}")
+
+    try:
+        expressoes.compilar("a*b").avaliar({'a': 1})
+        print("❌ FAIL: variável ausente aceita")
+    except ValueError as erro:
+        print(f"✅ Variável ausente: {erro}")
+    print()
+
+
+def testar_colunas():
+    """Avaliação por colunas igual à avaliação item a item, também com Decimal."""
+    print("=== Testando avaliação por colunas ===")
+    expressao = expressoes.compilar("baseCalculo*aliquotaAdValorem+quantidade*aliquotaAdRem")
+    aleatorio = random.Random(16)
+    colunas = {
+        'baseCalculo': [aleatorio.uniform(0, 1000) for _ in range(1000)],
+        'quantidade': [aleatorio.randint(1, 50) for _ in range(1000)],
+        'aliquotaAdValorem': 0.1,
+        'aliquotaAdRem': [aleatorio.uniform(0, 2) for _ in range(1000)],
+    }
+    por_colunas = expressao.avaliar_colunas(colunas)
+    por_item = [expressao.avaliar({nome: valor[indice] if isinstance(valor, list) else valor
+                                   for nome, valor in colunas.items()})
+                for indice in range(1000)]
+
+    exata = expressoes.compilar("aliquota*(1-percentualReducao)", numero=Decimal)
+    decimal_ok = exata.avaliar({'aliquota': Decimal("0.9"), 'percentualReducao': Decimal("0.6")}) == Decimal("0.36")
+    constante = expressoes.compilar("0").avaliar_colunas({'baseCalculo': [1, 2, 3]})
+
+    if por_colunas == por_item and decimal_ok and constante == [0.0, 0.0, 0.0]:
+        print("✅ 1000 itens iguais por colunas e por item; Decimal exato; constante expandida")
+    else:
+        print(f"❌ FAIL: colunas {por_colunas == por_item}, decimal {decimal_ok}, constante {constante}")
+    print()
+
+
+def testar_tratamentos():
+    """Todos os tratamentos da base compilam, em ordem de dependência, uma vez por versão."""
+    print("=== Testando tratamentos da base ===")
+    catalogo = database.obter_catalogo_tratamentos()
+    inicio = time.perf_counter()
+    catalogo.garantir_atualizado()
+    print(f"Compilação: {(time.perf_counter() - inicio) * 1000:.2f} ms | {catalogo.estatisticas()}")
+
+    integral = catalogo.obter(3)
+    exato = expressoes.CatalogoTratamentos(database.obter_conexao, numero=Decimal)
+    resultado = exato.obter(3).calcular({
+        'aliquota': Decimal("0.09"), 'percentualReducao': Decimal("0.6"),
+        'baseCalculoInformada': Decimal("1000.00"),
+        'impostoSeletivoInformado': Decimal(0), 'impostoSeletivoCalculado': Decimal(0),
+    })
+    print(f"{integral.descricao} (Decimal): {resultado}")
+
+    mistura = catalogo.obter(26)
+    ordem = [saida for saida, _ in mistura.passos]
+    ordem_ok = ordem.index('aliquota') < ordem.index('tributoDevido') and 'aliquota' not in mistura.entradas
+
+    catalogo._versao = "versao anterior"
+    catalogo._ultima_verificacao = 0.0
+    recompilado = catalogo.obter(3) is not integral and catalogo.estatisticas()['compilacoes'] == 2
+
+    if (resultado['tributoDevido'] == Decimal("36") and ordem_ok and recompilado
+            and catalogo.estatisticas()['tratamentos'] == 40 and catalogo.por_classificacao(1, "2027-01-01")):
+        print("✅ 40 tratamentos compilados, dependências ordenadas e recompilação na nova versão")
+    else:
+        print(f"❌ FAIL: ordem {ordem}, recompilado {recompilado}")
+    print()
+
+
+def testar_desempenho(quantidade=200000):
+    """Custo por item da expressão compilada: item a item e por colunas."""
+    print(f"=== Testando desempenho ({quantidade} itens) ===")
+    tratamento = database.buscar_tratamento_tributario(3)
+    aleatorio = random.Random(3)
+    bases = [aleatorio.uniform(1, 10000) for _ in range(quantidade)]
+    colunas = {'aliquota': 0.09, 'percentualReducao': 0.6, 'baseCalculoInformada': bases,
+               'impostoSeletivoInformado': 0.0, 'impostoSeletivoCalculado': 0.0}
+
+    inicio = time.perf_counter()
+    for base in bases:
+        tratamento.calcular({'aliquota': 0.09, 'percentualReducao': 0.6, 'baseCalculoInformada': base,
+                             'impostoSeletivoInformado': 0.0, 'impostoSeletivoCalculado': 0.0})
+    tempo_item = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultado = tratamento.calcular_colunas(colunas)
+    tempo_colunas = time.perf_counter() - inicio
+
+    print(f"Item a item: {tempo_item / quantidade * 1e6:.2f} µs/item | "
+          f"colunas: {tempo_colunas / quantidade * 1e6:.3f} µs/item")
+    if len(resultado['tributoDevido']) == quantidade:
+        print("✅ Tratamento aplicado a todos os itens")
+    else:
+        print("❌ FAIL: resultado incompleto")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO COMPILADOR DE EXPRESSÕES\n")
+    testar_sintaxe()
+    testar_colunas()
+    testar_tratamentos()
+    testar_desempenho()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
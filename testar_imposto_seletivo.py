@@ -0,0 +1,191 @@
+"""
+Teste do Imposto Seletivo sobre produtos: alíquotas iguais às da consulta
+SQL por prefixo de NCM, exceções, cálculo ad valorem + ad rem com unidade e
+vazão do lote com o IS preenchido.
+"""
+import random
+import sqlite3
+import time
+from decimal import Decimal
+import database
+import calculo_tributos
+import imposto_seletivo
+
+DATAS = ["2026-06-15", "2027-03-01", "2029-07-01", "2033-12-31"]
+
+_SQL_AD_VALOREM = """
+    SELECT a.AADV_VALOR
+    FROM ALIQUOTA_AD_VALOREM_PRODUTO p
+    JOIN ALIQUOTA_AD_VALOREM a ON a.AADV_ID = p.AAVP_AADV_ID
+    JOIN TRIBUTO t ON t.TBTO_ID = a.AADV_TBTO_ID
+    WHERE :ncm LIKE p.AAVP_NCM_CD || '%' AND t.TBTO_SIGLA = 'IS'
+      AND p.AAVP_INICIO_VIGENCIA <= :data AND (p.AAVP_FIM_VIGENCIA IS NULL OR p.AAVP_FIM_VIGENCIA >= :data)
+      AND a.AADV_INICIO_VIGENCIA <= :data AND (a.AADV_FIM_VIGENCIA IS NULL OR a.AADV_FIM_VIGENCIA >= :data)
+      AND NOT EXISTS (
+          SELECT 1 FROM EXCECAO_AD_VALOREM_PRODUTO e
+          WHERE e.EAVP_AAVP_ID = p.AAVP_ID AND :ncm LIKE e.EAVP_NCM_CD || '%'
+            AND e.EAVP_INICIO_VIGENCIA <= :data
+            AND (e.EAVP_FIM_VIGENCIA IS NULL OR e.EAVP_FIM_VIGENCIA >= :data))
+    ORDER BY length(p.AAVP_NCM_CD) DESC, p.AAVP_INICIO_VIGENCIA DESC, p.AAVP_ID
+    LIMIT 1
+"""
+
+_SQL_AD_REM = """
+    SELECT a.AARE_VALOR, u.UNMD_SIGLA
+    FROM ALIQUOTA_AD_REM_PRODUTO p
+    JOIN ALIQUOTA_AD_REM a ON a.AARE_ID = p.AARP_AARE_ID
+    JOIN TRIBUTO t ON t.TBTO_ID = a.AARE_TBTO_ID
+    LEFT JOIN UNIDADE_MEDIDA u ON u.UNMD_ID = a.AARE_UNMD_ID
+    WHERE :ncm LIKE p.AARP_NCM_CD || '%' AND t.TBTO_SIGLA = 'IS'
+      AND p.AARP_INICIO_VIGENCIA <= :data AND (p.AARP_FIM_VIGENCIA IS NULL OR p.AARP_FIM_VIGENCIA >= :data)
+      AND a.AARE_INICIO_VIGENCIA <= :data AND (a.AARE_FIM_VIGENCIA IS NULL OR a.AARE_FIM_VIGENCIA >= :data)
+    ORDER BY length(p.AARP_NCM_CD) DESC, p.AARP_INICIO_VIGENCIA DESC, p.AARP_ID
+    LIMIT 1
+"""
+
+
+def _ncms_com_seletivo():
+    cur = database.obter_conexao().cursor()
+    prefixos = [linha[0] for linha in cur.execute(
+        "SELECT AAVP_NCM_CD FROM ALIQUOTA_AD_VALOREM_PRODUTO UNION SELECT AARP_NCM_CD FROM ALIQUOTA_AD_REM_PRODUTO")]
+    return sorted({ncm[0] for ncm in database.obter_snapshot().ncms
+                   if any(ncm[0].startswith(prefixo) for prefixo in prefixos)})
+
+
+def testar_equivalencia_sql():
+    """Alíquotas do IS de cada NCM tributado e data iguais às da consulta SQL."""
+    print("=== Testando equivalência com a consulta SQL ===")
+    cur = database.obter_conexao().cursor()
+    resolvedor = database.obter_imposto_seletivo()
+    ncms = _ncms_com_seletivo()
+    divergencias = []
+    com_imposto = 0
+    for codigo in ncms + ["30049069"]:
+        for data in DATAS:
+            parametros = {'ncm': codigo, 'data': data}
+            ad_valorem = cur.execute(_SQL_AD_VALOREM, parametros).fetchone()
+            ad_rem = cur.execute(_SQL_AD_REM, parametros).fetchone() or (None, None)
+            esperado = None
+            if ad_valorem or ad_rem[0] is not None:
+                esperado = imposto_seletivo.AliquotaSeletivo(
+                    "IS", ad_valorem[0] if ad_valorem else None, *ad_rem)
+            obtido = resolvedor.aliquota_seletivo(codigo, data)
+            com_imposto += obtido is not None
+            if obtido != esperado:
+                divergencias.append((codigo, data, obtido, esperado))
+
+    print(f"{len(ncms)} NCMs com IS x {len(DATAS)} datas: {com_imposto} com alíquota | "
+          f"{resolvedor.estatisticas()}")
+    if not divergencias and com_imposto > 0:
+        print("✅ Alíquotas iguais à consulta SQL (prefixos, vigência e exceções)")
+    else:
+        print(f"❌ FAIL: {len(divergencias)} divergências, ex.: {divergencias[:3]}")
+    print()
+
+
+def testar_excecao():
+    """Uma exceção cadastrada retira o vínculo herdado do prefixo só no NCM excetuado."""
+    print("=== Testando exceções ===")
+    copia = sqlite3.connect(":memory:")
+    database.obter_conexao().backup(copia)
+    proprios = {linha[0] for linha in copia.execute("SELECT AAVP_NCM_CD FROM ALIQUOTA_AD_VALOREM_PRODUTO")}
+    resolvedor_atual = database.obter_imposto_seletivo()
+    for id_prefixo, prefixo in copia.execute("""
+            SELECT AAVP_ID, AAVP_NCM_CD FROM ALIQUOTA_AD_VALOREM_PRODUTO
+            WHERE length(AAVP_NCM_CD) < 8 ORDER BY AAVP_ID
+    """).fetchall():
+        # NCMs que só herdam o vínculo do prefixo
+        herdeiros = [ncm[0] for ncm in database.obter_snapshot().ncms
+                     if ncm[0].startswith(prefixo) and len(ncm[0]) > len(prefixo)
+                     and not any(ncm[0][:tamanho] in proprios for tamanho in range(len(prefixo) + 1, 9))
+                     and resolvedor_atual.aliquota_seletivo(ncm[0], "2027-03-01")]
+        # Dois NCMs fora da subárvore um do outro
+        vizinhos = [codigo for codigo in herdeiros[1:] if not codigo.startswith(herdeiros[0])]
+        if vizinhos:
+            break
+    excetuado, vizinho = herdeiros[0], vizinhos[0]
+    copia.execute("""
+        INSERT INTO EXCECAO_AD_VALOREM_PRODUTO (EAVP_NCM_CD, EAVP_AAVP_ID, EAVP_INICIO_VIGENCIA, EAVP_FIM_VIGENCIA)
+        VALUES (?, ?, '2027-01-01', '2027-12-31')
+    """, (excetuado, id_prefixo))
+    resolvedor = imposto_seletivo.ResolvedorImpostoSeletivo(copia)
+    copia.close()
+
+    antes = database.obter_imposto_seletivo().aliquota_seletivo(excetuado, "2027-03-01")
+    durante = resolvedor.aliquota_seletivo(excetuado, "2027-03-01")
+    depois = resolvedor.aliquota_seletivo(excetuado, "2028-03-01")
+    vizinho_durante = resolvedor.aliquota_seletivo(vizinho, "2027-03-01")
+    print(f"Prefixo {prefixo}: {excetuado} antes {antes}, com exceção {durante}, "
+          f"após a exceção {depois}; {vizinho} {vizinho_durante}")
+    if antes is not None and durante is None and depois is not None and vizinho_durante is not None:
+        print("✅ Exceção aplicada apenas ao NCM e à vigência cadastrados")
+    else:
+        print("❌ FAIL: exceção não respeitada")
+    print()
+
+
+def testar_calculo():
+    """IS = base * ad valorem + quantidade * ad rem, exato em centavos; unidade conferida."""
+    print("=== Testando cálculo ad valorem + ad rem ===")
+    resolvedor = database.obter_imposto_seletivo()
+    aliquota = resolvedor.aliquota_seletivo("24021000", "2028-01-01")
+    itens = [
+        ("24021000", "100.00", 10, "2028-01-01", None, "VN"),
+        ("24021000", "100.00", 10, "2028-01-01", None, "kg"),
+        ("24021000", "100.00", "2.5", "2028-01-01"),
+        ("22030000", "1000.00", 1, "2029-07-01", None, "LT"),
+        ("30049069", "1000.00", 1, "2029-07-01", None, "UN"),
+    ]
+    resultado = calculo_tributos.calcular_itens(itens)
+    obtidos = [resultado.item(indice)["IS"] for indice in range(len(itens))]
+    ad_valorem = Decimal(str(aliquota.ad_valorem)) / 100
+    ad_rem = Decimal(str(aliquota.ad_rem))
+    cerveja = Decimal(str(resolvedor.aliquota_seletivo("22030000", "2029-07-01").ad_valorem)) / 100
+    esperados = [
+        calculo_tributos.quantizar(Decimal("100.00") * ad_valorem + 10 * ad_rem),
+        None,
+        calculo_tributos.quantizar(Decimal("100.00") * ad_valorem + Decimal("2.5") * ad_rem),
+        calculo_tributos.quantizar(Decimal("1000.00") * cerveja),
+        None,
+    ]
+    print(f"Cigarros {aliquota}: IS {obtidos[0]}; unidades incompatíveis {resultado.unidades_incompativeis}")
+    if obtidos == esperados and resultado.unidades_incompativeis == [1] and resultado.item(1)["CBS"] is not None:
+        print("✅ IS exato; item com unidade diferente sinalizado sem perder CBS/IBS")
+    else:
+        print(f"❌ FAIL: {obtidos} != {esperados}")
+    print()
+
+
+def testar_vazao(quantidade=1_000_000):
+    """Lote de 1 milhão de itens com metade dos NCMs sujeitos ao IS."""
+    print(f"=== Testando vazão ({quantidade} itens) ===")
+    aleatorio = random.Random(23)
+    ncms_seletivo = aleatorio.sample(_ncms_com_seletivo(), 100)
+    ncms = ncms_seletivo + [ncm[0] for ncm in aleatorio.sample(database.obter_snapshot().ncms, 100)]
+    escolhidos = aleatorio.choices(ncms, k=quantidade)
+    bases = [f"{aleatorio.randint(1, 99999)}.{aleatorio.randint(0, 99):02d}" for _ in range(quantidade)]
+    quantidades = [aleatorio.randint(1, 50) for _ in range(quantidade)]
+    datas = aleatorio.choices(DATAS, k=quantidade)
+
+    inicio = time.perf_counter()
+    resultado = calculo_tributos.calcular_lote(escolhidos, bases, quantidades, datas)
+    tempo = time.perf_counter() - inicio
+    com_imposto = sum(valor is not None for valor in resultado.centavos["IS"])
+    print(f"{quantidade} itens em {tempo:.2f} s ({quantidade / tempo:,.0f} itens/s); "
+          f"{com_imposto} com IS, total IS {resultado.totais()['IS']}")
+    if len(resultado) == quantidade and com_imposto > 0 and tempo < 30:
+        print("✅ Lote com IS calculado em segundos")
+    else:
+        print("❌ FAIL: lote incompleto ou lento")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO IMPOSTO SELETIVO SOBRE PRODUTOS\n")
+    testar_equivalencia_sql()
+    testar_excecao()
+    testar_calculo()
+    testar_vazao()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
@@ -0,0 +1,129 @@
+"""
+Teste do índice FTS5 de descrições: acentos, prefixos, relevância,
+reconstrução por versão da base, buscas em andamento durante a
+atualização e desempenho.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import database
+import indice_busca
+
+
+def testar_acentos_e_prefixos():
+    """Verifica a busca sem acentos/maiúsculas e por prefixo."""
+    print("=== Testando acentos e prefixos ===")
+    casos = [("agua mineral", "ÁGUA MINERAL"), ("cafe", "Café"), ("arro", "arroz")]
+    for texto_a, texto_b in casos:
+        a = database.buscar_por_descricao(texto_a)
+        b = database.buscar_por_descricao(texto_b)
+        situacao = "✅" if a and {c for c, _ in a} >= {c for c, _ in b} else "❌ FAIL:"
+        print(f"{situacao} '{texto_a}' ({len(a)}) x '{texto_b}' ({len(b)})")
+
+    resultados = database.buscar_por_descricao("arroz")
+    print(f"Mais relevante para 'arroz': {resultados[0][0]} - {resultados[0][1]}")
+    print(f"NBS 'transporte escolar': {database.buscar_nbs_por_descricao('transporte escolar')[:1]}")
+    print()
+
+
+def testar_reconstrucao():
+    """Simula uma nova versão da base numa cópia do banco e confere a reconstrução."""
+    print("=== Testando reconstrução por versão ===")
+    pasta = tempfile.mkdtemp()
+    try:
+        copia = os.path.join(pasta, "calculadora.db")
+        shutil.copy(database.DB_PATH, copia)
+        indice = indice_busca.IndiceBusca(copia, lambda: sqlite3.connect(copia))
+        indice.buscar("arroz")
+
+        conn = sqlite3.connect(copia)
+        conn.execute("""
+            INSERT INTO VERSAO_BASE_DADO (VRBD_ID, VRBD_DESCRICAO, VRBD_VERSAO_BASE_DADO)
+            SELECT MAX(VRBD_ID) + 1, 'Teste', 'v9999' FROM VERSAO_BASE_DADO
+        """)
+        conn.execute("UPDATE NCM SET NCM_DESCRICAO = 'Arroz especial de teste' WHERE NCM_CD = '01'")
+        conn.commit()
+        conn.close()
+
+        indice._ultima_verificacao = 0.0
+        novos = [c for c, _, _ in indice.buscar("arroz especial")]
+        estatisticas = indice.estatisticas()
+        if estatisticas['reconstrucoes'] == 2 and '01' in novos:
+            print(f"✅ Índice reconstruído para {estatisticas['versao']}")
+        else:
+            print(f"❌ FAIL: {estatisticas}")
+        indice.fechar()
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    print()
+
+
+def testar_busca_durante_atualizacao():
+    """Uma mudança da base detectada por outra thread não fecha a conexão de uma busca em andamento."""
+    print("=== Testando busca durante a atualização ===")
+    indice = database.obter_indice_busca()
+    indice.garantir_atualizado()
+    buscando = threading.Event()
+    atualizado = threading.Event()
+    resultado = {}
+
+    def buscar():
+        cursor = indice._pool.obter().execute("SELECT codigo FROM BUSCA")
+        cursor.fetchone()
+        buscando.set()
+        atualizado.wait()
+        try:
+            resultado['linhas'] = len(cursor.fetchall())
+            resultado['seguinte'] = len(indice.buscar("arroz"))
+        except sqlite3.ProgrammingError as erro:
+            resultado['erro'] = str(erro)
+
+    thread = threading.Thread(target=buscar)
+    thread.start()
+    buscando.wait()
+    # Simula a troca da assinatura do banco, percebida por esta thread
+    indice._assinatura = None
+    indice._ultima_verificacao = 0.0
+    indice.garantir_atualizado()
+    atualizado.set()
+    thread.join()
+    print(f"Busca em andamento: {resultado}")
+    if 'erro' not in resultado and resultado.get('linhas') and resultado.get('seguinte'):
+        print("✅ Busca concluída e a seguinte feita numa conexão nova")
+    else:
+        print("❌ FAIL: conexão fechada durante a busca")
+    print()
+
+
+def testar_desempenho():
+    """Compara o índice FTS5 com o LIKE '%texto%'."""
+    print("=== Testando desempenho ===")
+    termos = ["arroz", "agua", "parafusos de aco", "cafe torrado", "medicamentos", "carne bovina"]
+    repeticoes = 200
+    database.buscar_por_descricao("arroz")
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for termo in termos:
+            database.buscar_por_descricao(termo)
+    tempo_fts = (time.perf_counter() - inicio) / (repeticoes * len(termos))
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for termo in termos:
+            database._buscar_por_descricao_like(termo)
+    tempo_like = (time.perf_counter() - inicio) / (repeticoes * len(termos))
+
+    print(f"FTS5: {tempo_fts * 1000:.3f} ms por busca")
+    print(f"LIKE: {tempo_like * 1000:.3f} ms por busca")
+    print()
+
+
+if __name__ == "__main__":
+    testar_acentos_e_prefixos()
+    testar_reconstrucao()
+    testar_busca_durante_atualizacao()
+    testar_desempenho()
@@ -0,0 +1,94 @@
+"""
+Teste da lista virtualizada: tempo de carga com todos os NCMs, janela de
+linhas materializadas, paginação e ir para código.
+Requer um display (o teste é ignorado quando o Tk não pode ser iniciado).
+"""
+import time
+import tkinter as tk
+import database
+from lista_virtual import ListaVirtual
+
+
+def testar_carga(lista, ncms):
+    """Carregar a lista completa deve materializar apenas as linhas visíveis."""
+    print("=== Testando carga da lista completa ===")
+    inicio = time.perf_counter()
+    lista.definir_itens(ncms, ordenado_por_codigo=True)
+    tempo_total = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    lista.definir_itens(ncms[:10], ordenado_por_codigo=True)
+    tempo_pequena = time.perf_counter() - inicio
+    lista.definir_itens(ncms, ordenado_por_codigo=True)
+
+    linhas = lista.listbox.size()
+    print(f"{len(ncms)} NCMs: {tempo_total * 1000:.2f} ms | 10 NCMs: {tempo_pequena * 1000:.2f} ms")
+    print(f"Linhas materializadas no Listbox: {linhas}")
+    if linhas <= 6:
+        print("✅ Apenas a janela visível foi materializada")
+    else:
+        print(f"❌ FAIL: {linhas} linhas materializadas")
+    print()
+
+
+def testar_paginacao(lista, ncms):
+    """Páginas seguintes e anteriores trocam apenas a janela visível."""
+    print("=== Testando paginação ===")
+    lista.proxima_pagina()
+    lista.proxima_pagina()
+    primeira_linha = lista.listbox.get(0)
+    print(f"Página {lista.pagina_atual()}: {primeira_linha}")
+    lista.pagina_anterior()
+    print(f"Página {lista.pagina_atual()}: {lista.listbox.get(0)}")
+
+    lista.rolar(len(ncms))
+    ultima_linha = lista.listbox.get(tk.END)
+    if ultima_linha.startswith(ncms[-1][0]):
+        print(f"✅ Rolagem até o fim exibe o último NCM: {ultima_linha[:40]}")
+    else:
+        print(f"❌ FAIL: última linha {ultima_linha[:40]}")
+    print()
+
+
+def testar_ir_para_codigo(lista, ncms):
+    """Ir para código usa busca binária na lista ordenada."""
+    print("=== Testando ir para código ===")
+    selecionados = []
+    lista.ao_selecionar = selecionados.append
+
+    for codigo in (ncms[len(ncms) // 2][0], "8471", "0101", "9999999999"):
+        inicio = time.perf_counter()
+        indice = lista.ir_para_codigo(codigo)
+        tempo = (time.perf_counter() - inicio) * 1000
+        if indice is None:
+            print(f"{codigo}: não encontrado ({tempo:.3f} ms)")
+            continue
+        item = lista.item_selecionado()
+        status = "✅" if item[0].startswith(codigo) else "❌ FAIL:"
+        print(f"{status} {codigo} -> índice {indice}: {item[0]} - {item[1][:40]} ({tempo:.3f} ms)")
+
+    lista.listbox.event_generate("<Return>")
+    print(f"Seleção notificada: {[item[0] for item in selecionados]}")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DA LISTA VIRTUALIZADA\n")
+    try:
+        janela = tk.Tk()
+    except tk.TclError as e:
+        print(f"⚠️ Teste ignorado, Tk indisponível: {e}")
+        raise SystemExit(0)
+
+    janela.withdraw()
+    lista = ListaVirtual(janela, altura=6, largura=100)
+    lista.pack(fill=tk.BOTH, expand=True)
+    ncms = database.buscar_ncms(usar_snapshot=True)
+
+    testar_carga(lista, ncms)
+    testar_paginacao(lista, ncms)
+    testar_ir_para_codigo(lista, ncms)
+
+    janela.destroy()
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
@@ -0,0 +1,73 @@
+"""
+Teste da consulta em lote de NCMs: equivalência com a consulta individual e vazão.
+"""
+import random
+import time
+import database
+
+
+def obter_codigos_exemplo(quantidade, semente=2026):
+    """Sorteia códigos de NCM existentes (com repetições, como itens de notas fiscais)."""
+    codigos = [linha[0] for linha in database.buscar_ncms()]
+    gerador = random.Random(semente)
+    return [gerador.choice(codigos) for _ in range(quantidade)] + ["99999999"]
+
+
+def testar_equivalencia():
+    """Compara o resultado do lote com chamadas individuais."""
+    print("=== Testando equivalência com a consulta individual ===")
+    codigos = obter_codigos_exemplo(300)
+    for incluir_herdadas, usar_snapshot in ((False, False), (True, False), (False, True)):
+        lote = database.buscar_informacoes_completas_lote(codigos, incluir_herdadas, usar_snapshot)
+        divergencias = 0
+        for codigo in set(codigos):
+            if usar_snapshot:
+                # O snapshot devolve os modelos estruturados
+                if lote[codigo] != database.buscar_informacoes_estruturadas_ncm(codigo, incluir_herdadas):
+                    divergencias += 1
+                continue
+            dados_ncm, resultados = database.buscar_informacoes_completas_ncm(codigo, incluir_herdadas)
+            dados_lote, resultados_lote = lote[codigo]
+            if dados_ncm != dados_lote or sorted(resultados or [], key=repr) != sorted(resultados_lote or [], key=repr):
+                divergencias += 1
+        modo = "com herança" if incluir_herdadas else "regras diretas"
+        if usar_snapshot:
+            modo += ", snapshot"
+        if divergencias == 0:
+            print(f"✅ {len(lote)} códigos distintos iguais à consulta individual ({modo})")
+        else:
+            print(f"❌ FAIL: {divergencias} códigos divergentes ({modo})")
+    print()
+
+
+def testar_vazao():
+    """Mede a vazão numa lista de 10.000 códigos: individual x lote x snapshot em memória."""
+    print("=== Testando vazão com 10.000 códigos ===")
+    codigos = obter_codigos_exemplo(10000)
+
+    inicio = time.perf_counter()
+    for codigo in codigos:
+        # sem_cache: mede as consultas ao banco, não os acertos do cache de resultados
+        database.buscar_informacoes_completas_ncm.sem_cache(codigo)
+    tempo_individual = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    lote = database.buscar_informacoes_completas_lote(codigos)
+    tempo_lote = time.perf_counter() - inicio
+
+    database.obter_snapshot()
+    inicio = time.perf_counter()
+    database.buscar_informacoes_completas_lote(codigos, usar_snapshot=True)
+    tempo_snapshot = time.perf_counter() - inicio
+
+    total = len(codigos)
+    print(f"Códigos: {total} ({len(lote)} distintos)")
+    print(f"Individual: {tempo_individual:.3f}s ({total / tempo_individual:,.0f} códigos/s)")
+    print(f"Lote SQL:   {tempo_lote:.3f}s ({total / tempo_lote:,.0f} códigos/s)")
+    print(f"Snapshot:   {tempo_snapshot:.3f}s ({total / tempo_snapshot:,.0f} códigos/s)")
+    print()
+
+
+if __name__ == "__main__":
+    testar_equivalencia()
+    testar_vazao()
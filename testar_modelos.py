@@ -0,0 +1,78 @@
+"""
+Teste do modelo tipado de resultados: equivalência entre SQL e snapshot
+e memória ocupada em comparação com as linhas planas da consulta completa.
+"""
+import sys
+import time
+import database
+
+EXEMPLOS = ["30049069", "30021590", "0102", "01069000", "10062010"]
+
+
+def tamanho_profundo(objeto, vistos=None):
+    """Soma sys.getsizeof do objeto e de tudo o que ele referencia (uma vez por objeto)."""
+    if vistos is None:
+        vistos = set()
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    tamanho = sys.getsizeof(objeto)
+    if isinstance(objeto, (tuple, list)):
+        tamanho += sum(tamanho_profundo(item, vistos) for item in objeto)
+    return tamanho
+
+
+def testar_equivalencia():
+    """Compara os modelos montados pelo SQL e pelo snapshot em memória."""
+    print("=== Testando equivalência SQL x snapshot ===")
+    lote = database.buscar_informacoes_estruturadas_lote(EXEMPLOS, incluir_herdadas=True)
+    for codigo in EXEMPLOS:
+        sql = database.buscar_informacoes_estruturadas_ncm(codigo, incluir_herdadas=True)
+        if sql == lote[codigo]:
+            print(f"✅ NCM {codigo}: {len(sql[1] or [])} regras iguais")
+        else:
+            print(f"❌ FAIL: NCM {codigo} divergente")
+
+    ncm, regras = lote[EXEMPLOS[0]]
+    reducao = regras[0].tributos[0].reducoes[0]
+    print(f"Exemplo: {ncm.codigo} / {regras[0].classificacao.codigo} / CST {regras[0].classificacao.cst} / "
+          f"{regras[0].tributos[0].sigla} redução {reducao.valor:.2f}% (isenção total: {reducao.isencao_total})")
+    print()
+
+
+def testar_memoria():
+    """Compara a memória das linhas planas com a dos modelos compartilhados do snapshot."""
+    print("=== Testando memória por NCM ===")
+    vistos_modelos = set()
+    for codigo in EXEMPLOS:
+        _, linhas = database.buscar_informacoes_completas_ncm(codigo)
+        _, regras = database.buscar_informacoes_estruturadas_lote([codigo])[codigo]
+        print(f"NCM {codigo}: linhas planas {tamanho_profundo(linhas or []) / 1024:.1f} KiB, "
+              f"modelos {tamanho_profundo(regras or [], vistos_modelos) / 1024:.1f} KiB "
+              f"(objetos compartilhados contados uma vez)")
+    print()
+
+
+def testar_desempenho():
+    """Mede a montagem dos modelos pelo SQL e pelo snapshot."""
+    print("=== Testando desempenho ===")
+    codigo = EXEMPLOS[0]
+    repeticoes = 200
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        # sem_cache: mede a montagem pelo SQL, não os acertos do cache de resultados
+        database.buscar_informacoes_estruturadas_ncm.sem_cache(codigo)
+    tempo_sql = (time.perf_counter() - inicio) / repeticoes
+    base = database.obter_snapshot()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        base.informacoes_estruturadas(codigo)
+    tempo_snapshot = (time.perf_counter() - inicio) / repeticoes
+    print(f"SQL: {tempo_sql * 1000:.2f} ms | Snapshot: {tempo_snapshot * 1000:.3f} ms")
+    print()
+
+
+if __name__ == "__main__":
+    testar_equivalencia()
+    testar_memoria()
+    testar_desempenho()
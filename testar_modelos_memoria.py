@@ -0,0 +1,118 @@
+"""
+Teste dos modelos compilados da memória de cálculo: resultado idêntico às
+substituições encadeadas anteriores para todos os textos da base, cache por
+texto e renderização de vários itens.
+"""
+import random
+import re
+import time
+import database
+import modelos_memoria
+
+MARCADORES = ['percentual_reducao', 'aliquota_ad_valorem', 'base_calculo', 'norma',
+              'tratamento', 'aliquota_ad_rem', 'quantidade', 'unidade']
+
+
+def processar_legado(memoria_calculo, **valores):
+    """Implementação anterior (str.replace encadeado + re.sub), usada como referência."""
+    if not memoria_calculo:
+        return "Memória de cálculo não disponível"
+    resultado = memoria_calculo
+    for nome in MARCADORES:
+        valor = valores.get(nome)
+        if valor is None:
+            continue
+        if nome in ('norma', 'tratamento', 'unidade'):
+            resultado = resultado.replace(f'[{nome}]', valor)
+            continue
+        try:
+            if isinstance(valor, str):
+                valor = float(valor)
+            resultado = resultado.replace(f'[{nome}]', f'{valor:.2f}')
+        except (ValueError, TypeError):
+            resultado = resultado.replace(f'[{nome}]', str(valor))
+    return re.sub(r'\[.*?\]', 'não especificado', resultado)
+
+
+def _textos_base():
+    conn = database.obter_conexao()
+    return [linha[0] for linha in conn.execute(
+        "SELECT DISTINCT CLTR_MEMORIA_CALCULO FROM CLASSIFICACAO_TRIBUTARIA")]
+
+
+def testar_equivalencia():
+    """Os modelos devem produzir exatamente o texto da implementação anterior."""
+    print("=== Testando equivalência com as substituições encadeadas ===")
+    textos = _textos_base() + [
+        None, "", "Sem marcadores.", "[desconhecido] e [base_calculo]",
+        "[norma][tratamento][norma]", "Colchete aberto [base_calculo",
+    ]
+    aleatorio = random.Random(17)
+    opcoes = {
+        'percentual_reducao': [None, 60.0, "30,5", "40", 100],
+        'aliquota_ad_valorem': [None, 0.9, "0.1", "abc"],
+        'base_calculo': [None, 1000.0, 12.345, "1e3"],
+        'norma': [None, "LC 214/2025", ""],
+        'tratamento': [None, "Tributação integral"],
+        'aliquota_ad_rem': [None, 1.5],
+        'quantidade': [None, 3, "2"],
+        'unidade': [None, "litro"],
+    }
+    comparacoes = 0
+    divergencias = []
+    for texto in textos:
+        for _ in range(200):
+            valores = {nome: aleatorio.choice(lista) for nome, lista in opcoes.items()}
+            esperado = processar_legado(texto, **valores)
+            obtido = database.processar_memoria_calculo(texto, **valores)
+            comparacoes += 1
+            if obtido != esperado:
+                divergencias.append((texto, valores, esperado, obtido))
+
+    print(f"{len(textos)} textos, {comparacoes} combinações | {modelos_memoria.estatisticas()}")
+    if not divergencias:
+        print("✅ Textos idênticos aos da implementação anterior")
+    else:
+        print(f"❌ FAIL: {len(divergencias)} divergências, ex.: {divergencias[0]}")
+
+    texto = textos[0]
+    if modelos_memoria.compilar_memoria(texto) is modelos_memoria.compilar_memoria("".join(list(texto))):
+        print("✅ Cada texto é compilado uma única vez")
+    else:
+        print("❌ FAIL: modelo recompilado")
+    print()
+
+
+def testar_itens():
+    """Renderização de vários itens com o mesmo modelo e comparação de tempo."""
+    print("=== Testando renderização de vários itens ===")
+    texto = max(_textos_base(), key=len)
+    modelo = modelos_memoria.compilar_memoria(texto)
+    itens = [{'base_calculo': 100.0 + indice, 'aliquota_ad_valorem': 0.9, 'percentual_reducao': 60.0,
+              'norma': "LC 214/2025", 'tratamento': "Tributação integral"} for indice in range(50000)]
+
+    inicio = time.perf_counter()
+    textos = modelo.renderizar_itens(itens)
+    tempo_modelo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    esperados = [processar_legado(texto, **item) for item in itens]
+    tempo_legado = time.perf_counter() - inicio
+
+    print(f"Modelo: {tempo_modelo / len(itens) * 1e6:.2f} µs/item | "
+          f"substituições encadeadas: {tempo_legado / len(itens) * 1e6:.2f} µs/item")
+    print(f"Exemplo: {textos[0]}")
+    if textos == esperados:
+        print(f"✅ {len(itens)} itens renderizados com o mesmo modelo")
+    else:
+        print("❌ FAIL: textos divergentes")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DOS MODELOS DE MEMÓRIA DE CÁLCULO\n")
+    testar_equivalencia()
+    testar_itens()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
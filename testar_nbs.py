@@ -0,0 +1,147 @@
+"""
+Teste das consultas de NBS: equivalência com a consulta SQL, herança das
+regras pelos níveis da NBS, códigos com pontos, alíquotas do IS sobre
+serviços e latência das consultas individuais e em lote.
+"""
+import time
+import database
+import snapshot
+
+_SQL_CST_NBS = """
+    SELECT DISTINCT
+        n.NBS_CD, n.NBS_DESCRICAO, st.SITR_CD, st.SITR_DESCRICAO,
+        ct.CLTR_CD, ct.CLTR_DESCRICAO, pr.PERE_VALOR, t.TBTO_SIGLA, t.TBTO_NOME
+    FROM NBS n
+    JOIN NBS_APLICAVEL na ON n.NBS_CD = na.NBSA_NBS_CD
+    JOIN CLASSIFICACAO_TRIBUTARIA ct ON na.NBSA_CLTR_ID = ct.CLTR_ID
+    LEFT JOIN SITUACAO_TRIBUTARIA st ON ct.CLTR_SITR_ID = st.SITR_ID
+    LEFT JOIN PERCENTUAL_REDUCAO pr ON ct.CLTR_ID = pr.PERE_CLTR_ID
+    LEFT JOIN TRIBUTO t ON pr.PERE_TBTO_ID = t.TBTO_ID
+    WHERE n.NBS_CD = ?
+    ORDER BY ct.CLTR_CD, t.TBTO_SIGLA, pr.PERE_VALOR DESC NULLS LAST
+"""
+
+
+def _codigos_nbs():
+    return [linha[0] for linha in database.obter_snapshot().nbss]
+
+
+def testar_equivalencia_sql():
+    """CST/cClassTrib/redução de todas as NBS iguais à consulta SQL."""
+    print("=== Testando equivalência com a consulta SQL ===")
+    cur = database.obter_conexao().cursor()
+    divergencias = []
+    com_regras = 0
+    for codigo in _codigos_nbs():
+        esperado = cur.execute(_SQL_CST_NBS, (codigo,)).fetchall()
+        obtido = database.buscar_cst_cclastrib_reducao_nbs(codigo)
+        com_regras += bool(obtido)
+        if obtido != esperado:
+            divergencias.append(codigo)
+    if not divergencias:
+        print(f"✅ {len(_codigos_nbs())} NBS iguais à consulta SQL ({com_regras} com regras próprias)")
+    else:
+        print(f"❌ FAIL: {len(divergencias)} divergências, ex.: {divergencias[:5]}")
+    print()
+
+
+def testar_heranca():
+    """As regras herdadas são as dos prefixos da NBS, da mais específica para a mais genérica."""
+    print("=== Testando herança pelos níveis da NBS ===")
+    base = database.obter_snapshot()
+    divergencias = 0
+    herdam = 0
+    for codigo in _codigos_nbs():
+        esperado = [regra[0] for tamanho in range(len(codigo), 0, -1)
+                    for regra in base.regras_por_nbs.get(codigo[:tamanho], [])]
+        obtido = [regra[0] for regra in base.regras_nbs(codigo, incluir_herdadas=True)]
+        divergencias += obtido != esperado
+        herdam += len(obtido) > len(base.regras_por_nbs.get(codigo, []))
+
+    nbs, regras = database.buscar_informacoes_estruturadas_nbs("1.2201.1", incluir_herdadas=True)
+    print(f"{herdam} NBS herdam regras; 1.2201.1 -> {nbs.codigo}: "
+          f"{[(regra.classificacao.codigo, regra.classificacao.cst) for regra in regras]}")
+    if divergencias == 0 and herdam > 0 and regras:
+        print("✅ Regras herdadas iguais às dos prefixos")
+    else:
+        print(f"❌ FAIL: {divergencias} divergências")
+    print()
+
+
+def testar_codigos_e_niveis():
+    """Códigos com pontos, níveis da nomenclatura, data de referência e item da LC 116."""
+    print("=== Testando códigos com pontos e níveis ===")
+    falhas = []
+    if database.buscar_nbs("1.0101.11.00") != database.buscar_nbs("101011100"):
+        falhas.append("código com pontos")
+    if database.buscar_nbs("999999999") is not None:
+        falhas.append("NBS inexistente")
+    if database.buscar_nbs("101011100", data_referencia="2024-12-31") is not None:
+        falhas.append("NBS fora da vigência")
+    nivel = database.buscar_nbs_por_prefixo("1.01")
+    if not nivel or any(not item.codigo.startswith("101") for item in nivel):
+        falhas.append("nível 1.01")
+    esperados_lc116 = {linha[0] for linha in database.obter_snapshot().nbss if linha[2]}
+    obtidos_lc116 = {item.codigo for itens in database.obter_snapshot().nbs_por_lc116.values() for item in itens}
+    if obtidos_lc116 != esperados_lc116:
+        falhas.append("LC 116")
+    print(f"Nível 1.01: {len(nivel)} NBS; itens da LC 116 mapeados: {len(database.obter_snapshot().nbs_por_lc116)}")
+    if not falhas:
+        print("✅ Códigos normalizados, níveis e vigência corretos")
+    else:
+        print(f"❌ FAIL: {falhas}")
+    print()
+
+
+def testar_aliquotas_servico():
+    """Alíquota ad valorem do IS sobre serviços só dentro da vigência."""
+    print("=== Testando alíquotas do IS sobre serviços ===")
+    cur = database.obter_conexao().cursor()
+    codigo, aadv_id = cur.execute(
+        "SELECT AAVS_NBS_CD, AAVS_AADV_ID FROM ALIQUOTA_AD_VALOREM_SERVICO LIMIT 1").fetchone()
+    valor = cur.execute("SELECT AADV_VALOR FROM ALIQUOTA_AD_VALOREM WHERE AADV_ID = ?", (aadv_id,)).fetchone()[0]
+    vigente = database.buscar_aliquotas_servico_nbs(codigo, "2027-06-01")
+    anterior = database.buscar_aliquotas_servico_nbs(codigo, "2026-06-01")
+    print(f"{codigo}: 2027-06-01 -> {vigente}; 2026-06-01 -> {anterior}")
+    if [linha[:2] for linha in vigente] == [("IS", valor)] and anterior == []:
+        print("✅ Alíquota do IS resolvida pela vigência")
+    else:
+        print("❌ FAIL: alíquotas do IS sobre serviços")
+    print()
+
+
+def testar_latencia():
+    """Consultas individuais e em lote sem SQL, com os modelos compartilhados."""
+    print("=== Testando latência ===")
+    codigos = _codigos_nbs()
+    database.buscar_informacoes_estruturadas_lote_nbs(codigos[:10], True, "2027-01-01")
+
+    inicio = time.perf_counter()
+    for codigo in codigos:
+        database.buscar_informacoes_estruturadas_nbs(codigo, True, "2027-01-01")
+    individual_us = (time.perf_counter() - inicio) / len(codigos) * 1e6
+
+    inicio = time.perf_counter()
+    lote = database.buscar_informacoes_estruturadas_lote_nbs(codigos * 10, True, "2027-01-01")
+    lote_ms = (time.perf_counter() - inicio) * 1000
+
+    individual = database.buscar_informacoes_estruturadas_nbs(codigos[-1], True, "2027-01-01")
+    print(f"Individual: {individual_us:.1f} µs/NBS; lote de {len(codigos) * 10} códigos: {lote_ms:.1f} ms")
+    if len(lote) == len(codigos) and lote[codigos[-1]] == individual:
+        print("✅ Lote igual à consulta individual")
+    else:
+        print("❌ FAIL: lote diferente da consulta individual")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DAS CONSULTAS DE NBS\n")
+    print(f"Snapshot: {snapshot.ler_versao_base(database.obter_conexao())}\n")
+    testar_equivalencia_sql()
+    testar_heranca()
+    testar_codigos_e_niveis()
+    testar_aliquotas_servico()
+    testar_latencia()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
@@ -0,0 +1,163 @@
+"""
+Teste do pool de conexões: reaproveitamento por thread, modo somente leitura e desempenho.
+"""
+import gc
+import threading
+import time
+import sqlite3
+import database
+from pool_conexoes import PoolConexoes
+
+
+def testar_reaproveitamento():
+    """Verifica se a mesma thread sempre recebe a mesma conexão."""
+    print("=== Testando reaproveitamento de conexões ===")
+    conn1 = database.obter_conexao()
+    conn2 = database.obter_conexao()
+    if conn1 is conn2:
+        print("✅ Mesma conexão reaproveitada na thread principal")
+    else:
+        print("❌ FAIL: conexões diferentes na mesma thread")
+
+    conexoes_threads = []
+
+    def consultar():
+        database.buscar_cst_cclastrib_reducao_ncm("100620")
+        conexoes_threads.append(database.obter_conexao())
+
+    threads = [threading.Thread(target=consultar) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    distintas = len({id(c) for c in conexoes_threads + [conn1]})
+    print(f"Conexões distintas entre 5 threads: {distintas}")
+    print()
+
+
+def testar_threads_encerradas():
+    """Verifica se a conexão de uma thread encerrada é fechada e sai do pool."""
+    print("=== Testando conexões de threads encerradas ===")
+    pool = PoolConexoes(database.DB_PATH)
+    pool.obter()
+    conexoes_threads = []
+
+    def consultar():
+        conexoes_threads.append(pool.obter())
+        pool.obter().execute("SELECT 1").fetchone()
+
+    for _ in range(3):
+        threads = [threading.Thread(target=consultar) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    gc.collect()
+
+    estatisticas = pool.estatisticas()
+    try:
+        conexoes_threads[0].execute("SELECT 1")
+        fechada = False
+    except sqlite3.ProgrammingError:
+        fechada = True
+    print(f"12 threads encerradas: {estatisticas['aberturas']} aberturas, "
+          f"{estatisticas['conexoes_abertas']} conexões abertas")
+    if estatisticas['conexoes_abertas'] == 1 and fechada:
+        print("✅ Conexões das threads encerradas fechadas; a da thread principal mantida")
+    else:
+        print("❌ FAIL: conexões de threads encerradas continuam abertas")
+    pool.fechar()
+    print()
+
+
+def testar_invalidacao():
+    """Verifica se invalidar() não fecha a conexão de outra thread durante a consulta."""
+    print("=== Testando invalidação com consultas em andamento ===")
+    pool = PoolConexoes(database.DB_PATH)
+    consultando = threading.Event()
+    invalidado = threading.Event()
+    resultado = {}
+
+    def consultar():
+        conn = pool.obter()
+        cursor = conn.execute("SELECT NCM_CD FROM NCM")
+        cursor.fetchone()
+        consultando.set()
+        invalidado.wait()
+        try:
+            resultado['linhas'] = len(cursor.fetchall())
+        except sqlite3.ProgrammingError as erro:
+            resultado['erro'] = erro
+        resultado['nova'] = pool.obter() is not conn
+        try:
+            conn.execute("SELECT 1")
+            resultado['antiga_fechada'] = False
+        except sqlite3.ProgrammingError:
+            resultado['antiga_fechada'] = True
+
+    thread = threading.Thread(target=consultar)
+    thread.start()
+    consultando.wait()
+    pool.invalidar()
+    invalidado.set()
+    thread.join()
+    print(f"Consulta em andamento após invalidar(): {resultado}")
+    if resultado.get('linhas') and resultado['nova'] and resultado['antiga_fechada']:
+        print("✅ Consulta concluída; a thread fechou a conexão antiga e abriu outra na chamada seguinte")
+    else:
+        print("❌ FAIL: invalidar() interrompeu a consulta ou manteve a conexão antiga")
+    pool.fechar()
+    print()
+
+
+def testar_somente_leitura():
+    """Verifica se o pool bloqueia escritas no banco."""
+    print("=== Testando modo somente leitura ===")
+    try:
+        database.obter_conexao().execute("CREATE TABLE TESTE_ESCRITA (ID INTEGER)")
+        print("❌ FAIL: escrita permitida no banco")
+    except sqlite3.OperationalError as e:
+        print(f"✅ Escrita bloqueada: {e}")
+    print()
+
+
+def _consultar_completo(conn, codigo):
+    """A mesma consulta de buscar_informacoes_completas_ncm, na conexão informada."""
+    conn.execute("SELECT NCM_CD, NCM_DESCRICAO, NCM_INICIO_VIGENCIA, NCM_FIM_VIGENCIA FROM NCM WHERE NCM_CD = ?",
+                 (codigo,)).fetchone()
+    return conn.execute(database._SQL_INFORMACOES_COMPLETAS.format(
+        origem_regras="NCM n JOIN NCM_APLICAVEL na ON n.NCM_CD = na.NCMA_NCM_CD",
+        filtro_ncm="n.NCM_CD = ?"
+    ), (codigo,)).fetchall()
+
+
+def testar_desempenho():
+    """Compara a mesma consulta pelo pool e com uma conexão nova por consulta."""
+    print("=== Testando desempenho ===")
+    exemplos = ["100620", "04011010", "220710", "847130", "851712"] * 100
+
+    inicio = time.perf_counter()
+    for codigo in exemplos:
+        _consultar_completo(database.obter_conexao(), codigo)
+    tempo_pool = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for codigo in exemplos:
+        conn = database.conectar()
+        _consultar_completo(conn, codigo)
+        conn.close()
+    tempo_avulso = time.perf_counter() - inicio
+
+    print(f"{len(exemplos)} consultas completas com pool: {tempo_pool:.3f}s")
+    print(f"{len(exemplos)} consultas completas abrindo conexão: {tempo_avulso:.3f}s")
+    print(f"Estatísticas do pool: {database.estatisticas_pool()}")
+    print()
+
+
+if __name__ == "__main__":
+    testar_reaproveitamento()
+    testar_threads_encerradas()
+    testar_invalidacao()
+    testar_somente_leitura()
+    testar_desempenho()
@@ -34,12 +34,12 @@ def testar_ncm_com_reducao():
         print(f"  NCMA_ID: {regra[4]}")
         print(f"  Tributo: {regra[21]} ({regra[22]})")
         print(f"  Alíquota: {regra[23]}")
-        print(f"  Percentual Redução: {regra[28]}")
-        print(f"  Início Redução: {regra[29]}")
-        print(f"  Fim Redução: {regra[30]}")
+        print(f"  Percentual Redução: {regra[30]}")
+        print(f"  Início Redução: {regra[31]}")
+        print(f"  Fim Redução: {regra[32]}")
         print()
         
-        if regra[28] is not None:
+        if regra[30] is not None:
             tem_reducoes = True
     
     if tem_reducoes:
@@ -62,9 +62,9 @@ def testar_ncm_com_reducao():
         # Verificar reduções
         tem_reducoes2 = False
         for regra in regras2[:3]:
-            if regra[28] is not None and regra[28] > 0:
+            if regra[30] is not None and regra[30] > 0:
                 tem_reducoes2 = True
-                print(f"  Redução encontrada: {regra[28]}% para tributo {regra[21]}")
+                print(f"  Redução encontrada: {regra[30]}% para tributo {regra[21]}")
         
         if not tem_reducoes2:
             print("  Nenhuma redução encontrada (como esperado)")
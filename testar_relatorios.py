@@ -0,0 +1,141 @@
+"""
+Teste da camada de relatórios compartilhada: agrupamento das linhas do banco,
+formatação das reduções, alíquota efetiva e cache por (tipo, código, versão).
+"""
+import time
+import database
+import relatorios
+
+
+def testar_formatacao():
+    """Formatação das reduções e cálculo da alíquota efetiva."""
+    print("=== Testando formatação e alíquota efetiva ===")
+    casos = [
+        ((None,), "Sem redução"),
+        ((None, "Não especificada"), "Não especificada"),
+        ((60.0,), "60.00%"),
+        (("30,5",), "30.50%"),
+        ((100.0,), "100.00% (fator especial)"),
+        ((10000.0,), "Isenção total (100%)"),
+        (("2026-01-01",), "Data inválida: 2026-01-01"),
+    ]
+    falhas = [(args, esperado, relatorios.formatar_reducao(*args))
+              for args, esperado in casos if relatorios.formatar_reducao(*args) != esperado]
+
+    efetivas = (relatorios.calcular_aliquota_efetiva(26.5, 60.0),
+                relatorios.calcular_aliquota_efetiva(26.5, 100.0),
+                relatorios.calcular_aliquota_efetiva(None, 60.0))
+    print(f"Alíquotas efetivas: {efetivas}")
+
+    if not falhas and abs(efetivas[0] - 10.6) < 1e-9 and efetivas[1] == 0.0 and efetivas[2] is None:
+        print(f"✅ {len(casos)} formatações e 3 alíquotas efetivas corretas")
+    else:
+        print(f"❌ FAIL: {falhas}")
+    print()
+
+
+def testar_agrupamento(codigo):
+    """Os relatórios devem conter todas as linhas do banco, agrupadas uma única vez."""
+    print(f"=== Testando agrupamento (NCM {codigo}) ===")
+    linhas_cst = database.buscar_cst_cclastrib_reducao_ncm(codigo)
+    relatorio_cst = relatorios.montar_relatorio_cst(codigo, linhas_cst)
+    chaves = {(linha[0], linha[2], linha[4]) for linha in linhas_cst}
+    reducoes = sum(1 for linha in linhas_cst if linha[6] is not None)
+    print(f"CST/CClasTrib: {len(linhas_cst)} linhas -> {len(relatorio_cst.combinacoes)} combinações, "
+          f"{relatorio_cst.total_reducoes} reduções ({relatorio_cst.reducoes_isencao} isenções)")
+
+    linhas_reducoes = database.buscar_reducoes_ncm(codigo)
+    relatorio_reducoes = relatorios.montar_relatorio_reducoes(codigo, linhas_reducoes)
+    agrupadas = sum(len(grupo.tributos) for grupo in relatorio_reducoes.classificacoes)
+    print(f"Reduções: {len(linhas_reducoes)} linhas -> {len(relatorio_reducoes.classificacoes)} classificações")
+
+    ncm, regras = database.buscar_informacoes_estruturadas_ncm(codigo)
+    relatorio_completo = relatorios.montar_relatorio_completo(ncm, regras)
+    print(f"Completo: {len(relatorio_completo.regras)} regras, tributos {relatorio_completo.tributos}")
+
+    if (len(relatorio_cst.combinacoes) == len(chaves) and relatorio_cst.total_reducoes == reducoes
+            and agrupadas == relatorio_reducoes.total == len(linhas_reducoes)
+            and len(relatorio_completo.regras) == len(regras)):
+        print("✅ Nenhuma linha perdida no agrupamento")
+    else:
+        print("❌ FAIL: contagens divergentes")
+
+    vazio = (relatorios.montar_relatorio_cst("9999", []),
+             relatorios.montar_relatorio_reducoes("9999", []),
+             relatorios.montar_relatorio_completo(None, []))
+    if vazio[0] is None and not vazio[1].classificacoes and vazio[2].ncm is None:
+        print("✅ NCM sem dados gera relatórios vazios")
+    else:
+        print(f"❌ FAIL: relatórios vazios inesperados: {vazio}")
+    print()
+
+
+def testar_cache(codigo):
+    """Cada relatório é montado uma vez por versão da base e reaproveitado pelas telas."""
+    print(f"=== Testando cache de relatórios (NCM {codigo}) ===")
+    versao = ["v1"]
+    motor = relatorios.MotorRelatorios(obter_versao=lambda: versao[0], tamanho_cache=4)
+
+    inicio = time.perf_counter()
+    primeiro = motor.relatorio_completo(codigo)
+    montagem_ms = (time.perf_counter() - inicio) * 1000
+
+    inicio = time.perf_counter()
+    for _ in range(3):
+        # Três telas exibindo o mesmo NCM
+        segundo = motor.relatorio_completo(codigo)
+    cache_ms = (time.perf_counter() - inicio) * 1000 / 3
+    print(f"Montagem: {montagem_ms:.2f} ms | do cache: {cache_ms:.4f} ms | {motor.estatisticas()}")
+
+    mesma_versao = segundo is primeiro and motor.montados == 1 and motor.acertos == 3
+
+    versao[0] = "v2"
+    terceiro = motor.relatorio_completo(codigo)
+    nova_versao = terceiro is not primeiro and motor.montados == 2
+
+    motor.relatorio_cst_cclastrib("9999")
+    motor.relatorio_cst_cclastrib("9999")
+    sem_resultado = motor.montados == 3 and motor.acertos == 4
+
+    for ncm in database.buscar_ncms(usar_snapshot=True)[:10]:
+        motor.relatorio_reducoes(ncm[0])
+    limite = motor.estatisticas()['relatorios_em_cache'] == 4
+
+    if mesma_versao and nova_versao and sem_resultado and limite:
+        print("✅ Reaproveitado na mesma versão, remontado na nova, vazio em cache e limite LRU respeitado")
+    else:
+        print(f"❌ FAIL: {mesma_versao}, {nova_versao}, {sem_resultado}, {limite}")
+    print()
+
+
+def testar_memoria_calculo(codigo):
+    """A memória de cálculo recebe só norma e tratamento, como na tela original, mesmo com vários tributos."""
+    print(f"=== Testando memória de cálculo (NCM {codigo}) ===")
+    ncm, regras = database.buscar_informacoes_estruturadas_ncm(codigo)
+    relatorio = relatorios.montar_relatorio_completo(ncm, regras)
+    divergentes = []
+    for regra, regra_relatorio in zip(regras, relatorio.regras):
+        memoria = regra.classificacao.memoria_calculo
+        esperado = database.processar_memoria_calculo(
+            memoria_calculo=memoria, norma=relatorios.NORMA_PADRAO,
+            tratamento=relatorios.TRATAMENTO_PADRAO) if memoria else memoria
+        if regra_relatorio.memoria_calculo != esperado:
+            divergentes.append(regra.id)
+    varios = sum(1 for regra in regras if len(regra.tributos) > 1)
+    print(f"{len(regras)} regras, {varios} com mais de um tributo")
+    if not divergentes:
+        print("✅ Memória de cálculo igual à exibida originalmente")
+    else:
+        print(f"❌ FAIL: memória divergente nas regras {divergentes[:5]}")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DA CAMADA DE RELATÓRIOS\n")
+    testar_formatacao()
+    testar_agrupamento("30049069")
+    testar_cache("30049069")
+    testar_memoria_calculo("0102")
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
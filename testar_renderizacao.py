@@ -0,0 +1,117 @@
+"""
+Teste da renderização em lote dos relatórios: modelo de documento, uma única
+chamada a Text.insert por relatório e tempo de montagem do NCM mais lento.
+O Tk real é usado quando há display; caso contrário, um Text simulado.
+"""
+import time
+import tkinter as tk
+import database
+import relatorios
+from calculadora import CalculadoraTributariaCompleta
+from documento import Documento, aplicar_no_widget, renderizar_texto
+
+
+class TextoSimulado:
+    """Imita delete/insert do tk.Text contando as chamadas."""
+
+    def __init__(self):
+        self.conteudo = []
+        self.chamadas_insert = 0
+
+    def delete(self, inicio, fim):
+        self.conteudo = []
+
+    def insert(self, indice, *argumentos):
+        self.chamadas_insert += 1
+        self.conteudo.extend(argumentos[0::2])
+
+
+class RotuloSimulado:
+    def config(self, **opcoes):
+        pass
+
+
+def testar_documento():
+    """Trechos consecutivos com a mesma tag são unidos e o texto simples é preservado."""
+    print("=== Testando modelo de documento ===")
+    documento = Documento()
+    documento.adicionar("NCM: ", "normal")
+    documento.adicionar("30049069\n", "normal")
+    documento.adicionar("")
+    documento.adicionar("Reduções: ", "destaque")
+    documento.adicionar("60%\n")
+
+    trechos = documento.trechos()
+    intervalos = documento.intervalos()
+    print(f"Trechos: {trechos}")
+    print(f"Intervalos: {intervalos}")
+
+    texto = TextoSimulado()
+    aplicar_no_widget(texto, documento)
+    if (len(trechos) == 3 and intervalos == [(0, 14, "normal"), (14, 24, "destaque")]
+            and renderizar_texto(documento) == "NCM: 30049069\nReduções: 60%\n"
+            and texto.chamadas_insert == 1):
+        print("✅ Documento com 3 trechos aplicado com 1 chamada")
+    else:
+        print("❌ FAIL: documento inesperado")
+    print()
+
+
+def testar_ncm_mais_lento(texto):
+    """Monta o relatório completo de todos os NCMs e mede o mais lento."""
+    print("=== Testando relatório completo de todos os NCMs ===")
+    app = CalculadoraTributariaCompleta.__new__(CalculadoraTributariaCompleta)
+    app.resultado_texto = texto
+    app.status_label = RotuloSimulado()
+
+    codigos = [ncm[0] for ncm in database.buscar_ncms(usar_snapshot=True)]
+    consultas = database.buscar_informacoes_estruturadas_lote(codigos)
+
+    mais_lento = (0.0, None)
+    inicio_total = time.perf_counter()
+    for codigo, (ncm, regras) in consultas.items():
+        inicio = time.perf_counter()
+        app.exibir_completo(codigo, relatorios.montar_relatorio_completo(ncm, regras))
+        tempo = time.perf_counter() - inicio
+        if tempo > mais_lento[0]:
+            mais_lento = (tempo, codigo)
+    tempo_total = time.perf_counter() - inicio_total
+
+    tempo, codigo = mais_lento
+    ncm, regras = consultas[codigo]
+    print(f"{len(consultas)} relatórios em {tempo_total:.2f} s")
+    print(f"NCM mais lento: {codigo} ({len(regras)} regras) em {tempo * 1000:.1f} ms")
+
+    if isinstance(texto, TextoSimulado):
+        texto.chamadas_insert = 0
+        app.exibir_completo(codigo, relatorios.montar_relatorio_completo(ncm, regras))
+        print(f"Trechos do relatório: {len(texto.conteudo)} | chamadas a insert: {texto.chamadas_insert}")
+        if texto.chamadas_insert == 1:
+            print("✅ Relatório aplicado com uma única chamada ao widget")
+        else:
+            print(f"❌ FAIL: {texto.chamadas_insert} chamadas a insert")
+    else:
+        caracteres = len(texto.get("1.0", tk.END))
+        print(f"✅ Relatório exibido no tk.Text ({caracteres} caracteres)")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DA RENDERIZAÇÃO EM LOTE\n")
+    testar_documento()
+
+    try:
+        janela = tk.Tk()
+        janela.withdraw()
+        texto = tk.Text(janela)
+    except tk.TclError:
+        print("(Tk indisponível: usando Text simulado)\n")
+        janela = None
+        texto = TextoSimulado()
+
+    testar_ncm_mais_lento(texto)
+
+    if janela is not None:
+        janela.destroy()
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
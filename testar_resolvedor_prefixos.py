@@ -0,0 +1,65 @@
+"""
+Teste do resolvedor hierárquico de NCM: herança de regras por prefixo e exceções.
+"""
+import time
+import database
+
+
+def testar_heranca():
+    """Verifica se um NCM de 8 dígitos herda as regras dos seus prefixos."""
+    print("=== Testando herança de regras ===")
+    print(f"Índice carregado: {database.obter_resolvedor_ncm().estatisticas()}")
+
+    codigo = "10062010"
+    diretas = database.buscar_cst_cclastrib_reducao_ncm(codigo)
+    herdadas = database.buscar_cst_cclastrib_reducao_ncm(codigo, incluir_herdadas=True)
+    print(f"NCM {codigo}: {len(diretas)} linhas diretas, {len(herdadas)} com herança")
+
+    for regra in database.buscar_regras_aplicaveis_ncm(codigo):
+        print(f"  NCMA_ID {regra[0]} cadastrada em {regra[1]} (cClassTrib ID {regra[2]})")
+    print()
+
+
+def testar_excecoes():
+    """Compara o resolvedor com uma consulta SQL equivalente para todos os NCMs."""
+    print("=== Testando exceções (comparação com SQL) ===")
+    conn = database.obter_conexao()
+    resolvedor = database.obter_resolvedor_ncm()
+    divergencias = 0
+    total = 0
+
+    for (codigo,) in conn.execute("SELECT NCM_CD FROM NCM"):
+        esperado = sorted(r[0] for r in conn.execute("""
+            SELECT na.NCMA_ID FROM NCM_APLICAVEL na
+            WHERE ? LIKE na.NCMA_NCM_CD || '%'
+              AND NOT EXISTS (
+                  SELECT 1 FROM EXCECAO_NCM_APLICAVEL e
+                  WHERE e.ENCM_NCMA_ID = na.NCMA_ID AND ? LIKE e.ENCM_NCM_CD || '%')
+        """, (codigo, codigo)))
+        if sorted(resolvedor.ids_aplicaveis(codigo)) != esperado:
+            divergencias += 1
+        total += 1
+
+    if divergencias == 0:
+        print(f"✅ {total} NCMs resolvidos igual ao SQL")
+    else:
+        print(f"❌ FAIL: {divergencias} de {total} NCMs divergentes")
+    print()
+
+
+def testar_desempenho():
+    """Mede o tempo médio de resolução em memória."""
+    print("=== Testando desempenho ===")
+    repeticoes = 10000
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        database.buscar_regras_aplicaveis_ncm("03021100")
+    media = (time.perf_counter() - inicio) / repeticoes
+    print(f"Tempo médio por resolução: {media * 1e6:.1f} µs")
+    print()
+
+
+if __name__ == "__main__":
+    testar_heranca()
+    testar_excecoes()
+    testar_desempenho()
@@ -0,0 +1,245 @@
+"""
+Teste do serviço HTTP de consultas: rotas, erros, lote, keep-alive e um
+gerador de carga local (várias threads, cada uma com uma conexão keep-alive)
+para medir a vazão em requisições por segundo.
+"""
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+import database
+import servidor_http
+
+
+def _iniciar_servidor(trabalhadores=16):
+    servidor = servidor_http.ServidorConsultas(("127.0.0.1", 0), trabalhadores)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, servidor.server_address[1]
+
+
+def _requisitar(conexao, metodo, caminho, corpo=None):
+    cabecalhos = {'Content-Type': 'application/json'} if corpo is not None else {}
+    conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+    resposta = conexao.getresponse()
+    return resposta.status, json.loads(resposta.read())
+
+
+def testar_rotas(porta):
+    """Todas as rotas numa única conexão keep-alive."""
+    print("=== Testando rotas ===")
+    conexao = http.client.HTTPConnection("127.0.0.1", porta)
+    casos = [
+        ("GET", "/ncm/30049069", 200),
+        ("GET", "/ncm/30049069?data=2027-03-01", 200),
+        ("GET", "/ncm/30049069/cst", 200),
+        ("GET", "/ncm/30049069/reducoes", 200),
+        ("GET", "/busca?q=leite", 200),
+        ("GET", "/saude", 200),
+        ("GET", "/ncm/99999999", 404),
+        ("GET", "/ncm/30049069?data=31/12/2026", 400),
+        ("GET", "/ncm/30049069/outra", 404),
+        ("GET", "/busca", 400),
+        ("POST", "/outra", 404),
+        ("POST", "/lote", 400),
+    ]
+    falhas = []
+    respostas = {}
+    for metodo, caminho, esperado in casos:
+        corpo = b'{"codigos": "x"}' if metodo == "POST" else None
+        status, dados = _requisitar(conexao, metodo, caminho, corpo)
+        respostas[caminho] = dados
+        if status != esperado:
+            falhas.append((caminho, status, esperado))
+
+    completo = respostas["/ncm/30049069"]
+    print(f"/ncm/30049069: {len(completo['regras'])} regras, tributos {completo['tributos']}")
+    print(f"/busca?q=leite: {respostas['/busca?q=leite']['total']} NCMs")
+
+    relatorio = database.buscar_informacoes_estruturadas_ncm("30049069")[1]
+    if not falhas and len(completo['regras']) == len(relatorio) and conexao.sock is not None:
+        print(f"✅ {len(casos)} requisições com status corretos na mesma conexão")
+    else:
+        print(f"❌ FAIL: {falhas}")
+    conexao.close()
+    print()
+
+
+def testar_lote(porta):
+    """O lote devolve cada código e lista os não encontrados."""
+    print("=== Testando lote ===")
+    codigos = [ncm[0] for ncm in database.buscar_ncms(usar_snapshot=True)[:200]] + ["99999999"]
+    conexao = http.client.HTTPConnection("127.0.0.1", porta)
+    pedido = json.dumps({"codigos": codigos, "tipo": "cst", "data_referencia": "2027-01-01"})
+    inicio = time.perf_counter()
+    status, dados = _requisitar(conexao, "POST", "/lote", pedido)
+    tempo_ms = (time.perf_counter() - inicio) * 1000
+    print(f"{len(codigos)} códigos em {tempo_ms:.1f} ms: {len(dados['resultados'])} resultados, "
+          f"não encontrados {dados['nao_encontrados']}")
+    if status == 200 and len(dados['resultados']) == 200 and dados['nao_encontrados'] == ["99999999"]:
+        print("✅ Lote respondido numa única requisição")
+    else:
+        print(f"❌ FAIL: status {status}")
+    conexao.close()
+    print()
+
+
+def testar_clientes_ociosos():
+    """Conexões keep-alive ociosas não impedem o atendimento de novos clientes."""
+    print("=== Testando clientes ociosos ===")
+    servidor, porta = _iniciar_servidor(trabalhadores=2)
+    try:
+        ociosas = [http.client.HTTPConnection("127.0.0.1", porta) for _ in range(2)]
+        for conexao in ociosas:
+            _requisitar(conexao, "GET", "/ncm/30049069/reducoes")
+
+        novo = http.client.HTTPConnection("127.0.0.1", porta)
+        inicio = time.perf_counter()
+        status, _ = _requisitar(novo, "GET", "/ncm/30049069/reducoes")
+        espera = time.perf_counter() - inicio
+
+        # Com uma conexão na fila, a resposta pede o fechamento da conexão atendida
+        fila = [http.client.HTTPConnection("127.0.0.1", porta) for _ in range(3)]
+        for conexao in fila:
+            conexao.connect()
+        time.sleep(0.05)
+        novo.request("GET", "/ncm/30049069/reducoes")
+        resposta = novo.getresponse()
+        resposta.read()
+        fechada = resposta.getheader("Connection") == "close"
+        for conexao in ociosas + fila + [novo]:
+            conexao.close()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    print(f"Novo cliente atendido em {espera * 1000:.0f} ms com 2 conexões ociosas e 2 threads")
+    if status == 200 and espera < servidor_http.TEMPO_OCIOSO + 0.5 and fechada:
+        print("✅ Ociosas fechadas rapidamente; Connection: close com conexões na fila")
+    else:
+        print(f"❌ FAIL: espera {espera:.2f} s, Connection: close {fechada}")
+    print()
+
+
+def _ler_resposta(cliente):
+    """Lê uma resposta completa do socket; retorna (status, cabeçalhos em minúsculas, corpo)."""
+    arquivo = cliente.makefile("rb")
+    status = int(arquivo.readline().split()[1])
+    cabecalhos = {}
+    for linha in iter(arquivo.readline, b"\r\n"):
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        cabecalhos[nome.strip().lower()] = valor.strip()
+    corpo = arquivo.read(int(cabecalhos.get("content-length", 0)))
+    arquivo.close()
+    return status, cabecalhos, corpo
+
+
+def testar_clientes_lentos():
+    """Requisição enviada aos poucos é lida por inteiro; Content-Length negativo é recusado."""
+    print("=== Testando clientes lentos e Content-Length inválido ===")
+    servidor, porta = _iniciar_servidor(trabalhadores=2)
+    pausa = servidor_http.TEMPO_OCIOSO * 3
+    try:
+        corpo = json.dumps({"codigos": ["30049069", "04011010"], "tipo": "cst"}).encode()
+        partes = [b"POST /lote HTTP/1.1\r\nHost: local\r\n",
+                  b"Content-Type: application/json\r\nContent-Length: " + str(len(corpo)).encode() + b"\r\n\r\n",
+                  corpo[:10], corpo[10:]]
+        with socket.create_connection(("127.0.0.1", porta)) as cliente:
+            for parte in partes:
+                cliente.sendall(parte)
+                time.sleep(pausa)
+            status_lento, _, resposta = _ler_resposta(cliente)
+        resultados_lento = len(json.loads(resposta)['resultados']) if status_lento == 200 else 0
+
+        with socket.create_connection(("127.0.0.1", porta)) as cliente:
+            cliente.settimeout(5)
+            cliente.sendall(b"POST /lote HTTP/1.1\r\nHost: local\r\nContent-Length: -1\r\n\r\n{}")
+            inicio = time.perf_counter()
+            status_negativo, cabecalhos, _ = _ler_resposta(cliente)
+            espera = time.perf_counter() - inicio
+            fechada = cliente.recv(1) == b""
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    print(f"Pausas de {pausa:.2f} s entre as partes: status {status_lento}, {resultados_lento} resultados; "
+          f"Content-Length -1: status {status_negativo} em {espera * 1000:.0f} ms, conexão fechada {fechada}")
+    if (status_lento == 200 and resultados_lento == 2 and status_negativo == 400
+            and cabecalhos.get("connection") == "close" and fechada and espera < 1):
+        print("✅ Cliente lento atendido; Content-Length negativo recusado sem bloquear a thread")
+    else:
+        print("❌ FAIL: cliente lento cortado ou Content-Length negativo aceito")
+    print()
+
+
+def gerar_carga(porta, caminhos, clientes=8, duracao=3.0):
+    """
+    Gerador de carga: cada cliente mantém uma conexão keep-alive e faz
+    requisições em sequência durante a duração.
+
+    Returns:
+        (requisições concluídas, erros, segundos)
+    """
+    contagens = [0] * clientes
+    erros = [0] * clientes
+    fim = time.perf_counter() + duracao
+
+    def cliente(indice):
+        aleatorio = random.Random(indice)
+        conexao = http.client.HTTPConnection("127.0.0.1", porta)
+        while time.perf_counter() < fim:
+            conexao.request("GET", aleatorio.choice(caminhos))
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status == 200:
+                contagens[indice] += 1
+            else:
+                erros[indice] += 1
+        conexao.close()
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=cliente, args=(indice,)) for indice in range(clientes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(contagens), sum(erros), time.perf_counter() - inicio
+
+
+def testar_vazao(porta):
+    """Vazão com o cache aquecido, com 8 clientes keep-alive."""
+    print("=== Testando vazão (gerador de carga local) ===")
+    codigos = [ncm[0] for ncm in random.Random(18).sample(database.buscar_ncms(usar_snapshot=True), 500)]
+    caminhos = [f"/ncm/{codigo}" for codigo in codigos] + [f"/ncm/{codigo}/cst" for codigo in codigos]
+
+    frio = gerar_carga(porta, caminhos, clientes=8, duracao=2.0)
+    quente = gerar_carga(porta, caminhos, clientes=8, duracao=3.0)
+    for nome, (requisicoes, erros, segundos) in (("Primeira passada", frio), ("Cache aquecido", quente)):
+        print(f"{nome}: {requisicoes} requisições em {segundos:.1f} s "
+              f"({requisicoes / segundos:,.0f} req/s), {erros} erros")
+
+    if quente[0] > 0 and quente[1] == 0:
+        print("✅ Carga atendida sem erros")
+    else:
+        print("❌ FAIL: erros sob carga")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DO SERVIÇO HTTP DE CONSULTAS\n")
+    servidor_http.aquecer()
+    servidor, porta = _iniciar_servidor()
+    try:
+        testar_rotas(porta)
+        testar_lote(porta)
+        testar_vazao(porta)
+        testar_clientes_ociosos()
+        testar_clientes_lentos()
+        print(f"Cache de respostas: {servidor.cache.estatisticas()}")
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
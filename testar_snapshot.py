@@ -0,0 +1,64 @@
+"""
+Teste do snapshot em memória: equivalência com as consultas SQL e tempo de resposta.
+"""
+import time
+from collections import Counter
+import database
+
+
+def testar_carregamento():
+    """Mede o tempo de carga do snapshot."""
+    print("=== Testando carregamento do snapshot ===")
+    inicio = time.perf_counter()
+    snap = database.obter_snapshot()
+    print(f"Snapshot carregado em {time.perf_counter() - inicio:.3f}s")
+    for chave, valor in snap.estatisticas().items():
+        print(f"  {chave}: {valor}")
+    print()
+
+
+def testar_equivalencia():
+    """Compara o snapshot com as consultas SQL para todos os NCMs."""
+    print("=== Testando equivalência com SQL ===")
+    snap = database.obter_snapshot()
+    divergencias = 0
+
+    for ncm_cd, _, _, _ in snap.ncms:
+        if database.buscar_informacoes_estruturadas_ncm.sem_cache(ncm_cd) != snap.informacoes_estruturadas(ncm_cd):
+            divergencias += 1
+        if Counter(database.buscar_cst_cclastrib_reducao_ncm(ncm_cd)) != Counter(snap.cst_cclastrib_reducao(ncm_cd)):
+            divergencias += 1
+
+    if divergencias == 0:
+        print(f"✅ {len(snap.ncms)} NCMs com resultados idênticos")
+    else:
+        print(f"❌ FAIL: {divergencias} divergências")
+    print()
+
+
+def testar_desempenho():
+    """Compara o tempo de consulta em memória com o SQL."""
+    print("=== Testando desempenho ===")
+    snap = database.obter_snapshot()
+    exemplos = ["100620", "04011010", "30049099", "220710", "851712"] * 200
+
+    tempos = {}
+    for nome, consultar in (("SQL completa", database.buscar_informacoes_completas_ncm.sem_cache),
+                            ("SQL estruturada", database.buscar_informacoes_estruturadas_ncm.sem_cache),
+                            ("Snapshot", snap.informacoes_estruturadas)):
+        inicio = time.perf_counter()
+        for codigo in exemplos:
+            consultar(codigo)
+        tempos[nome] = time.perf_counter() - inicio
+        print(f"{nome}: {tempos[nome] / len(exemplos) * 1e6:.1f} µs por consulta")
+    if tempos["Snapshot"] < min(tempos["SQL completa"], tempos["SQL estruturada"]):
+        print("✅ Snapshot mais rápido que as consultas SQL")
+    else:
+        print("❌ FAIL: snapshot mais lento que o SQL")
+    print()
+
+
+if __name__ == "__main__":
+    testar_carregamento()
+    testar_equivalencia()
+    testar_desempenho()
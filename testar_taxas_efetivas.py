@@ -0,0 +1,136 @@
+"""
+Teste da tabela materializada de alíquotas efetivas: equivalência com o
+cálculo sobre a consulta estruturada na data e tempo da busca por chave.
+"""
+import random
+import sqlite3
+import threading
+import time
+import database
+import taxas_efetivas
+
+DATAS = ["2025-06-01", "2026-12-31", "2027-01-01", "2028-03-15", "2031-07-01", "2033-12-31", "2040-01-01"]
+
+
+def esperado_na_data(codigo, data):
+    """Calcula as alíquotas efetivas do NCM na data a partir da consulta estruturada."""
+    _, regras = database.buscar_informacoes_estruturadas_ncm(codigo, incluir_herdadas=True,
+                                                              data_referencia=data)
+    esperado = {}
+    for regra in regras or []:
+        for tributo in regra.tributos:
+            if not tributo.aliquotas:
+                continue
+            aliquota = tributo.aliquotas[-1].valor
+            reducao = tributo.reducoes[0].valor if tributo.reducoes else 0.0
+            chave = (regra.classificacao.codigo, tributo.sigla)
+            esperado.setdefault(chave, taxas_efetivas.calcular_aliquota_efetiva(aliquota, reducao))
+    return esperado
+
+
+def testar_construcao():
+    """Constrói (ou reaproveita) a tabela da versão atual da base."""
+    print("=== Testando construção da tabela ===")
+    tabela = database.obter_taxas_efetivas()
+    inicio = time.perf_counter()
+    tabela.garantir_atualizado()
+    print(f"Tabela pronta em {time.perf_counter() - inicio:.2f}s: {tabela.estatisticas()}")
+    print()
+
+
+def testar_consulta_durante_atualizacao():
+    """Uma mudança da base detectada por outra thread não fecha a conexão de uma consulta em andamento."""
+    print("=== Testando consulta durante a atualização ===")
+    tabela = database.obter_taxas_efetivas()
+    tabela.garantir_atualizado()
+    consultando = threading.Event()
+    atualizada = threading.Event()
+    resultado = {}
+
+    def consultar():
+        cursor = tabela._pool.obter().execute("SELECT NCM_CD FROM TAXA_EFETIVA")
+        cursor.fetchone()
+        consultando.set()
+        atualizada.wait()
+        try:
+            resultado['linhas'] = len(cursor.fetchall())
+            resultado['seguinte'] = tabela.consultar_ncm("04011010", "2027-01-01") is not None
+        except sqlite3.ProgrammingError as erro:
+            resultado['erro'] = str(erro)
+
+    thread = threading.Thread(target=consultar)
+    thread.start()
+    consultando.wait()
+    # Simula a troca da assinatura do banco, percebida por esta thread
+    tabela._assinatura = None
+    tabela._ultima_verificacao = 0.0
+    tabela.garantir_atualizado()
+    atualizada.set()
+    thread.join()
+    print(f"Consulta em andamento: {resultado}")
+    if 'erro' not in resultado and resultado.get('linhas') and resultado.get('seguinte'):
+        print("✅ Consulta concluída e a seguinte feita numa conexão nova")
+    else:
+        print("❌ FAIL: conexão fechada durante a consulta")
+    print()
+
+
+def testar_equivalencia():
+    """A busca na tabela deve dar o mesmo valor que o cálculo sobre as regras vigentes."""
+    print("=== Testando equivalência com o cálculo na data ===")
+    snap = database.obter_snapshot()
+    codigos = [ncm[0] for ncm in random.Random(14).sample(snap.ncms, 200)] + ["30049069", "01012100"]
+
+    verificados = 0
+    divergencias = 0
+    for codigo in codigos:
+        for data in DATAS:
+            esperado = esperado_na_data(codigo, data)
+            obtido = {(taxa.cclasstrib, taxa.tributo): taxa.aliquota_efetiva
+                      for taxa in database.buscar_aliquotas_efetivas_ncm(codigo, data)}
+            if obtido != esperado:
+                divergencias += 1
+                continue
+            for (cclasstrib, sigla), valor in esperado.items():
+                taxa = database.buscar_aliquota_efetiva(codigo, cclasstrib, sigla, data)
+                if taxa is None or taxa.aliquota_efetiva != valor:
+                    divergencias += 1
+                verificados += 1
+
+    if divergencias == 0 and verificados > 0:
+        print(f"✅ {verificados} alíquotas efetivas iguais em {len(codigos)} NCMs x {len(DATAS)} datas")
+    else:
+        print(f"❌ FAIL: {divergencias} divergências ({verificados} verificadas)")
+    print()
+
+
+def testar_desempenho():
+    """Busca pela chave contra consulta estruturada + cálculo."""
+    print("=== Testando desempenho da validação de item ===")
+    taxas = database.buscar_aliquotas_efetivas_ncm("30049069", "2027-01-01")
+    itens = [(taxa.ncm, taxa.cclasstrib, taxa.tributo, "2027-01-01") for taxa in taxas] * 20
+
+    inicio = time.perf_counter()
+    for item in itens:
+        database.buscar_aliquota_efetiva(*item)
+    tempo_tabela = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for _ in range(5):
+        esperado_na_data("30049069", "2027-01-01")
+    tempo_calculo = (time.perf_counter() - inicio) / 5
+
+    print(f"Tabela: {tempo_tabela / len(itens) * 1e6:.1f} µs por item | "
+          f"consulta + cálculo do NCM: {tempo_calculo * 1e3:.2f} ms")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DA TABELA DE ALÍQUOTAS EFETIVAS\n")
+    testar_construcao()
+    testar_consulta_durante_atualizacao()
+    testar_equivalencia()
+    testar_desempenho()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
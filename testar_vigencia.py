@@ -0,0 +1,122 @@
+"""
+Teste da consulta por data de referência: índice de intervalos de vigência
+comparado com a varredura linear e consultas do snapshot numa data.
+"""
+import random
+import time
+import database
+import vigencia
+from resolvedor_prefixos import vigente_em
+
+DATAS = ["2024-12-31", "2025-01-01", "2026-06-15", "2026-12-31", "2027-01-01",
+         "2030-07-01", "2033-12-31", "2034-01-01", "2099-01-01"]
+
+
+def testar_indice():
+    """O índice deve devolver os mesmos itens que a varredura, em qualquer data."""
+    print("=== Testando índice de intervalos ===")
+    registros = [
+        ("A", "2025-01-01", "2026-12-31", "a1"),
+        ("A", "2027-01-01", None, "a2"),
+        ("A", "2026-01-01", "2027-06-30", "a3"),
+        ("B", None, "2025-12-31", "b1"),
+    ]
+    indice = vigencia.IndiceIntervalos(registros)
+
+    divergencias = 0
+    for ano in range(2024, 2030):
+        for dia in ("01-01", "06-30", "07-01", "12-31"):
+            data = f"{ano}-{dia}"
+            for chave in ("A", "B", "C"):
+                esperado = tuple(item for c, inicio, fim, item in registros
+                                 if c == chave and vigente_em(inicio or "", fim, data))
+                if indice.vigentes(chave, data) != esperado:
+                    divergencias += 1
+                    print(f"   {chave} em {data}: {indice.vigentes(chave, data)} != {esperado}")
+
+    print(f"Estatísticas: {indice.estatisticas()}")
+    if divergencias == 0 and indice.vigentes("A", "2026-06-30") == ("a1", "a3"):
+        print("✅ Índice equivalente à varredura em 72 consultas")
+    else:
+        print(f"❌ FAIL: {divergencias} divergências")
+
+    try:
+        vigencia.validar_data_referencia("31/12/2026")
+        print("❌ FAIL: data inválida aceita")
+    except ValueError:
+        print("✅ Data fora do formato AAAA-MM-DD rejeitada")
+    print()
+
+
+def testar_snapshot():
+    """Consultas na data equivalem a filtrar por vigência o resultado sem data."""
+    print("=== Testando consultas do snapshot na data ===")
+    snap = database.obter_snapshot()
+    inicio = time.perf_counter()
+    indices = snap.indices_vigencia()
+    print(f"Índices montados em {(time.perf_counter() - inicio) * 1000:.1f} ms; "
+          f"pontos de mudança: {len(indices.pontos)}")
+
+    codigos = [ncm[0] for ncm in random.Random(13).sample(snap.ncms, 300)] + ["30049069"]
+    divergencias = 0
+    for codigo in codigos:
+        ncm, regras = snap.informacoes_estruturadas(codigo)
+        for data in DATAS:
+            ncm_data, regras_data = snap.informacoes_estruturadas(codigo, data_referencia=data)
+            if not vigente_em(ncm.inicio_vigencia, ncm.fim_vigencia, data):
+                divergencias += ncm_data is not None
+                continue
+            esperado = [
+                (regra.id, [(t.sigla,
+                             [a.valor for a in t.aliquotas if vigente_em(a.inicio_vigencia, a.fim_vigencia, data)],
+                             [r.valor for r in t.reducoes if vigente_em(r.inicio_vigencia, r.fim_vigencia, data)])
+                            for t in regra.tributos])
+                for regra in regras if vigente_em(regra.inicio_vigencia, regra.fim_vigencia, data)
+            ]
+            obtido = [(regra.id, [(t.sigla, [a.valor for a in t.aliquotas], [r.valor for r in t.reducoes])
+                                  for t in regra.tributos])
+                      for regra in regras_data]
+            if obtido != esperado:
+                divergencias += 1
+
+    ncm, regras = database.buscar_informacoes_estruturadas_ncm("30049069", data_referencia="2027-03-01")
+    aliquotas = {t.sigla: [a.valor for a in t.aliquotas] for t in regras[0].tributos} if regras else {}
+    print(f"30049069 em 2027-03-01: {len(regras or [])} regras, alíquotas {aliquotas}")
+
+    if divergencias == 0 and all(len(valores) <= 1 for valores in aliquotas.values()):
+        print(f"✅ {len(codigos)} NCMs x {len(DATAS)} datas equivalentes ao filtro por vigência")
+    else:
+        print(f"❌ FAIL: {divergencias} divergências")
+    print()
+
+
+def testar_desempenho():
+    """Consulta pontual pelo índice contra a varredura linear dos registros."""
+    print("=== Testando desempenho da consulta pontual ===")
+    snap = database.obter_snapshot()
+    indices = snap.indices_vigencia()
+    chaves = list(snap.aliquotas_por_tributo) * 2000
+
+    inicio = time.perf_counter()
+    for chave in chaves:
+        [linha for linha in snap.aliquotas_por_tributo[chave] if vigente_em(linha[2], linha[3], "2030-07-01")]
+    tempo_varredura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for chave in chaves:
+        indices.aliquotas.vigentes(chave, "2030-07-01")
+    tempo_indice = time.perf_counter() - inicio
+
+    print(f"Varredura: {tempo_varredura / len(chaves) * 1e6:.2f} µs | "
+          f"índice: {tempo_indice / len(chaves) * 1e6:.2f} µs por consulta")
+    print()
+
+
+if __name__ == "__main__":
+    print("🧪 TESTE DA CONSULTA POR DATA DE REFERÊNCIA\n")
+    testar_indice()
+    testar_snapshot()
+    testar_desempenho()
+
+    database.fechar_conexoes()
+    print("🎉 Testes concluídos!")
@@ -0,0 +1,130 @@
+"""
+Índice de intervalos de vigência para consultas numa data de referência.
+Os registros de cada chave (NCM, regra, classificação, tributo...) são
+convertidos uma única vez em pontos de mudança ordenados: entre dois pontos
+consecutivos o conjunto de registros vigentes não muda, e ele fica pronto numa
+tupla. A consulta de uma data é então uma busca binária nos pontos da chave,
+sem percorrer os registros.
+As datas são textos ISO (YYYY-MM-DD); fim nulo significa vigência em aberto.
+"""
+
+from bisect import bisect_right
+from datetime import date, timedelta
+
+from resolvedor_prefixos import vigente_em
+
+# Início usado quando o registro não informa o início da vigência
+INICIO_INDEFINIDO = ""
+
+
+def dia_seguinte(data_iso):
+    """
+    Retorna o dia seguinte à data ISO (primeiro dia fora da vigência), ou None
+    se a data for a última representável (9999-12-31, usada como "sem fim").
+    """
+    try:
+        return (date.fromisoformat(data_iso) + timedelta(days=1)).isoformat()
+    except OverflowError:
+        return None
+
+
+def dia_anterior(data_iso):
+    """Retorna o dia anterior à data ISO (último dia de um segmento que termina nela)."""
+    return (date.fromisoformat(data_iso) - timedelta(days=1)).isoformat()
+
+
+def validar_data_referencia(data_referencia):
+    """
+    Valida a data de referência informada pelo usuário.
+
+    Returns:
+        A data no formato YYYY-MM-DD, ou None se não foi informada
+
+    Raises:
+        ValueError: Se a data não estiver no formato YYYY-MM-DD
+    """
+    if data_referencia is None:
+        return None
+    return date.fromisoformat(data_referencia).isoformat()
+
+
+class IndiceIntervalos:
+    """
+    Registros com vigência agrupados por chave, consultáveis por data.
+
+    Args:
+        registros: Iterável de (chave, inicio, fim, item); a ordem dos itens
+                   de cada chave é preservada nos resultados
+    """
+
+    def __init__(self, registros=()):
+        por_chave = {}
+        for chave, inicio, fim, item in registros:
+            por_chave.setdefault(chave, []).append((inicio or INICIO_INDEFINIDO, fim, item))
+
+        self._pontos = {}
+        self._segmentos = {}
+        self.total_registros = 0
+        for chave, intervalos in por_chave.items():
+            pontos = {inicio for inicio, _, _ in intervalos}
+            pontos.update(dia_seguinte(fim) for _, fim, _ in intervalos if fim)
+            pontos.discard(None)
+            pontos = sorted(pontos)
+            self._pontos[chave] = pontos
+            self._segmentos[chave] = [
+                tuple(item for inicio, fim, item in intervalos if vigente_em(inicio, fim, ponto))
+                for ponto in pontos
+            ]
+            self.total_registros += len(intervalos)
+
+    def localizar(self, chave, data):
+        """
+        Retorna (posicao, itens) do segmento de vigência que contém a data.
+        A posição identifica o segmento: datas com a mesma posição têm os mesmos itens.
+
+        Returns:
+            Tupla (posicao, itens); posicao é -1 e itens vazio se nada vigorar na data
+        """
+        pontos = self._pontos.get(chave)
+        if pontos is None:
+            return -1, ()
+        posicao = bisect_right(pontos, data) - 1
+        if posicao < 0:
+            return -1, ()
+        return posicao, self._segmentos[chave][posicao]
+
+    def vigentes(self, chave, data):
+        """Retorna a tupla de itens da chave vigentes na data."""
+        return self.localizar(chave, data)[1]
+
+    def pontos(self, chave=None):
+        """Retorna o conjunto dos pontos de mudança do índice (ou apenas os da chave)."""
+        if chave is not None:
+            return set(self._pontos.get(chave, ()))
+        return {ponto for pontos in self._pontos.values() for ponto in pontos}
+
+    def __contains__(self, chave):
+        return chave in self._pontos
+
+    def estatisticas(self):
+        """Retorna o tamanho do índice."""
+        return {
+            'chaves': len(self._pontos),
+            'registros': self.total_registros,
+            'segmentos': sum(len(pontos) for pontos in self._pontos.values()),
+        }
+
+
+def normalizar_data(pontos, data):
+    """
+    Retorna o maior ponto de mudança que não passa da data.
+    Duas datas com o mesmo ponto têm exatamente os mesmos registros vigentes em
+    todos os índices que geraram os pontos, o que permite usar o ponto como
+    chave de cache.
+
+    Args:
+        pontos: Lista ordenada dos pontos de mudança
+        data: Data de referência (YYYY-MM-DD)
+    """
+    posicao = bisect_right(pontos, data) - 1
+    return pontos[posicao] if posicao >= 0 else INICIO_INDEFINIDO